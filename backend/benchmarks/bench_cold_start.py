@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start cost of each Lambda handler
+
+Every sample is a fresh interpreter that imports handler.py the way the
+Lambda runtime does (init), then evaluates what a typical request of that
+scenario touches first (tables, clients, the nutrition engine), so work
+moved from init to first use is still counted. Pass a git ref to measure
+the same scenarios against an older tree (e.g. the commit before the lazy
+clients) and print both side by side. No AWS calls are made.
+
+Run from backend/: python benchmarks/bench_cold_start.py [--baseline REF] [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+LAMBDAS_DIR = os.path.join(BACKEND_DIR, 'lambdas')
+
+ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_EC2_METADATA_DISABLED': 'true',
+    'MEAL_PLANS_TABLE': 'MealPlans',
+    'USER_PREFERENCES_TABLE': 'UserPreferences',
+    'RECEIPTS_TABLE': 'Receipts',
+    'RESULT_CACHE_TABLE': 'ResultCache',
+    'PLAN_JOBS_TABLE': 'PlanJobs',
+    'PLAN_JOBS_QUEUE_URL': 'https://sqs.us-east-1.amazonaws.com/000000000000/PlanJobs',
+    'RECEIPTS_BUCKET': 'receipts',
+}
+
+# (function, scenario, expressions evaluated in the handler module after import)
+SCENARIOS = [
+    ('analyze_receipt_ai', 'analyze', ['receipts_table.meta', 'user_preferences_table.meta', 'bedrock.client']),
+    ('api_upload', 'presign', ['s3_client.meta']),
+    ('auth_callback', 'token exchange', []),
+    ('auth_login', 'login', []),
+    ('generate_plan', 'pantryItems', ['user_preferences_table.meta', 'result_cache_table.meta',
+                                      'meal_plans_table.meta', 'bedrock.client', 'get_nutrition_engine()']),
+    ('generate_plan', 'async submit', ['plan_jobs_table.meta', 'get_job_queue()']),
+    ('get_meal_plan', 'job poll', ['plan_jobs_table.meta']),
+    ('get_meal_plan', 'list plans', ['meal_plans_table.meta']),
+    ('parse_receipt', 'parse', ['textract_client.meta', 'receipts_table.meta']),
+    ('preferences', 'get', ['preferences_table.meta']),
+]
+
+CHILD = r'''
+import json, os, sys, time
+lambdas_dir, lambda_name, expressions = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+sys.path[:0] = [lambdas_dir, os.path.join(lambdas_dir, lambda_name)]
+started = time.perf_counter()
+import handler
+init = time.perf_counter() - started
+for expression in expressions:
+    eval(expression, vars(handler))
+total = time.perf_counter() - started
+print(json.dumps({'init': init * 1000, 'first': total * 1000}))
+'''
+
+
+def sample(lambdas_dir, lambda_name, expressions):
+    env = dict(os.environ, **ENV)
+    completed = subprocess.run([sys.executable, '-c', CHILD, lambdas_dir, lambda_name, json.dumps(expressions)],
+                               capture_output=True, text=True, env=env, cwd=os.path.join(lambdas_dir, lambda_name))
+    if completed.returncode != 0:
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(lambdas_dir, runs):
+    results = {}
+    for lambda_name, scenario, expressions in SCENARIOS:
+        sample(lambdas_dir, lambda_name, expressions)  # warm the page cache / .pyc files
+        samples = [sample(lambdas_dir, lambda_name, expressions) for _ in range(runs)]
+        if any(s is None for s in samples):
+            results[(lambda_name, scenario)] = None
+            continue
+        results[(lambda_name, scenario)] = (statistics.median(s['init'] for s in samples),
+                                            statistics.median(s['first'] for s in samples))
+    return results
+
+
+def export_tree(ref, target):
+    archive = subprocess.run(['git', 'archive', ref, 'lambdas'], cwd=BACKEND_DIR, capture_output=True, check=True)
+    subprocess.run(['tar', '-x', '-C', target], input=archive.stdout, check=True)
+    return os.path.join(target, 'lambdas')
+
+
+def cell(result):
+    return '        n/a        ' if result is None else f"{result[0]:7.0f} {result[1]:9.0f}  "
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start cost per Lambda handler')
+    parser.add_argument('--baseline', help='git ref to compare against (e.g. HEAD~1)')
+    parser.add_argument('--runs', type=int, default=7, help='fresh interpreters per scenario (median)')
+    args = parser.parse_args()
+
+    current = measure(LAMBDAS_DIR, args.runs)
+    baseline = None
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as target:
+            baseline = measure(export_tree(args.baseline, target), args.runs)
+
+    print(f"median of {args.runs} fresh interpreters, ms (init = import handler; first = init + first request's setup)\n")
+    columns = f"{'init':>7} {'first':>9}  "
+    print(f"{'':<36}" + (f"{'baseline':<19}" if baseline is not None else '') + f"{'current':<19}")
+    print(f"{'function / scenario':<36}" + (columns if baseline is not None else '') + columns)
+    for lambda_name, scenario, _ in SCENARIOS:
+        key = (lambda_name, scenario)
+        line = f"{lambda_name + ' / ' + scenario:<36}"
+        if baseline is not None:
+            line += cell(baseline[key])
+        line += cell(current[key])
+        if baseline is not None and baseline[key] and current[key]:
+            line += f"  first {current[key][1] - baseline[key][1]:+6.0f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: categorizing receipt items locally instead of in the analysis response
+
+Builds synthetic receipts from the normalizer's canonical names plus a few
+names the keyword dictionary can't place, then times building the automaton
+(once per container), a first pass (each distinct name through the
+Aho-Corasick pass) and a warm pass (memoized, as in a warm Lambda), and
+reports how many items are still left for the model.
+
+Run from backend/: python benchmarks/bench_item_categories.py [receipt_count]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas', 'analyze_receipt_ai'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas', 'parse_receipt'))
+
+from item_categories import ItemCategorizer  # noqa: E402
+from item_names import CANONICAL_NAMES  # noqa: E402
+
+UNPLACED = ['Chicken Noodle Soup', 'Kombucha Ginger', 'Dish Brush', 'Gift Card', 'Pad Thai Kit']
+
+
+def make_receipts(count, seed=7):
+    rng = random.Random(seed)
+    names = list(CANONICAL_NAMES) + UNPLACED
+    return [[{'name': rng.choice(names), 'price': round(rng.uniform(1, 15), 2)} for _ in range(rng.randint(8, 30))]
+            for _ in range(count)]
+
+
+def timed(label, run, item_count):
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {elapsed * 1000:9.1f} ms  {elapsed / item_count * 1e6:7.2f} us/item")
+    return result
+
+
+def main():
+    receipt_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    receipts = make_receipts(receipt_count)
+    item_count = sum(len(items) for items in receipts)
+    print(f"{receipt_count:,} receipts, {item_count:,} items")
+
+    started = time.perf_counter()
+    categorizer = ItemCategorizer()
+    print(f"{'build automaton':<24} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    timed('first pass', lambda: [categorizer.categorize_items(items) for items in receipts], item_count)
+    results = timed('warm (memoized)', lambda: [categorizer.categorize_items(items) for items in receipts],
+                    item_count)
+
+    leftovers = sum(len(left) for _, left in results)
+    print(f"\nleft for the model: {leftovers:,} of {item_count:,} items ({leftovers / item_count:.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tolerant JSON extraction over complete and truncated model responses
+
+Builds a corpus of meal plan and receipt insight responses shaped like real
+Claude output (prose preamble, ```json fences) plus copies cut off at several
+points, then compares the legacy find/rfind + json.loads parse with
+utils.llm_json.extract_json on throughput and on how much data survives.
+
+Run from backend/: python benchmarks/bench_llm_json.py
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas'))
+
+from utils.llm_json import extract_json  # noqa: E402
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+INSIGHT_SECTIONS = ['categories', 'nutritionalAssessment', 'budgetAnalysis', 'recipeSuggestions',
+                    'missingEssentials', 'mealPlanIdeas', 'healthTips']
+INGREDIENTS = ['chicken breast', 'brown rice', 'broccoli', 'olive oil', 'eggs', 'spinach', 'oats',
+               'greek yogurt', 'salmon', 'sweet potato', 'black beans', 'avocado', 'whole wheat tortilla']
+CUT_POINTS = (0.3, 0.5, 0.7, 0.9, 0.97)
+
+
+def make_meal(rng, label):
+    return {
+        'name': f"{label} {rng.choice(['Bowl', 'Salad', 'Wrap', 'Stir-Fry', 'Skillet'])}",
+        'ingredients': rng.sample(INGREDIENTS, 4),
+        'prepTime': f"{rng.randint(5, 40)} mins",
+        'calories': rng.randint(150, 700),
+        'protein': rng.randint(5, 45),
+        'carbs': rng.randint(10, 80),
+        'fat': rng.randint(3, 30)
+    }
+
+
+def make_plan_response(rng):
+    plan = {
+        'weeklyPlan': {
+            day: {
+                'breakfast': make_meal(rng, 'Breakfast'),
+                'lunch': make_meal(rng, 'Lunch'),
+                'dinner': make_meal(rng, 'Dinner'),
+                'snacks': [make_meal(rng, 'Snack')]
+            }
+            for day in WEEKDAYS
+        },
+        'tips': ['Prep grains on Sunday', 'Keep cut vegetables ready']
+    }
+    return "Here's your personalized 7-day meal plan:\n\n```json\n" + json.dumps(plan, indent=2) + "\n```"
+
+
+def make_insights_response(rng):
+    items = [{'name': name, 'price': round(rng.uniform(1, 12), 2)} for name in rng.sample(INGREDIENTS, 8)]
+    insights = {
+        'categories': {'produce': items[:3], 'protein': items[3:5], 'grains': items[5:]},
+        'nutritionalAssessment': {'healthScore': 7, 'healthyItemsCount': 6, 'unhealthyItemsCount': 2,
+                                  'balanceDescription': 'Good variety of proteins and vegetables'},
+        'budgetAnalysis': {'totalSpent': round(sum(i['price'] for i in items), 2), 'averageItemCost': 5.1,
+                           'budgetStatus': 'Under budget', 'savingsOpportunities': ['Buy store brand rice']},
+        'recipeSuggestions': [{'name': 'Chicken Rice Bowl', 'ingredients': INGREDIENTS[:3], 'prepTime': '25 mins',
+                               'servings': 4, 'estimatedCost': 12.0}],
+        'missingEssentials': ['garlic', 'onions'],
+        'mealPlanIdeas': ['Monday: Chicken stir-fry', 'Tuesday: Salmon with rice'],
+        'healthTips': ['Great job on buying fresh vegetables!']
+    }
+    return "Analysis complete.\n```json\n" + json.dumps(insights, indent=2) + "\n```"
+
+
+def build_corpus(count=50, seed=7):
+    """Complete responses plus truncated copies, tagged with their kind"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        for kind, text in (('plan', make_plan_response(rng)), ('insights', make_insights_response(rng))):
+            corpus.append((kind, 'complete', text))
+            for cut in CUT_POINTS:
+                corpus.append((kind, f'cut@{int(cut * 100)}%', text[:int(len(text) * cut)]))
+    return corpus
+
+
+def legacy_parse(text):
+    """The find/rfind slice used by parse_meal_plan_response/parse_ai_insights before"""
+    try:
+        start_idx = text.find('{')
+        end_idx = text.rfind('}') + 1
+        return json.loads(text[start_idx:end_idx])
+    except ValueError:
+        return {}
+
+
+def tolerant_parse(kind, text):
+    if kind == 'plan':
+        return extract_json(text, expected_keys=['weeklyPlan'], expected_members={'weeklyPlan': WEEKDAYS}).data
+    return extract_json(text, expected_keys=INSIGHT_SECTIONS).data
+
+
+def recovered_units(kind, data):
+    """Days for plans, sections for insights"""
+    if kind == 'plan':
+        weekly_plan = data.get('weeklyPlan')
+        return len(weekly_plan) if isinstance(weekly_plan, dict) else 0
+    return sum(1 for section in INSIGHT_SECTIONS if section in data)
+
+
+def measure(corpus, parse, repeat=5):
+    total_bytes = sum(len(text) for _, _, text in corpus) * repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for kind, _, text in corpus:
+            parse(kind, text)
+    elapsed = time.perf_counter() - started
+    return total_bytes / elapsed / 1e6, elapsed / (len(corpus) * repeat) * 1e6
+
+
+def main():
+    corpus = build_corpus()
+    print(f"Corpus: {len(corpus)} responses, {sum(len(t) for _, _, t in corpus) / 1e6:.2f} MB")
+
+    subsets = {
+        'all': corpus,
+        'complete': [entry for entry in corpus if entry[1] == 'complete'],
+        'truncated': [entry for entry in corpus if entry[1] != 'complete'],
+    }
+    for name, subset in subsets.items():
+        legacy_mbps, legacy_us = measure(subset, lambda kind, text: legacy_parse(text))
+        tolerant_mbps, tolerant_us = measure(subset, tolerant_parse)
+        print(f"[{name:<9}] legacy find/rfind : {legacy_mbps:8.2f} MB/s  {legacy_us:8.1f} us/response")
+        print(f"[{name:<9}] extract_json      : {tolerant_mbps:8.2f} MB/s  {tolerant_us:8.1f} us/response")
+
+    print()
+    print(f"{'kind':<9} {'variant':<9} | {'legacy units':>12} | {'tolerant units':>14}")
+    print('-' * 52)
+    groups = {}
+    for kind, variant, text in corpus:
+        legacy = recovered_units(kind, legacy_parse(text))
+        tolerant = recovered_units(kind, tolerant_parse(kind, text))
+        totals = groups.setdefault((kind, variant), [0, 0, 0])
+        totals[0] += legacy
+        totals[1] += tolerant
+        totals[2] += 1
+    for (kind, variant), (legacy, tolerant, n) in groups.items():
+        print(f"{kind:<9} {variant:<9} | {legacy / n:>12.2f} | {tolerant / n:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
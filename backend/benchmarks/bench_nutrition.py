@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: scoring 10,000 weekly meal plans with the nutrition engine
+
+Generates synthetic plans (7 days x 3 meals + 1 snack, 3-5 ingredient lines
+with amounts) and times NutritionEngine.score_plans on the whole batch with
+NumPy, then the pure-Python aggregation used when NumPy is unavailable, and a
+plan-at-a-time loop for comparison.
+
+Run from backend/: python benchmarks/bench_nutrition.py [plan_count]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas', 'generate_plan'))
+
+import nutrition  # noqa: E402
+from nutrition import NutritionEngine  # noqa: E402
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+INGREDIENTS = ['150g chicken breast', '1 cup brown rice', '2 large eggs', '1 cup broccoli', '1 tbsp olive oil',
+               '140g salmon fillet', '200g sweet potato', '1 cup greek yogurt', '1/2 cup berries', '1 banana',
+               '2 slices whole wheat bread', '1 cup black beans', '100g tofu', '1 cup quinoa', '1 avocado',
+               '1 cup spinach', '30g cheddar cheese', '2 tbsp peanut butter', '1 cup oats', '1 cup milk',
+               'salt and pepper', '1 cup pasta', '120g ground turkey', '1/2 onion', '2 cloves garlic']
+
+
+def make_plans(count, seed=11):
+    rng = random.Random(seed)
+    plans = []
+    for _ in range(count):
+        weekly_plan = {}
+        for day in WEEKDAYS:
+            weekly_plan[day] = {
+                slot: {'name': slot, 'ingredients': rng.sample(INGREDIENTS, rng.randint(3, 5))}
+                for slot in ('breakfast', 'lunch', 'dinner')
+            }
+            weekly_plan[day]['snacks'] = [{'name': 'snack', 'ingredients': rng.sample(INGREDIENTS, 2)}]
+        plans.append(weekly_plan)
+    targets = [(rng.choice([1600, 2000, 2400]), 150, 200, 65) for _ in range(count)]
+    return plans, targets
+
+
+def timed(label, run, plan_count):
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  {plan_count / elapsed:11,.0f} plans/s")
+    return result
+
+
+def main():
+    plan_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    plans, targets = make_plans(plan_count)
+    ingredient_lines = sum(len(meal['ingredients']) for plan in plans for day in plan.values()
+                           for meal in [day['breakfast'], day['lunch'], day['dinner']] + day['snacks'])
+    engine = NutritionEngine()
+    print(f"{plan_count:,} plans, {ingredient_lines:,} ingredient lines, NumPy: {nutrition.np is not None}")
+
+    timed('cold (ingredient lookups)', lambda: engine.score_plans(plans, targets), plan_count)
+    report = timed('batch, NumPy', lambda: engine.score_plans(plans, targets), plan_count)
+    timed('one plan at a time, NumPy',
+          lambda: [engine.score_plans([plan], [target]) for plan, target in zip(plans, targets)], plan_count)
+
+    numpy_module = nutrition.np
+    nutrition.np = None
+    try:
+        python_engine = NutritionEngine()
+        python_engine.score_plans(plans, targets)
+        timed('batch, pure Python', lambda: python_engine.score_plans(plans, targets), plan_count)
+    finally:
+        nutrition.np = numpy_module
+
+    scores = sorted(float(score) for score in report.plan_scores)
+    print(f"\ntarget match: min {scores[0]:.1f}  median {scores[len(scores) // 2]:.1f}  max {scores[-1]:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: size of the legacy meal plan prompt vs the compiled prompt
+
+Run from backend/: python benchmarks/bench_prompt_size.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas', 'generate_plan'))
+
+from prompt_compiler import compile_meal_plan_prompt, estimate_tokens  # noqa: E402
+
+PREFERENCES = {
+    'budget': 100,
+    'dietaryRestrictions': 'vegetarian, no nuts',
+    'nutritionGoal': 'weight-loss',
+    'caloricTarget': 1800,
+    'proteinTarget': 120,
+    'carbTarget': 150,
+    'fatTarget': 60
+}
+
+STAPLES = [
+    'Quinoa', 'Black Beans', 'Spinach', 'Avocado', 'Olive Oil', 'Greek Yogurt', 'Eggs',
+    'Brown Rice', 'Chicken Breast', 'Broccoli', 'Sweet Potatoes', 'Oats', 'Bananas',
+    'Blueberries', 'Almond Butter', 'Whole Wheat Bread', 'Cheddar Cheese', 'Tomatoes',
+    'Onions', 'Garlic', 'Lentils', 'Tofu', 'Bell Peppers', 'Salmon Fillet', 'Milk',
+    'Carrots', 'Cucumber', 'Pasta', 'Marinara Sauce', 'Apples', 'Shopping Bag', 'Sales Tax'
+]
+
+
+def legacy_meal_plan_prompt(preferences, grocery_items):
+    """
+    The pre-compiler create_meal_plan_prompt, kept verbatim as the baseline
+    """
+    grocery_list = "\n".join([f"- {item.get('name', 'Unknown item')}" for item in grocery_items[:20]])
+    
+    prompt = f"""You are a professional nutritionist and meal planning expert. Create a personalized 7-day meal plan based on the following information:
+
+AVAILABLE GROCERY ITEMS:
+{grocery_list if grocery_list.strip() else 'No recent grocery data available'}
+
+REQUIREMENTS:
+1. Create a COMPLETE 7-day meal plan (Monday, Tuesday, Wednesday, Thursday, Friday, Saturday, Sunday)
+2. Include breakfast, lunch, dinner, and 1-2 snacks per day for ALL 7 DAYS
+3. Use the available grocery items when possible
+4. Include simple, practical recipes
+5. Provide estimated prep time and nutrition info for each meal
+
+IMPORTANT: You MUST include all 7 days. Do not truncate or abbreviate any days.
+
+RESPONSE FORMAT (JSON):
+{{
+  "weeklyPlan": {{
+    "monday": {{
+      "breakfast": {{"name": "Meal Name", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}},
+      "lunch": {{"name": "Meal Name", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}},
+      "dinner": {{"name": "Meal Name", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}},
+      "snacks": [{{"name": "Snack Name", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}]
+    }},
+    "tuesday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
+    "wednesday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
+    "thursday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
+    "friday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
+    "saturday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
+    "sunday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }}
+  }}
+}}
+
+Generate a practical, healthy, and budget-friendly meal plan that helps achieve the user's nutrition goals."""
+
+    return prompt
+
+
+def pantry_of(size):
+    """Receipt-style pantry: staples repeat across receipts, most recent first"""
+    return [{'name': STAPLES[i % len(STAPLES)]} for i in range(size)]
+
+
+def time_call(fn, repeat=200):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    print(f"{'pantry':>6} | {'legacy chars':>12} {'legacy tok':>10} | {'compiled chars':>14} {'compiled tok':>12} "
+          f"{'items':>5} | {'saved':>6} | {'compile us':>10}")
+    print('-' * 98)
+    for size in (0, 5, 20, 50, 200):
+        grocery_items = pantry_of(size)
+        legacy = legacy_meal_plan_prompt(PREFERENCES, grocery_items)
+        compiled = compile_meal_plan_prompt(PREFERENCES, grocery_items)
+        legacy_tokens = estimate_tokens(legacy)
+        saved = 1 - compiled.tokens / legacy_tokens
+        micros = time_call(lambda: compile_meal_plan_prompt(PREFERENCES, grocery_items))
+        print(f"{size:>6} | {len(legacy):>12} {legacy_tokens:>10} | {len(compiled.text):>14} {compiled.tokens:>12} "
+              f"{len(compiled.pantry_items):>5} | {saved:>6.0%} | {micros:>10.1f}")
+
+    print()
+    for budget in (350, 450, 600):
+        compiled = compile_meal_plan_prompt(PREFERENCES, pantry_of(200), input_token_budget=budget)
+        print(f"budget {budget:>4}: {compiled.tokens} tokens, {len(compiled.pantry_items)} items kept, "
+              f"{len(compiled.dropped_items)} dropped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: encoding large API responses
+
+Builds a get_meal_plan list response (10 week plans read back from DynamoDB,
+so every number is a Decimal) and an analyze_receipt_ai insights response,
+then times the per-handler encoders the handlers used to carry against
+utils.db_helpers.dumps with orjson (when installed) and with the stdlib
+fallback.
+
+Run from backend/: python benchmarks/bench_responses.py [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas'))
+
+from utils import db_helpers  # noqa: E402
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+class LegacyDecimalEncoder(json.JSONEncoder):
+    """The DecimalEncoder copied into analyze_receipt_ai and parse_receipt"""
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super(LegacyDecimalEncoder, self).default(obj)
+
+
+def legacy_decimal_default(obj):
+    """The decimal_default of get_meal_plan"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def make_meal(day, slot, index):
+    return {
+        'name': f"{day.capitalize()} {slot} bowl {index}",
+        'calories': Decimal(str(450 + index)), 'protein': Decimal('32.5'),
+        'carbs': Decimal('48'), 'fat': Decimal('17.25'),
+        'ingredients': ['150g chicken breast', '1 cup brown rice', '1 cup broccoli', '1 tbsp olive oil'],
+        'prepTime': '25 mins'
+    }
+
+
+def make_plan_list(plan_count=10):
+    plans = []
+    for plan_index in range(plan_count):
+        weekly_plan = {day: {slot: make_meal(day, slot, plan_index) for slot in ('breakfast', 'lunch', 'dinner')}
+                       for day in WEEKDAYS}
+        meals = [dict(meal, day=day.capitalize(), mealType=slot.capitalize(),
+                      imageUrl='https://images.pexels.com/photos/1640777/pexels-photo-1640777.jpeg')
+                 for day, slots in weekly_plan.items() for slot, meal in slots.items()]
+        plans.append({
+            'planId': f"plan-{plan_index}", 'planDate': f"2025-01-{plan_index + 1:02d}",
+            'mealPlan': {'weeklyPlan': weekly_plan, 'meals': meals,
+                         'weeklyTotals': {'totalCalories': Decimal('22050'), 'estimatedCost': Decimal('84.50')}},
+            'preferencesUsed': {'budget': Decimal('100'), 'caloricTarget': Decimal('2000')},
+            'createdAt': '2025-01-01T12:00:00', 'status': 'active'
+        })
+    return {'success': True, 'mealPlans': plans, 'count': plan_count, 'message': 'Meal plans retrieved successfully'}
+
+
+def make_insights(item_count=60):
+    return {
+        'success': True, 's3Key': 'receipts/u1/receipt.jpg', 'userId': 'u1',
+        'insights': {
+            'categories': {'produce': [{'name': f"Item {i}", 'price': Decimal(f"{i % 9}.99")} for i in range(item_count)]},
+            'nutritionalAssessment': {'score': Decimal('7.5'), 'notes': ['More leafy greens'] * 10},
+            'budgetAnalysis': {'totalSpent': Decimal('142.37'), 'byCategory': {f"cat{i}": Decimal('11.5') for i in range(12)}},
+            'recipeSuggestions': [{'name': f"Recipe {i}", 'ingredients': ['a', 'b', 'c'], 'calories': Decimal('520')}
+                                  for i in range(8)],
+        }
+    }
+
+
+def timed(label, encode, payload, iterations):
+    encode(payload)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        body = encode(payload)
+    elapsed = (time.perf_counter() - started) / iterations
+    print(f"  {label:<34} {elapsed * 1e6:9.1f} us  {len(body):>8,} chars")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    payloads = [('get_meal_plan list (10 plans)', make_plan_list()), ('analyze_receipt_ai insights', make_insights())]
+    orjson_module = db_helpers.orjson
+
+    for name, payload in payloads:
+        print(name)
+        timed('json.dumps(cls=DecimalEncoder)', lambda p: json.dumps(p, cls=LegacyDecimalEncoder), payload, iterations)
+        timed('json.dumps(default=decimal_default)', lambda p: json.dumps(p, default=legacy_decimal_default),
+              payload, iterations)
+        db_helpers.orjson = None
+        timed('db_helpers.dumps, stdlib', db_helpers.dumps, payload, iterations)
+        db_helpers.orjson = orjson_module
+        if orjson_module is not None:
+            timed('db_helpers.dumps, orjson', db_helpers.dumps, payload, iterations)
+        else:
+            print("  (orjson not installed)")
+
+
+if __name__ == '__main__':
+    main()
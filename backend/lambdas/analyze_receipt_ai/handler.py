@@ -1,22 +1,124 @@
 import json
-import boto3
 import os
 from datetime import datetime
 from decimal import Decimal
 
-# Initialize AWS clients
-bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-1')
-dynamodb = boto3.resource('dynamodb')
+from item_categories import CATEGORIES, category_entry, get_item_categorizer
+from utils.aws_clients import lazy_table
+from utils.bedrock_client import get_bedrock_client
+from utils.budget_ledger import record_spend, week_bucket
+from utils.db_helpers import create_response, error_response
+from utils.llm_json import extract_json
+from utils.metrics import metered_handler, tag_request
+from utils.model_router import TASK_ANALYZE, TASK_CATEGORIZE, estimate_tokens, get_model_router
+from utils.receipts import receipt_key
+from utils.result_cache import ResultCache, content_hash, normalize_preferences
+
+# Initialize AWS clients (Bedrock calls share one retrying, rate-adaptive client)
+bedrock = get_bedrock_client()
 
 # Environment variables
 RECEIPTS_TABLE = os.environ.get('RECEIPTS_TABLE')
 USER_PREFERENCES_TABLE = os.environ.get('USER_PREFERENCES_TABLE')
+RESULT_CACHE_TABLE = os.environ.get('RESULT_CACHE_TABLE')
+
+# Allowed methods in this endpoint's CORS headers
+CORS_METHODS = 'POST, OPTIONS'
+
+# DynamoDB tables (built on first use)
+receipts_table = lazy_table(RECEIPTS_TABLE)
+user_preferences_table = lazy_table(USER_PREFERENCES_TABLE)
+result_cache_table = lazy_table(RESULT_CACHE_TABLE) if RESULT_CACHE_TABLE else None
+
+# Model tier per call: small receipts go to a faster model than large ones (utils.model_router)
+model_router = get_model_router()
+
+# API Gateway gives up after 29s; a typical analysis response is ~1200 tokens
+ANALYSIS_SLO_MS = int(os.environ.get('ANALYSIS_SLO_MS', '25000'))
+TYPICAL_ANALYSIS_TOKENS = 1200
+
+# Receipt items -> categories by keyword (memo lives across warm invocations)
+item_categorizer = get_item_categorizer()
+
+# Top-level sections of the stored analysis
+INSIGHT_SECTIONS = [
+    'categories',
+    'nutritionalAssessment',
+    'budgetAnalysis',
+    'recipeSuggestions',
+    'missingEssentials',
+    'mealPlanIdeas',
+    'healthTips'
+]
+
+# Sections the model writes (see ANALYSIS_FORMAT): item_categorizer fills in
+# categories, so the model only names categories for the items it couldn't place
+MODEL_SECTIONS = ['itemCategories'] + INSIGHT_SECTIONS[1:]
+
+# What to analyze and the JSON shape of one receipt's analysis (shared by the single and batch prompts)
+ANALYSIS_FORMAT = """ANALYSIS REQUIREMENTS:
+1. **Categorize Items**: Items are already sorted into categories (in brackets). For items marked [?] only, choose one of: produce, protein, dairy, grains, snacks, beverages, other
+2. **Nutritional Assessment**: Evaluate the nutritional balance (healthy vs. unhealthy items)
+3. **Budget Analysis**: Calculate total spent and budget efficiency
+4. **Recipe Suggestions**: Suggest 3-5 recipes that can be made with these ingredients
+5. **Missing Items**: Identify essential pantry staples that might be missing
+6. **Health Score**: Rate the purchase on a health scale (1-10)
+7. **Savings Opportunities**: Suggest where they could save money or buy healthier alternatives
+8. **Meal Plan Ideas**: Brief suggestions for meals this week
 
-# DynamoDB tables
-receipts_table = dynamodb.Table(RECEIPTS_TABLE)
-user_preferences_table = dynamodb.Table(USER_PREFERENCES_TABLE)
+RESPONSE FORMAT (JSON):
+{
+  "itemCategories": {"item marked [?]": "produce"},
+  "nutritionalAssessment": {
+    "healthScore": 7,
+    "healthyItemsCount": 15,
+    "unhealthyItemsCount": 3,
+    "balanceDescription": "Good variety of proteins and vegetables..."
+  },
+  "budgetAnalysis": {
+    "totalSpent": 85.50,
+    "averageItemCost": 4.75,
+    "budgetStatus": "Under budget",
+    "savingsOpportunities": ["Buy store brand milk to save $2", "Frozen vegetables instead of fresh saves $5"]
+  },
+  "recipeSuggestions": [
+    {
+      "name": "Grilled Chicken Salad",
+      "ingredients": ["chicken breast", "lettuce", "tomatoes"],
+      "prepTime": "20 mins",
+      "servings": 4,
+      "estimatedCost": 12.00
+    }
+  ],
+  "missingEssentials": ["olive oil", "garlic", "onions", "spices"],
+  "mealPlanIdeas": [
+    "Monday: Chicken stir-fry with vegetables",
+    "Tuesday: Pasta with marinara sauce",
+    "Wednesday: Grilled salmon with rice"
+  ],
+  "healthTips": [
+    "Great job on buying fresh vegetables!",
+    "Consider reducing processed snacks",
+    "Add more whole grains to your cart"
+  ]
+}"""
+
+# Batch analysis (backfills): receipts sharing the prompt preferences go in one request
+BATCH_MAX_RECEIPTS = int(os.environ.get('BATCH_MAX_RECEIPTS', '4'))
+BATCH_MAX_TOKENS_PER_RECEIPT = 2000
 
+# Insights keyed by item list + prompt preferences, shared across users: re-uploads
+# and identical weekly shops skip the model call
+INSIGHT_CACHE_VERSION = 2
+insight_cache = ResultCache(
+    table=result_cache_table,
+    key_prefix='insight#',
+    max_entries=int(os.environ.get('INSIGHT_CACHE_MAX_ENTRIES', '256')),
+    ttl_seconds=int(os.environ.get('INSIGHT_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+)
 
+
+@metered_handler('analyze_receipt_ai')
 def lambda_handler(event, context):
     """
     AI-powered receipt analysis using Amazon Bedrock
@@ -25,89 +127,94 @@ def lambda_handler(event, context):
     try:
         body = json.loads(event.get('body', '{}'))
         s3_key = body.get('s3Key')
-        user_id = body.get('userId', 'anonymous')
+        user_id = body.get('userId')
+        tag_request(userId=user_id)
         
         if not s3_key:
-            return error_response(400, 's3Key is required')
+            return error_response(400, 's3Key is required', methods=CORS_METHODS)
+        if not user_id:
+            return error_response(400, 'userId is required', methods=CORS_METHODS)
+        
+        # The parsed receipt, read by its key (derived from the S3 key)
+        try:
+            key = receipt_key(s3_key)
+        except ValueError as e:
+            return error_response(400, 'Invalid s3Key', str(e), CORS_METHODS)
+        # Only the receipt's owner may read or (re)analyze it
+        if key['user_id'] != user_id:
+            return error_response(404, 'Receipt not found', methods=CORS_METHODS)
         
-        # Get receipt data from S3 key
-        receipt_data = get_receipt_data_from_s3(s3_key)
+        receipt = get_receipt(key)
+        if receipt is None:
+            return error_response(404, 'Receipt not found', 'Parse the receipt before analyzing it', CORS_METHODS)
+        if receipt.get('status') == 'error':
+            return error_response(422, 'Receipt could not be parsed', receipt.get('error'), CORS_METHODS)
+        
+        receipt_id = key['receipt_id']
         
         # Check if AI insights already exist (return cached results)
-        if 'ai_insights' in receipt_data and receipt_data['ai_insights']:
+        if receipt.get('ai_insights') and not body.get('forceRefresh'):
+            tag_request(cache='hit')
             print(f"Returning cached AI insights for receipt {receipt_id}")
-            return {
-                'statusCode': 200,
-                'headers': cors_headers(),
-                'body': json.dumps({
-                    'success': True,
-                    'receiptId': receipt_id,
-                    'insights': receipt_data['ai_insights'],
-                    'message': 'Receipt analysis retrieved from cache',
-                    'cached': True
-                }, cls=DecimalEncoder)
-            }
-        
-        # Get user preferences for context
-        user_preferences = get_user_preferences(user_id)
+            return create_response(200, {
+                'success': True,
+                's3Key': s3_key,
+                'userId': key['user_id'],
+                'receiptId': receipt_id,
+                'insights': receipt['ai_insights'],
+                'message': 'Receipt analysis retrieved from cache',
+                'cached': True
+            }, CORS_METHODS)
         
-        # Analyze receipt with Bedrock AI
-        ai_insights = analyze_receipt_with_bedrock(
-            receipt_data, 
-            user_preferences
-        )
+        tag_request(cache='miss')
+        items = receipt.get('items') or []
         
-        # Store insights in DynamoDB
-        store_analysis_results(user_id, s3_key, ai_insights)
+        if items:
+            # Get user preferences for context
+            user_preferences = get_user_preferences(key['user_id'])
+            
+            # Analyze receipt with Bedrock AI (or reuse insights for an identical item list)
+            ai_insights, cache_tier = analyze_receipt_cached(receipt, user_preferences)
+            if cache_tier:
+                tag_request(cache=f"hit:{cache_tier}")
+        else:
+            # Nothing to analyze; don't pay for a model call
+            ai_insights = create_fallback_insights(items)
         
-        # Update user's budget tracker with total spent
-        total_spent = ai_insights.get('budgetAnalysis', {}).get('totalSpent', 0)
-        if total_spent > 0:
-            update_budget_tracking(user_id, total_spent)
+        # Store insights on the receipt; fallback results are not cached so a later request retries
+        if not ai_insights.get('fallback'):
+            # The receipt's total goes to its week's spend (on a forceRefresh, only the change)
+            previous_insights = receipt.get('ai_insights')
+            amount = insights_total(ai_insights) - insights_total(previous_insights)
+            
+            # Only the analysis whose write replaced previous_insights records the spend, so a
+            # concurrent or retried analysis of the same receipt can't count it twice
+            stored = update_receipt_with_insights(key['user_id'], receipt_id, ai_insights, previous_insights)
+            
+            if stored and amount:
+                update_budget_tracking(key['user_id'], amount, receipt_time(receipt))
         
-        return {
-            'statusCode': 200,
-            'headers': cors_headers(),
-            'body': json.dumps({
-                'success': True,
-                's3Key': s3_key,
-                'userId': user_id,
-                'insights': ai_insights,
-                'message': 'Receipt analyzed successfully with AI'
-            }, cls=DecimalEncoder)
-        }
+        return create_response(200, {
+            'success': True,
+            's3Key': s3_key,
+            'userId': key['user_id'],
+            'receiptId': receipt_id,
+            'insights': ai_insights,
+            'message': 'Receipt analyzed successfully with AI',
+            'cached': False
+        }, CORS_METHODS)
         
     except Exception as e:
         print(f"Error in AI receipt analysis: {str(e)}")
-        return error_response(500, 'Failed to analyze receipt', str(e))
+        return error_response(500, 'Failed to analyze receipt', str(e), CORS_METHODS)
 
 
-def get_receipt_data_from_s3(s3_key):
+def get_receipt(key):
     """
-    Retrieve receipt data from S3 or DynamoDB using s3_key
+    The parsed Receipts item for {'user_id', 'receipt_id'}, or None
     """
-    try:
-        # For now, return basic structure
-        # In production, you'd call Textract to extract text from S3 file
-        return {
-            's3_key': s3_key,
-            'status': 'pending_analysis'
-        }
-    except Exception as e:
-        print(f"Error getting receipt from S3: {str(e)}")
-        raise
-
-
-def store_analysis_results(user_id, s3_key, ai_insights):
-    """
-    Store analysis results in DynamoDB
-    """
-    try:
-        # Store in receipts table if needed
-        return True
-    except Exception as e:
-        print(f"Error storing analysis results: {str(e)}")
-        raise
+    response = receipts_table.get_item(Key=key)
+    return response.get('Item')
 
 
 def get_user_preferences(user_id):
@@ -123,6 +230,86 @@ def get_user_preferences(user_id):
 
 
 
+def normalize_receipt_items(items):
+    """
+    Sorted (name, price in cents, quantity) of each item: case, spacing and order don't matter
+    """
+    normalized = []
+    for item in items or []:
+        name = ' '.join(str(item.get('name') or '').lower().split())
+        try:
+            cents = int(round(float(item.get('price') or 0) * 100))
+        except (TypeError, ValueError):
+            cents = 0
+        quantity = item.get('quantity', 1)
+        try:
+            quantity = float(quantity)
+        except (TypeError, ValueError):
+            quantity = 1.0
+        normalized.append([name, cents, quantity])
+    return sorted(normalized)
+
+
+def prompt_preferences(user_preferences):
+    """
+    The preference fields create_analysis_prompt uses, normalized
+    """
+    preferences = user_preferences or {}
+    return normalize_preferences({
+        'budget': preferences.get('budget'),
+        'dietaryRestrictions': preferences.get('dietaryRestrictions')
+    })
+
+
+def make_insight_cache_key(items, user_preferences):
+    """
+    Content-addressed key: SHA-256 of the normalized items and the preference
+    fields create_analysis_prompt uses
+    """
+    material = {
+        'v': INSIGHT_CACHE_VERSION,
+        'models': model_router.fingerprint(),
+        'items': normalize_receipt_items(items),
+        'preferences': prompt_preferences(user_preferences)
+    }
+    return content_hash(material)
+
+
+def get_cached_insights(items, user_preferences):
+    """
+    (insights, tier) from the shared insight cache, or (None, None).
+    The analysis is shared; the item list and timestamp belong to this receipt.
+    """
+    insights, tier = insight_cache.get(make_insight_cache_key(items, user_preferences))
+    if insights is not None:
+        insights['originalItems'] = items
+        insights['itemCount'] = len(items)
+        insights['analyzedAt'] = datetime.now().isoformat()
+    return insights, tier
+
+
+def cache_insights(items, user_preferences, insights):
+    # Only complete model results are shared; fallbacks and partial answers are retried next time
+    if not insights.get('fallback') and not insights.get('missingSections'):
+        insight_cache.put(make_insight_cache_key(items, user_preferences), insights)
+
+
+def analyze_receipt_cached(receipt_data, user_preferences):
+    """
+    analyze_receipt_with_bedrock behind the shared insight cache.
+    Returns (insights, tier) where tier is "memory", "dynamodb" or None when the model was called.
+    """
+    items = receipt_data.get('items', [])
+    insights, tier = get_cached_insights(items, user_preferences)
+    if insights is not None:
+        print(f"Insight cache hit ({tier})")
+        return insights, tier
+    
+    insights = analyze_receipt_with_bedrock(receipt_data, user_preferences)
+    cache_insights(items, user_preferences, insights)
+    return insights, None
+
+
 def analyze_receipt_with_bedrock(receipt_data, user_preferences):
     """
     Use Bedrock Claude to analyze receipt and provide intelligent insights
@@ -134,44 +321,106 @@ def analyze_receipt_with_bedrock(receipt_data, user_preferences):
         # Create AI prompt
         prompt = create_analysis_prompt(items, user_preferences)
         
-        # Call Bedrock Claude 4.5 Sonnet via inference profile (most intelligent available model)
-        response = bedrock_runtime.invoke_model(
-            modelId='us.anthropic.claude-sonnet-4-5-20250929-v1:0',
-            body=json.dumps({
-                'anthropic_version': 'bedrock-2023-05-31',
-                'max_tokens': 3000,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': prompt
-                    }
-                ],
-                'temperature': 0.5
-            })
-        )
-        
-        # Parse response
-        response_body = json.loads(response['body'].read())
-        analysis_text = response_body['content'][0]['text']
+        # Call Bedrock (model tier chosen by receipt size and the SLO)
+        analysis_text = invoke_analysis_model(prompt)
         
         # Parse structured insights from Claude's response
         insights = parse_ai_insights(analysis_text, items)
         
-        return insights
+        # A truncated response keeps its complete sections; ask again for the missing ones only
+        if insights.get('missingSections'):
+            insights = complete_missing_sections(insights, items, user_preferences)
+        
+        return apply_item_categories(insights, items)
         
     except Exception as e:
         print(f"Error in Bedrock analysis: {str(e)}")
         return create_fallback_insights(receipt_data.get('items', []))
 
 
-def create_analysis_prompt(items, user_preferences):
+def invoke_analysis_model(prompt, max_tokens=3000, task=TASK_ANALYZE, slo_ms=ANALYSIS_SLO_MS):
     """
-    Create a comprehensive prompt for receipt analysis
+    Call the model tier routed for this prompt and return the generated text
+    """
+    decision = model_router.route(task, estimate_tokens(prompt), max_tokens, slo_ms=slo_ms,
+                                  output_tokens=min(max_tokens, TYPICAL_ANALYSIS_TOKENS))
+    return model_router.invoke_text(bedrock, decision, create_analysis_request(prompt, max_tokens))
+
+
+def create_analysis_request(prompt, max_tokens=3000):
+    """
+    InvokeModel body for the analysis model (also the modelInput of batch-inference records)
+    """
+    return {
+        'anthropic_version': 'bedrock-2023-05-31',
+        'max_tokens': max_tokens,
+        'messages': [
+            {
+                'role': 'user',
+                'content': prompt
+            }
+        ],
+        'temperature': 0.5
+    }
+
+
+def complete_missing_sections(insights, items, user_preferences):
+    """
+    Re-request only the sections missing from a truncated analysis and merge them in
+    """
+    missing_sections = insights['missingSections']
+    print(f"Re-requesting missing analysis sections: {missing_sections}")
+    
+    try:
+        prompt = create_analysis_prompt(items, user_preferences) + (
+            "\n\nReturn a JSON object containing ONLY these keys: " + ", ".join(missing_sections)
+        )
+        # Only leftover item categories missing: a small task for the fast tier
+        task = TASK_CATEGORIZE if missing_sections == ['itemCategories'] else TASK_ANALYZE
+        extraction = extract_json(invoke_analysis_model(prompt, task=task), expected_keys=missing_sections)
+        for section in missing_sections:
+            if section in extraction.data:
+                insights[section] = extraction.data[section]
+    except Exception as e:
+        print(f"Error re-requesting analysis sections: {str(e)}")
+    
+    return fill_missing_sections(insights, items)
+
+
+def format_receipt_items(items):
+    """
+    One line per item with its category from item_categorizer ([?] when the model should decide)
     """
-    items_text = "\n".join([
-        f"- {item.get('name', 'Unknown')}: ${item.get('price', 0):.2f} (Qty: {item.get('quantity', 1)})"
+    return "\n".join([
+        f"- {item.get('name', 'Unknown')}: ${item.get('price', 0):.2f} (Qty: {item.get('quantity', 1)}) "
+        f"[{item_categorizer.categorize(item.get('name')).category or '?'}]"
         for item in items
     ])
+
+
+def apply_item_categories(insights, items):
+    """
+    Build the categories section: item_categorizer's buckets, plus the
+    model's itemCategories for the items it couldn't place ("other" if none)
+    """
+    categories, leftovers = item_categorizer.categorize_items(items)
+    model_categories = insights.pop('itemCategories', None)
+    if not isinstance(model_categories, dict):
+        model_categories = {}
+    
+    for item in leftovers:
+        category = str(model_categories.get(item.get('name')) or '').strip().lower()
+        categories[category if category in CATEGORIES else 'other'].append(category_entry(item))
+    
+    insights['categories'] = categories
+    return insights
+
+
+def create_analysis_prompt(items, user_preferences):
+    """
+    Create a comprehensive prompt for receipt analysis
+    """
+    items_text = format_receipt_items(items)
     
     budget = user_preferences.get('budget', 'Not specified')
     allergies = user_preferences.get('dietaryRestrictions', 'None')
@@ -185,60 +434,7 @@ USER CONTEXT:
 - Weekly Budget: ${budget}
 - Dietary Restrictions/Allergies: {allergies}
 
-ANALYSIS REQUIREMENTS:
-1. **Categorize Items**: Group items by category (produce, protein, dairy, grains, snacks, etc.)
-2. **Nutritional Assessment**: Evaluate the nutritional balance (healthy vs. unhealthy items)
-3. **Budget Analysis**: Calculate total spent and budget efficiency
-4. **Recipe Suggestions**: Suggest 3-5 recipes that can be made with these ingredients
-5. **Missing Items**: Identify essential pantry staples that might be missing
-6. **Health Score**: Rate the purchase on a health scale (1-10)
-7. **Savings Opportunities**: Suggest where they could save money or buy healthier alternatives
-8. **Meal Plan Ideas**: Brief suggestions for meals this week
-
-RESPONSE FORMAT (JSON):
-{{
-  "categories": {{
-    "produce": [{{"name": "item", "price": 0.00}}],
-    "protein": [{{"name": "item", "price": 0.00}}],
-    "dairy": [{{"name": "item", "price": 0.00}}],
-    "grains": [{{"name": "item", "price": 0.00}}],
-    "snacks": [{{"name": "item", "price": 0.00}}],
-    "beverages": [{{"name": "item", "price": 0.00}}],
-    "other": [{{"name": "item", "price": 0.00}}]
-  }},
-  "nutritionalAssessment": {{
-    "healthScore": 7,
-    "healthyItemsCount": 15,
-    "unhealthyItemsCount": 3,
-    "balanceDescription": "Good variety of proteins and vegetables..."
-  }},
-  "budgetAnalysis": {{
-    "totalSpent": 85.50,
-    "averageItemCost": 4.75,
-    "budgetStatus": "Under budget",
-    "savingsOpportunities": ["Buy store brand milk to save $2", "Frozen vegetables instead of fresh saves $5"]
-  }},
-  "recipeSuggestions": [
-    {{
-      "name": "Grilled Chicken Salad",
-      "ingredients": ["chicken breast", "lettuce", "tomatoes"],
-      "prepTime": "20 mins",
-      "servings": 4,
-      "estimatedCost": 12.00
-    }}
-  ],
-  "missingEssentials": ["olive oil", "garlic", "onions", "spices"],
-  "mealPlanIdeas": [
-    "Monday: Chicken stir-fry with vegetables",
-    "Tuesday: Pasta with marinara sauce",
-    "Wednesday: Grilled salmon with rice"
-  ],
-  "healthTips": [
-    "Great job on buying fresh vegetables!",
-    "Consider reducing processed snacks",
-    "Add more whole grains to your cart"
-  ]
-}}
+{ANALYSIS_FORMAT}
 
 Analyze the receipt and provide actionable, helpful insights in JSON format."""
 
@@ -248,38 +444,57 @@ Analyze the receipt and provide actionable, helpful insights in JSON format."""
 def parse_ai_insights(analysis_text, original_items):
     """
     Parse Claude's analysis into structured data
+    Truncated or fenced responses keep every complete section; the rest are listed in missingSections
     """
     try:
-        # Extract JSON from response
-        start_idx = analysis_text.find('{')
-        end_idx = analysis_text.rfind('}') + 1
+        extraction = extract_json(analysis_text, expected_keys=MODEL_SECTIONS)
+        insights = extraction.data
         
-        if start_idx != -1 and end_idx != -1:
-            json_str = analysis_text[start_idx:end_idx]
-            insights = json.loads(json_str)
-            
-            # Add original items and metadata
-            insights['originalItems'] = original_items
-            insights['analyzedAt'] = datetime.now().isoformat()
-            insights['itemCount'] = len(original_items)
-            
-            return insights
-        else:
+        if len(extraction.missing) == len(MODEL_SECTIONS):
             raise ValueError("No JSON found in AI response")
+        
+        if extraction.missing:
+            print(f"AI insights missing sections: {extraction.missing}")
+            insights['missingSections'] = extraction.missing
+        
+        # Add original items and metadata
+        insights['originalItems'] = original_items
+        insights['analyzedAt'] = datetime.now().isoformat()
+        insights['itemCount'] = len(original_items)
+        
+        return insights
             
     except Exception as e:
         print(f"Error parsing AI insights: {str(e)}")
         return create_fallback_insights(original_items)
 
 
+def fill_missing_sections(insights, items):
+    """
+    Use the basic fallback values for any sections that are still missing
+    """
+    fallback = create_fallback_insights(items)
+    still_missing = [section for section in insights.get('missingSections', []) if section not in insights]
+    
+    for section in still_missing:
+        insights[section] = fallback.get(section, {})
+    
+    if still_missing:
+        insights['missingSections'] = still_missing
+    else:
+        insights.pop('missingSections', None)
+    
+    return insights
+
+
 def create_fallback_insights(items):
     """
     Create basic insights if AI analysis fails
     """
     total_spent = sum(item.get('price', 0) * item.get('quantity', 1) for item in items)
     
-    return {
-        "categories": {"other": items},
+    # Categories still come from item_categorizer; items it can't place go to "other"
+    return apply_item_categories({
         "nutritionalAssessment": {
             "healthScore": 5,
             "balanceDescription": "Unable to analyze - basic processing only"
@@ -294,8 +509,9 @@ def create_fallback_insights(items):
         "healthTips": ["Enable AI analysis for detailed nutritional insights"],
         "originalItems": items,
         "analyzedAt": datetime.now().isoformat(),
-        "itemCount": len(items)
-    }
+        "itemCount": len(items),
+        "fallback": True
+    }, items)
 
 
 def convert_floats_to_decimal(obj):
@@ -312,96 +528,256 @@ def convert_floats_to_decimal(obj):
         return obj
 
 
-def update_receipt_with_insights(user_id, receipt_id, insights):
+def update_receipt_with_insights(user_id, receipt_id, insights, previous_insights=None):
     """
-    Update receipt in DynamoDB with AI insights
+    Update receipt in DynamoDB with AI insights, only if its stored total is
+    still the one in previous_insights (the analysis that was read).
+    Returns True when the write went through.
     """
     try:
         # Convert floats to Decimal for DynamoDB
         insights_decimal = convert_floats_to_decimal(insights)
         
+        # Only annotate receipts that exist; never create a bare insights item
+        condition = 'attribute_exists(receipt_id)'
+        names = {'#insights': 'ai_insights'}
+        values = {
+            ':insights': insights_decimal,
+            ':timestamp': datetime.now().isoformat()
+        }
+        previous_total = ((previous_insights or {}).get('budgetAnalysis') or {}).get('totalSpent')
+        if not previous_insights:
+            condition += ' AND attribute_not_exists(#insights)'
+        elif previous_total is None:
+            condition += ' AND attribute_not_exists(#insights.#budget.#total)'
+            names.update({'#budget': 'budgetAnalysis', '#total': 'totalSpent'})
+        else:
+            condition += ' AND #insights.#budget.#total = :previous_total'
+            names.update({'#budget': 'budgetAnalysis', '#total': 'totalSpent'})
+            values[':previous_total'] = convert_floats_to_decimal(previous_total)
+        
         receipts_table.update_item(
             Key={
                 'user_id': user_id,
                 'receipt_id': receipt_id
             },
-            UpdateExpression='SET ai_insights = :insights, analyzed_at = :timestamp',
-            ExpressionAttributeValues={
-                ':insights': insights_decimal,
-                ':timestamp': datetime.now().isoformat()
-            }
+            UpdateExpression='SET #insights = :insights, analyzed_at = :timestamp',
+            ConditionExpression=condition,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
         )
+        return True
     except Exception as e:
-        print(f"Error updating receipt: {str(e)}")
+        if is_conditional_check_failure(e):
+            print(f"Receipt {receipt_id} was analyzed concurrently; keeping the stored insights")
+        else:
+            print(f"Error updating receipt: {str(e)}")
+        return False
+
 
+def is_conditional_check_failure(error):
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
 
-def update_budget_tracking(user_id, amount_spent):
+
+def insights_total(insights):
     """
-    Update user's budget tracking with new purchase
-    Subtracts from weekly budget in UserPreferences table
+    budgetAnalysis.totalSpent of an analysis as a float (0 when absent)
     """
     try:
-        print(f"Updating budget: User {user_id} spent ${amount_spent}")
-        
-        # Get current budget data
-        response = user_preferences_table.get_item(Key={'user_id': user_id})
-        preferences = response.get('Item', {})
-        
-        # Get current budget and spent amount
-        weekly_budget = float(preferences.get('weekly_budget', 100))  # Default $100
-        total_spent = float(preferences.get('total_spent', 0))
-        
-        # Add new expense
-        new_total_spent = total_spent + float(amount_spent)
-        remaining_budget = weekly_budget - new_total_spent
-        
-        # Update in DynamoDB
-        user_preferences_table.update_item(
-            Key={'user_id': user_id},
-            UpdateExpression='SET total_spent = :spent, remaining_budget = :remaining, last_purchase = :timestamp',
-            ExpressionAttributeValues={
-                ':spent': Decimal(str(new_total_spent)),
-                ':remaining': Decimal(str(remaining_budget)),
-                ':timestamp': datetime.now().isoformat()
-            }
-        )
-        
-        print(f"Budget updated: ${new_total_spent} spent of ${weekly_budget}, ${remaining_budget} remaining")
-        
+        return float(((insights or {}).get('budgetAnalysis') or {}).get('totalSpent') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def receipt_time(receipt):
+    """
+    When the receipt was parsed (its ledger week), or None for now
+    """
+    try:
+        return datetime.fromisoformat(receipt['processed_at'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def update_budget_tracking(user_id, amount_spent, when=None):
+    """
+    Add a purchase to the user's weekly spending ledger (UserPreferences)
+    One atomic ADD: no read, and parallel analyses can't lose each other's updates
+    """
+    try:
+        print(f"Updating budget: User {user_id} spent ${amount_spent:.2f} in {week_bucket(when)}")
+        record_spend(user_preferences_table, user_id, amount_spent, when)
     except Exception as e:
         print(f"Error updating budget: {str(e)}")
 
 
-def cors_headers():
-    """CORS headers for API responses"""
-    return {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'POST, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type'
-    }
+def plan_insight_batches(entries, max_receipts=None):
+    """
+    Group (receipt, user_preferences) pairs into batches of at most
+    max_receipts whose prompt preferences match, so each batch needs one
+    USER CONTEXT block. Returns [(receipts, user_preferences), ...].
+    """
+    size = max(1, max_receipts or BATCH_MAX_RECEIPTS)
+    groups = {}
+    for receipt, user_preferences in entries:
+        group = groups.setdefault(content_hash(prompt_preferences(user_preferences)), (user_preferences, []))
+        group[1].append(receipt)
+    
+    batches = []
+    for user_preferences, receipts in groups.values():
+        for start in range(0, len(receipts), size):
+            batches.append((receipts[start:start + size], user_preferences))
+    return batches
 
 
-def error_response(status_code, message, details=None):
-    """Standard error response format"""
-    body = {
-        'success': False,
-        'error': message
-    }
-    if details:
-        body['details'] = details
+def batch_label(index):
+    return f"R{index + 1}"
+
+
+def create_batch_analysis_prompt(receipts, user_preferences):
+    """
+    One prompt for several receipts: each is labelled R1, R2, ... and the
+    response is a JSON object with one analysis per label
+    """
+    receipts_text = "\n\n".join(
+        f"RECEIPT {batch_label(index)}:\n{format_receipt_items(receipt.get('items', [])) or 'No items found'}"
+        for index, receipt in enumerate(receipts)
+    )
+    labels = ", ".join(batch_label(index) for index in range(len(receipts)))
     
+    budget = user_preferences.get('budget', 'Not specified')
+    allergies = user_preferences.get('dietaryRestrictions', 'None')
+    
+    return f"""You are an AI nutritionist and meal planning expert. Analyze each of these {len(receipts)} grocery receipts separately and provide intelligent insights for each.
+
+{receipts_text}
+
+USER CONTEXT (applies to every receipt):
+- Weekly Budget: ${budget}
+- Dietary Restrictions/Allergies: {allergies}
+
+Analyze every receipt on its own (never combine items across receipts).
+
+{ANALYSIS_FORMAT}
+
+Return ONE JSON object whose keys are the receipt labels ({labels}) and whose values are each receipt's analysis in the format above. Keep suggestions brief."""
+
+
+def split_batch_insights(analysis_text, receipts):
+    """
+    Per-receipt insights from a batch response, in receipt order; None for a
+    receipt whose analysis is missing or incomplete (e.g. a truncated response)
+    """
+    labels = [batch_label(index) for index in range(len(receipts))]
+    try:
+        data = extract_json(analysis_text, expected_keys=labels).data
+    except Exception as e:
+        print(f"Error parsing batch analysis: {str(e)}")
+        data = {}
+    
+    results = []
+    for label, receipt in zip(labels, receipts):
+        analysis = data.get(label)
+        if not isinstance(analysis, dict) or any(section not in analysis for section in MODEL_SECTIONS):
+            results.append(None)
+            continue
+        items = receipt.get('items', [])
+        insights = apply_item_categories({section: analysis[section] for section in MODEL_SECTIONS}, items)
+        insights['originalItems'] = items
+        insights['analyzedAt'] = datetime.now().isoformat()
+        insights['itemCount'] = len(items)
+        results.append(insights)
+    return results
+
+
+def analyze_receipt_batch(receipts, user_preferences):
+    """
+    Analyze receipts that share user_preferences with one model call.
+    Cached analyses are reused; receipts the batch response doesn't cover
+    completely are analyzed one at a time. Returns insights in receipt order.
+    """
+    results = [None] * len(receipts)
+    pending = []
+    for index, receipt in enumerate(receipts):
+        items = receipt.get('items') or []
+        if not items:
+            results[index] = create_fallback_insights(items)
+            continue
+        results[index] = get_cached_insights(items, user_preferences)[0]
+        if results[index] is None:
+            pending.append(index)
+    
+    if len(pending) > 1:
+        batch = [receipts[index] for index in pending]
+        try:
+            # Backfills have no latency SLO
+            analysis_text = invoke_analysis_model(create_batch_analysis_prompt(batch, user_preferences),
+                                                  max_tokens=BATCH_MAX_TOKENS_PER_RECEIPT * len(batch), slo_ms=None)
+            for index, insights in zip(pending, split_batch_insights(analysis_text, batch)):
+                if insights is not None:
+                    results[index] = insights
+                    cache_insights(receipts[index].get('items', []), user_preferences, insights)
+        except Exception as e:
+            print(f"Error in batch analysis: {str(e)}")
+    
+    for index in pending:
+        if results[index] is None:
+            results[index] = analyze_receipt_cached(receipts[index], user_preferences)[0]
+    return results
+
+
+def create_batch_inference_record(record_id, receipts, user_preferences):
+    """
+    One line of a Bedrock batch-inference input file (JSONL) for a batch of receipts
+    """
+    prompt = create_batch_analysis_prompt(receipts, user_preferences)
     return {
-        'statusCode': status_code,
-        'headers': cors_headers(),
-        'body': json.dumps(body)
+        'recordId': record_id,
+        'modelInput': create_analysis_request(prompt, max_tokens=BATCH_MAX_TOKENS_PER_RECEIPT * len(receipts))
     }
 
 
-class DecimalEncoder(json.JSONEncoder):
-    """Helper to encode Decimal values from DynamoDB"""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+def read_batch_inference_output(record, receipts):
+    """
+    Per-receipt insights (None where missing) from one line of a
+    batch-inference output file, for the receipts its input record packed
+    """
+    if record.get('error') or not record.get('modelOutput'):
+        print(f"Batch inference record {record.get('recordId')} failed: {record.get('error')}")
+        return [None] * len(receipts)
+    analysis_text = record['modelOutput']['content'][0]['text']
+    return split_batch_insights(analysis_text, receipts)
 
+
+def write_insights_batch(receipts, insights_list):
+    """
+    Store insights on backfilled receipts. Receipts were read at scan time, so
+    each write is conditional: a receipt deleted, re-parsed (new processed_at)
+    or analyzed by the API since is left as it is now. Fallback insights are
+    skipped, as in lambda_handler. Returns the number written.
+    """
+    written = 0
+    analyzed_at = datetime.now().isoformat()
+    for receipt, insights in zip(receipts, insights_list):
+        if not insights or insights.get('fallback'):
+            continue
+        condition = 'attribute_exists(receipt_id) AND attribute_not_exists(#insights)'
+        values = {':insights': convert_floats_to_decimal(insights), ':timestamp': analyzed_at}
+        if receipt.get('processed_at'):
+            condition += ' AND processed_at = :processed_at'
+            values[':processed_at'] = receipt['processed_at']
+        try:
+            receipts_table.update_item(
+                Key={'user_id': receipt['user_id'], 'receipt_id': receipt['receipt_id']},
+                UpdateExpression='SET #insights = :insights, analyzed_at = :timestamp',
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#insights': 'ai_insights'},
+                ExpressionAttributeValues=values
+            )
+            written += 1
+        except Exception as e:
+            if not is_conditional_check_failure(e):
+                raise
+            print(f"Receipt {receipt['receipt_id']} changed since it was read; skipping its backfilled insights")
+    return written
@@ -0,0 +1,226 @@
+"""
+Receipt item categorization without the model.
+
+ItemCategorizer sorts item names into the analysis buckets (produce,
+protein, dairy, grains, snacks, beverages, other) with a keyword dictionary:
+
+1. clean: lowercase, letters only, each word singularized ("apples" -> "apple")
+2. match: one pass of an Aho-Corasick automaton finds every keyword phrase
+   in the name at once (whole words only)
+3. resolve: keywords inside a longer match are dropped ("orange" inside
+   "orange juice"); the item gets the category the rest agree on, if one
+   of them covers the head noun (the last word)
+
+Names with no keyword, with keywords from different categories ("chicken
+noodle soup") or with a keyword only on a modifier ("apple pie", "ginger
+ale") are left over for the model. Results are memoized per name
+for the life of the container.
+"""
+import re
+import threading
+from collections import deque, namedtuple
+
+CATEGORIES = ('produce', 'protein', 'dairy', 'grains', 'snacks', 'beverages', 'other')
+
+ItemCategory = namedtuple('ItemCategory', ['category', 'keyword'])
+
+CATEGORY_KEYWORDS = {
+    'produce': (
+        'apple', 'banana', 'orange', 'lemon', 'lime', 'strawberry', 'blueberry', 'raspberry', 'blackberry',
+        'berries', 'grape', 'avocado', 'pineapple', 'mango', 'watermelon', 'melon', 'cantaloupe', 'peach',
+        'pear', 'plum', 'cherry', 'kiwi', 'tomato', 'potato', 'sweet potato', 'onion', 'green onion',
+        'scallion', 'shallot', 'garlic', 'ginger', 'pepper', 'bell pepper', 'jalapeno', 'lettuce', 'romaine',
+        'spinach', 'kale', 'arugula', 'broccoli', 'cauliflower', 'carrot', 'celery', 'cucumber', 'zucchini',
+        'squash', 'mushroom', 'asparagus', 'green bean', 'corn', 'cabbage', 'brussels sprout', 'beet',
+        'radish', 'eggplant', 'cilantro', 'basil', 'parsley', 'mint', 'herb', 'salad', 'vegetable', 'veggie',
+        'fruit', 'produce',
+    ),
+    'protein': (
+        'chicken', 'beef', 'steak', 'ground beef', 'ground turkey', 'turkey', 'pork', 'ham', 'bacon',
+        'sausage', 'lamb', 'salmon', 'tilapia', 'cod', 'shrimp', 'tuna', 'fish', 'seafood', 'tofu', 'tempeh',
+        'egg', 'black bean', 'kidney bean', 'pinto bean', 'chickpea', 'lentil', 'peanut butter',
+        'almond butter', 'almond', 'walnut', 'peanut', 'cashew', 'pecan', 'nut', 'deli meat',
+        'chicken breast', 'chicken thigh', 'chicken wing', 'turkey breast', 'pork chop', 'pork loin',
+    ),
+    'dairy': (
+        'milk', 'whole milk', 'skim milk', 'almond milk', 'oat milk', 'soy milk', 'cheese', 'cheddar',
+        'mozzarella', 'parmesan', 'feta', 'cottage cheese', 'cream cheese', 'yogurt', 'greek yogurt', 'butter',
+        'cream', 'heavy cream', 'sour cream', 'half and half', 'creamer',
+    ),
+    'grains': (
+        'bread', 'whole wheat bread', 'bagel', 'tortilla', 'pita', 'bun', 'roll', 'english muffin', 'pasta',
+        'spaghetti', 'penne', 'macaroni', 'noodle', 'rice', 'brown rice', 'jasmine rice', 'quinoa', 'oat',
+        'oatmeal', 'cereal', 'flour', 'couscous', 'barley',
+    ),
+    'snacks': (
+        'chip', 'tortilla chip', 'cracker', 'cookie', 'cookies', 'candy', 'chocolate', 'popcorn', 'pretzel',
+        'granola bar', 'protein bar', 'snack', 'ice cream', 'trail mix', 'granola', 'hummus',
+    ),
+    'beverages': (
+        'juice', 'orange juice', 'apple juice', 'soda', 'cola', 'coffee', 'tea', 'water', 'sparkling water',
+        'lemonade', 'kombucha', 'sports drink', 'energy drink', 'beer', 'wine', 'drink', 'beverage',
+        'coconut water',
+    ),
+    # Pantry staples, condiments and non-food lines
+    'other': (
+        'oil', 'olive oil', 'vegetable oil', 'vinegar', 'sauce', 'tomato sauce', 'pasta sauce', 'soy sauce',
+        'salsa', 'ketchup', 'mustard', 'mayonnaise', 'mayo', 'dressing', 'honey', 'syrup', 'maple syrup',
+        'jam', 'jelly', 'sugar', 'salt', 'black pepper', 'spice', 'seasoning', 'baking soda',
+        'baking powder', 'vanilla', 'broth', 'stock',
+        'bag', 'fee', 'tax', 'deposit', 'coupon', 'discount', 'paper towel', 'toilet paper', 'detergent',
+        'soap', 'foil', 'trash bag',
+    ),
+}
+
+_NON_LETTERS = re.compile(r"[^a-z]+")
+_MEMO_MAX_ENTRIES = 4096
+
+
+def _stem(token):
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith(('oes', 'ches', 'shes', 'xes')) and len(token) > 4:
+        return token[:-2]
+    if token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def clean_name(name):
+    """
+    Lowercase words, singularized, space-padded so keywords match whole words
+    """
+    words = _NON_LETTERS.sub(' ', str(name or '').lower()).split()
+    return ' ' + ' '.join(_stem(word) for word in words) + ' '
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton: every occurrence of every keyword in one pass over the text
+    """
+
+    def __init__(self, keywords):
+        """
+        keywords: {pattern: value}
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for pattern, value in keywords.items():
+            state = 0
+            for letter in pattern:
+                next_state = self._goto[state].get(letter)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][letter] = next_state
+                state = next_state
+            self._output[state].append((pattern, value))
+
+        # Failure links, breadth first: the longest proper suffix that is also a prefix
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for letter, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and letter not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(letter, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """
+        [(start, end, pattern, value)] for every keyword occurrence in text
+        """
+        matches = []
+        state = 0
+        for index, letter in enumerate(text):
+            while state and letter not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(letter, 0)
+            for pattern, value in self._output[state]:
+                matches.append((index + 1 - len(pattern), index + 1, pattern, value))
+        return matches
+
+
+class ItemCategorizer:
+    """
+    Assigns receipt items to analysis categories from CATEGORY_KEYWORDS
+    """
+
+    def __init__(self, category_keywords=None):
+        keywords = {}
+        for category, phrases in (category_keywords or CATEGORY_KEYWORDS).items():
+            for phrase in phrases:
+                keywords[clean_name(phrase)] = category
+        self.matcher = KeywordMatcher(keywords)
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def categorize(self, name):
+        """
+        ItemCategory for one item name; category is None when it is ambiguous
+        """
+        text = clean_name(name)
+        with self._lock:
+            cached = self._memo.get(text)
+        if cached is not None:
+            return cached
+
+        result = self._categorize(text)
+        with self._lock:
+            if len(self._memo) >= _MEMO_MAX_ENTRIES:
+                self._memo.pop(next(iter(self._memo)))
+            self._memo[text] = result
+        return result
+
+    def _categorize(self, text):
+        matches = self.matcher.find(text)
+        # Keep matches that aren't inside a longer one ("milk" in "almond milk")
+        outer = [match for match in matches
+                 if not any(other is not match and other[0] <= match[0] and match[1] <= other[1]
+                            and other[1] - other[0] > match[1] - match[0] for other in matches)]
+        categories = {match[3] for match in outer}
+        if len(categories) != 1:
+            return ItemCategory(None, None)
+        # Keywords are space-padded, so a match ending the text covers the last word
+        if not any(match[1] == len(text) for match in outer):
+            return ItemCategory(None, None)
+        longest = max(outer, key=lambda match: match[1] - match[0])
+        return ItemCategory(longest[3], longest[2].strip())
+
+    def categorize_items(self, items):
+        """
+        Bulk categorization of receipt items. Returns (categories, leftovers):
+        {category: [{'name', 'price'}]} for every CATEGORIES bucket, and the
+        items that need the model.
+        """
+        categories = {category: [] for category in CATEGORIES}
+        leftovers = []
+        for item in items or []:
+            category = self.categorize(item.get('name')).category
+            if category is None:
+                leftovers.append(item)
+            else:
+                categories[category].append(category_entry(item))
+        return categories, leftovers
+
+
+def category_entry(item):
+    return {'name': item.get('name', 'Unknown'), 'price': item.get('price', 0)}
+
+
+_categorizer = None
+
+
+def get_item_categorizer():
+    """
+    Module-level categorizer: its memo persists across warm invocations
+    """
+    global _categorizer
+    if _categorizer is None:
+        _categorizer = ItemCategorizer()
+    return _categorizer
@@ -1,11 +1,17 @@
 import json
-import boto3
 import os
 from datetime import datetime
 
-s3_client = boto3.client('s3')
+from utils.aws_clients import lazy_client
+from utils.db_helpers import create_response, error_response
+
+# Built on first use, so bad requests never load boto3
+s3_client = lazy_client('s3')
 RECEIPTS_BUCKET = os.environ.get('RECEIPTS_BUCKET')
 
+# Allowed methods in this endpoint's CORS headers
+CORS_METHODS = 'POST, OPTIONS'
+
 
 def lambda_handler(event, context):
     """
@@ -20,14 +26,7 @@ def lambda_handler(event, context):
         user_id = body.get('userId', 'anonymous')
         
         if not file_name:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'fileName is required'})
-            }
+            return error_response(400, 'fileName is required', methods=CORS_METHODS)
         
         # Generate unique key for S3 object
         timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
@@ -44,26 +43,12 @@ def lambda_handler(event, context):
             ExpiresIn=300  # URL expires in 5 minutes
         )
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'uploadUrl': presigned_url,
-                's3Key': s3_key,
-                'expiresIn': 300
-            })
-        }
+        return create_response(200, {
+            'uploadUrl': presigned_url,
+            's3Key': s3_key,
+            'expiresIn': 300
+        }, CORS_METHODS)
         
     except Exception as e:
         print(f"Error generating presigned URL: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Failed to generate upload URL'})
-        }
+        return error_response(500, 'Failed to generate upload URL', methods=CORS_METHODS)
@@ -1,14 +1,16 @@
 import json
 import os
-import boto3
 import base64
 import hashlib
 from urllib.parse import urlencode
 import urllib.request
 import urllib.error
 
-# Initialize Cognito client
-cognito_client = boto3.client('cognito-idp', region_name='us-east-1')
+from utils.db_helpers import create_response, error_response
+
+# Allowed methods in this endpoint's CORS headers
+CORS_METHODS = 'POST, OPTIONS'
+
 
 def lambda_handler(event, context):
     """
@@ -29,13 +31,13 @@ def lambda_handler(event, context):
         
         # Handle errors from Cognito
         if error:
-            return error_response(400, error_description or error)
+            return error_response(400, error_description or error, methods=CORS_METHODS)
         
         if not code or not state:
-            return error_response(400, 'Missing code or state parameter')
+            return error_response(400, 'Missing code or state parameter', methods=CORS_METHODS)
         
         if not code_verifier:
-            return error_response(400, 'Missing code verifier')
+            return error_response(400, 'Missing code verifier', methods=CORS_METHODS)
         
         # Get environment variables
         cognito_domain = os.environ.get('COGNITO_DOMAIN')
@@ -44,7 +46,7 @@ def lambda_handler(event, context):
         redirect_uri = os.environ.get('REDIRECT_URI')
         
         if not all([cognito_domain, client_id, client_secret, redirect_uri]):
-            return error_response(500, 'Missing Cognito configuration')
+            return error_response(500, 'Missing Cognito configuration', methods=CORS_METHODS)
         
         # Exchange code for tokens
         token_endpoint = f"{cognito_domain}/oauth2/token"
@@ -74,35 +76,26 @@ def lambda_handler(event, context):
             id_token = tokens.get('id_token', '')
             user_info = decode_token(id_token)
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                    'Access-Control-Allow-Headers': 'Content-Type'
+            return create_response(200, {
+                'success': True,
+                'tokens': {
+                    'idToken': tokens.get('id_token'),
+                    'accessToken': tokens.get('access_token'),
+                    'refreshToken': tokens.get('refresh_token')
                 },
-                'body': json.dumps({
-                    'success': True,
-                    'tokens': {
-                        'idToken': tokens.get('id_token'),
-                        'accessToken': tokens.get('access_token'),
-                        'refreshToken': tokens.get('refresh_token')
-                    },
-                    'user': user_info
-                })
-            }
+                'user': user_info
+            }, CORS_METHODS)
         
         except urllib.error.HTTPError as e:
             error_body = e.read().decode('utf-8')
             print(f"Token exchange failed: {error_body}")
-            return error_response(400, f'Failed to exchange authorization code for tokens: {error_body}')
+            return error_response(400, f'Failed to exchange authorization code for tokens: {error_body}', methods=CORS_METHODS)
     
     except Exception as e:
         print(f"Error in auth callback: {str(e)}")
         import traceback
         traceback.print_exc()
-        return error_response(500, str(e))
+        return error_response(500, str(e), methods=CORS_METHODS)
 
 
 def decode_token(token):
@@ -127,15 +120,3 @@ def decode_token(token):
     except Exception as e:
         print(f"Error decoding token: {str(e)}")
         return {}
-
-
-def error_response(status_code, message):
-    """Helper to return error responses"""
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({'error': message})
-    }
@@ -1,10 +1,15 @@
-import json
 import os
 import secrets
 import base64
 import hashlib
 from urllib.parse import urlencode
 
+from utils.db_helpers import create_response, error_response
+
+# Allowed methods in this endpoint's CORS headers
+CORS_METHODS = 'GET, OPTIONS'
+
+
 def lambda_handler(event, context):
     """
     Initiate Cognito OAuth login flow with PKCE
@@ -16,7 +21,7 @@ def lambda_handler(event, context):
         redirect_uri = os.environ.get('REDIRECT_URI')
         
         if not all([cognito_domain, client_id, redirect_uri]):
-            return error_response(500, 'Missing Cognito configuration')
+            return error_response(500, 'Missing Cognito configuration', methods=CORS_METHODS)
         
         # Generate PKCE parameters
         code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
@@ -38,33 +43,12 @@ def lambda_handler(event, context):
         
         auth_url = f"{cognito_domain}/oauth2/authorize?{urlencode(auth_params)}"
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': json.dumps({
-                'authUrl': auth_url,
-                'codeVerifier': code_verifier,
-                'state': state
-            })
-        }
+        return create_response(200, {
+            'authUrl': auth_url,
+            'codeVerifier': code_verifier,
+            'state': state
+        }, CORS_METHODS)
     
     except Exception as e:
         print(f"Error in auth login: {str(e)}")
-        return error_response(500, str(e))
-
-
-def error_response(status_code, message):
-    """Helper to return error responses"""
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'body': json.dumps({'error': message})
-    }
+        return error_response(500, str(e), methods=CORS_METHODS)
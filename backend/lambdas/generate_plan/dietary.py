@@ -0,0 +1,157 @@
+"""
+Dietary restriction terms and matching.
+
+Free-text restrictions ("no eggs", "nut allergy", "gluten-free") become
+terms: tuples of singularized words. Text is restricted when a term's words
+appear in a row among its own words, so "no eggs" excludes "3 large eggs"
+but not "eggplant", and "nut allergy" excludes "mixed nuts" but not
+"coconut milk". A term naming a food group ("nut", "dairy", "gluten", ...)
+stands for the foods in FOOD_GROUPS, and a diet ("vegetarian", "vegan",
+...) for the groups it excludes. Parts that are none of these ("keto",
+"low sodium") are returned as unparsed, for callers that can't honor them.
+"""
+import re
+from collections import namedtuple
+
+FOOD_GROUPS = {
+    'nut': ('nut', 'almond', 'walnut', 'cashew', 'pecan', 'hazelnut', 'pistachio', 'macadamia', 'peanut'),
+    'dairy': ('dairy', 'milk', 'cheese', 'butter', 'yogurt', 'cream', 'creamer', 'whey', 'ghee', 'cheddar',
+              'mozzarella', 'parmesan', 'feta', 'ricotta', 'kefir', 'half and half'),
+    'egg': ('egg', 'mayonnaise', 'mayo', 'meringue'),
+    'gluten': ('gluten', 'wheat', 'flour', 'bread', 'breadcrumb', 'pasta', 'spaghetti', 'penne', 'macaroni',
+               'noodle', 'couscous', 'barley', 'rye', 'bagel', 'tortilla', 'pita', 'bun', 'roll', 'cracker',
+               'cereal', 'seitan', 'muffin', 'pancake', 'waffle'),
+    'fish': ('fish', 'salmon', 'tuna', 'cod', 'tilapia', 'trout', 'sardine', 'anchovy', 'halibut', 'mackerel',
+             'fish sauce'),
+    'shellfish': ('shellfish', 'shrimp', 'prawn', 'crab', 'lobster', 'scallop', 'clam', 'mussel', 'oyster'),
+    'meat': ('meat', 'chicken', 'beef', 'steak', 'pork', 'ham', 'bacon', 'sausage', 'turkey', 'lamb', 'veal',
+             'duck', 'prosciutto', 'salami', 'pepperoni', 'chorizo', 'meatball', 'jerky', 'gelatin'),
+    'honey': ('honey',),
+}
+
+# Diets by the FOOD_GROUPS they exclude
+_VEGAN = ('meat', 'fish', 'shellfish', 'dairy', 'egg', 'honey')
+DIETS = {
+    'vegetarian': ('meat', 'fish', 'shellfish'),
+    'lacto ovo vegetarian': ('meat', 'fish', 'shellfish'),
+    'lacto vegetarian': ('meat', 'fish', 'shellfish', 'egg'),
+    'ovo vegetarian': ('meat', 'fish', 'shellfish', 'dairy'),
+    'pescatarian': ('meat',),
+    'pescetarian': ('meat',),
+    'vegan': _VEGAN,
+    'plant based': _VEGAN,
+    'lactose intolerant': ('dairy',),
+}
+
+# Parts that mean "no restrictions"
+_NO_RESTRICTIONS = {'none', 'no', 'na', 'n a', 'nothing', 'no restriction', 'no restrictions'}
+
+# Restriction words that stand for one or more FOOD_GROUPS
+GROUP_ALIASES = {
+    'tree nut': ('nut',),
+    'lactose': ('dairy',),
+    'seafood': ('fish', 'shellfish'),
+}
+
+# "coconut milk" and "peanut butter" are not dairy
+_PLANT_BASED = {'coconut', 'almond', 'oat', 'soy', 'rice', 'cashew', 'peanut', 'vegan', 'plant'}
+_DAIRY_NAMES = {'milk', 'butter', 'cheese', 'yogurt', 'cream', 'creamer'}
+
+_WORDS = re.compile(r'[a-z]+')
+
+
+def singular_word(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def food_words(text):
+    """
+    Lowercase, singularized words of an ingredient or restriction
+    """
+    return [singular_word(word) for word in _WORDS.findall(str(text or '').lower())]
+
+
+_GROUP_TERMS = {group: [tuple(food_words(food)) for food in foods] for group, foods in FOOD_GROUPS.items()}
+
+Restrictions = namedtuple('Restrictions', ['terms', 'unparsed'])
+
+
+def restriction_parts(restrictions):
+    """
+    Lowercased comma/semicolon separated parts; lists of restrictions are accepted too
+    """
+    if isinstance(restrictions, (list, tuple, set)):
+        restrictions = ','.join(str(part) for part in restrictions)
+    parts = re.split(r'[,;]', str(restrictions or '').lower())
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_restrictions(restrictions):
+    """
+    Restrictions(terms, unparsed) for free-text restrictions: terms from
+    diets and "no X" / "avoid X" / "X-free" / "X allergy" parts, and the
+    parts that are none of these
+    """
+    terms = []
+    unparsed = []
+    for part in restriction_parts(restrictions):
+        words = ' '.join(_WORDS.findall(part))
+        if words in _NO_RESTRICTIONS:
+            continue
+        diet = DIETS.get(re.sub(r'\s+diet$', '', words))
+        match = re.match(r'^(?:no|avoid|without)\s+(.+)$', part) or \
+            re.match(r'^(.+?)[\s-]*(?:free|allergy|allergies)$', part)
+        if diet:
+            part_terms = [term for group in diet for term in _GROUP_TERMS[group]]
+        elif match:
+            part_terms = expand_term(match.group(1))
+        else:
+            unparsed.append(part)
+            continue
+        for term in part_terms:
+            if term not in terms:
+                terms.append(term)
+    return Restrictions(terms, unparsed)
+
+
+def restriction_terms(restrictions):
+    """
+    Terms for the diets and restricted foods in free-text restrictions
+    """
+    return parse_restrictions(restrictions).terms
+
+
+def expand_term(phrase):
+    """
+    A restricted food as terms: a food group becomes all of its foods
+    """
+    words = tuple(food_words(phrase))
+    if not words:
+        return []
+    name = ' '.join(words)
+    groups = GROUP_ALIASES.get(name) or ((name,) if name in FOOD_GROUPS else ())
+    if groups:
+        return [term for group in groups for term in _GROUP_TERMS[group]]
+    return [words]
+
+
+def is_restricted(text, terms):
+    """
+    True when any term's words appear in a row among the words of text
+    """
+    words = food_words(text)
+    for term in terms:
+        size = len(term)
+        for start in range(len(words) - size + 1):
+            if tuple(words[start:start + size]) != term:
+                continue
+            if size == 1 and term[0] in _DAIRY_NAMES and start and words[start - 1] in _PLANT_BASED:
+                continue
+            return True
+    return False
@@ -1,89 +1,491 @@
 import json
-import boto3
 import os
+import time
 from datetime import datetime, timedelta
+from decimal import Decimal
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-# Initialize AWS clients
-bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-1')
-dynamodb = boto3.resource('dynamodb')
+from image_resolver import PEXELS_SEARCH_URL, MealImageResolver
+from nutrition import get_nutrition_engine
+from pantry import fetch_recent_pantry
+from plan_cache import PlanCache, make_plan_cache_key
+from plan_edit import (
+    PLAN_REVISION_ATTRIBUTE, SCOPE_DAY, PlanPartNotFound, apply_replacement, build_plan_update, check_target,
+    compile_regeneration_prompt, extract_replacement, parse_regeneration_target
+)
+from plan_fanout import WEEKDAYS, generate_days_in_parallel
+from plan_jobs import (
+    JOB_QUEUED, JOB_SUCCEEDED, LocalJobQueue, PlanJobStore, SqsJobQueue, sqs_records_to_messages
+)
+from plan_stream import read_meal_plan_stream
+from prompt_compiler import compile_meal_plan_prompt, rank_pantry_items
+from recipe_index import RecipeCatalog
+from shopping_list import build_shopping_list
+from utils.aws_clients import get_client, lazy_table
+from utils.bedrock_client import get_bedrock_client
+from utils.concurrency import BackgroundTasks, gather
+from utils.db_helpers import create_response, error_response
+from utils.plan_codec import LEGACY_PLAN_ATTRIBUTE, decode_meal_plan, encode_meal_plan
+from utils.llm_json import extract_json
+from utils.metrics import metered_handler, tag_request
+from utils.model_router import TASK_FULL_PLAN, TASK_REGENERATE, estimate_tokens, get_model_router
+
+# Initialize AWS clients (Bedrock calls share one retrying, rate-adaptive client)
+bedrock = get_bedrock_client()
 
 # Environment variables
 MEAL_PLANS_TABLE = os.environ.get('MEAL_PLANS_TABLE')
 USER_PREFERENCES_TABLE = os.environ.get('USER_PREFERENCES_TABLE')
 RECEIPTS_TABLE = os.environ.get('RECEIPTS_TABLE')
+RESULT_CACHE_TABLE = os.environ.get('RESULT_CACHE_TABLE')
+PLAN_JOBS_TABLE = os.environ.get('PLAN_JOBS_TABLE')
+PLAN_JOBS_QUEUE_URL = os.environ.get('PLAN_JOBS_QUEUE_URL')
+
+# Allowed methods in this endpoint's CORS headers
+CORS_METHODS = 'POST, OPTIONS'
+
+# DynamoDB tables, built on first use (e.g. Receipts is never touched when the request has pantryItems)
+meal_plans_table = lazy_table(MEAL_PLANS_TABLE)
+user_preferences_table = lazy_table(USER_PREFERENCES_TABLE)
+receipts_table = lazy_table(RECEIPTS_TABLE)
+result_cache_table = lazy_table(RESULT_CACHE_TABLE) if RESULT_CACHE_TABLE else None
+plan_jobs_table = lazy_table(PLAN_JOBS_TABLE) if PLAN_JOBS_TABLE else None
+
+# Model tier per call by task and prompt size (utils.model_router): whole weeks
+# on the balanced tier, single meals on the fast one
+model_router = get_model_router()
+
+# Latency SLOs (ms): regeneration is answered synchronously; 0 disables
+PLAN_SLO_MS = int(os.environ.get('PLAN_SLO_MS', '0'))
+REGENERATE_SLO_MS = int(os.environ.get('REGENERATE_SLO_MS', '20000'))
+
+# Parallel generation settings (generationMode=parallel)
+FANOUT_DAYS_PER_CALL = int(os.environ.get('FANOUT_DAYS_PER_CALL', '2'))
+FANOUT_MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', '4'))
+FANOUT_MAX_RETRIES = int(os.environ.get('FANOUT_MAX_RETRIES', '2'))
+MAX_TOKENS_PER_DAY = 700
+# More days per call no longer fit the per-call token budget reliably
+MAX_DAYS_PER_CALL = 2
+
+# Distinct pantry items read from recent receipts
+PANTRY_MAX_ITEMS = int(os.environ.get('PANTRY_MAX_ITEMS', '50'))
+
+# Generated plans keyed by normalized preferences + pantry (lives across warm invocations)
+plan_cache = PlanCache(
+    table=result_cache_table,
+    max_entries=int(os.environ.get('PLAN_CACHE_MAX_ENTRIES', '128')),
+    ttl_seconds=int(os.environ.get('PLAN_CACHE_TTL_SECONDS', str(6 * 3600)))
+)
+
+# Status records for generate-plan jobs (body.async)
+plan_job_store = PlanJobStore(plan_jobs_table) if plan_jobs_table else None
 
-# DynamoDB tables
-meal_plans_table = dynamodb.Table(MEAL_PLANS_TABLE)
-user_preferences_table = dynamodb.Table(USER_PREFERENCES_TABLE)
-receipts_table = dynamodb.Table(RECEIPTS_TABLE)
+# Meals from saved plans, indexed by ingredient: a Bedrock-free fast path and fallback
+recipe_catalog = RecipeCatalog(
+    table=meal_plans_table,
+    cache=PlanCache(table=result_cache_table, key_prefix='catalog#', max_entries=1, ttl_seconds=24 * 3600),
+    max_plans=int(os.environ.get('RECIPE_CATALOG_MAX_PLANS', '500'))
+)
+CATALOG_MIN_COVERAGE = float(os.environ.get('CATALOG_MIN_COVERAGE', '0.6'))
 
+# Independent context reads (preferences, pantry, catalog) run side by side;
+# preference writes run in the background and are drained before returning
+context_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='plan-context')
+background_tasks = BackgroundTasks(max_workers=2, thread_name_prefix='plan-writes')
+BACKGROUND_DRAIN_SECONDS = float(os.environ.get('BACKGROUND_DRAIN_SECONDS', '5'))
 
+
+@metered_handler('generate_plan')
 def lambda_handler(event, context):
     """
     Generate AI-powered meal plans using Bedrock Claude
     """
+    # Queued jobs arrive from SQS as Records
+    if 'Records' in event:
+        return handle_job_records(event)
+    
     try:
         # Parse request body
         body = json.loads(event.get('body', '{}'))
         user_id = body.get('userId') or 'anonymous'
+        tag_request(userId=user_id)
         
-        # Get pantry items from request (NEW: direct pantry items)
-        pantry_items = body.get('pantryItems', [])
+        # Edit mode: replace one day, meal slot or snack of a saved plan
+        if body.get('regenerate'):
+            return handle_regenerate_request(user_id, body)
         
-        print(f"Received request - userId: {user_id}, pantryItems: {pantry_items}")
+        if body.get('daysPerCall') is not None:
+            try:
+                body['daysPerCall'] = parse_days_per_call(body['daysPerCall'])
+            except ValueError as e:
+                return error_response(400, 'Invalid daysPerCall', str(e), CORS_METHODS)
         
-        # Get user preferences from request or database
-        preferences = get_user_preferences(user_id, body.get('preferences', {}))
+        # Job mode: queue the generation and return a jobId for polling,
+        # since API Gateway gives up after 29s while generation may take longer
+        if body.get('async'):
+            if plan_job_store is None:
+                print("Warning: PLAN_JOBS_TABLE not set, generating synchronously")
+            else:
+                tag_request(operation='submit')
+                job_id = submit_plan_job(user_id, body)
+                return create_response(202, {
+                    'success': True,
+                    'jobId': job_id,
+                    'status': JOB_QUEUED,
+                    'message': 'Meal plan generation started'
+                }, CORS_METHODS)
         
-        # Get recent grocery purchases (fallback if no pantry items provided)
-        if not pantry_items:
-            grocery_items = get_recent_grocery_items(user_id)
-        else:
-            # Convert pantry item strings to dict format
-            grocery_items = [{'name': item} for item in pantry_items]
+        result = run_plan_generation(user_id, body)
+        meal_plan = result['mealPlan']
         
-        print(f"Grocery items for meal generation: {grocery_items}")
+        return create_response(200, {
+            'success': True,
+            'planId': result['planId'],
+            'meals': meal_plan.get('meals', []),  # NEW: return meals array for frontend
+            'mealPlan': meal_plan,
+            'generationMode': result['generationMode'],
+            'cache': result['cache'],
+            'message': 'Meal plan generated successfully'
+        }, CORS_METHODS)
         
+    except Exception as e:
+        print(f"Error generating meal plan: {str(e)}")
+        return error_response(500, 'Failed to generate meal plan', str(e), CORS_METHODS)
+
+
+def run_plan_generation(user_id, body, plan_id=None, plan_date=None):
+    """
+    Generate (or reuse from cache) and save a meal plan for a request body.
+    Shared by the synchronous API path and the job worker.
+    """
+    try:
+        return _run_plan_generation(user_id, body, plan_id=plan_id, plan_date=plan_date)
+    finally:
+        # Lambda freezes once we return, so finish any preference write first
+        background_tasks.drain(timeout=BACKGROUND_DRAIN_SECONDS)
+
+
+def _run_plan_generation(user_id, body, plan_id, plan_date):
+    # Get pantry items from request (NEW: direct pantry items)
+    pantry_items = body.get('pantryItems', [])
+    
+    print(f"Received request - userId: {user_id}, pantryItems: {pantry_items}")
+    
+    # Preferences, receipts and the recipe catalog are read concurrently
+    preferences, grocery_items = load_plan_context(user_id, body)
+    
+    print(f"Grocery items for meal generation: {grocery_items}")
+    
+    generation_mode = body.get('generationMode', 'standard')
+    
+    # Identical preferences + pantry reuse a previously generated plan
+    cache_key = make_plan_cache_key(preferences, grocery_items, model_router.fingerprint())
+    cached_plan, cache_tier = (None, None) if body.get('forceRefresh') else plan_cache.get(cache_key)
+    
+    # A pantry that covers enough known recipes is planned from the catalog without Bedrock
+    catalog_plan = None
+    if cached_plan is None and grocery_items and body.get('useCatalog', True) and not body.get('forceRefresh'):
+        catalog_plan = build_catalog_meal_plan(preferences, grocery_items)
+    
+    streamed = False
+    if body.get('forceRefresh'):
+        cache_status = 'bypass'
+    elif cached_plan is not None:
+        cache_status = f"hit:{cache_tier}"
+    else:
+        cache_status = 'catalog' if catalog_plan is not None else 'miss'
+    tag_request(operation='generate', cache=cache_status, generationMode=generation_mode)
+    
+    if cached_plan is not None:
+        print(f"Plan cache hit ({cache_tier}) for key {cache_key[:12]}")
+        meal_plan = cached_plan
+    elif catalog_plan is not None:
+        generation_mode = 'catalog'
+        meal_plan = catalog_plan
+    elif generation_mode == 'stream':
+        # Stream days into the saved plan as they finish so polling clients see them early
+        streamed = True
+        plan_id, meal_plan = generate_and_publish_streaming(
+            user_id, preferences, grocery_items, plan_id=plan_id, plan_date=plan_date
+        )
+    elif generation_mode == 'parallel':
+        # One Bedrock call per 1-2 days, run concurrently
+        days_per_call = parse_days_per_call(body.get('daysPerCall'))
+        meal_plan = generate_meal_plan_parallel(preferences, grocery_items, days_per_call=days_per_call)
+    else:
         # Generate meal plan using Bedrock Claude
         meal_plan = generate_meal_plan_with_ai(preferences, grocery_items)
-        
-        print(f"Generated meal plan with {len(meal_plan.get('meals', []))} meals")
-        
-        # Save meal plan to DynamoDB
-        plan_id = save_meal_plan(user_id, meal_plan, preferences)
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': json.dumps({
-                'success': True,
-                'planId': plan_id,
-                'meals': meal_plan.get('meals', []),  # NEW: return meals array for frontend
-                'mealPlan': meal_plan,
-                'message': 'Meal plan generated successfully'
-            })
+    
+    # Save meal plan to DynamoDB (the streaming path saved it as it went)
+    if not streamed:
+        attach_shopping_list(meal_plan, grocery_items)
+        plan_id = save_meal_plan(user_id, meal_plan, preferences, plan_id=plan_id, plan_date=plan_date)
+    
+    if cached_plan is None and is_cacheable_plan(meal_plan):
+        plan_cache.put(cache_key, meal_plan)
+        recipe_catalog.add_plan(meal_plan)
+    
+    print(f"Generated meal plan with {len(meal_plan.get('meals', []))} meals")
+    
+    return {
+        'planId': plan_id,
+        'mealPlan': meal_plan,
+        'generationMode': generation_mode,
+        'cache': {
+            'hit': cached_plan is not None,
+            'tier': cache_tier,
+            'stats': plan_cache.stats
         }
-        
+    }
+
+
+def parse_days_per_call(value):
+    """
+    daysPerCall from a request (default FANOUT_DAYS_PER_CALL) clamped to
+    1..MAX_DAYS_PER_CALL; ValueError when it isn't a whole number
+    """
+    if value is None or value == '':
+        value = FANOUT_DAYS_PER_CALL
+    if isinstance(value, bool):
+        raise ValueError(f"daysPerCall must be a whole number, got {value!r}")
+    try:
+        days_per_call = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"daysPerCall must be a whole number, got {value!r}")
+    return min(max(days_per_call, 1), MAX_DAYS_PER_CALL)
+
+
+def handle_regenerate_request(user_id, body):
+    """
+    Response for body.regenerate: {planDate, planId?, day, mealType?, mealIndex?}
+    """
+    try:
+        result = regenerate_plan_part(user_id, body)
+    except ValueError as e:
+        return error_response(400, 'Invalid regenerate request', str(e), CORS_METHODS)
+    except PlanPartNotFound as e:
+        return error_response(404, 'Meal plan not found', str(e), CORS_METHODS)
     except Exception as e:
-        print(f"Error generating meal plan: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': 'Failed to generate meal plan',
-                'details': str(e)
-            })
-        }
+        if is_conditional_check_failure(e):
+            return error_response(409, 'Meal plan changed during regeneration, reload it and retry', None, CORS_METHODS)
+        raise
+    
+    meal_plan = result['mealPlan']
+    return create_response(200, {
+        'success': True,
+        'planId': result['planId'],
+        'planDate': result['planDate'],
+        'regenerated': result['regenerated'],
+        'revision': result['revision'],
+        'meals': meal_plan.get('meals', []),
+        'mealPlan': meal_plan,
+        'message': 'Meal plan updated successfully'
+    }, CORS_METHODS)
+
+
+def regenerate_plan_part(user_id, body):
+    """
+    Regenerate one part of a saved plan with a small Bedrock call and update
+    the saved item in place. The rest of the week goes to the model as a
+    compact summary so the new meals don't repeat it.
+    """
+    spec = body.get('regenerate')
+    target = parse_regeneration_target(spec)
+    tag_request(operation='regenerate', scope=target.scope, cache='none')
+    plan_date = spec.get('planDate')
+    if not plan_date:
+        raise ValueError("regenerate.planDate is required")
+    
+    key = {'user_id': user_id, 'plan_date': plan_date}
+    item = meal_plans_table.get_item(Key=key).get('Item')
+    if not item or (spec.get('planId') and item.get('plan_id') != spec['planId']):
+        raise PlanPartNotFound(f"No saved meal plan for {plan_date}")
+    if item.get('status') == 'generating':
+        raise ValueError("The meal plan is still being generated")
+    
+    meal_plan = decode_meal_plan(item)
+    weekly_plan = meal_plan.get('weeklyPlan') or {}
+    check_target(weekly_plan, target)
+    
+    # The preferences the plan was made with, updated by any sent with the request
+    preferences = dict(item.get('preferences_used') or {}, **(body.get('preferences') or {}))
+    pantry_items = body.get('pantryItems')
+    grocery_items = [{'name': name} for name in pantry_items] if pantry_items else get_recent_grocery_items(user_id)
+    
+    started = time.time()
+    replacement = generate_plan_part(preferences, grocery_items, weekly_plan, target)
+    print(f"Regenerated {target.describe()} in {int((time.time() - started) * 1000)} ms")
+    
+    previous_images = {meal['title']: meal['img'] for meal in meal_plan.get('meals') or [] if meal.get('img')}
+    weekly_plan = apply_replacement(weekly_plan, target, replacement)
+    meal_plan['weeklyPlan'] = weekly_plan
+    meal_plan['meals'] = format_meals_for_frontend(weekly_plan, known_images=previous_images)
+    meal_plan['weeklyTotals'] = dict(meal_plan.get('weeklyTotals') or {},
+                                     **summarize_weekly_totals(weekly_plan, preferences))
+    attach_shopping_list(meal_plan, grocery_items)
+    missing_days = [day for day in meal_plan.get('missingDays') or [] if day not in weekly_plan]
+    if missing_days:
+        meal_plan['missingDays'] = missing_days
+    else:
+        meal_plan.pop('missingDays', None)
+    
+    # Only the plan attributes change; a legacy nested map is replaced by the blob
+    attributes = encode_meal_plan(meal_plan)
+    attributes['updated_at'] = datetime.now().isoformat()
+    response = meal_plans_table.update_item(**build_plan_update(
+        key, attributes, item['plan_id'],
+        revision=item.get(PLAN_REVISION_ATTRIBUTE),
+        remove=[LEGACY_PLAN_ATTRIBUTE]
+    ))
+    
+    return {
+        'planId': item['plan_id'],
+        'planDate': plan_date,
+        'mealPlan': meal_plan,
+        'regenerated': {
+            'scope': target.scope,
+            'day': target.day,
+            'mealType': target.meal_type,
+            'mealIndex': target.index
+        },
+        'revision': (response.get('Attributes') or {}).get(PLAN_REVISION_ATTRIBUTE)
+    }
+
+
+def generate_plan_part(preferences, grocery_items, weekly_plan, target):
+    """
+    Ask Bedrock for just the target day, slot or snack
+    """
+    prompt = compile_regeneration_prompt(preferences, grocery_items, weekly_plan, target)
+    print(f"Compiled regeneration prompt for {target.describe()}: ~{prompt.tokens} tokens")
+    max_tokens = MAX_TOKENS_PER_DAY if target.scope == SCOPE_DAY else target.max_tokens
+    response_text = invoke_meal_plan_model(prompt.text, max_tokens, task=TASK_REGENERATE, slo_ms=REGENERATE_SLO_MS)
+    extraction = extract_json(response_text, expected_keys=[target.reply_key])
+    replacement = extract_replacement(extraction.data, target)
+    if replacement is None:
+        raise RuntimeError(f"No usable {target.describe()} in the model response")
+    return replacement
+
+
+def is_conditional_check_failure(error):
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def submit_plan_job(user_id, body):
+    """
+    Record a queued job and hand the request to the worker queue
+    """
+    job_id = str(uuid.uuid4())
+    plan_job_store.create(job_id, user_id, body.get('generationMode', 'standard'))
+    get_job_queue().send({'jobId': job_id, 'userId': user_id, 'body': body})
+    print(f"Queued meal plan job {job_id} for {user_id}")
+    return job_id
+
+
+def process_plan_job(message):
+    """
+    Worker: generate and save the plan for one queued job, recording its status.
+    The saved plan reuses the job id as its plan id.
+    """
+    job_id = message.get('jobId')
+    user_id = message.get('userId') or 'anonymous'
+    tag_request(userId=user_id, jobId=job_id)
+    if not job_id:
+        print(f"Ignoring job message without jobId: {message}")
+        return
+    
+    job = plan_job_store.get(job_id) or {}
+    if job.get('status') == JOB_SUCCEEDED:
+        # SQS delivers at least once; don't generate the same plan twice
+        print(f"Job {job_id} already completed, skipping redelivery")
+        return
+    
+    try:
+        plan_job_store.mark_running(job_id)
+        plan_date = datetime.now().strftime('%Y-%m-%d')
+        result = run_plan_generation(user_id, message.get('body') or {}, plan_id=job_id, plan_date=plan_date)
+        if result['planId'] is None:
+            raise RuntimeError('Meal plan could not be saved')
+        plan_job_store.mark_succeeded(job_id, result['planId'], plan_date)
+    except Exception as e:
+        print(f"Error processing meal plan job {job_id}: {str(e)}")
+        try:
+            plan_job_store.mark_failed(job_id, e)
+        except Exception as store_error:
+            print(f"Error recording failure for job {job_id}: {str(store_error)}")
+
+
+def handle_job_records(event):
+    """
+    SQS entry point: run each queued job. Failures are recorded on the job
+    itself rather than retried, so a bad request is not re-billed to Bedrock.
+    """
+    messages = sqs_records_to_messages(event)
+    for message in messages:
+        process_plan_job(message)
+    return {'processed': len(messages)}
+
+
+_job_queue = None
+
+
+def get_job_queue():
+    """
+    SQS when PLAN_JOBS_QUEUE_URL is set, otherwise an in-process stand-in
+    that runs the worker on a background thread (local development)
+    """
+    global _job_queue
+    if _job_queue is None:
+        if PLAN_JOBS_QUEUE_URL:
+            _job_queue = SqsJobQueue(get_client('sqs'), PLAN_JOBS_QUEUE_URL)
+        else:
+            print("Warning: PLAN_JOBS_QUEUE_URL not set, running jobs in-process")
+            _job_queue = LocalJobQueue(process_plan_job)
+    return _job_queue
+
+
+def load_plan_context(user_id, body):
+    """
+    Read everything generation needs in one round-trip's time: stored
+    preferences and the receipt pantry (when the request has no pantryItems)
+    are fetched in parallel while the recipe catalog loads.
+    Returns (preferences, grocery_items).
+    """
+    pantry_items = body.get('pantryItems', [])
+    use_catalog = body.get('useCatalog', True) and not body.get('forceRefresh')
+    
+    if use_catalog:
+        # Warm the catalog alongside the reads but don't wait for it: a plan
+        # cache hit never needs it, and the fast path blocks on its lock if still loading
+        context_executor.submit(warm_recipe_catalog)
+    
+    started = time.time()
+    context = gather({
+        'preferences': lambda: get_user_preferences(user_id, body.get('preferences', {})),
+        # Get recent grocery purchases (fallback if no pantry items provided)
+        'grocery_items': None if pantry_items else (lambda: get_recent_grocery_items(user_id))
+    }, context_executor)
+    print(f"Plan context loaded in {int((time.time() - started) * 1000)} ms")
+    
+    if pantry_items:
+        # Convert pantry item strings to dict format
+        grocery_items = [{'name': item} for item in pantry_items]
+    else:
+        grocery_items = context['grocery_items']
+    
+    return context['preferences'], grocery_items
+
+
+def warm_recipe_catalog():
+    """
+    Load the recipe catalog into memory; failures leave it for the fast path to retry
+    """
+    try:
+        recipe_catalog.get()
+    except Exception as e:
+        print(f"Error warming recipe catalog: {str(e)}")
 
 
 def get_user_preferences(user_id, request_preferences):
@@ -106,9 +508,9 @@ def get_user_preferences(user_id, request_preferences):
             'fatTarget': request_preferences.get('fatTarget') or stored_preferences.get('fatTarget', 65)
         }
         
-        # Save updated preferences if new ones provided
+        # Save updated preferences if new ones provided, without waiting on the write
         if request_preferences:
-            save_user_preferences(user_id, preferences)
+            background_tasks.submit(save_user_preferences, user_id, preferences)
             
         return preferences
         
@@ -129,13 +531,15 @@ def get_user_preferences(user_id, request_preferences):
 def save_user_preferences(user_id, preferences):
     """
     Save user preferences to DynamoDB
+    (an update, so the item's budget ledger attributes are kept)
     """
     try:
-        user_preferences_table.put_item(
-            Item={
-                'user_id': user_id,
-                'preferences': preferences,
-                'updated_at': datetime.now().isoformat()
+        user_preferences_table.update_item(
+            Key={'user_id': user_id},
+            UpdateExpression='SET preferences = :preferences, updated_at = :updated',
+            ExpressionAttributeValues={
+                ':preferences': preferences,
+                ':updated': datetime.now().isoformat()
             }
         )
     except Exception as e:
@@ -144,23 +548,14 @@ def save_user_preferences(user_id, preferences):
 
 def get_recent_grocery_items(user_id):
     """
-    Get recent grocery purchases from receipts table
+    Get the user's pantry from recent receipts: distinct items ranked by how
+    often and how recently they were bought
     """
     try:
-        # Query recent receipts (last 30 days)
-        response = receipts_table.query(
-            KeyConditionExpression='user_id = :user_id',
-            ExpressionAttributeValues={':user_id': user_id},
-            ScanIndexForward=False,  # Most recent first
-            Limit=10  # Last 10 receipts
-        )
-        
-        grocery_items = []
-        for receipt in response.get('Items', []):
-            items = receipt.get('items', [])
-            grocery_items.extend(items)
-            
-        return grocery_items[:50]  # Limit to 50 most recent items
+        started = time.time()
+        grocery_items = fetch_recent_pantry(receipts_table, user_id, max_items=PANTRY_MAX_ITEMS)
+        print(f"Pantry: {len(grocery_items)} distinct items in {int((time.time() - started) * 1000)} ms")
+        return grocery_items
         
     except Exception as e:
         print(f"Error getting grocery items: {str(e)}")
@@ -175,100 +570,311 @@ def generate_meal_plan_with_ai(preferences, grocery_items):
         # Create the prompt for Claude
         prompt = create_meal_plan_prompt(preferences, grocery_items)
         
-        # Call Bedrock Claude 3.5 Sonnet via inference profile
-        response = bedrock_runtime.invoke_model(
-            modelId='us.anthropic.claude-3-5-sonnet-20241022-v2:0',
-            body=json.dumps({
-                'anthropic_version': 'bedrock-2023-05-31',
-                'max_tokens': 4000,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': prompt
-                    }
-                ],
-                'temperature': 0.7
-            })
-        )
-        
-        # Parse response
-        response_body = json.loads(response['body'].read())
-        meal_plan_text = response_body['content'][0]['text']
+        # Call Bedrock (model tier chosen by the router)
+        meal_plan_text = invoke_meal_plan_model(prompt)
         
         # Parse the structured meal plan from Claude's response
         meal_plan = parse_meal_plan_response(meal_plan_text)
         
+        # A response cut off at max_tokens keeps its finished days; ask again for the rest only
+        if meal_plan.get('missingDays') and meal_plan.get('weeklyPlan'):
+            meal_plan = complete_missing_days(meal_plan, preferences, grocery_items)
+        
+        if meal_plan.get('weeklyPlan'):
+            meal_plan['weeklyTotals'] = summarize_weekly_totals(meal_plan['weeklyPlan'], preferences)
+        
         return meal_plan
         
     except Exception as e:
         print(f"Error calling Bedrock: {str(e)}")
         # Return a fallback meal plan
-        return create_fallback_meal_plan(preferences)
+        return create_fallback_meal_plan(preferences, grocery_items)
 
 
-def create_meal_plan_prompt(preferences, grocery_items):
+def generate_meal_plan_streaming(preferences, grocery_items, on_day=None):
     """
-    Create a detailed prompt for Claude to generate meal plans
+    Generate a meal plan with InvokeModelWithResponseStream.
+    on_day(day_name, day_meals, day_frontend_meals) is called as soon as each
+    day's JSON object has been streamed, before the rest of the week is done.
+    Streamed days carry default images; the finished plan's images are
+    resolved once, after the stream has been read.
     """
-    grocery_list = "\n".join([f"- {item.get('name', 'Unknown item')}" for item in grocery_items[:20]])
+    streamed_days = {}
+    
+    def handle_day(day_name, day_meals):
+        streamed_days[day_name] = day_meals
+        if on_day:
+            # No image lookups here: they would hold up reading the stream
+            on_day(day_name, day_meals, format_meals_for_frontend({day_name: day_meals}, resolve_images=False))
     
-    prompt = f"""You are a professional nutritionist and meal planning expert. Create a personalized 7-day meal plan based on the following information:
+    try:
+        prompt = create_meal_plan_prompt(preferences, grocery_items)
+        
+        decision = model_router.route(TASK_FULL_PLAN, estimate_tokens(prompt), 4000, slo_ms=PLAN_SLO_MS)
+        event_stream = model_router.invoke_stream(bedrock, decision, build_meal_plan_request(prompt))
+        try:
+            meal_plan_text = read_meal_plan_stream(event_stream, handle_day)
+        finally:
+            event_stream.close()
+        meal_plan = parse_meal_plan_response(meal_plan_text)
+        
+        # Keep the days we already streamed if the tail of the response was unusable
+        if not meal_plan.get('weeklyPlan') and streamed_days:
+            meal_plan['weeklyPlan'] = streamed_days
+            meal_plan['meals'] = format_meals_for_frontend(streamed_days)
+        
+        # Fill in days lost to truncation and publish them like streamed ones
+        if meal_plan.get('missingDays') and meal_plan.get('weeklyPlan'):
+            already_published = set(streamed_days)
+            meal_plan = complete_missing_days(meal_plan, preferences, grocery_items)
+            for day_name, day_meals in meal_plan['weeklyPlan'].items():
+                if day_name not in already_published:
+                    handle_day(day_name, day_meals)
+        
+        if meal_plan.get('weeklyPlan'):
+            meal_plan['weeklyTotals'] = summarize_weekly_totals(meal_plan['weeklyPlan'], preferences)
+        
+        return meal_plan
+        
+    except Exception as e:
+        print(f"Error streaming from Bedrock: {str(e)}")
+        if streamed_days:
+            # The streamed days are the model's; only the days it never sent are missing
+            weekly_plan = {day: streamed_days[day] for day in WEEKDAYS if day in streamed_days}
+            missing_days = [day for day in WEEKDAYS if day not in streamed_days]
+            return build_partial_meal_plan(weekly_plan, preferences, missing_days)
+        return create_fallback_meal_plan(preferences, grocery_items)
+
+
+def generate_and_publish_streaming(user_id, preferences, grocery_items, plan_id=None, plan_date=None):
+    """
+    Run streaming generation and write each finished day into the user's
+    MealPlans item (status "generating") so get_meal_plan can serve it early
+    """
+    plan_id = plan_id or str(uuid.uuid4())
+    plan_date = plan_date or datetime.now().strftime('%Y-%m-%d')
+    started = time.time()
+    published = {'days': 0}
+    
+    try:
+        meal_plans_table.put_item(
+            Item={
+                'user_id': user_id,
+                'plan_date': plan_date,
+                'plan_id': plan_id,
+                'meal_plan': {'weeklyPlan': {}, 'meals': []},
+                'preferences_used': convert_floats_to_decimal(preferences),
+                'created_at': datetime.now().isoformat(),
+                'status': 'generating'
+            }
+        )
+    except Exception as e:
+        print(f"Error creating streaming meal plan record: {str(e)}")
+    
+    def publish_day(day_name, day_meals, day_frontend_meals):
+        published['days'] += 1
+        if published['days'] == 1:
+            print(f"First day streamed after {int((time.time() - started) * 1000)} ms")
+        try:
+            meal_plans_table.update_item(
+                Key={'user_id': user_id, 'plan_date': plan_date},
+                UpdateExpression='SET meal_plan.weeklyPlan.#day = :day, '
+                                 'meal_plan.meals = list_append(meal_plan.meals, :meals), '
+                                 'days_ready = :count',
+                ConditionExpression='plan_id = :plan_id',
+                ExpressionAttributeNames={'#day': day_name},
+                ExpressionAttributeValues={
+                    ':day': convert_floats_to_decimal(day_meals),
+                    ':meals': convert_floats_to_decimal(day_frontend_meals),
+                    ':count': published['days'],
+                    ':plan_id': plan_id
+                }
+            )
+        except Exception as e:
+            print(f"Error publishing streamed day {day_name}: {str(e)}")
+    
+    meal_plan = generate_meal_plan_streaming(preferences, grocery_items, on_day=publish_day)
+    print(f"Streamed {published['days']} days in {int((time.time() - started) * 1000)} ms")
+    
+    attach_shopping_list(meal_plan, grocery_items)
+    saved_plan_id = save_meal_plan(user_id, meal_plan, preferences, plan_id=plan_id, plan_date=plan_date)
+    return saved_plan_id, meal_plan
+
+
+def generate_meal_plan_parallel(preferences, grocery_items, days_per_call=FANOUT_DAYS_PER_CALL):
+    """
+    Generate the week as concurrent Bedrock calls of days_per_call days each.
+    Days that fail are retried on their own; the result has the same
+    weeklyPlan/meals shape as generate_meal_plan_with_ai.
+    """
+    started = time.time()
+    weekly_plan, failed_days = generate_days_in_parallel(
+        lambda day_names: generate_days_with_ai(preferences, grocery_items, day_names),
+        days_per_call=days_per_call,
+        max_workers=FANOUT_MAX_WORKERS,
+        max_retries=FANOUT_MAX_RETRIES
+    )
+    print(f"Parallel generation finished in {int((time.time() - started) * 1000)} ms, failed days: {failed_days}")
+    
+    if not weekly_plan:
+        return create_fallback_meal_plan(preferences, grocery_items)
+    
+    return build_partial_meal_plan(weekly_plan, preferences, failed_days)
+
+
+def build_partial_meal_plan(weekly_plan, preferences, missing_days=None):
+    """
+    Meal plan from the days the model did generate; the others are listed in missingDays
+    """
+    meal_plan = {
+        'weeklyPlan': weekly_plan,
+        'meals': format_meals_for_frontend(weekly_plan),
+        'weeklyTotals': summarize_weekly_totals(weekly_plan, preferences),
+        'shoppingList': [],
+        'tips': []
+    }
+    if missing_days:
+        meal_plan['missingDays'] = missing_days
+    
+    return meal_plan
 
-AVAILABLE GROCERY ITEMS:
-{grocery_list if grocery_list.strip() else 'No recent grocery data available'}
 
-REQUIREMENTS:
-1. Create a COMPLETE 7-day meal plan (Monday, Tuesday, Wednesday, Thursday, Friday, Saturday, Sunday)
-2. Include breakfast, lunch, dinner, and 1-2 snacks per day for ALL 7 DAYS
-3. Use the available grocery items when possible
-4. Include simple, practical recipes
-5. Provide estimated prep time and nutrition info for each meal
+def generate_days_with_ai(preferences, grocery_items, day_names):
+    """
+    Generate only the given days; returns {day_name: day_meals} for the days
+    that came back complete
+    """
+    prompt = create_meal_plan_prompt(preferences, grocery_items, days=day_names)
+    response_text = invoke_meal_plan_model(prompt, MAX_TOKENS_PER_DAY * len(day_names))
+    extraction = extract_json(
+        response_text,
+        expected_members={'weeklyPlan': day_names}
+    )
+    weekly_plan = extraction.data.get('weeklyPlan')
+    return weekly_plan if isinstance(weekly_plan, dict) else {}
 
-IMPORTANT: You MUST include all 7 days. Do not truncate or abbreviate any days.
 
-RESPONSE FORMAT (JSON):
-{{
-  "weeklyPlan": {{
-    "monday": {{
-      "breakfast": {{"name": "Meal Name", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}},
-      "lunch": {{"name": "Meal Name", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}},
-      "dinner": {{"name": "Meal Name", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}},
-      "snacks": [{{"name": "Snack Name", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}]
-    }},
-    "tuesday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
-    "wednesday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
-    "thursday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
-    "friday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
-    "saturday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }},
-    "sunday": {{ "breakfast": {{"name": "...", "calories": 400, "protein": 20, "carbs": 45, "fat": 15}}, "lunch": {{"name": "...", "calories": 500, "protein": 25, "carbs": 55, "fat": 18}}, "dinner": {{"name": "...", "calories": 600, "protein": 35, "carbs": 60, "fat": 20}}, "snacks": [{{"name": "...", "calories": 150, "protein": 8, "carbs": 15, "fat": 6}}] }}
-  }}
-}}
+def complete_missing_days(meal_plan, preferences, grocery_items):
+    """
+    Re-request just the days a truncated response is missing and merge them in weekday order
+    """
+    missing_days = meal_plan.get('missingDays', [])
+    print(f"Re-requesting missing days: {missing_days}")
+    
+    recovered, still_missing = generate_days_in_parallel(
+        lambda day_names: generate_days_with_ai(preferences, grocery_items, day_names),
+        days=missing_days,
+        days_per_call=FANOUT_DAYS_PER_CALL,
+        max_workers=FANOUT_MAX_WORKERS,
+        max_retries=FANOUT_MAX_RETRIES
+    )
+    
+    merged = dict(meal_plan['weeklyPlan'], **recovered)
+    meal_plan['weeklyPlan'] = {day: merged[day] for day in WEEKDAYS if day in merged}
+    meal_plan['meals'] = format_meals_for_frontend(meal_plan['weeklyPlan'])
+    if still_missing:
+        meal_plan['missingDays'] = still_missing
+    else:
+        meal_plan.pop('missingDays', None)
+    
+    return meal_plan
+
+
+def summarize_weekly_totals(weekly_plan, preferences):
+    """
+    Weekly macro totals from the nutrition engine, compared with the user's daily targets
+    """
+    totals = get_nutrition_engine().apply(weekly_plan, preferences)
+    totals['estimatedCost'] = int(preferences.get('budget', 100))
+    return totals
+
+
+def attach_shopping_list(meal_plan, grocery_items):
+    """
+    Set the plan's shoppingList from its ingredients, minus the pantry
+    (computed here rather than asked of the model, so edits keep it right)
+    """
+    try:
+        meal_plan['shoppingList'] = build_shopping_list(meal_plan.get('weeklyPlan'), grocery_items)
+    except Exception as e:
+        print(f"Error building shopping list: {str(e)}")
+    return meal_plan
+
+
+def is_cacheable_plan(meal_plan):
+    """
+    Only complete AI-generated weeks are worth caching (not fallbacks or partial weeks)
+    """
+    if meal_plan.get('source') == 'catalog':
+        return False
+    weekly_plan = meal_plan.get('weeklyPlan') or {}
+    return len(weekly_plan) == len(WEEKDAYS) and not meal_plan.get('missingDays')
+
+
+def invoke_meal_plan_model(prompt, max_tokens=4000, task=TASK_FULL_PLAN, slo_ms=PLAN_SLO_MS):
+    """
+    Call the model tier routed for this prompt and return the generated text
+    """
+    decision = model_router.route(task, estimate_tokens(prompt), max_tokens, slo_ms=slo_ms)
+    return model_router.invoke_text(bedrock, decision, build_meal_plan_request(prompt, max_tokens=max_tokens))
+
+
+def build_meal_plan_request(prompt, max_tokens=4000):
+    """
+    Build the Anthropic messages request body for meal plan generation
+    """
+    return {
+        'anthropic_version': 'bedrock-2023-05-31',
+        'max_tokens': max_tokens,
+        'messages': [
+            {
+                'role': 'user',
+                'content': prompt
+            }
+        ],
+        'temperature': 0.7
+    }
 
-Generate a practical, healthy, and budget-friendly meal plan that helps achieve the user's nutrition goals."""
 
-    return prompt
+def create_meal_plan_prompt(preferences, grocery_items, days=None):
+    """
+    Create the prompt for Claude to generate meal plans
+    Pass days (e.g. ['monday', 'tuesday']) to ask for part of the week only
+    """
+    compiled = compile_meal_plan_prompt(preferences, grocery_items, days=days)
+    print(f"Compiled prompt: ~{compiled.tokens} tokens, "
+          f"{len(compiled.pantry_items)} pantry items included, {len(compiled.dropped_items)} dropped")
+    return compiled.text
 
 
 def parse_meal_plan_response(response_text):
     """
     Parse Claude's response into structured meal plan data and format for frontend
+    Truncated or fenced responses keep every complete day; the rest are listed in missingDays
     """
     try:
-        # Try to extract JSON from the response
-        start_idx = response_text.find('{')
-        end_idx = response_text.rfind('}') + 1
+        extraction = extract_json(
+            response_text,
+            expected_keys=['weeklyPlan'],
+            expected_members={'weeklyPlan': WEEKDAYS}
+        )
+        meal_plan_data = extraction.data
+        weekly_plan = meal_plan_data.get('weeklyPlan')
         
-        if start_idx != -1 and end_idx != -1:
-            json_str = response_text[start_idx:end_idx]
-            meal_plan_data = json.loads(json_str)
-            
-            # Convert to frontend format with Pexels images
-            weekly_plan = meal_plan_data.get('weeklyPlan', {})
-            meal_plan_data['meals'] = format_meals_for_frontend(weekly_plan)
-            
-            return meal_plan_data
-        else:
-            raise ValueError("No JSON found in response")
+        if not isinstance(weekly_plan, dict) or not weekly_plan:
+            raise ValueError("No meal plan JSON found in response")
+        
+        if not extraction.complete:
+            print(f"Salvaged truncated meal plan response, missing: {extraction.missing}")
+        
+        missing_days = [path.split('.', 1)[1] for path in extraction.missing if path.startswith('weeklyPlan.')]
+        if missing_days:
+            meal_plan_data['missingDays'] = missing_days
+        
+        # Convert to frontend format with Pexels images
+        meal_plan_data['meals'] = format_meals_for_frontend(weekly_plan)
+        
+        return meal_plan_data
             
     except Exception as e:
         print(f"Error parsing meal plan response: {str(e)}")
@@ -297,37 +903,43 @@ def get_pexels_image(meal_name, meal_type):
     """
     Get meal image from Pexels API based on meal name
     """
-    import urllib.request
-    import urllib.parse
-    
-    try:
-        # Pexels API key from environment
-        pexels_api_key = os.environ.get('PEXELS_API_KEY', '')
-        
-        if not pexels_api_key:
-            print("Warning: PEXELS_API_KEY not set, using default images")
-            return get_default_image(meal_type)
-        
-        # Create search query from meal name (e.g., "Grilled Chicken Salad" -> "grilled chicken salad food")
-        query = f"{meal_name} food"
-        encoded_query = urllib.parse.quote(query)
-        
-        # Call Pexels API
-        url = f"https://api.pexels.com/v1/search?query={encoded_query}&per_page=1"
-        req = urllib.request.Request(url)
-        req.add_header('Authorization', pexels_api_key)
-        
-        with urllib.request.urlopen(req, timeout=5) as response:
-            data = json.loads(response.read())
-            if data.get('photos') and len(data['photos']) > 0:
-                return data['photos'][0]['src']['large']
-        
-        # If no results for specific meal, try generic meal type
-        return get_default_image(meal_type)
-        
-    except Exception as e:
-        print(f"Error fetching from Pexels for {meal_name}: {str(e)}")
+    resolver = get_image_resolver()
+    if resolver is None:
+        print("Warning: PEXELS_API_KEY not set, using default images")
         return get_default_image(meal_type)
+    
+    return resolver.resolve([(meal_name, meal_type)])[0]
+
+
+_image_resolver = None
+
+
+def get_image_resolver():
+    """
+    Shared MealImageResolver (kept across warm invocations), or None when
+    Pexels isn't configured
+    """
+    global _image_resolver
+    
+    pexels_api_key = os.environ.get('PEXELS_API_KEY', '')
+    if not pexels_api_key:
+        return None
+    
+    if _image_resolver is None:
+        _image_resolver = MealImageResolver(
+            api_key=pexels_api_key,
+            default_image=get_default_image,
+            search_url=os.environ.get('PEXELS_API_URL', PEXELS_SEARCH_URL),
+            cache=PlanCache(
+                table=result_cache_table,
+                key_prefix='img#',
+                max_entries=2048,
+                ttl_seconds=7 * 24 * 3600
+            ),
+            max_connections=int(os.environ.get('MEAL_IMAGE_MAX_CONNECTIONS', '8')),
+            deadline_seconds=float(os.environ.get('MEAL_IMAGE_DEADLINE_SECONDS', '2.5'))
+        )
+    return _image_resolver
 
 
 def get_default_image(meal_type):
@@ -343,11 +955,19 @@ def get_default_image(meal_type):
     return fallbacks.get(meal_type.lower(), fallbacks['lunch'])
 
 
-def format_meals_for_frontend(weekly_plan):
+def format_meals_for_frontend(weekly_plan, known_images=None, resolve_images=True):
     """
-    Convert weekly plan to flat array of meals with AI-generated images
+    Convert weekly plan to flat array of meals with Pexels images
     Format expected by GenerateMeals.jsx
+    known_images ({title: url}) skips the lookup for meals that already have one;
+    resolve_images=False keeps the default images without any lookup
     """
+    # Macros come from the ingredients, not from the model (filled in place)
+    try:
+        get_nutrition_engine().apply(weekly_plan)
+    except Exception as e:
+        print(f"Error computing meal nutrition: {str(e)}")
+    
     meals = []
     
     for day_name, day_meals in weekly_plan.items():
@@ -359,10 +979,7 @@ def format_meals_for_frontend(weekly_plan):
             if meal_data:
                 meal_name = meal_data.get('name', 'Untitled Meal')
                 
-                # Get image from Pexels (use default for speed)
-                img_url = get_default_image(meal_type)
-                
-                # Format for frontend
+                # Format for frontend (images are resolved below in one batch)
                 meals.append({
                     'title': meal_name,
                     'meal': meal_type.capitalize(),
@@ -370,7 +987,7 @@ def format_meals_for_frontend(weekly_plan):
                     'p': meal_data.get('protein', 0),
                     'c': meal_data.get('carbs', 0),
                     'f': meal_data.get('fat', 0),
-                    'img': img_url,
+                    'img': get_default_image(meal_type),
                     'ingredients': meal_data.get('ingredients', []),
                     'prepTime': meal_data.get('prepTime', 'N/A')
                 })
@@ -381,10 +998,7 @@ def format_meals_for_frontend(weekly_plan):
             if snack_data:
                 snack_name = snack_data.get('name', 'Untitled Snack')
                 
-                # Get image from Pexels (use default for speed)
-                img_url = get_default_image('snack')
-                
-                # Format for frontend
+                # Format for frontend (images are resolved below in one batch)
                 meals.append({
                     'title': snack_name,
                     'meal': 'Snack',
@@ -392,57 +1006,127 @@ def format_meals_for_frontend(weekly_plan):
                     'p': snack_data.get('protein', 0),
                     'c': snack_data.get('carbs', 0),
                     'f': snack_data.get('fat', 0),
-                    'img': img_url,
+                    'img': get_default_image('snack'),
                     'ingredients': snack_data.get('ingredients', []),
                     'prepTime': snack_data.get('prepTime', 'N/A')
                 })
     
+    known_images = known_images or {}
+    unresolved = []
+    for meal in meals:
+        if meal['title'] in known_images:
+            meal['img'] = known_images[meal['title']]
+        else:
+            unresolved.append(meal)
+    
+    # Fetch all Pexels images concurrently; slow lookups keep the default image
+    resolver = get_image_resolver() if resolve_images else None
+    if resolver is not None and unresolved:
+        image_urls = resolver.resolve([(meal['title'], meal['meal']) for meal in unresolved])
+        for meal, img_url in zip(unresolved, image_urls):
+            meal['img'] = img_url
+    
     return meals
 
 
-def create_fallback_meal_plan(preferences):
+def build_catalog_meal_plan(preferences, grocery_items, min_coverage=None):
     """
-    Create a simple fallback meal plan if AI generation fails
+    Assemble a full week from catalog recipes the pantry covers; None when
+    the catalog doesn't have enough fitting recipes
     """
+    started = time.time()
+    try:
+        index = recipe_catalog.get()
+        weekly_plan = index.assemble_week(
+            rank_pantry_items(grocery_items, preferences),
+            preferences,
+            min_coverage=CATALOG_MIN_COVERAGE if min_coverage is None else min_coverage
+        )
+    except Exception as e:
+        print(f"Error assembling meal plan from catalog: {str(e)}")
+        return None
+    
+    if not weekly_plan:
+        return None
+    
+    print(f"Assembled meal plan from catalog ({len(index)} recipes) in {int((time.time() - started) * 1000)} ms")
+    return {
+        'weeklyPlan': weekly_plan,
+        'meals': format_meals_for_frontend(weekly_plan),
+        'weeklyTotals': summarize_weekly_totals(weekly_plan, preferences),
+        'shoppingList': [],
+        'tips': ["Built from saved recipes that match your pantry."],
+        'source': 'catalog'
+    }
+
+
+def create_fallback_meal_plan(preferences, grocery_items=None):
+    """
+    Create a simple fallback meal plan if AI generation fails: a week from
+    the recipe catalog when it has enough recipes, otherwise one fixed day
+    """
+    catalog_plan = build_catalog_meal_plan(preferences, grocery_items or [], min_coverage=0)
+    if catalog_plan is not None:
+        catalog_plan['tips'] = ["AI generation is unavailable; this week was built from saved recipes."]
+        return catalog_plan
+    
     return {
         "weeklyPlan": {
             "monday": {
-                "breakfast": {"name": "Oatmeal with Berries", "calories": 350, "prepTime": "5 mins"},
-                "lunch": {"name": "Grilled Chicken Salad", "calories": 450, "prepTime": "15 mins"},
-                "dinner": {"name": "Baked Salmon with Vegetables", "calories": 550, "prepTime": "25 mins"}
+                "breakfast": {"name": "Oatmeal with Berries", "calories": 350, "prepTime": "5 mins",
+                              "ingredients": ["1 cup oats", "1/2 cup berries", "1 cup milk"]},
+                "lunch": {"name": "Grilled Chicken Salad", "calories": 450, "prepTime": "15 mins",
+                          "ingredients": ["150g chicken breast", "2 cups mixed greens", "1 tbsp olive oil"]},
+                "dinner": {"name": "Baked Salmon with Vegetables", "calories": 550, "prepTime": "25 mins",
+                           "ingredients": ["150g salmon fillet", "1 cup broccoli", "1 cup brown rice"]}
             }
         },
         "weeklyTotals": {
             "avgDailyCalories": int(preferences['caloricTarget']),
             "estimatedCost": int(preferences['budget'])
         },
-        "shoppingList": ["Oats", "Berries", "Chicken", "Salmon", "Mixed Vegetables"],
+        "shoppingList": [],
         "tips": ["This is a basic meal plan. Upload receipts for personalized recommendations."]
     }
 
 
-def save_meal_plan(user_id, meal_plan, preferences):
+def save_meal_plan(user_id, meal_plan, preferences, plan_id=None, plan_date=None):
     """
     Save generated meal plan to DynamoDB
     """
     try:
-        plan_id = str(uuid.uuid4())
-        plan_date = datetime.now().strftime('%Y-%m-%d')
+        plan_id = plan_id or str(uuid.uuid4())
+        plan_date = plan_date or datetime.now().strftime('%Y-%m-%d')
         
-        meal_plans_table.put_item(
-            Item={
-                'user_id': user_id,
-                'plan_date': plan_date,
-                'plan_id': plan_id,
-                'meal_plan': meal_plan,
-                'preferences_used': preferences,
-                'created_at': datetime.now().isoformat(),
-                'status': 'active'
-            }
-        )
+        # The plan is stored compressed (see utils.plan_codec) with a few summary attributes
+        item = {
+            'user_id': user_id,
+            'plan_date': plan_date,
+            'plan_id': plan_id,
+            'preferences_used': convert_floats_to_decimal(preferences),
+            'created_at': datetime.now().isoformat(),
+            'status': 'active'
+        }
+        item.update(encode_meal_plan(meal_plan))
+        meal_plans_table.put_item(Item=item)
         
         return plan_id
         
     except Exception as e:
         print(f"Error saving meal plan: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+def convert_floats_to_decimal(obj):
+    """
+    Recursively convert all float values to Decimal for DynamoDB
+    """
+    if isinstance(obj, list):
+        return [convert_floats_to_decimal(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {key: convert_floats_to_decimal(value) for key, value in obj.items()}
+    elif isinstance(obj, float):
+        return Decimal(str(obj))
+    else:
+        return obj
+
@@ -0,0 +1,138 @@
+import http.client
+import json
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from plan_cache import PlanCache
+
+PEXELS_SEARCH_URL = 'https://api.pexels.com/v1/search'
+
+# Cached when Pexels has no photo for a meal, so the lookup isn't repeated
+NO_IMAGE = ''
+
+
+def normalize_meal_name(meal_name):
+    """
+    Cache key for a meal: lower-cased words only ("Grilled Chicken Salad!" -> "grilled chicken salad")
+    """
+    return ' '.join(re.findall(r'[a-z0-9]+', str(meal_name).lower()))
+
+
+class MealImageResolver:
+    """
+    Resolve meal images from Pexels concurrently.
+
+    Lookups run on a bounded pool whose threads each keep one keep-alive
+    connection, so max_connections caps both concurrency and open sockets.
+    Results are cached by normalized meal name (in-process LRU plus the
+    shared cache table). resolve() never waits past its deadline: meals still
+    in flight get the default image, and their results warm the cache when
+    they arrive.
+    """
+
+    def __init__(self, api_key, default_image, search_url=PEXELS_SEARCH_URL, cache=None,
+                 max_connections=8, deadline_seconds=2.5, request_timeout=4.0):
+        self.api_key = api_key
+        self.default_image = default_image
+        self.cache = cache or PlanCache(key_prefix='img#', max_entries=2048, ttl_seconds=7 * 24 * 3600)
+        self.deadline_seconds = deadline_seconds
+        self.request_timeout = request_timeout
+
+        url = urllib.parse.urlsplit(search_url)
+        self._scheme = url.scheme
+        self._host = url.hostname
+        self._port = url.port
+        self._path = url.path or '/'
+
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='meal-images')
+        self._local = threading.local()
+        self._in_flight = {}
+        # Re-entrant: a future that is already done runs its callback inside _submit
+        self._lock = threading.RLock()
+
+    def resolve(self, meals, deadline_seconds=None):
+        """
+        Resolve [(meal_name, meal_type), ...] to a list of image URLs in the same order
+        """
+        deadline = self.deadline_seconds if deadline_seconds is None else deadline_seconds
+        keys = [normalize_meal_name(meal_name) for meal_name, _ in meals]
+
+        futures = {}
+        for key, (meal_name, _) in zip(keys, meals):
+            if key and key not in futures:
+                futures[key] = self._submit(key, meal_name)
+
+        if futures:
+            _, not_done = wait(list(futures.values()), timeout=deadline)
+            if not_done:
+                print(f"Meal image deadline hit: {len(not_done)} of {len(futures)} lookups still running")
+
+        urls = []
+        for key, (_, meal_type) in zip(keys, meals):
+            future = futures.get(key)
+            url = None
+            if future is not None and future.done() and future.exception() is None:
+                url = future.result()
+            urls.append(url or self.default_image(meal_type))
+        return urls
+
+    def _submit(self, key, meal_name):
+        # Concurrent requests for the same meal share one lookup
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._executor.submit(self._lookup, key, meal_name)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+            return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _lookup(self, key, meal_name):
+        cached, _ = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        url = self._search(meal_name)
+        if url is not None:
+            self.cache.put(key, url)
+        return url
+
+    def _search(self, meal_name):
+        """
+        Query Pexels for one photo; returns its URL, NO_IMAGE when there are
+        no results, or None on errors (which are not cached)
+        """
+        query = urllib.parse.urlencode({'query': f"{meal_name} food", 'per_page': 1})
+        try:
+            connection = self._connection()
+            connection.request('GET', f"{self._path}?{query}", headers={'Authorization': self.api_key})
+            response = connection.getresponse()
+            body = response.read()
+            if response.status != 200:
+                print(f"Pexels returned {response.status} for {meal_name}")
+                return None
+            photos = json.loads(body).get('photos') or []
+            return photos[0]['src']['large'] if photos else NO_IMAGE
+        except Exception as e:
+            print(f"Error fetching from Pexels for {meal_name}: {str(e)}")
+            self._reset_connection()
+            return None
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self._scheme == 'https' else http.client.HTTPConnection
+            connection = connection_class(self._host, self._port, timeout=self.request_timeout)
+            self._local.connection = connection
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self._local.connection = None
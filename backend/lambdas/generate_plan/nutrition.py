@@ -0,0 +1,350 @@
+import csv
+import os
+import re
+import threading
+from collections import namedtuple
+
+from plan_fanout import WEEKDAYS
+from recipe_index import normalize_ingredient
+
+# NumPy is imported with the first engine rather than with this module, so
+# handler paths that never total macros don't pay for it on a cold start.
+# None means unavailable: the pure-Python aggregation below is used instead.
+_NOT_LOADED = object()
+np = _NOT_LOADED
+
+
+def _load_numpy():
+    global np
+    if np is _NOT_LOADED:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nutrients.csv')
+
+# Column order of the nutrient matrix and of every totals row
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+TARGET_KEYS = ('caloricTarget', 'proteinTarget', 'carbTarget', 'fatTarget')
+DEFAULT_TARGETS = (2000, 150, 200, 65)
+
+# Row used for ingredients the table doesn't know
+FALLBACK_FOOD = 'mixed dish'
+DEFAULT_CUP_GRAMS = 150
+
+MEAL_SLOTS = ('breakfast', 'lunch', 'dinner')
+
+_MASS_UNITS = {'g': 1, 'gram': 1, 'grams': 1, 'kg': 1000, 'oz': 28.35, 'ounce': 28.35, 'ounces': 28.35,
+               'lb': 453.6, 'lbs': 453.6, 'pound': 453.6, 'pounds': 453.6, 'ml': 1, 'l': 1000}
+_VOLUME_UNITS = {'cup': 1, 'cups': 1, 'tbsp': 1 / 16, 'tablespoon': 1 / 16, 'tablespoons': 1 / 16,
+                 'tsp': 1 / 48, 'teaspoon': 1 / 48, 'teaspoons': 1 / 48}
+_AMOUNT = re.compile(
+    r'(?P<qty>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)\s*(?P<unit>[a-z]+\b)?'
+)
+
+# Per-meal / per-day results for a batch of weekly plans. Rows of meal_totals
+# line up with meal_keys (plan, day, slot, position); rows of day_totals and
+# day_deviation with day_keys (plan, day). plan_scores is 0-100 target match.
+NutritionReport = namedtuple('NutritionReport', [
+    'meal_keys', 'meal_totals', 'day_keys', 'day_totals', 'day_deviation', 'plan_daily_average', 'plan_scores'
+])
+
+# How an ingredient line was read: the table row and the phrase that matched
+# it (None for unknown foods), grams, the number of items for counted lines
+# ("2 eggs", otherwise None), and whether the line gave an amount at all
+Measurement = namedtuple('Measurement', ['row', 'phrase', 'grams', 'count', 'measured'])
+
+
+class NutritionEngine:
+    """
+    Macro calculator backed by the bundled nutrient table. Ingredient lines
+    are mapped to table rows and gram amounts once (memoized), then meals,
+    days and plans are totalled in batch with NumPy.
+    """
+
+    def __init__(self, table_path=DEFAULT_TABLE_PATH):
+        _load_numpy()
+        self.foods = []
+        self.categories = []
+        self._aliases = {}
+        rows = []
+        portions = []
+        with open(table_path, newline='') as table_file:
+            lines = (line for line in table_file if not line.startswith('#'))
+            for record in csv.DictReader(lines):
+                row = len(self.foods)
+                self.foods.append(record['name'])
+                self.categories.append(record.get('category') or 'other')
+                rows.append([float(record[column]) for column in ('kcal', 'protein', 'carbs', 'fat')])
+                portions.append((
+                    float(record['serving_g']),
+                    float(record['unit_g'] or record['serving_g']),
+                    float(record['cup_g'] or DEFAULT_CUP_GRAMS)
+                ))
+                for alias in [record['name']] + [a for a in record['aliases'].split('|') if a]:
+                    self._aliases.setdefault(normalize_ingredient(alias), row)
+
+        self._per_100g = np.array(rows, dtype=np.float64) if np is not None else rows
+        self._portions = portions
+        self._fallback_row = self.foods.index(FALLBACK_FOOD)
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, ingredient):
+        """
+        (row, grams) for an ingredient line such as "150g chicken breast" or "1 cup rice"
+        """
+        measurement = self.measure(ingredient)
+        return measurement.row, measurement.grams
+
+    def measure(self, ingredient):
+        """
+        Measurement of an ingredient line (memoized, shared with resolve)
+        """
+        key = str(ingredient)
+        measurement = self._resolved.get(key)
+        if measurement is None:
+            measurement = self._measure(key)
+            with self._lock:
+                if len(self._resolved) < 50000:
+                    self._resolved[key] = measurement
+        return measurement
+
+    def _measure(self, ingredient):
+        text = ingredient.lower()
+        amount = _AMOUNT.search(text)
+        phrase, row = self._match_phrase(normalize_ingredient(text))
+        if row is None:
+            row = self._fallback_row
+        serving, unit_grams, cup_grams = self._portions[row]
+
+        if amount is None:
+            return Measurement(row, phrase, serving, None, False)
+        quantity = _parse_quantity(amount.group('qty'))
+        unit = amount.group('unit')
+        if unit in _MASS_UNITS:
+            return Measurement(row, phrase, quantity * _MASS_UNITS[unit], None, True)
+        if unit in _VOLUME_UNITS:
+            return Measurement(row, phrase, quantity * _VOLUME_UNITS[unit] * cup_grams, None, True)
+        if unit in ('can', 'cans'):
+            return Measurement(row, phrase, quantity * 240, None, True)
+        # Counted items: "2 eggs", "3 slices bread" (a word after the number that isn't a unit is the food)
+        return Measurement(row, phrase, quantity * unit_grams, quantity, True)
+
+    def _match_food(self, term):
+        row = self._match_phrase(term)[1]
+        return self._fallback_row if row is None else row
+
+    def _match_phrase(self, term):
+        """
+        Longest known phrase in the ingredient and its row, preferring ones
+        that end on its last word ("grilled chicken breast" -> chicken breast);
+        (None, None) when nothing matches
+        """
+        words = term.split()
+        for length in range(len(words), 0, -1):
+            suffix = ' '.join(words[len(words) - length:])
+            if suffix in self._aliases:
+                return suffix, self._aliases[suffix]
+            for start in range(len(words) - length):
+                phrase = ' '.join(words[start:start + length])
+                if phrase in self._aliases:
+                    return phrase, self._aliases[phrase]
+        return None, None
+
+    def score_plans(self, weekly_plans, targets=None):
+        """
+        Total macros per meal and per day for many weekly plans at once and
+        compare each day with its plan's daily targets (one (calories,
+        protein, carbs, fat) tuple per plan; defaults when omitted).
+        Meals without ingredients are skipped.
+        """
+        meal_keys, day_keys = [], []
+        meal_day, rows, grams, ingredient_meal = [], [], [], []
+        day_ids = {}
+
+        for plan_index, weekly_plan in enumerate(weekly_plans):
+            for day, meal_key_part, meal in _iter_meals(weekly_plan):
+                ingredients = meal.get('ingredients') or []
+                if not ingredients:
+                    continue
+                day_key = (plan_index, day)
+                if day_key not in day_ids:
+                    day_ids[day_key] = len(day_keys)
+                    day_keys.append(day_key)
+                meal_index = len(meal_keys)
+                meal_keys.append((plan_index, day) + meal_key_part)
+                meal_day.append(day_ids[day_key])
+                for ingredient in ingredients:
+                    row, amount = self.resolve(ingredient)
+                    rows.append(row)
+                    grams.append(amount)
+                    ingredient_meal.append(meal_index)
+
+        plan_count = len(weekly_plans)
+        target_rows = [tuple(t) for t in (targets or [DEFAULT_TARGETS] * plan_count)]
+        day_plan = [plan_index for plan_index, _ in day_keys]
+
+        if np is not None:
+            return self._aggregate_numpy(meal_keys, day_keys, meal_day, rows, grams, ingredient_meal,
+                                         day_plan, target_rows, plan_count)
+        return self._aggregate_python(meal_keys, day_keys, meal_day, rows, grams, ingredient_meal,
+                                      day_plan, target_rows, plan_count)
+
+    def _aggregate_numpy(self, meal_keys, day_keys, meal_day, rows, grams, ingredient_meal,
+                         day_plan, target_rows, plan_count):
+        contributions = self._per_100g[np.asarray(rows, dtype=np.intp)] * (np.asarray(grams) / 100.0)[:, None]
+        meal_totals = _sum_rows(contributions, np.asarray(ingredient_meal, dtype=np.intp), len(meal_keys))
+        day_totals = _sum_rows(meal_totals, np.asarray(meal_day, dtype=np.intp), len(day_keys))
+
+        day_plan = np.asarray(day_plan, dtype=np.intp)
+        targets = np.asarray(target_rows, dtype=np.float64).reshape(plan_count, len(MACROS))
+        day_targets = targets[day_plan]
+        day_deviation = np.divide(day_totals - day_targets, day_targets,
+                                  out=np.zeros_like(day_totals), where=day_targets > 0)
+
+        days_per_plan = np.bincount(day_plan, minlength=plan_count).astype(np.float64)
+        plan_sums = _sum_rows(day_totals, day_plan, plan_count)
+        plan_daily_average = plan_sums / np.maximum(days_per_plan, 1)[:, None]
+        plan_error = _sum_rows(np.abs(day_deviation), day_plan, plan_count).sum(axis=1)
+        plan_error /= np.maximum(days_per_plan * len(MACROS), 1)
+        plan_scores = np.clip(100.0 * (1.0 - plan_error), 0, 100)
+
+        return NutritionReport(meal_keys, meal_totals, day_keys, day_totals, day_deviation,
+                               plan_daily_average, plan_scores)
+
+    def _aggregate_python(self, meal_keys, day_keys, meal_day, rows, grams, ingredient_meal,
+                          day_plan, target_rows, plan_count):
+        width = len(MACROS)
+        meal_totals = [[0.0] * width for _ in meal_keys]
+        for row, amount, meal_index in zip(rows, grams, ingredient_meal):
+            per_100g = self._per_100g[row]
+            totals = meal_totals[meal_index]
+            for column in range(width):
+                totals[column] += per_100g[column] * amount / 100.0
+
+        day_totals = [[0.0] * width for _ in day_keys]
+        for meal_index, day_index in enumerate(meal_day):
+            for column in range(width):
+                day_totals[day_index][column] += meal_totals[meal_index][column]
+
+        day_deviation = []
+        plan_sums = [[0.0] * width for _ in range(plan_count)]
+        plan_error = [0.0] * plan_count
+        days_per_plan = [0] * plan_count
+        for day_index, plan_index in enumerate(day_plan):
+            target = target_rows[plan_index]
+            deviation = [(day_totals[day_index][c] - target[c]) / target[c] if target[c] > 0 else 0.0
+                         for c in range(width)]
+            day_deviation.append(deviation)
+            days_per_plan[plan_index] += 1
+            plan_error[plan_index] += sum(abs(value) for value in deviation)
+            for column in range(width):
+                plan_sums[plan_index][column] += day_totals[day_index][column]
+
+        plan_daily_average = [[value / max(days_per_plan[p], 1) for value in plan_sums[p]] for p in range(plan_count)]
+        plan_scores = [min(100.0, max(0.0, 100.0 * (1 - plan_error[p] / max(days_per_plan[p] * width, 1))))
+                       for p in range(plan_count)]
+        return NutritionReport(meal_keys, meal_totals, day_keys, day_totals, day_deviation,
+                               plan_daily_average, plan_scores)
+
+    def apply(self, weekly_plan, preferences=None):
+        """
+        Write computed calories/protein/carbs/fat into every meal of weekly_plan
+        (in place) and return weekly totals compared with the user's targets
+        """
+        targets = preferences_to_targets(preferences)
+        report = self.score_plans([weekly_plan], [targets])
+
+        meals = {key[1:]: meal for key, meal in _keyed_meals(weekly_plan)}
+        for key, totals in zip(report.meal_keys, report.meal_totals):
+            meal = meals[key[1:]]
+            for column, macro in enumerate(MACROS):
+                meal[macro] = int(round(float(totals[column])))
+
+        day_count = len(report.day_keys)
+        total_calories = sum(float(day[0]) for day in report.day_totals)
+        average = report.plan_daily_average[0]
+        return {
+            'totalCalories': int(round(total_calories)),
+            'avgDailyCalories': int(round(float(average[0]))) if day_count else 0,
+            'avgDailyProtein': int(round(float(average[1]))) if day_count else 0,
+            'avgDailyCarbs': int(round(float(average[2]))) if day_count else 0,
+            'avgDailyFat': int(round(float(average[3]))) if day_count else 0,
+            'targetMatch': int(round(float(report.plan_scores[0]))) if day_count else 0,
+            'dailyDeviation': {
+                day: {macro: round(float(deviation[column]), 3) for column, macro in enumerate(MACROS)}
+                for (_, day), deviation in zip(report.day_keys, report.day_deviation)
+            }
+        }
+
+
+def preferences_to_targets(preferences):
+    preferences = preferences or {}
+    targets = []
+    for key, default in zip(TARGET_KEYS, DEFAULT_TARGETS):
+        try:
+            targets.append(float(preferences.get(key) or default))
+        except (TypeError, ValueError):
+            targets.append(float(default))
+    return tuple(targets)
+
+
+def _sum_rows(values, index, size):
+    """Sum rows of values grouped by index (like np.add.at, but via bincount per column)"""
+    if not len(index):
+        return np.zeros((size, values.shape[1]))
+    return np.stack([np.bincount(index, weights=values[:, column], minlength=size)
+                     for column in range(values.shape[1])], axis=1)
+
+
+def _parse_quantity(text):
+    total = 0.0
+    for part in text.split():
+        if '/' in part:
+            numerator, denominator = part.split('/')
+            total += float(numerator) / float(denominator) if float(denominator) else 0
+        else:
+            total += float(part)
+    return total
+
+
+def _keyed_meals(weekly_plan):
+    for day, key_part, meal in _iter_meals(weekly_plan):
+        yield (0, day) + key_part, meal
+
+
+def _iter_meals(weekly_plan):
+    """(day, (slot, position), meal) for every meal object in weekday order"""
+    weekly_plan = weekly_plan or {}
+    days = [day for day in WEEKDAYS if day in weekly_plan] + [day for day in weekly_plan if day not in WEEKDAYS]
+    for day in days:
+        day_meals = weekly_plan[day]
+        if not isinstance(day_meals, dict):
+            continue
+        for slot in MEAL_SLOTS:
+            meal = day_meals.get(slot)
+            if isinstance(meal, dict):
+                yield day, (slot, 0), meal
+        for position, snack in enumerate(day_meals.get('snacks') or []):
+            if isinstance(snack, dict):
+                yield day, ('snacks', position), snack
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_nutrition_engine():
+    """
+    Process-wide engine so the table is parsed once per container
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = NutritionEngine()
+    return _engine
@@ -0,0 +1,98 @@
+import time
+from datetime import datetime
+
+from prompt_compiler import NON_FOOD_PATTERN
+
+# A purchase loses half its weight every PANTRY_HALF_LIFE_DAYS
+PANTRY_HALF_LIFE_DAYS = 14
+
+# Only what the pantry needs; ai_insights and the other receipt attributes stay on the server
+RECEIPT_PROJECTION = '#items, processed_at, #status'
+RECEIPT_PROJECTION_NAMES = {'#items': 'items', '#status': 'status'}
+
+
+def _item_key(name):
+    return ' '.join(str(name).lower().split())
+
+
+def _age_days(timestamp, now):
+    if not timestamp:
+        return 0.0
+    try:
+        purchased = datetime.fromisoformat(str(timestamp)).timestamp()
+    except ValueError:
+        return 0.0
+    return max(0.0, (now - purchased) / 86400)
+
+
+def aggregate_pantry(receipts, max_items=50, now=None, half_life_days=PANTRY_HALF_LIFE_DAYS):
+    """
+    Dedupe the line items of receipts (most recent first) and rank them by a
+    recency-weighted purchase count: each purchase adds 0.5 ** (age / half_life).
+    Returns [{'name', 'count', 'lastPurchased'}, ...] best first.
+    """
+    now = now if now is not None else time.time()
+    stats = {}
+
+    for receipt in receipts:
+        if receipt.get('status') == 'error':
+            continue
+        processed_at = receipt.get('processed_at')
+        weight = 0.5 ** (_age_days(processed_at, now) / half_life_days)
+        seen_in_receipt = set()
+        for item in receipt.get('items') or []:
+            name = item.get('name') if isinstance(item, dict) else item
+            if not name:
+                continue
+            key = _item_key(name)
+            if not key or NON_FOOD_PATTERN.search(key) or key in seen_in_receipt:
+                continue
+            seen_in_receipt.add(key)
+
+            entry = stats.get(key)
+            if entry is None:
+                # Receipts arrive newest first, so the first spelling seen is the latest
+                stats[key] = {'name': str(name).strip(), 'count': 1, 'score': weight, 'lastPurchased': processed_at}
+            else:
+                entry['count'] += 1
+                entry['score'] += weight
+
+    ranked = sorted(stats.values(), key=lambda entry: -entry['score'])
+    return [
+        {'name': entry['name'], 'count': entry['count'], 'lastPurchased': entry['lastPurchased']}
+        for entry in ranked[:max_items]
+    ]
+
+
+def fetch_recent_pantry(table, user_id, max_items=50, min_receipts=10, max_receipts=60, page_size=10):
+    """
+    Page through the user's receipts newest first, reading only item names and
+    dates, until at least min_receipts were read and max_items distinct items
+    were found (or max_receipts / the end of the history is reached)
+    """
+    receipts = []
+    distinct = set()
+    query_kwargs = {
+        'KeyConditionExpression': 'user_id = :user_id',
+        'ExpressionAttributeValues': {':user_id': user_id},
+        'ProjectionExpression': RECEIPT_PROJECTION,
+        'ExpressionAttributeNames': RECEIPT_PROJECTION_NAMES,
+        'ScanIndexForward': False  # Most recent first
+    }
+
+    while len(receipts) < max_receipts:
+        response = table.query(Limit=min(page_size, max_receipts - len(receipts)), **query_kwargs)
+        for receipt in response.get('Items', []):
+            receipts.append(receipt)
+            for item in receipt.get('items') or []:
+                name = item.get('name') if isinstance(item, dict) else item
+                if name:
+                    distinct.add(_item_key(name))
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        if len(receipts) >= min_receipts and len(distinct) >= max_items:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return aggregate_pantry(receipts, max_items=max_items)
@@ -0,0 +1,40 @@
+from utils.result_cache import ResultCache, content_hash, normalize_preferences
+
+# Bump to invalidate every cached plan when the prompt or output shape changes
+CACHE_VERSION = 1
+
+
+class PlanCache(ResultCache):
+    """
+    Result cache for generated plans; other callers pass their own key_prefix
+    """
+
+    def __init__(self, table=None, max_entries=128, ttl_seconds=6 * 3600, key_prefix='plan#'):
+        super().__init__(table=table, max_entries=max_entries, ttl_seconds=ttl_seconds, key_prefix=key_prefix)
+
+
+def normalize_pantry(grocery_items):
+    """
+    Sorted, de-duplicated, lower-cased pantry item names
+    """
+    names = set()
+    for item in grocery_items or []:
+        name = item.get('name') if isinstance(item, dict) else item
+        if name:
+            name = ' '.join(str(name).lower().split())
+            if name:
+                names.add(name)
+    return sorted(names)
+
+
+def make_plan_cache_key(preferences, grocery_items, model_id=''):
+    """
+    Content-addressed key: SHA-256 of the normalized preferences and pantry
+    """
+    material = {
+        'v': CACHE_VERSION,
+        'model': model_id,
+        'preferences': normalize_preferences(preferences),
+        'pantry': normalize_pantry(grocery_items)
+    }
+    return content_hash(material)
@@ -0,0 +1,353 @@
+"""
+Partial regeneration of a saved meal plan: one day, one meal slot, or one snack.
+
+The model sees only the part being replaced, the user's targets, a small
+pantry and a one-line-per-day summary of the rest of the week (so it avoids
+repeats and fits what is left of the day's calories). A one-meal edit is
+roughly 5% of the tokens of a full week. The merged plan is written back
+with one UpdateExpression, guarded by a revision counter.
+"""
+from collections import namedtuple
+
+from plan_fanout import WEEKDAYS
+from prompt_compiler import (
+    DAY_SCHEMA, MEAL_SCHEMA, CompiledPrompt, estimate_tokens, format_preferences, rank_pantry_items
+)
+
+MEAL_SLOTS = ['breakfast', 'lunch', 'dinner']
+SNACKS = 'snacks'
+
+SCOPE_DAY = 'day'
+SCOPE_SLOT = 'slot'
+SCOPE_MEAL = 'meal'
+
+# Output budgets: a day is MAX_TOKENS_PER_DAY in the handler
+MAX_TOKENS_PER_MEAL = 250
+MAX_TOKENS_PER_SNACKS = 350
+
+# Pantry names are the least important part of an edit prompt
+DEFAULT_PANTRY_TOKEN_BUDGET = 60
+
+# Longest meal name kept in the week summary
+CONTEXT_NAME_CHARS = 40
+
+# Never ask for less than a snack's worth when the rest of the day is over target
+MIN_MEAL_CALORIES = 150
+
+PLAN_REVISION_ATTRIBUTE = 'plan_revision'
+
+_SLOT_LETTERS = {'breakfast': 'B', 'lunch': 'L', 'dinner': 'D'}
+
+
+class PlanPartNotFound(LookupError):
+    """
+    The saved plan, or the part of it to replace, doesn't exist
+    """
+
+
+class RegenerationTarget(namedtuple('RegenerationTarget', ['day', 'meal_type', 'index'])):
+    """
+    The part of a plan to replace: a day (meal_type None), a slot
+    (breakfast/lunch/dinner, or all snacks), or one snack (index set)
+    """
+    __slots__ = ()
+
+    @property
+    def scope(self):
+        if self.index is not None:
+            return SCOPE_MEAL
+        return SCOPE_SLOT if self.meal_type else SCOPE_DAY
+
+    @property
+    def reply_key(self):
+        if self.scope == SCOPE_DAY:
+            return 'day'
+        return SNACKS if self.scope == SCOPE_SLOT and self.meal_type == SNACKS else 'meal'
+
+    @property
+    def max_tokens(self):
+        return MAX_TOKENS_PER_SNACKS if self.reply_key == SNACKS else MAX_TOKENS_PER_MEAL
+
+    def describe(self):
+        if self.scope == SCOPE_DAY:
+            return self.day
+        if self.scope == SCOPE_MEAL:
+            return f"{self.day} snack {self.index + 1}"
+        return f"{self.day} {self.meal_type}"
+
+
+def parse_regeneration_target(spec):
+    """
+    Read {"day": "tuesday", "mealType": "dinner"|"snacks", "mealIndex": 0}
+    from a request; raises ValueError when it doesn't name a valid part
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("regenerate must be an object with a day")
+
+    day = str(spec.get('day') or '').strip().lower()
+    if day not in WEEKDAYS:
+        raise ValueError(f"Unknown day: {spec.get('day')!r}")
+
+    meal_type = spec.get('mealType')
+    if meal_type is not None:
+        meal_type = str(meal_type).strip().lower()
+        if meal_type == 'snack':
+            meal_type = SNACKS
+        if meal_type not in MEAL_SLOTS and meal_type != SNACKS:
+            raise ValueError(f"Unknown meal type: {spec.get('mealType')!r}")
+
+    index = spec.get('mealIndex')
+    if index is not None:
+        if meal_type != SNACKS:
+            raise ValueError("mealIndex only applies to snacks")
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid mealIndex: {spec.get('mealIndex')!r}")
+        if index < 0:
+            raise ValueError(f"Invalid mealIndex: {index}")
+
+    return RegenerationTarget(day, meal_type, index)
+
+
+def check_target(weekly_plan, target):
+    """
+    Raise PlanPartNotFound when the part to replace isn't in the plan. A whole
+    day may be missing (e.g. left out of a truncated response) and is filled in.
+    """
+    if target.scope == SCOPE_DAY:
+        return
+    day_meals = weekly_plan.get(target.day)
+    if not isinstance(day_meals, dict):
+        raise PlanPartNotFound(f"The plan has no {target.day}")
+    if target.scope == SCOPE_MEAL and target.index >= len(day_meals.get(SNACKS) or []):
+        raise PlanPartNotFound(f"The plan has no {target.describe()}")
+
+
+def current_meals(weekly_plan, target):
+    """
+    The meal objects being replaced
+    """
+    day_meals = weekly_plan.get(target.day)
+    if not isinstance(day_meals, dict):
+        return []
+    if target.scope == SCOPE_DAY:
+        return [day_meals.get(slot) for slot in MEAL_SLOTS if day_meals.get(slot)] + list(day_meals.get(SNACKS) or [])
+    if target.scope == SCOPE_MEAL:
+        return [day_meals[SNACKS][target.index]]
+    if target.meal_type == SNACKS:
+        return list(day_meals.get(SNACKS) or [])
+    return [day_meals[target.meal_type]] if day_meals.get(target.meal_type) else []
+
+
+def _meal_name(meal):
+    name = ' '.join(str((meal or {}).get('name') or '').split())
+    return name[:CONTEXT_NAME_CHARS]
+
+
+def _meal_calories(meal):
+    try:
+        return float((meal or {}).get('calories') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _day_line(day, day_meals, skip=None, snacks=True):
+    """
+    "monday: B Oatmeal; L Chicken Salad; D Salmon; S Apple" without the meals in skip
+    """
+    skip = skip or []
+    parts = []
+    for slot in MEAL_SLOTS:
+        meal = day_meals.get(slot)
+        if meal and not any(meal is skipped for skipped in skip):
+            parts.append(f"{_SLOT_LETTERS[slot]} {_meal_name(meal)}")
+    for snack in (day_meals.get(SNACKS) or []) if snacks else []:
+        if snack and not any(snack is skipped for skipped in skip):
+            parts.append(f"S {_meal_name(snack)}")
+    return f"{day}: {'; '.join(parts)}" if parts else ''
+
+
+def summarize_week(weekly_plan, target):
+    """
+    Compact context lines for every day except the target day; other days'
+    snacks only matter when snacks are being replaced
+    """
+    snacks = target.meal_type == SNACKS
+    lines = []
+    for day in WEEKDAYS:
+        day_meals = weekly_plan.get(day)
+        if day == target.day or not isinstance(day_meals, dict):
+            continue
+        line = _day_line(day, day_meals, snacks=snacks)
+        if line:
+            lines.append(line)
+    return lines
+
+
+def remaining_calories(weekly_plan, target, preferences):
+    """
+    Calories left for the replaced meal(s) after the rest of the target day
+    """
+    try:
+        daily_target = float(preferences.get('caloricTarget') or 2000)
+    except (TypeError, ValueError):
+        daily_target = 2000.0
+    day_meals = weekly_plan.get(target.day)
+    if target.scope == SCOPE_DAY or not isinstance(day_meals, dict):
+        return int(daily_target)
+    replaced = current_meals(weekly_plan, target)
+    kept = [meal for meal in _all_meals(day_meals) if not any(meal is old for old in replaced)]
+    return int(max(MIN_MEAL_CALORIES, daily_target - sum(_meal_calories(meal) for meal in kept)))
+
+
+def _all_meals(day_meals):
+    meals = [day_meals.get(slot) for slot in MEAL_SLOTS if day_meals.get(slot)]
+    return meals + [snack for snack in day_meals.get(SNACKS) or [] if snack]
+
+
+def _fit_pantry(ranked_names, token_budget):
+    included = []
+    used = 0
+    for name in ranked_names:
+        cost = estimate_tokens(name) + 1
+        if used + cost > token_budget:
+            continue
+        included.append(name)
+        used += cost
+    return included
+
+
+def _render(preferences, weekly_plan, target, pantry_names):
+    pantry = ", ".join(pantry_names) if pantry_names else "none recorded"
+    week = "\n".join(summarize_week(weekly_plan, target)) or "none"
+    replaced = "; ".join(_meal_name(meal) for meal in current_meals(weekly_plan, target)) or "none"
+
+    if target.scope == SCOPE_DAY:
+        task = f"Replace the {target.day} plan of an existing weekly meal plan."
+        rules = ("breakfast, lunch, dinner and 1-2 snacks; portions sized to the daily targets; "
+                 "every ingredient with an amount; simple practical recipes; nothing from the rest of the week.")
+        reply = f'{{"day":D}}\nD={DAY_SCHEMA}\nM={MEAL_SCHEMA}'
+        same_day = ''
+    else:
+        kcal = remaining_calories(weekly_plan, target, preferences)
+        day_meals = weekly_plan.get(target.day) or {}
+        same_day_line = _day_line(target.day, day_meals, skip=current_meals(weekly_plan, target))
+        same_day = f"\nSAME DAY (keep): {same_day_line or 'none'}\n"
+        if target.reply_key == SNACKS:
+            task = f"Replace the {target.day} snacks of an existing weekly meal plan."
+            rules = f"1-2 snacks totalling about {kcal} kcal"
+            reply = f'{{"snacks":[M]}}\nM={MEAL_SCHEMA}'
+        else:
+            task = f"Replace {target.describe()} of an existing weekly meal plan."
+            rules = f"one {'snack' if target.scope == SCOPE_MEAL else target.meal_type} of about {kcal} kcal"
+            reply = f'{{"meal":M}}\nM={MEAL_SCHEMA}'
+        rules += "; every ingredient with an amount; simple practical recipe; nothing from the rest of the week."
+
+    return f"""You are a nutritionist. {task}
+
+USER:
+{format_preferences(preferences)}
+
+PANTRY (prefer these): {pantry}
+
+REST OF WEEK (don't repeat):
+{week}
+{same_day}
+REPLACING (the user wants something different): {replaced}
+
+RULES: {rules}
+
+Reply with JSON only:
+{reply}"""
+
+
+def compile_regeneration_prompt(preferences, grocery_items, weekly_plan, target, pantry_token_budget=None):
+    """
+    Build the prompt for one part of a saved plan; the week is summarized by meal name only
+    """
+    preferences = preferences or {}
+    budget = DEFAULT_PANTRY_TOKEN_BUDGET if pantry_token_budget is None else pantry_token_budget
+    ranked = rank_pantry_items(grocery_items, preferences)
+    included = _fit_pantry(ranked, budget)
+    included_set = set(included)
+    text = _render(preferences, weekly_plan, target, included)
+    return CompiledPrompt(text, estimate_tokens(text), included, [name for name in ranked if name not in included_set])
+
+
+def _is_meal(value):
+    return isinstance(value, dict) and bool(str(value.get('name') or '').strip())
+
+
+def extract_replacement(data, target):
+    """
+    The replacement from the parsed model reply, or None when it isn't usable
+    """
+    value = (data or {}).get(target.reply_key)
+    if target.reply_key == 'day':
+        if not isinstance(value, dict) or not all(_is_meal(value.get(slot)) for slot in MEAL_SLOTS):
+            return None
+        snacks = value.get(SNACKS)
+        snacks = [snack for snack in snacks if _is_meal(snack)] if isinstance(snacks, list) else []
+        return dict(value, **{SNACKS: snacks})
+    if target.reply_key == SNACKS:
+        if not isinstance(value, list):
+            return None
+        snacks = [snack for snack in value if _is_meal(snack)]
+        return snacks or None
+    return value if _is_meal(value) else None
+
+
+def apply_replacement(weekly_plan, target, replacement):
+    """
+    A new weekly plan (weekday order) with the target replaced; other days are shared, not copied
+    """
+    merged = dict(weekly_plan)
+    if target.scope == SCOPE_DAY:
+        merged[target.day] = replacement
+    else:
+        day_meals = dict(weekly_plan[target.day])
+        if target.scope == SCOPE_MEAL:
+            snacks = list(day_meals.get(SNACKS) or [])
+            snacks[target.index] = replacement
+            day_meals[SNACKS] = snacks
+        else:
+            day_meals[target.meal_type] = replacement
+        merged[target.day] = day_meals
+    return {day: merged[day] for day in WEEKDAYS if day in merged}
+
+
+def build_plan_update(key, attributes, plan_id, revision=None, remove=()):
+    """
+    update_item kwargs that SET the given attributes on a saved plan in place
+    and bump its revision, only if it is still the plan (and revision) that was read
+    """
+    names = {'#rev': PLAN_REVISION_ATTRIBUTE, '#plan_id': 'plan_id'}
+    values = {':one': 1, ':plan_id': plan_id}
+    assignments = []
+    for position, (name, value) in enumerate(sorted(attributes.items())):
+        names[f"#a{position}"] = name
+        values[f":a{position}"] = value
+        assignments.append(f"#a{position} = :a{position}")
+
+    expression = f"SET {', '.join(assignments)} ADD #rev :one"
+    removals = [name for name in remove if name not in attributes]
+    if removals:
+        for position, name in enumerate(removals):
+            names[f"#r{position}"] = name
+        expression += f" REMOVE {', '.join(f'#r{position}' for position in range(len(removals)))}"
+
+    if revision is None:
+        condition = '#plan_id = :plan_id AND attribute_not_exists(#rev)'
+    else:
+        condition = '#plan_id = :plan_id AND #rev = :revision'
+        values[':revision'] = revision
+
+    return {
+        'Key': key,
+        'UpdateExpression': expression,
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+        'ReturnValues': 'UPDATED_NEW'
+    }
@@ -0,0 +1,57 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def chunk_days(days, days_per_call):
+    """
+    Split a list of day names into consecutive chunks of days_per_call
+    """
+    days_per_call = max(1, int(days_per_call))
+    return [days[i:i + days_per_call] for i in range(0, len(days), days_per_call)]
+
+
+def generate_days_in_parallel(generate_days, days=None, days_per_call=2, max_workers=4,
+                              max_retries=2, retry_delay=0.5):
+    """
+    Run generate_days(day_names) -> {day_name: day_meals} for every chunk of the
+    week on a bounded thread pool and merge the results in weekday order.
+
+    A chunk that raises, or returns without some of its days, is retried for
+    the missing days only. Returns (weekly_plan, failed_days).
+    """
+    days = list(days or WEEKDAYS)
+    chunks = chunk_days(days, days_per_call)
+    workers = max(1, min(int(max_workers), len(chunks)))
+
+    def run_chunk(chunk):
+        pending = list(chunk)
+        generated = {}
+        for attempt in range(max_retries + 1):
+            try:
+                result = generate_days(pending) or {}
+                for day in pending:
+                    if isinstance(result.get(day), dict) and result[day]:
+                        generated[day] = result[day]
+            except Exception as e:
+                print(f"Error generating days {pending} (attempt {attempt + 1}): {str(e)}")
+
+            pending = [day for day in pending if day not in generated]
+            if not pending:
+                break
+            if attempt < max_retries:
+                # Jittered backoff so retries of different chunks don't line up
+                time.sleep(retry_delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+        return generated, pending
+
+    weekly_generated = {}
+    failed_days = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for generated, pending in executor.map(run_chunk, chunks):
+            weekly_generated.update(generated)
+            failed_days.extend(pending)
+
+    weekly_plan = {day: weekly_generated[day] for day in days if day in weekly_generated}
+    return weekly_plan, failed_days
@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+# Job lifecycle, stored in the PlanJobs item's "status" attribute
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+# Job records are only needed while the client polls
+DEFAULT_JOB_TTL_SECONDS = 24 * 3600
+
+
+class PlanJobStore:
+    """
+    Status records for asynchronous generate-plan jobs (PlanJobs table, pk job_id)
+    """
+
+    def __init__(self, table, ttl_seconds=DEFAULT_JOB_TTL_SECONDS):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+
+    def create(self, job_id, user_id, generation_mode):
+        now = int(time.time())
+        self.table.put_item(
+            Item={
+                'job_id': job_id,
+                'user_id': user_id,
+                'status': JOB_QUEUED,
+                'generation_mode': generation_mode,
+                'created_at': datetime.now().isoformat(),
+                'expires_at': now + self.ttl_seconds
+            }
+        )
+
+    def get(self, job_id):
+        response = self.table.get_item(Key={'job_id': job_id})
+        return response.get('Item')
+
+    def mark_running(self, job_id):
+        self._update(job_id, JOB_RUNNING, {'started_at': datetime.now().isoformat()})
+
+    def mark_succeeded(self, job_id, plan_id, plan_date):
+        self._update(job_id, JOB_SUCCEEDED, {
+            'plan_id': plan_id,
+            'plan_date': plan_date,
+            'finished_at': datetime.now().isoformat()
+        })
+
+    def mark_failed(self, job_id, error):
+        self._update(job_id, JOB_FAILED, {
+            'error': str(error)[:1000],
+            'finished_at': datetime.now().isoformat()
+        })
+
+    def _update(self, job_id, status, attributes):
+        names = {'#status': 'status'}
+        values = {':status': status}
+        assignments = ['#status = :status']
+        for index, (name, value) in enumerate(attributes.items()):
+            names[f"#a{index}"] = name
+            values[f":a{index}"] = value
+            assignments.append(f"#a{index} = :a{index}")
+
+        self.table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression='SET ' + ', '.join(assignments),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+
+
+class SqsJobQueue:
+    """
+    Deliver job messages through SQS; the queue's event source mapping
+    invokes the generate_plan Lambda with them as Records
+    """
+
+    def __init__(self, sqs_client, queue_url):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+
+    def send(self, message):
+        self.sqs_client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(message))
+
+
+class LocalJobQueue:
+    """
+    Stand-in queue for local runs and tests: hands each message straight to
+    the worker, on a background thread unless run_inline is set
+    """
+
+    def __init__(self, worker, run_inline=False):
+        self.worker = worker
+        self.run_inline = run_inline
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+        if self.run_inline:
+            self.worker(message)
+        else:
+            threading.Thread(target=self.worker, args=(message,), daemon=True).start()
+
+
+def sqs_records_to_messages(event):
+    """
+    Job messages carried by an SQS event (records with unreadable bodies are skipped)
+    """
+    messages = []
+    for record in event.get('Records', []):
+        try:
+            messages.append(json.loads(record.get('body') or '{}'))
+        except ValueError as e:
+            print(f"Skipping malformed job message {record.get('messageId')}: {str(e)}")
+    return messages
@@ -0,0 +1,68 @@
+import json
+
+from utils.llm_json import IncrementalJSONExtractor
+
+# Days are emitted from this top-level key of the meal plan JSON
+WEEKLY_PLAN_KEY = 'weeklyPlan'
+
+# Bedrock stream event keys that carry an error instead of a chunk
+STREAM_ERROR_KEYS = (
+    'internalServerException',
+    'modelStreamErrorException',
+    'validationException',
+    'throttlingException',
+    'modelTimeoutException',
+    'serviceUnavailableException',
+)
+
+
+class DayStreamParser(IncrementalJSONExtractor):
+    """
+    Incremental parser for a streamed meal plan response.
+    Feed it text chunks as they arrive; every day object inside "weeklyPlan"
+    is returned as soon as its closing brace has been received.
+    """
+
+    def __init__(self, container_key=WEEKLY_PLAN_KEY):
+        super().__init__(watch=[(container_key,)])
+
+    def feed(self, chunk):
+        """
+        Append a chunk of model output and return the (day_name, day_meals)
+        pairs completed by it
+        """
+        return [
+            (day_name, day_meals)
+            for _, day_name, day_meals in super().feed(chunk)
+            if isinstance(day_meals, dict)
+        ]
+
+
+def read_meal_plan_stream(event_stream, on_day):
+    """
+    Consume an InvokeModelWithResponseStream body, calling on_day(day_name, day_meals)
+    for each completed day. Returns the full generated text.
+    """
+    parser = DayStreamParser()
+
+    for event in event_stream:
+        for error_key in STREAM_ERROR_KEYS:
+            if error_key in event:
+                raise RuntimeError(f"Bedrock stream error ({error_key}): {event[error_key].get('message', '')}")
+
+        chunk = event.get('chunk')
+        if not chunk:
+            continue
+
+        payload = json.loads(chunk['bytes'])
+        if payload.get('type') != 'content_block_delta':
+            continue
+
+        text = payload.get('delta', {}).get('text', '')
+        if not text:
+            continue
+
+        for day_name, day_meals in parser.feed(text):
+            on_day(day_name, day_meals)
+
+    return parser.text
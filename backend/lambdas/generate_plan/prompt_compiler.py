@@ -0,0 +1,161 @@
+import math
+import os
+import re
+from collections import namedtuple
+
+from dietary import is_restricted, restriction_terms
+from plan_fanout import WEEKDAYS
+
+# Input-token budget for the whole prompt (instructions + pantry)
+DEFAULT_INPUT_TOKEN_BUDGET = int(os.environ.get('PROMPT_INPUT_TOKEN_BUDGET', '600'))
+
+# Compact schema: every meal object has the same shape, so it is described once.
+# Macros are computed from the ingredient amounts (nutrition.py), so none are requested.
+MEAL_SCHEMA = '{"name":str,"ingredients":[str],"prepTime":str}'
+DAY_SCHEMA = '{"breakfast":M,"lunch":M,"dinner":M,"snacks":[M]}'
+
+# Receipt lines that are not ingredients
+NON_FOOD_PATTERN = re.compile(
+    r'\b(bag|bags|tax|deposit|discount|coupon|subtotal|total|change|purchase from|gift card|lottery)\b'
+)
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+CompiledPrompt = namedtuple('CompiledPrompt', ['text', 'tokens', 'pantry_items', 'dropped_items'])
+
+
+def _load_tokenizer():
+    """
+    Use tiktoken's cl100k_base as a closer approximation when it is installed;
+    Claude's tokenizer is not available offline
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        return None
+
+
+_tokenizer = _load_tokenizer()
+
+
+def estimate_tokens(text):
+    """
+    Count tokens with the optional tokenizer, or estimate them: words cost
+    roughly one token per four letters, digits and punctuation one each
+    """
+    if _tokenizer is not None:
+        return len(_tokenizer.encode(text))
+
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece[0].isalpha():
+            tokens += max(1, math.ceil(len(piece) / 4))
+        elif piece[0].isdigit():
+            tokens += max(1, math.ceil(len(piece) / 3))
+        else:
+            tokens += 1
+    return tokens
+
+
+def _normalize_name(name):
+    return ' '.join(str(name).lower().split())
+
+
+def rank_pantry_items(grocery_items, preferences=None):
+    """
+    Deduplicate pantry items and order them by relevance: how often they
+    were bought, then how recently (grocery_items is most-recent first).
+    Non-food lines and items excluded by the dietary restrictions are dropped.
+    """
+    restrictions = restriction_terms((preferences or {}).get('dietaryRestrictions', ''))
+    stats = {}
+
+    for position, item in enumerate(grocery_items or []):
+        raw_name = item.get('name') if isinstance(item, dict) else item
+        if not raw_name:
+            continue
+        key = _normalize_name(raw_name)
+        if not key or NON_FOOD_PATTERN.search(key):
+            continue
+        if is_restricted(key, restrictions):
+            continue
+
+        count = 1
+        if isinstance(item, dict):
+            try:
+                count = max(1, int(item.get('count', 1)))
+            except (TypeError, ValueError):
+                count = 1
+
+        if key in stats:
+            stats[key]['count'] += count
+        else:
+            stats[key] = {'name': str(raw_name).strip(), 'count': count, 'first_seen': position}
+
+    ranked = sorted(stats.values(), key=lambda entry: (-entry['count'], entry['first_seen']))
+    return [entry['name'] for entry in ranked]
+
+
+def format_preferences(preferences):
+    """
+    The USER block of a prompt: goal, daily macro targets, budget and any dietary restrictions
+    """
+    lines = [
+        f"Goal: {preferences.get('nutritionGoal', 'maintenance')}",
+        f"Daily targets: {preferences.get('caloricTarget', 2000)} kcal, "
+        f"{preferences.get('proteinTarget', 150)}g protein, "
+        f"{preferences.get('carbTarget', 200)}g carbs, "
+        f"{preferences.get('fatTarget', 65)}g fat",
+        f"Weekly budget: ${preferences.get('budget', 100)}",
+    ]
+    restrictions = preferences.get('dietaryRestrictions')
+    if restrictions:
+        lines.append(f"Dietary restrictions: {restrictions}")
+    return "\n".join(lines)
+
+
+def _render(preferences, days, pantry_names):
+    day_count = len(days)
+    pantry = ", ".join(pantry_names) if pantry_names else "none recorded"
+    return f"""You are a nutritionist. Create a {day_count}-day meal plan for: {", ".join(days)}.
+
+USER:
+{format_preferences(preferences)}
+
+PANTRY (prefer these): {pantry}
+
+RULES: breakfast, lunch, dinner and 1-2 snacks for every listed day; portions sized to the daily targets; every ingredient with an amount ("150g chicken breast", "1 cup rice"); simple practical recipes; no missing days.
+
+Reply with JSON only:
+{{"weeklyPlan":{{"<day>":D}}}}
+D={DAY_SCHEMA}
+M={MEAL_SCHEMA}"""
+
+
+def compile_meal_plan_prompt(preferences, grocery_items, days=None, input_token_budget=None):
+    """
+    Build the meal plan prompt from the compact schema and fit as many of
+    the most relevant pantry items as the input-token budget allows
+    """
+    preferences = preferences or {}
+    days = list(days or WEEKDAYS)
+    budget = input_token_budget or DEFAULT_INPUT_TOKEN_BUDGET
+
+    ranked = rank_pantry_items(grocery_items, preferences)
+    base_tokens = estimate_tokens(_render(preferences, days, []))
+
+    included = []
+    used = base_tokens
+    for name in ranked:
+        # ", name" costs the name plus the separator
+        cost = estimate_tokens(name) + 1
+        if used + cost > budget:
+            continue
+        included.append(name)
+        used += cost
+
+    included_set = set(included)
+    dropped = [name for name in ranked if name not in included_set]
+    text = _render(preferences, days, included)
+    return CompiledPrompt(text, estimate_tokens(text), included, dropped)
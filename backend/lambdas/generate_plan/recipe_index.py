@@ -0,0 +1,312 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from dietary import is_restricted, parse_restrictions, singular_word
+from plan_fanout import WEEKDAYS
+from utils.plan_codec import LEGACY_PLAN_ATTRIBUTE, PLAN_BLOB_ATTRIBUTE, PLAN_CODEC_ATTRIBUTE, decode_meal_plan
+
+MEAL_SLOTS = ('breakfast', 'lunch', 'dinner')
+SNACK_SLOT = 'snack'
+
+# Share of the daily calorie target each slot should land near
+SLOT_CALORIE_SHARE = {'breakfast': 0.25, 'lunch': 0.30, 'dinner': 0.35, 'snack': 0.10}
+
+# Assumed to be in every kitchen, so they never count against pantry coverage
+STAPLES = {'salt', 'pepper', 'black pepper', 'water', 'oil', 'olive oil', 'vegetable oil',
+           'cooking spray', 'spice', 'seasoning', 'herb'}
+
+_QUANTITY = re.compile(
+    r'\b\d+([./]\d+)?\s*(cups?|tbsp|tsp|tablespoons?|teaspoons?|oz|ounces?|lbs?|pounds?|g|grams?|kg|ml|l|cloves?|slices?|pieces?)?\b'
+)
+_DESCRIPTORS = {'fresh', 'chopped', 'diced', 'sliced', 'minced', 'organic', 'large', 'small', 'medium',
+                'boneless', 'skinless', 'frozen', 'raw', 'cooked', 'shredded', 'grated', 'lean', 'low', 'fat'}
+
+
+def ingredient_words(text):
+    """
+    Food words of an ingredient line as written: "2 cups Chopped Tomatoes (ripe)" -> ["tomatoes"]
+    """
+    text = re.sub(r'\([^)]*\)', ' ', str(text).lower())
+    text = _QUANTITY.sub(' ', text)
+    return [word for word in re.findall(r'[a-z]+', text) if word not in _DESCRIPTORS]
+
+
+def normalize_ingredient(text):
+    """
+    Reduce an ingredient line to its food words: "2 cups Chopped Tomatoes (ripe)" -> "tomato"
+    """
+    return ' '.join(singular_word(word) for word in ingredient_words(text))
+
+
+def _number(value):
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class RecipeIndex:
+    """
+    Catalog of meals seen in saved plans, with an inverted index from
+    ingredient words to the recipe ingredients that contain them
+    """
+
+    def __init__(self):
+        self.recipes = []
+        self._by_name = {}
+        self._ingredient_terms = []
+        self._postings = defaultdict(set)
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def add_meal(self, meal, slot):
+        """
+        Add one meal object ({"name", "ingredients", "calories", ...}) for a slot
+        """
+        if not isinstance(meal, dict) or not meal.get('name') or not meal.get('ingredients'):
+            return None
+        name_key = ' '.join(str(meal['name']).lower().split())
+        recipe_id = self._by_name.get(name_key)
+        if recipe_id is not None:
+            self.recipes[recipe_id]['slots'].add(slot)
+            return recipe_id
+
+        terms = []
+        for ingredient in meal['ingredients']:
+            term = normalize_ingredient(ingredient)
+            if term and term not in terms:
+                terms.append(term)
+        if not terms:
+            return None
+
+        recipe_id = len(self.recipes)
+        self.recipes.append({
+            'name': str(meal['name']),
+            'ingredients': [str(ingredient) for ingredient in meal['ingredients']],
+            'prepTime': meal.get('prepTime', 'N/A'),
+            'calories': _number(meal.get('calories', 0)),
+            'protein': _number(meal.get('protein', 0)),
+            'carbs': _number(meal.get('carbs', 0)),
+            'fat': _number(meal.get('fat', 0)),
+            'slots': {slot}
+        })
+        self._by_name[name_key] = recipe_id
+        self._ingredient_terms.append(terms)
+        for position, term in enumerate(terms):
+            for word in term.split():
+                self._postings[word].add((recipe_id, position))
+        return recipe_id
+
+    def add_plan(self, meal_plan):
+        """
+        Add every meal of a saved plan's weeklyPlan
+        """
+        weekly_plan = (meal_plan or {}).get('weeklyPlan') or {}
+        for day_meals in weekly_plan.values():
+            if not isinstance(day_meals, dict):
+                continue
+            for slot in MEAL_SLOTS:
+                self.add_meal(day_meals.get(slot), slot)
+            for snack in day_meals.get('snacks') or []:
+                self.add_meal(snack, SNACK_SLOT)
+
+    def pantry_coverage(self, pantry_items):
+        """
+        {recipe_id: share of its ingredients found in the pantry or staples}.
+        A pantry item matches an ingredient when one's words contain the
+        other's ("chicken" matches "chicken breast" and vice versa).
+        """
+        matched = defaultdict(set)
+        for item in pantry_items or []:
+            words = set(normalize_ingredient(item).split())
+            if not words:
+                continue
+            candidates = set()
+            for word in words:
+                candidates |= self._postings.get(word, set())
+            for recipe_id, position in candidates:
+                ingredient_words = set(self._ingredient_terms[recipe_id][position].split())
+                if ingredient_words <= words or words <= ingredient_words:
+                    matched[recipe_id].add(position)
+
+        coverage = {}
+        for recipe_id, terms in enumerate(self._ingredient_terms):
+            have = matched.get(recipe_id, set())
+            staples = sum(1 for position, term in enumerate(terms) if position not in have and term in STAPLES)
+            coverage[recipe_id] = (len(have) + staples) / len(terms)
+        return coverage
+
+    def assemble_week(self, pantry_items, preferences=None, days=None, min_coverage=0.6, min_choices=2):
+        """
+        Build {day: {breakfast, lunch, dinner, snacks}} from catalog recipes
+        whose pantry coverage is at least min_coverage, rotating recipes so
+        the least-used fitting one is picked for each slot. Returns None when
+        any main slot has fewer than min_choices eligible recipes, or when a
+        dietary restriction can't be parsed into excluded foods (the model
+        reads those as text).
+        """
+        preferences = preferences or {}
+        days = list(days or WEEKDAYS)
+        restrictions = parse_restrictions(preferences.get('dietaryRestrictions', ''))
+        if restrictions.unparsed:
+            print(f"Catalog skipped for unparsed restrictions: {', '.join(restrictions.unparsed)}")
+            return None
+        excluded = restrictions.terms
+        coverage = self.pantry_coverage(pantry_items)
+        daily_calories = _number(preferences.get('caloricTarget', 2000)) or 2000
+
+        choices = {}
+        for slot in MEAL_SLOTS + (SNACK_SLOT,):
+            target = daily_calories * SLOT_CALORIE_SHARE[slot]
+            eligible = []
+            for recipe_id, recipe in enumerate(self.recipes):
+                if slot not in recipe['slots'] or coverage[recipe_id] < min_coverage:
+                    continue
+                # Each line on its own: "rolled oats" + "milk" is not "oat milk"
+                if any(is_restricted(text, excluded) for text in [recipe['name']] + recipe['ingredients']):
+                    continue
+                calorie_gap = abs(recipe['calories'] - target) / target if recipe['calories'] else 1
+                eligible.append((coverage[recipe_id] - 0.5 * calorie_gap, recipe_id))
+            eligible.sort(key=lambda entry: (-entry[0], entry[1]))
+            choices[slot] = [recipe_id for _, recipe_id in eligible]
+
+        if any(len(choices[slot]) < min_choices for slot in MEAL_SLOTS):
+            return None
+
+        uses = defaultdict(int)
+        weekly_plan = {}
+        for day in days:
+            day_meals = {}
+            for slot in MEAL_SLOTS:
+                recipe_id = self._least_used(choices[slot], uses)
+                day_meals[slot] = self.meal(recipe_id)
+            snack_id = self._least_used(choices[SNACK_SLOT], uses)
+            day_meals['snacks'] = [self.meal(snack_id)] if snack_id is not None else []
+            weekly_plan[day] = day_meals
+        return weekly_plan
+
+    @staticmethod
+    def _least_used(ranked_ids, uses):
+        if not ranked_ids:
+            return None
+        # ranked_ids is best-first, so min() keeps the best among equally used recipes
+        recipe_id = min(ranked_ids, key=lambda rid: uses[rid])
+        uses[recipe_id] += 1
+        return recipe_id
+
+    def meal(self, recipe_id):
+        """
+        Recipe as a meal object in the weeklyPlan shape
+        """
+        recipe = self.recipes[recipe_id]
+        return {
+            'name': recipe['name'],
+            'ingredients': list(recipe['ingredients']),
+            'prepTime': recipe['prepTime'],
+            'calories': recipe['calories'],
+            'protein': recipe['protein'],
+            'carbs': recipe['carbs'],
+            'fat': recipe['fat']
+        }
+
+    def to_records(self):
+        return [dict(self.meal(recipe_id), slots=sorted(recipe['slots']))
+                for recipe_id, recipe in enumerate(self.recipes)]
+
+    @classmethod
+    def from_records(cls, records):
+        index = cls()
+        for record in records or []:
+            for slot in record.get('slots') or []:
+                index.add_meal(record, slot)
+        return index
+
+
+class RecipeCatalog:
+    """
+    Lazily built RecipeIndex shared across warm invocations. Loaded from a
+    snapshot in the shared cache when one exists, otherwise built by scanning
+    saved MealPlans (then snapshotted), and rebuilt after refresh_seconds.
+    """
+
+    SNAPSHOT_KEY = 'recipes'
+
+    def __init__(self, table=None, cache=None, max_plans=500, refresh_seconds=24 * 3600):
+        self.table = table
+        self.cache = cache
+        self.max_plans = max_plans
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._index is None or time.time() - self._loaded_at > self.refresh_seconds:
+                self._index = self._load()
+                self._loaded_at = time.time()
+            return self._index
+
+    def add_plan(self, meal_plan):
+        """
+        Fold a freshly generated plan into the in-memory index
+        """
+        with self._lock:
+            if self._index is not None:
+                self._index.add_plan(meal_plan)
+
+    def _load(self):
+        started = time.time()
+        if self.cache is not None:
+            records, tier = self.cache.get(self.SNAPSHOT_KEY)
+            if records is not None:
+                index = RecipeIndex.from_records(records)
+                print(f"Recipe catalog loaded from {tier} snapshot: {len(index)} recipes")
+                return index
+
+        index = RecipeIndex()
+        if self.table is not None:
+            try:
+                plans = 0
+                for item in self._scan_plans():
+                    try:
+                        index.add_plan(decode_meal_plan(item))
+                    except Exception as e:
+                        print(f"Skipping undecodable saved plan: {str(e)}")
+                    plans += 1
+                print(f"Recipe catalog built from {plans} saved plans: {len(index)} recipes "
+                      f"in {int((time.time() - started) * 1000)} ms")
+            except Exception as e:
+                print(f"Error building recipe catalog: {str(e)}")
+
+        if self.cache is not None and len(index):
+            self.cache.put(self.SNAPSHOT_KEY, index.to_records())
+        return index
+
+    def _scan_plans(self):
+        scan_kwargs = {
+            # Compressed plans come whole; older items only need their weeklyPlan
+            'ProjectionExpression': '#plan.weeklyPlan, #blob, #codec',
+            'ExpressionAttributeNames': {
+                '#plan': LEGACY_PLAN_ATTRIBUTE,
+                '#blob': PLAN_BLOB_ATTRIBUTE,
+                '#codec': PLAN_CODEC_ATTRIBUTE
+            }
+        }
+        seen = 0
+        while seen < self.max_plans:
+            response = self.table.scan(Limit=min(100, self.max_plans - seen), **scan_kwargs)
+            for item in response.get('Items', []):
+                seen += 1
+                yield item
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,192 @@
+import math
+import re
+
+from dietary import singular_word
+from nutrition import get_nutrition_engine
+from plan_fanout import WEEKDAYS
+from recipe_index import ingredient_words, normalize_ingredient
+
+# Aisle order of the list; categories come from the nutrient table
+CATEGORY_ORDER = ['produce', 'protein', 'dairy', 'grains & bakery', 'pantry', 'spices & condiments', 'other']
+DEFAULT_CATEGORY = 'other'
+
+MEAL_SLOTS = ('breakfast', 'lunch', 'dinner')
+
+# Ingredients nobody shops for
+NOT_PURCHASED = {'water'}
+
+# How it's cut or cooked doesn't change what to buy ("grilled chicken" is chicken breast)
+PREPARATION_WORDS = {'grilled', 'baked', 'roasted', 'steamed', 'fried', 'boiled', 'poached', 'sauteed', 'smoked',
+                     'fillet', 'toasted', 'mashed', 'scrambled', 'seared', 'braised', 'pulled',
+                     # "salt to taste", "parsley for garnish"
+                     'to', 'taste', 'as', 'needed', 'for', 'garnish', 'optional', 'pinch', 'dash', 'of'}
+
+# Joins two foods on one line ("salt and pepper to taste")
+_CONJUNCTION = re.compile(r'\s+(?:and|&)\s+')
+
+
+def _plan_meals(weekly_plan):
+    weekly_plan = weekly_plan or {}
+    for day in [day for day in WEEKDAYS if day in weekly_plan] + [day for day in weekly_plan if day not in WEEKDAYS]:
+        day_meals = weekly_plan[day]
+        if not isinstance(day_meals, dict):
+            continue
+        for slot in MEAL_SLOTS:
+            if isinstance(day_meals.get(slot), dict):
+                yield day_meals[slot]
+        for snack in day_meals.get('snacks') or []:
+            if isinstance(snack, dict):
+                yield snack
+
+
+def ingredient_parts(engine, ingredient):
+    """
+    An ingredient line as one line per food when it joins known foods
+    ("salt and pepper to taste"); "mac and cheese" stays whole. Only the
+    first food keeps the line's amount.
+    """
+    parts = _CONJUNCTION.split(ingredient)
+    if len(parts) > 1 and all(engine.measure(part).phrase for part in parts):
+        return parts
+    return [ingredient]
+
+
+def item_name(engine, ingredient):
+    """
+    (key, name, category, measurement) for an ingredient line. Lines are
+    totalled per key: known foods are keyed by the phrase that matched, or
+    by their table row when the phrase is just a shorter or cooked form of
+    it ("grilled chicken" -> "chicken breast", while "almond milk" stays
+    apart from "milk"). When the line has other food words than the phrase
+    ("coconut milk", "peanut oil") it is a different product and is keyed by
+    its own food words, as unknown ones are. The name shown is the line's
+    food words as written ("mixed berries"), or the table row it was merged into.
+    """
+    measurement = engine.measure(ingredient)
+    term = normalize_ingredient(ingredient)
+    if measurement.phrase is None:
+        key, category = term, DEFAULT_CATEGORY
+    else:
+        category = engine.categories[measurement.row]
+        if set(term.split()) - set(measurement.phrase.split()) - PREPARATION_WORDS:
+            key = term
+        else:
+            food = engine.foods[measurement.row]
+            words = set(measurement.phrase.split()) - PREPARATION_WORDS
+            key = food if words <= set(food.split()) else measurement.phrase
+    written = [word for word in ingredient_words(ingredient) if word not in PREPARATION_WORDS]
+    name = ' '.join(written) if ' '.join(singular_word(word) for word in written) == key else key
+    return key, name, category, measurement
+
+
+def format_amount(grams, count, unmeasured):
+    """
+    "750 g", "1.2 kg", "6", "6 + 200 g", or "as needed"
+    """
+    parts = []
+    if count:
+        parts.append(str(int(math.ceil(count - 1e-9))))
+    if grams:
+        if grams >= 1000:
+            parts.append(f"{math.ceil(grams / 100) / 10:g} kg")
+        else:
+            parts.append(f"{int(math.ceil(grams / 5) * 5)} g")
+    if not parts:
+        return 'as needed' if unmeasured else ''
+    return ' + '.join(parts)
+
+
+class ShoppingListBuilder:
+    """
+    Totals a plan's ingredient lines per item. Amounts are normalized with
+    the nutrition engine's parser: weights and volumes become grams, counted
+    items ("2 eggs") stay counts, and lines without an amount are "as needed".
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or get_nutrition_engine()
+        self._items = {}
+
+    def add_plan(self, weekly_plan):
+        for meal in _plan_meals(weekly_plan):
+            for ingredient in meal.get('ingredients') or []:
+                self.add(ingredient)
+        return self
+
+    def add(self, ingredient):
+        if not isinstance(ingredient, str) or not ingredient.strip():
+            return
+        for part in ingredient_parts(self.engine, ingredient):
+            self._add(part)
+
+    def _add(self, ingredient):
+        key, name, category, measurement = item_name(self.engine, ingredient)
+        if not key or key in NOT_PURCHASED:
+            return
+        item = self._items.get(key)
+        if item is None:
+            item = self._items[key] = {'name': name, 'category': category, 'grams': 0.0, 'count': 0.0,
+                                       'unmeasured': 0, 'uses': 0}
+        item['uses'] += 1
+        if measurement.count is not None:
+            item['count'] += measurement.count
+        elif measurement.measured:
+            item['grams'] += measurement.grams
+        else:
+            item['unmeasured'] += 1
+
+    def subtract_pantry(self, pantry_items):
+        """
+        Take what the user already has off the list: a pantry line with an
+        amount ("500g chicken breast") is subtracted, a bare name removes the item
+        """
+        for pantry_item in pantry_items or []:
+            text = pantry_item.get('name') if isinstance(pantry_item, dict) else pantry_item
+            if not text or not str(text).strip():
+                continue
+            for part in ingredient_parts(self.engine, str(text)):
+                self._subtract(part)
+        return self
+
+    def _subtract(self, pantry_line):
+        key, _, _, measurement = item_name(self.engine, pantry_line)
+        item = self._items.get(key)
+        if item is None:
+            return
+        if not measurement.measured:
+            del self._items[key]
+            return
+        if measurement.count is not None:
+            item['count'] = max(0.0, item['count'] - measurement.count)
+        else:
+            item['grams'] = max(0.0, item['grams'] - measurement.grams)
+        if item['count'] <= 0 and item['grams'] <= 0 and not item['unmeasured']:
+            del self._items[key]
+
+    def items(self):
+        """
+        [{'name', 'category', 'amount', 'grams'?, 'count'?, 'uses'}, ...] in aisle order, then by name
+        """
+        rank = {category: position for position, category in enumerate(CATEGORY_ORDER)}
+        result = []
+        for item in sorted(self._items.values(),
+                           key=lambda entry: (rank.get(entry['category'], len(rank)), entry['name'])):
+            entry = {
+                'name': item['name'],
+                'category': item['category'],
+                'amount': format_amount(item['grams'], item['count'], item['unmeasured']),
+                'uses': item['uses']
+            }
+            if item['grams']:
+                entry['grams'] = int(math.ceil(item['grams']))
+            if item['count']:
+                entry['count'] = int(math.ceil(item['count'] - 1e-9))
+            result.append(entry)
+        return result
+
+
+def build_shopping_list(weekly_plan, pantry_items=None, engine=None):
+    """
+    Aggregated, categorized shopping list for a weekly plan, minus the pantry
+    """
+    return ShoppingListBuilder(engine).add_plan(weekly_plan).subtract_pantry(pantry_items).items()
@@ -11,6 +11,8 @@ from unittest.mock import Mock, patch
 
 # Add the handler directory to Python path
 sys.path.insert(0, os.path.dirname(__file__))
+# Shared utils package (deployed as a Lambda layer)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 # Mock environment variables
 os.environ['MEAL_PLANS_TABLE'] = 'test-meal-plans'
@@ -9,6 +9,8 @@ import os
 
 # Add the handler directory to Python path
 sys.path.insert(0, os.path.dirname(__file__))
+# Shared utils package (deployed as a Lambda layer)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 def test_prompt_creation():
     """Test the prompt creation logic"""
@@ -1,16 +1,24 @@
-import json
-import boto3
 import os
-from boto3.dynamodb.conditions import Key
+from datetime import datetime, timedelta
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
+from utils.aws_clients import lazy_table
+from utils.db_helpers import create_response, error_response
+from utils.plan_codec import decode_meal_plan
 
 # Environment variables
 MEAL_PLANS_TABLE = os.environ.get('MEAL_PLANS_TABLE')
+PLAN_JOBS_TABLE = os.environ.get('PLAN_JOBS_TABLE')
 
-# DynamoDB table
-meal_plans_table = dynamodb.Table(MEAL_PLANS_TABLE)
+# A job still "running" after this long was cut off by the Lambda timeout:
+# the worker times out at 60s and SQS gives up after two 180s receives
+STALE_JOB_SECONDS = int(os.environ.get('PLAN_JOB_STALE_SECONDS', 600))
+
+# Allowed methods in this endpoint's CORS headers
+CORS_METHODS = 'GET, OPTIONS'
+
+# DynamoDB tables (built on first use: a jobId poll never touches MealPlans)
+meal_plans_table = lazy_table(MEAL_PLANS_TABLE)
+plan_jobs_table = lazy_table(PLAN_JOBS_TABLE) if PLAN_JOBS_TABLE else None
 
 
 def lambda_handler(event, context):
@@ -20,6 +28,19 @@ def lambda_handler(event, context):
     try:
         # Get query parameters
         query_params = event.get('queryStringParameters') or {}
+        
+        # Poll an asynchronous generate-plan job
+        job_id = query_params.get('jobId')
+        if job_id:
+            job = get_plan_job(job_id)
+            if job is None:
+                return error_response(404, 'Job not found', methods=CORS_METHODS)
+            return create_response(200, {
+                'success': True,
+                'job': job,
+                'message': f"Meal plan job is {job['status']}"
+            }, CORS_METHODS)
+        
         user_id = query_params.get('userId', 'anonymous')
         plan_date = query_params.get('planDate')  # Optional: specific date
         limit = int(query_params.get('limit', 10))  # Default to 10 plans
@@ -31,7 +52,7 @@ def lambda_handler(event, context):
                 'success': True,
                 'mealPlan': meal_plan,
                 'message': 'Meal plan retrieved successfully'
-            })
+            }, CORS_METHODS)
         else:
             # Get recent meal plans
             meal_plans = get_recent_meal_plans(user_id, limit)
@@ -40,15 +61,11 @@ def lambda_handler(event, context):
                 'mealPlans': meal_plans,
                 'count': len(meal_plans),
                 'message': 'Meal plans retrieved successfully'
-            })
+            }, CORS_METHODS)
         
     except Exception as e:
         print(f"Error retrieving meal plans: {str(e)}")
-        return create_response(500, {
-            'success': False,
-            'error': 'Failed to retrieve meal plans',
-            'details': str(e)
-        })
+        return error_response(500, 'Failed to retrieve meal plans', str(e), CORS_METHODS)
 
 
 def get_specific_meal_plan(user_id, plan_date):
@@ -74,13 +91,71 @@ def get_specific_meal_plan(user_id, plan_date):
         return None
 
 
+def get_plan_job(job_id):
+    """
+    Get the status of a generate-plan job, with the saved meal plan once it has succeeded
+    """
+    if plan_jobs_table is None:
+        print("Warning: PLAN_JOBS_TABLE not set, job lookups unavailable")
+        return None
+    
+    try:
+        item = plan_jobs_table.get_item(Key={'job_id': job_id}).get('Item')
+    except Exception as e:
+        print(f"Error getting meal plan job: {str(e)}")
+        return None
+    
+    if not item:
+        return None
+    
+    job = {
+        'jobId': item.get('job_id'),
+        'status': item.get('status'),
+        'generationMode': item.get('generation_mode'),
+        'createdAt': item.get('created_at'),
+        'startedAt': item.get('started_at'),
+        'finishedAt': item.get('finished_at'),
+        'planId': item.get('plan_id'),
+        'planDate': item.get('plan_date'),
+        'error': item.get('error'),
+        'mealPlan': None
+    }
+    
+    if job['status'] == 'running' and is_stale_job(item):
+        job['status'] = 'failed'
+        job['error'] = 'Meal plan job timed out'
+    
+    if job['status'] == 'succeeded' and job['planDate']:
+        meal_plan = get_specific_meal_plan(item.get('user_id'), job['planDate'])
+        if meal_plan and meal_plan.get('planId') != job['planId']:
+            # A later generation the same day saved over the plan this job produced
+            job['status'] = 'failed'
+            job['error'] = 'Meal plan was replaced by a newer generation'
+            meal_plan = None
+        job['mealPlan'] = meal_plan
+    
+    return job
+
+
+def is_stale_job(item, now=None):
+    """
+    True when a running job started more than STALE_JOB_SECONDS ago
+    """
+    try:
+        started_at = datetime.fromisoformat(item.get('started_at'))
+    except (TypeError, ValueError):
+        return False
+    return (now or datetime.now()) - started_at > timedelta(seconds=STALE_JOB_SECONDS)
+
+
 def get_recent_meal_plans(user_id, limit):
     """
     Get recent meal plans for a user
     """
     try:
         response = meal_plans_table.query(
-            KeyConditionExpression=Key('user_id').eq(user_id),
+            KeyConditionExpression='user_id = :user_id',
+            ExpressionAttributeValues={':user_id': user_id},
             ScanIndexForward=False,  # Most recent first
             Limit=limit
         )
@@ -100,27 +175,18 @@ def format_meal_plan(item):
     """
     Format meal plan item for response
     """
+    try:
+        # Compressed plans and older items with a nested meal_plan map both decode here
+        meal_plan = decode_meal_plan(item)
+    except Exception as e:
+        print(f"Error decoding meal plan {item.get('plan_id')}: {str(e)}")
+        meal_plan = {}
+    
     return {
         'planId': item.get('plan_id'),
         'planDate': item.get('plan_date'),
-        'mealPlan': item.get('meal_plan', {}),
+        'mealPlan': meal_plan,
         'preferencesUsed': item.get('preferences_used', {}),
         'createdAt': item.get('created_at'),
         'status': item.get('status', 'active')
     }
-
-
-def create_response(status_code, body):
-    """
-    Create standardized API response
-    """
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'GET, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type'
-        },
-        'body': json.dumps(body)
-    }
\ No newline at end of file
@@ -1,20 +1,28 @@
 import json
-import boto3
 import os
 from datetime import datetime
 from decimal import Decimal
 
-# Initialize AWS clients
-textract_client = boto3.client('textract')
-dynamodb = boto3.resource('dynamodb')
-s3_client = boto3.client('s3')
+from item_names import get_item_normalizer
+from utils.aws_clients import lazy_client, lazy_table
+from utils.db_helpers import create_response, error_response
+from utils.receipts import receipt_key
+
+# Initialize AWS clients (built on first use)
+textract_client = lazy_client('textract')
 
 # Environment variables
 RECEIPTS_BUCKET = os.environ.get('RECEIPTS_BUCKET')
 RECEIPTS_TABLE = os.environ.get('RECEIPTS_TABLE')
 
+# Allowed methods in this endpoint's CORS headers
+CORS_METHODS = 'POST, OPTIONS'
+
 # DynamoDB table
-receipts_table = dynamodb.Table(RECEIPTS_TABLE)
+receipts_table = lazy_table(RECEIPTS_TABLE)
+
+# Receipt abbreviations -> canonical grocery names (memo lives across warm invocations)
+item_normalizer = get_item_normalizer()
 
 
 def lambda_handler(event, context):
@@ -33,59 +41,31 @@ def lambda_handler(event, context):
                 # Process the uploaded receipt
                 result = process_receipt(bucket, key)
                 
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps({
-                        'success': True,
-                        'message': 'Receipt processed successfully',
-                        'result': result
-                    }, cls=DecimalEncoder)
-                }
+                return create_response(200, {
+                    'success': True,
+                    'message': 'Receipt processed successfully',
+                    'result': result
+                }, CORS_METHODS)
         
         # Handle direct API call
         body = json.loads(event.get('body', '{}'))
         s3_key = body.get('s3Key')
         
         if not s3_key:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 's3Key is required'}, cls=DecimalEncoder)
-            }
+            return error_response(400, 's3Key is required', methods=CORS_METHODS)
         
         # Process the receipt
         result = process_receipt(RECEIPTS_BUCKET, s3_key)
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': True,
-                'message': 'Receipt processed successfully',
-                'result': result
-            }, cls=DecimalEncoder)
-        }
+        return create_response(200, {
+            'success': True,
+            'message': 'Receipt processed successfully',
+            'result': result
+        }, CORS_METHODS)
         
     except Exception as e:
         print(f"Error processing receipt: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': 'Failed to process receipt',
-                'details': str(e)
-            }, cls=DecimalEncoder)
-        }
+        return error_response(500, 'Failed to process receipt', str(e), CORS_METHODS)
 
 
 def process_receipt(bucket, key):
@@ -93,9 +73,9 @@ def process_receipt(bucket, key):
     Process receipt using Textract and save to DynamoDB
     """
     try:
-        # Extract user_id from S3 key (format: receipts/user_id/timestamp-filename)
-        path_parts = key.split('/')
-        user_id = path_parts[1] if len(path_parts) > 1 else 'anonymous'
+        # user_id and receipt_id come from the S3 key (format: receipts/user_id/timestamp-filename)
+        item_key = receipt_key(key)
+        user_id = item_key['user_id']
         
         # Call Textract to analyze the receipt
         response = textract_client.analyze_expense(
@@ -110,8 +90,8 @@ def process_receipt(bucket, key):
         # Parse Textract response
         parsed_items = parse_textract_response(response)
         
-        # Generate receipt ID (use filename from S3 key which already has timestamp)
-        receipt_id = key.split('/')[-1]  # Just use the filename
+        # Receipt ID is the filename from the S3 key, which already has a timestamp
+        receipt_id = item_key['receipt_id']
         
         # Save to DynamoDB
         receipts_table.put_item(
@@ -195,6 +175,7 @@ def parse_textract_response(response):
                         # Set defaults
                         item.setdefault('price', Decimal('0'))
                         item.setdefault('quantity', 1)
+                        normalize_item_name(item)
                         items.append(item)
         
         # If no line items found, try to extract from summary fields
@@ -234,9 +215,17 @@ def parse_textract_response(response):
     return items
 
 
-class DecimalEncoder(json.JSONEncoder):
-    """Helper to encode Decimal values from DynamoDB"""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
\ No newline at end of file
+def normalize_item_name(item):
+    """
+    Store the canonical grocery name, keeping what the receipt printed in raw_name
+    """
+    raw_name = item['name']
+    try:
+        name = item_normalizer.normalize(raw_name)
+    except Exception as e:
+        print(f"Error normalizing item name {raw_name!r}: {str(e)}")
+        return item
+    if name and name != raw_name:
+        item['name'] = name
+        item['raw_name'] = raw_name
+    return item
@@ -0,0 +1,283 @@
+"""
+Receipt item-name normalization.
+
+Textract returns line items the way the store printed them ("ORG BNLS CHKN
+BRST 2.31 LB"). ItemNameNormalizer turns them into canonical grocery names
+("Chicken Breast") once, at parse time:
+
+1. clean: lowercase, drop codes, weights, prices and punctuation
+2. expand each token: abbreviation dictionary, then the known vocabulary,
+   a prefix trie for truncated words ("BROCC"), vowel-stripped abbreviations
+   ("STRWBRY") and a trigram index for OCR misspellings ("BROCOLI")
+3. match: the canonical name with the most tokens all present in the line,
+   used only when it accounts for (nearly) every non-descriptor token, so
+   "ICE CREAM" and "POTATO CHIPS" keep their own expanded names instead of
+   becoming "Rice" and "Potatoes"; truncation and misspelling guesses that
+   no canonical name confirms are undone
+
+Results are memoized per raw name for the life of the container.
+"""
+import re
+import threading
+from collections import defaultdict, namedtuple
+
+ItemMatch = namedtuple('ItemMatch', ['name', 'canonical', 'method'])
+
+# Store abbreviations and codes; '' drops the token (store brands, packaging)
+ABBREVIATIONS = {
+    'org': 'organic', 'orgnc': 'organic', 'bnls': 'boneless', 'sknls': 'skinless', 'skls': 'skinless',
+    'chkn': 'chicken', 'chk': 'chicken', 'chix': 'chicken', 'brst': 'breast', 'bst': 'breast',
+    'thgh': 'thigh', 'thghs': 'thighs', 'grnd': 'ground', 'gr': 'ground', 'bf': 'beef', 'trky': 'turkey',
+    'tky': 'turkey', 'prk': 'pork', 'chp': 'chop', 'chps': 'chops', 'bcn': 'bacon', 'saus': 'sausage',
+    'slmn': 'salmon', 'shrmp': 'shrimp', 'tlpa': 'tilapia',
+    'mlk': 'milk', 'whl': 'whole', 'wh': 'whole', 'skm': 'skim', 'chs': 'cheese', 'chse': 'cheese',
+    'ched': 'cheddar', 'chdr': 'cheddar', 'mozz': 'mozzarella', 'parm': 'parmesan', 'yog': 'yogurt',
+    'ygrt': 'yogurt', 'yogrt': 'yogurt', 'grk': 'greek', 'btr': 'butter', 'bttr': 'butter',
+    'crm': 'cream', 'hvy': 'heavy', 'sr': 'sour', 'lg': 'large', 'lrg': 'large', 'med': 'medium',
+    'sm': 'small', 'xl': 'large', 'dz': 'dozen', 'doz': 'dozen',
+    'bnna': 'banana', 'bnnas': 'bananas', 'bana': 'banana', 'appl': 'apple', 'strwbry': 'strawberries',
+    'strwb': 'strawberries', 'bluebry': 'blueberries', 'blubry': 'blueberries', 'rsp': 'raspberries',
+    'avo': 'avocado', 'avoc': 'avocado', 'tom': 'tomato', 'tmto': 'tomato', 'tmtos': 'tomatoes',
+    'pot': 'potato', 'pots': 'potatoes', 'swt': 'sweet', 'onn': 'onion', 'onin': 'onion',
+    'grn': 'green', 'ylw': 'yellow', 'pepr': 'pepper', 'ppr': 'pepper', 'pep': 'pepper',
+    'lett': 'lettuce', 'ltc': 'lettuce', 'rom': 'romaine', 'spin': 'spinach', 'spnch': 'spinach',
+    'broc': 'broccoli', 'brocc': 'broccoli', 'cauli': 'cauliflower', 'carr': 'carrots', 'crrt': 'carrots',
+    'cuc': 'cucumber', 'cuke': 'cucumber', 'mush': 'mushrooms', 'mshrm': 'mushrooms', 'grlc': 'garlic',
+    'cel': 'celery', 'zucc': 'zucchini', 'zuc': 'zucchini', 'asp': 'asparagus', 'lmn': 'lemon',
+    'lme': 'lime', 'orng': 'orange', 'oj': 'orange juice', 'aj': 'apple juice', 'pb': 'peanut butter',
+    'pnt': 'peanut', 'bred': 'bread', 'brd': 'bread', 'ww': 'whole wheat', 'whwht': 'whole wheat',
+    'wht': 'wheat', 'tort': 'tortillas', 'torts': 'tortillas', 'bgl': 'bagels', 'bgls': 'bagels',
+    'pst': 'pasta', 'spag': 'spaghetti', 'rce': 'rice', 'brn': 'brown', 'jsmn': 'jasmine',
+    'oat': 'oats', 'olv': 'olive', 'ol': 'olive', 'evoo': 'olive oil', 'veg': 'vegetable',
+    'bns': 'beans', 'blk': 'black', 'chkpea': 'chickpeas', 'hmms': 'hummus', 'sce': 'sauce',
+    'sal': 'salsa', 'grnola': 'granola', 'cer': 'cereal', 'ckie': 'cookies',
+    'frz': 'frozen', 'frzn': 'frozen', 'frsh': 'fresh', 'nat': 'natural', 'ntrl': 'natural',
+    'gv': '', 'ks': '', 'kirk': '', 'sig': '', 'kroger': '', 'tj': '', 'pkg': '', 'pk': '', 'ct': '',
+    'ea': '', 'btl': '', 'cn': '', 'jr': '',
+    # Kept as-is so fee lines stay recognizable as non-food
+    'bag': 'bag', 'fee': 'fee', 'tax': 'tax', 'deposit': 'deposit', 'coupon': 'coupon',
+}
+
+# Dropped when matching: they don't change what the item is
+DESCRIPTORS = {'organic', 'natural', 'boneless', 'skinless', 'fresh', 'large', 'medium', 'small', 'jumbo',
+               'premium', 'select', 'value', 'family', 'size', 'dozen', 'grade', 'the', 'and', 'of',
+               'baby', 'bunch', 'loose', 'bulk', 'pack', 'gal', 'gallon', 'half', 'lb', 'florets', 'crowns',
+               'hearts', 'crunchy', 'creamy', 'smooth', 'sliced', 'shredded', 'chopped', 'diced', 'fillet',
+               'fillets', 'extra', 'virgin', 'salted', 'unsalted', 'lowfat', 'nonfat', 'reduced', 'plain',
+               'original', 'classic', 'regular'}
+
+# Real words that are also prefixes of vocabulary words: printed whole they
+# are words of their own ("WATER" is not "WATERMELON", "CHICK" not "CHICKPEAS")
+COMMON_WORDS = {'water', 'straw', 'blue', 'rasp', 'pine', 'chick', 'crack', 'cook', 'lent', 'gall', 'hear',
+                'butt', 'must', 'skin', 'fill', 'dice', 'ketch', 'gran'}
+
+# Share of a line's non-descriptor tokens a canonical name must account for
+# when some are left over ("Chicken Breast Tenders" -> "Chicken Breast")
+MIN_CANONICAL_COVERAGE = 0.75
+
+# Canonical names receipts are normalized to (display spelling)
+CANONICAL_NAMES = (
+    'Chicken Breast', 'Chicken Thighs', 'Chicken Wings', 'Whole Chicken', 'Chicken', 'Ground Beef',
+    'Ground Turkey', 'Ground Pork', 'Beef Steak', 'Pork Chops', 'Pork Loin', 'Bacon', 'Sausage', 'Ham',
+    'Turkey Breast', 'Deli Turkey', 'Salmon', 'Tilapia', 'Cod', 'Shrimp', 'Tuna', 'Tofu', 'Tempeh',
+    'Eggs', 'Milk', 'Whole Milk', 'Skim Milk', 'Almond Milk', 'Oat Milk', 'Butter', 'Heavy Cream',
+    'Sour Cream', 'Cream Cheese', 'Cheddar Cheese', 'Mozzarella Cheese', 'Parmesan Cheese', 'Feta Cheese',
+    'Cottage Cheese', 'Cheese', 'Yogurt', 'Greek Yogurt',
+    'Bananas', 'Apples', 'Oranges', 'Lemons', 'Limes', 'Strawberries', 'Blueberries', 'Raspberries',
+    'Grapes', 'Avocados', 'Pineapple', 'Mango', 'Watermelon', 'Peaches', 'Pears',
+    'Tomatoes', 'Potatoes', 'Sweet Potatoes', 'Onions', 'Red Onions', 'Green Onions', 'Garlic', 'Ginger',
+    'Bell Peppers', 'Jalapenos', 'Lettuce', 'Romaine Lettuce', 'Spinach', 'Kale', 'Broccoli',
+    'Cauliflower', 'Carrots', 'Celery', 'Cucumbers', 'Zucchini', 'Mushrooms', 'Asparagus', 'Green Beans',
+    'Corn', 'Cabbage', 'Cilantro', 'Basil', 'Parsley',
+    'Bread', 'Whole Wheat Bread', 'Bagels', 'Tortillas', 'Pasta', 'Spaghetti', 'Rice', 'Brown Rice',
+    'Jasmine Rice', 'Quinoa', 'Oats', 'Cereal', 'Granola', 'Flour', 'Sugar',
+    'Black Beans', 'Kidney Beans', 'Chickpeas', 'Lentils', 'Peanut Butter', 'Almonds', 'Walnuts',
+    'Hummus', 'Salsa', 'Tomato Sauce', 'Pasta Sauce', 'Soy Sauce', 'Olive Oil', 'Vegetable Oil',
+    'Frozen Vegetables', 'Frozen Berries', 'Orange Juice', 'Apple Juice', 'Coffee', 'Tea', 'Chips',
+    'Crackers', 'Cookies', 'Honey', 'Maple Syrup', 'Ketchup', 'Mustard', 'Mayonnaise', 'Salt', 'Pepper',
+)
+
+_LINE_NOISE = re.compile(r"\$?\d+(?:[.,/]\d+)*\s*(?:lbs?|oz|fl|kg|g|ct|pk|ea)?\b|@|[^a-z\s]")
+_VOWELS = set('aeiou')
+_MEMO_MAX_ENTRIES = 4096
+
+
+def _stem(token):
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('oes') and len(token) > 4:
+        return token[:-2]
+    if token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def _trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _is_subsequence(short, long):
+    letters = iter(long)
+    return all(letter in letters for letter in short)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'word')
+
+    def __init__(self):
+        self.children = {}
+        self.word = None
+
+
+class ItemNameNormalizer:
+    """
+    Maps raw receipt item names to canonical grocery names
+    """
+
+    def __init__(self, canonical_names=CANONICAL_NAMES, abbreviations=None, min_similarity=0.5):
+        self.abbreviations = dict(ABBREVIATIONS if abbreviations is None else abbreviations)
+        self.min_similarity = min_similarity
+        self.canonical = []
+        self._by_stem = defaultdict(list)  # token stem -> canonical indexes
+        vocabulary = set(DESCRIPTORS)
+        for name in canonical_names:
+            tokens = name.lower().split()
+            self.canonical.append((name, frozenset(_stem(token) for token in tokens)))
+            for token in tokens:
+                self._by_stem[_stem(token)].append(len(self.canonical) - 1)
+            vocabulary.update(tokens)
+        self.vocabulary = vocabulary
+        self._vocabulary_stems = {_stem(word) for word in vocabulary}
+
+        self._trie = _TrieNode()
+        self._trigram_index = defaultdict(set)
+        self._trigram_counts = {}
+        for word in sorted(vocabulary, key=len):
+            node = self._trie
+            for letter in word:
+                node = node.children.setdefault(letter, _TrieNode())
+                # Shortest completion wins; words are inserted shortest first
+                if node.word is None:
+                    node.word = word
+            grams = _trigrams(word)
+            self._trigram_counts[word] = len(grams)
+            for gram in grams:
+                self._trigram_index[gram].add(word)
+
+        self._memo = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def normalize(self, raw_name):
+        return self.match(raw_name).name
+
+    def match(self, raw_name):
+        key = ' '.join(str(raw_name or '').split())
+        with self._lock:
+            cached = self._memo.get(key)
+            if cached is not None:
+                self.stats['hits'] += 1
+                return cached
+            self.stats['misses'] += 1
+
+        result = self._match(key)
+        with self._lock:
+            if len(self._memo) >= _MEMO_MAX_ENTRIES:
+                self._memo.pop(next(iter(self._memo)))
+            self._memo[key] = result
+        return result
+
+    def _match(self, raw_name):
+        expanded = self._expand_tokens(raw_name)
+        # Only printed descriptors are noise; a guess that lands on one ("bull" -> "bulk") is a real word
+        meaningful = [(token, original) for token, original in expanded
+                      if token not in DESCRIPTORS or original is not None]
+        if not meaningful:
+            return ItemMatch(raw_name, False, 'unchanged')
+
+        stems = [_stem(token) for token, _ in meaningful]
+        best = None
+        for index in sorted({index for stem in stems for index in self._by_stem.get(stem, ())}):
+            name, name_stems = self.canonical[index]
+            if name_stems <= set(stems) and (best is None or len(name_stems) > len(best[1])):
+                best = (name, name_stems)
+        if best is not None:
+            covered = sum(1 for stem in stems if stem in best[1])
+            if covered == len(stems) or covered / len(stems) >= MIN_CANONICAL_COVERAGE:
+                return ItemMatch(best[0], True, 'canonical')
+
+        # Not a canonical item: guesses ("pepperoni" -> "pepper") go back to what was printed
+        return ItemMatch(' '.join(original or token for token, original in meaningful).title(), False, 'expanded')
+
+    def expand(self, raw_name):
+        """
+        Cleaned, expanded tokens of a raw name
+        """
+        return [token for token, _ in self._expand_tokens(raw_name)]
+
+    def _expand_tokens(self, raw_name):
+        """
+        [(token, original)]: original is the printed token when token is only a truncation or misspelling guess
+        """
+        tokens = []
+        for token in _LINE_NOISE.sub(' ', raw_name.lower()).split():
+            expanded, guessed = self._expand_token(token)
+            if expanded:
+                tokens.extend((word, token if guessed else None) for word in expanded.split())
+        return tokens
+
+    def _expand_token(self, token):
+        if token in self.abbreviations:
+            return self.abbreviations[token], False
+        # Known words stay as printed, singular or plural ("potato", "chip")
+        if token in self.vocabulary or _stem(token) in self._vocabulary_stems or token in COMMON_WORDS \
+                or len(token) < 3:
+            return (token if len(token) > 1 else ''), False
+
+        # Truncated word: BROCC -> broccoli
+        if len(token) >= 4:
+            node = self._trie
+            for letter in token:
+                node = node.children.get(letter)
+                if node is None:
+                    break
+            else:
+                return node.word, True
+
+        # Vowel-stripped abbreviation: STRWBRY -> strawberries
+        if not _VOWELS.intersection(token[1:]):
+            candidates = [word for word in self.vocabulary
+                          if word[0] == token[0] and len(word) > len(token) and _is_subsequence(token, word)]
+            if candidates:
+                return min(candidates, key=lambda word: (len(word), word)), False
+
+        # OCR misspelling: BROCOLI -> broccoli; short words have too few trigrams ("ice" -> "rice")
+        if len(token) <= 3:
+            return token, False
+        grams = _trigrams(token)
+        scores = defaultdict(int)
+        for gram in grams:
+            for word in self._trigram_index.get(gram, ()):
+                scores[word] += 1
+        best_word, best_score = None, 0.0
+        for word, shared in scores.items():
+            score = 2.0 * shared / (len(grams) + self._trigram_counts[word])
+            if score > best_score or (score == best_score and best_word is not None and word < best_word):
+                best_word, best_score = word, score
+        if best_word is not None and best_score >= self.min_similarity:
+            return best_word, True
+        return token, False
+
+
+_normalizer = None
+
+
+def get_item_normalizer():
+    """
+    Module-level normalizer: its memo persists across warm invocations
+    """
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = ItemNameNormalizer()
+    return _normalizer
@@ -1,28 +1,30 @@
 import json
-import boto3
 import os
 from datetime import datetime
 from decimal import Decimal
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name='us-east-2')
+from utils.aws_clients import lazy_table
+from utils.budget_ledger import budget_summary, clear_week
+from utils.db_helpers import create_response, error_response
 
 # Environment variables
 USER_PREFERENCES_TABLE = os.environ.get('USER_PREFERENCES_TABLE', 'user_preferences')
 
 # DynamoDB table
-preferences_table = dynamodb.Table(USER_PREFERENCES_TABLE)
+preferences_table = lazy_table(USER_PREFERENCES_TABLE, region_name='us-east-2')
 
 
 def lambda_handler(event, context):
     """
     Handle user preferences save and retrieval
-    Supports both GET (retrieve) and POST (save) operations
+    Supports both GET (retrieve) and POST (save, or reset the week's spend) operations
     """
     try:
         http_method = event.get('httpMethod', 'GET')
         
-        if http_method == 'GET':
+        if http_method == 'POST' and (event.get('path') or '').rstrip('/').endswith('/reset-budget'):
+            return handle_reset_budget(event)
+        elif http_method == 'GET':
             return handle_get_preferences(event)
         elif http_method == 'POST':
             return handle_save_preferences(event)
@@ -38,6 +40,7 @@ def handle_get_preferences(event):
     """
     GET /preferences/get?userId=<userId>
     Retrieve user preferences from DynamoDB
+    Spent and remaining are this week's, read from the budget ledger (utils.budget_ledger)
     """
     try:
         # Get userId from query parameters
@@ -51,31 +54,32 @@ def handle_get_preferences(event):
             return error_response(400, 'userId query parameter is required')
         
         # Retrieve from DynamoDB
-        response = preferences_table.get_item(Key={'userId': user_id})
+        response = preferences_table.get_item(Key={'user_id': user_id})
         
         if 'Item' not in response:
             # Return empty preferences if user hasn't saved any yet
-            return success_response({
-                'preferences': {
+            return create_response(200, {
+                'preferences': dict({
                     'allergies': [],
                     'budget': 0,
-                    'spent': 0,
                     'customPreferences': ''
-                }
+                }, **budget_summary({}, 0))
             })
         
         item = response['Item']
+        budget = float(item.get('budget', 0))
         
         # Convert DynamoDB Decimal to float for JSON serialization
         preferences = {
             'allergies': item.get('allergies', []),
-            'budget': float(item.get('budget', 0)),
-            'spent': float(item.get('spent', 0)),
+            'budget': budget,
             'customPreferences': item.get('customPreferences', ''),
             'lastUpdated': item.get('lastUpdated', '')
         }
+        # Receipts add to the ledger as they are analyzed; remaining is worked out here
+        preferences.update(budget_summary(item, budget))
         
-        return success_response({'preferences': preferences})
+        return create_response(200, {'preferences': preferences})
     
     except Exception as e:
         print(f"Error retrieving preferences: {str(e)}")
@@ -86,13 +90,14 @@ def handle_save_preferences(event):
     """
     POST /preferences/save
     Save user preferences to DynamoDB
+    Only the preference attributes are set, so the item's budget ledger is kept
+    (spending comes from analyzed receipts, not from this body)
     
     Expected body:
     {
         "userId": "session_abc123_1234567890",
         "allergies": ["peanuts", "dairy"],
         "budget": 500,
-        "spent": 150,
         "customPreferences": "Low carb, vegetarian"
     }
     """
@@ -114,29 +119,26 @@ def handle_save_preferences(event):
         except (ValueError, TypeError):
             return error_response(400, 'budget must be a number')
         
-        spent = body.get('spent', 0)
-        try:
-            spent = float(spent)
-        except (ValueError, TypeError):
-            return error_response(400, 'spent must be a number')
-        
         custom_preferences = body.get('customPreferences', '')
         if not isinstance(custom_preferences, str):
             custom_preferences = str(custom_preferences)
         
         # Save to DynamoDB
-        preferences_table.put_item(
-            Item={
-                'userId': user_id,
-                'allergies': allergies,
-                'budget': Decimal(str(budget)),
-                'spent': Decimal(str(spent)),
-                'customPreferences': custom_preferences,
-                'lastUpdated': datetime.utcnow().isoformat()
+        preferences_table.update_item(
+            Key={'user_id': user_id},
+            UpdateExpression=(
+                'SET allergies = :allergies, budget = :budget, '
+                'customPreferences = :custom, lastUpdated = :updated'
+            ),
+            ExpressionAttributeValues={
+                ':allergies': allergies,
+                ':budget': Decimal(str(budget)),
+                ':custom': custom_preferences,
+                ':updated': datetime.utcnow().isoformat()
             }
         )
         
-        return success_response({
+        return create_response(200, {
             'message': 'Preferences saved successfully',
             'userId': user_id
         })
@@ -148,33 +150,26 @@ def handle_save_preferences(event):
         return error_response(500, f'Error saving preferences: {str(e)}')
 
 
-def success_response(data):
+def handle_reset_budget(event):
     """
-    Return a successful API response
+    POST /preferences/reset-budget
+    Clear this week's spend in the budget ledger (earlier weeks are kept)
     """
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type'
-        },
-        'body': json.dumps(data)
-    }
-
-
-def error_response(status_code, message):
-    """
-    Return an error API response
-    """
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type'
-        },
-        'body': json.dumps({'error': message})
-    }
+    try:
+        body = json.loads(event.get('body') or '{}')
+        
+        user_id = body.get('userId')
+        if not user_id:
+            return error_response(400, 'userId is required')
+        
+        clear_week(preferences_table, user_id)
+        return create_response(200, {
+            'message': 'Weekly budget reset',
+            'userId': user_id
+        })
+    
+    except json.JSONDecodeError:
+        return error_response(400, 'Invalid JSON in request body')
+    except Exception as e:
+        print(f"Error resetting budget: {str(e)}")
+        return error_response(500, f'Error resetting budget: {str(e)}')
@@ -0,0 +1,79 @@
+"""
+Lazily built boto3 clients and DynamoDB tables, shared per process.
+
+Handlers declare their tables and clients at module level as before, but
+boto3 is imported and each client/resource built only when a request first
+touches it, so branches that never use one (a jobId poll, a request with
+pantryItems) don't pay for it during a cold start.
+"""
+import threading
+
+_lock = threading.RLock()
+_clients = {}
+_resources = {}
+
+
+def get_client(service_name, region_name=None, **kwargs):
+    """
+    Process-wide boto3 client per (service, region); extra kwargs (e.g. config) apply on first build
+    """
+    key = (service_name, region_name)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                import boto3
+                client = boto3.client(service_name, region_name=region_name, **kwargs)
+                _clients[key] = client
+    return client
+
+
+def get_resource(service_name, region_name=None):
+    key = (service_name, region_name)
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                import boto3
+                resource = boto3.resource(service_name, region_name=region_name)
+                _resources[key] = resource
+    return resource
+
+
+class LazyProxy:
+    """
+    Stands in for a boto3 client or Table and builds it on first attribute access
+    """
+
+    def __init__(self, factory, description):
+        self._factory = factory
+        self._description = description
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            with _lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    @property
+    def is_built(self):
+        return self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        state = 'built' if self._target is not None else 'not built'
+        return f"<LazyProxy {self._description} ({state})>"
+
+
+def lazy_client(service_name, region_name=None, **kwargs):
+    return LazyProxy(lambda: get_client(service_name, region_name, **kwargs), f"{service_name} client")
+
+
+def lazy_table(table_name, region_name=None):
+    return LazyProxy(lambda: get_resource('dynamodb', region_name).Table(table_name), f"table {table_name}")
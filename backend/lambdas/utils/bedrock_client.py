@@ -0,0 +1,350 @@
+"""
+Shared Bedrock invocation layer.
+
+One tuned bedrock-runtime client per process with:
+- jittered exponential backoff on throttling and transient errors,
+- an AIMD limiter that adapts concurrent calls to the account's quota,
+- keep-alive connection pool settings sized to the limiter,
+- per-call latency and token metrics, logged as CloudWatch EMF (utils.metrics).
+"""
+import json
+import os
+import random
+import threading
+import time
+
+from utils.metrics import record_model_call
+
+# Errors worth retrying; ThrottlingException also shrinks the concurrency limit
+THROTTLING_ERRORS = ('ThrottlingException', 'TooManyRequestsException')
+TRANSIENT_ERRORS = ('ServiceUnavailableException', 'ModelNotReadyException', 'InternalServerException')
+
+DEFAULT_REGION = os.environ.get('BEDROCK_REGION', 'us-east-1')
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_MAX_ATTEMPTS', '6'))
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get('BEDROCK_MAX_CONCURRENCY', '16'))
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    Every successful call raises the limit by increase / limit (about +increase
+    per round of calls); a throttle multiplies it by decrease_factor. Throttles
+    within cooldown_seconds of the last decrease count once, since a single
+    burst usually produces several of them.
+    """
+
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=DEFAULT_MAX_CONCURRENCY,
+                 increase=1.0, decrease_factor=0.5, cooldown_seconds=1.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown_seconds = cooldown_seconds
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self, timeout=None):
+        """
+        Wait for a free slot; returns False if timeout elapsed first
+        """
+        with self._condition:
+            acquired = self._condition.wait_for(lambda: self._in_flight < int(self._limit), timeout=timeout)
+            if acquired:
+                self._in_flight += 1
+            return acquired
+
+    def release(self):
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self._limit = min(self.max_limit, self._limit + self.increase / max(self._limit, 1.0))
+            self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown_seconds:
+                return
+            self._last_decrease = now
+            self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+
+
+class BedrockClient:
+    """
+    invoke()/invoke_stream() wrappers around bedrock-runtime. The boto3
+    client is created on first use so importing handlers stays cheap.
+    """
+
+    def __init__(self, client=None, region_name=DEFAULT_REGION, limiter=None, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 base_delay=0.25, max_delay=8.0, on_metrics=None, sleep=time.sleep):
+        self._client = client
+        self.region_name = region_name
+        self.limiter = limiter or AIMDLimiter()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_metrics = on_metrics or log_call_metrics
+        self._sleep = sleep
+        self._client_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'calls': 0, 'throttles': 0, 'retries': 0, 'failures': 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = create_bedrock_runtime(self.region_name, self.limiter.max_limit)
+        return self._client
+
+    def invoke(self, model_id, request, max_attempts=None):
+        """
+        InvokeModel with retries; returns the decoded response body.
+        max_attempts overrides the client's (e.g. fail fast and fall back to another model).
+        """
+        metrics = {'modelId': model_id, 'operation': 'InvokeModel', 'maxTokens': request.get('max_tokens')}
+        started = time.perf_counter()
+        try:
+            response = self._call_with_retry(
+                lambda: self.client.invoke_model(modelId=model_id, body=json.dumps(request)),
+                metrics,
+                max_attempts=max_attempts
+            )
+            body = response['body'].read()
+            metrics['latencyMs'] = _elapsed_ms(started)
+            response_body = json.loads(body)
+            usage = response_body.get('usage') or {}
+            metrics['inputTokens'] = usage.get('input_tokens')
+            metrics['outputTokens'] = usage.get('output_tokens')
+            # "max_tokens" here means the response was cut off
+            metrics['stopReason'] = response_body.get('stop_reason')
+            metrics['status'] = 'ok'
+            return response_body
+        except Exception as e:
+            metrics.setdefault('latencyMs', _elapsed_ms(started))
+            metrics['status'] = 'error'
+            metrics['error'] = _error_code(e) or type(e).__name__
+            raise
+        finally:
+            self._record(metrics)
+
+    def invoke_text(self, model_id, request, max_attempts=None):
+        """
+        invoke() and return the text of the first content block
+        """
+        return self.invoke(model_id, request, max_attempts)['content'][0]['text']
+
+    def invoke_stream(self, model_id, request, max_attempts=None):
+        """
+        InvokeModelWithResponseStream with retries on the initial request.
+        Returns an iterator over the stream events; the limiter slot is held
+        until the stream is exhausted or closed.
+        """
+        metrics = {'modelId': model_id, 'operation': 'InvokeModelWithResponseStream',
+                   'maxTokens': request.get('max_tokens')}
+        started = time.perf_counter()
+        try:
+            response = self._call_with_retry(
+                lambda: self.client.invoke_model_with_response_stream(modelId=model_id, body=json.dumps(request)),
+                metrics,
+                release=False,
+                max_attempts=max_attempts
+            )
+        except Exception as e:
+            metrics['latencyMs'] = _elapsed_ms(started)
+            metrics['status'] = 'error'
+            metrics['error'] = _error_code(e) or type(e).__name__
+            self._record(metrics)
+            raise
+        metrics['firstByteMs'] = _elapsed_ms(started)
+        return _MeteredStream(self, response['body'], metrics, started)
+
+    def _call_with_retry(self, call, metrics, release=True, max_attempts=None):
+        """
+        Run call() inside a limiter slot, retrying throttles and transient
+        errors with full-jitter exponential backoff. With release=False the
+        slot stays held after success (streams release it when consumed).
+        """
+        attempt = 0
+        metrics['attempts'] = 0
+        metrics['throttles'] = 0
+        while True:
+            attempt += 1
+            metrics['attempts'] = attempt
+            self.limiter.acquire()
+            try:
+                result = call()
+            except Exception as e:
+                self.limiter.release()
+                code = _error_code(e)
+                if code in THROTTLING_ERRORS:
+                    metrics['throttles'] += 1
+                    self._count('throttles')
+                    self.limiter.on_throttle()
+                elif code not in TRANSIENT_ERRORS:
+                    raise
+                if attempt >= (max_attempts or self.max_attempts):
+                    raise
+                self._count('retries')
+                self._sleep(self.backoff_delay(attempt))
+                continue
+
+            self.limiter.on_success()
+            if release:
+                self.limiter.release()
+            return result
+
+    def backoff_delay(self, attempt):
+        """
+        Full jitter: uniform in [0, min(max_delay, base_delay * 2^(attempt-1))]
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _record(self, metrics):
+        self._count('calls')
+        if metrics.get('status') != 'ok':
+            self._count('failures')
+        try:
+            self.on_metrics(metrics)
+        except Exception as e:
+            print(f"Error recording Bedrock metrics: {str(e)}")
+
+
+class _MeteredStream:
+    """
+    Iterates a response stream, collecting token usage, and gives the limiter
+    slot back exactly once: when the stream ends, fails or is closed
+    """
+
+    def __init__(self, owner, event_stream, metrics, started):
+        self._owner = owner
+        self._events = iter(event_stream)
+        self._metrics = metrics
+        self._started = started
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            event = next(self._events)
+        except StopIteration:
+            self._finish('ok')
+            raise
+        except Exception as e:
+            self._metrics['error'] = _error_code(e) or type(e).__name__
+            self._finish('error')
+            raise
+        _collect_stream_usage(event, self._metrics)
+        return event
+
+    def close(self):
+        self._finish('closed')
+
+    def __del__(self):
+        self._finish('closed')
+
+    def _finish(self, status):
+        if self._finished:
+            return
+        self._finished = True
+        self._owner.limiter.release()
+        self._metrics['status'] = status
+        self._metrics['latencyMs'] = _elapsed_ms(self._started)
+        self._owner._record(self._metrics)
+
+
+def create_bedrock_runtime(region_name=DEFAULT_REGION, max_pool_connections=DEFAULT_MAX_CONCURRENCY):
+    """
+    bedrock-runtime client with keep-alive pooling sized to the limiter and
+    botocore's own retries disabled (BedrockClient retries with backoff)
+    """
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        region_name=region_name,
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        connect_timeout=5,
+        read_timeout=120,
+        retries={'total_max_attempts': 1, 'mode': 'standard'}
+    )
+    return boto3.client('bedrock-runtime', region_name=region_name, config=config)
+
+
+def log_call_metrics(metrics):
+    """
+    Default metrics sink: one EMF log line per call, tagged with the current request
+    """
+    record_model_call(metrics)
+
+
+def _collect_stream_usage(event, metrics):
+    """
+    Token counts arrive in the final chunk's amazon-bedrock-invocationMetrics,
+    the stop reason in the message_delta event before it
+    """
+    chunk = event.get('chunk') if isinstance(event, dict) else None
+    if not chunk:
+        return
+    try:
+        payload = json.loads(chunk['bytes'])
+    except (KeyError, TypeError, ValueError):
+        return
+    if payload.get('type') == 'message_delta':
+        metrics['stopReason'] = (payload.get('delta') or {}).get('stop_reason')
+    invocation_metrics = payload.get('amazon-bedrock-invocationMetrics')
+    if invocation_metrics:
+        metrics['inputTokens'] = invocation_metrics.get('inputTokenCount')
+        metrics['outputTokens'] = invocation_metrics.get('outputTokenCount')
+
+
+def is_throttling_error(error):
+    return _error_code(error) in THROTTLING_ERRORS
+
+
+def _error_code(error):
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+
+def _elapsed_ms(started):
+    return int((time.perf_counter() - started) * 1000)
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_bedrock_client():
+    """
+    Process-wide BedrockClient, so concurrent calls in one Lambda share a limiter
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = BedrockClient()
+    return _shared_client
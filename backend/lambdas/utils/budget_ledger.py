@@ -0,0 +1,76 @@
+"""
+Weekly spending ledger on the UserPreferences item.
+
+Each ISO week's spend is its own top-level number attribute
+(spent#2025-W09, ...) that analyses add to with an atomic ADD: one
+UpdateItem, no read, and concurrent receipts never overwrite each other.
+Remaining budget is not stored; budget_summary() works it out from the item
+when it is read, so a new week starts at zero without a reset job.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+SPENT_PREFIX = 'spent#'
+
+
+def week_bucket(when=None):
+    """
+    ISO week of a datetime (default now), e.g. "2025-W09"
+    """
+    year, week, _ = (when or datetime.now()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def spent_attribute(when=None):
+    return SPENT_PREFIX + week_bucket(when)
+
+
+def record_spend(table, user_id, amount, when=None):
+    """
+    Atomically add amount (may be negative, e.g. a corrected total) to the
+    user's spend for the week of `when`
+    """
+    table.update_item(
+        Key={'user_id': user_id},
+        UpdateExpression='ADD #spent :amount SET last_purchase = :timestamp',
+        ExpressionAttributeNames={'#spent': spent_attribute(when)},
+        ExpressionAttributeValues={
+            ':amount': Decimal(str(round(float(amount), 2))),
+            ':timestamp': datetime.now().isoformat()
+        }
+    )
+
+
+def clear_week(table, user_id, when=None):
+    """
+    Drop the spend recorded for the week of `when`
+    """
+    table.update_item(
+        Key={'user_id': user_id},
+        UpdateExpression='REMOVE #spent',
+        ExpressionAttributeNames={'#spent': spent_attribute(when)}
+    )
+
+
+def spending_by_week(item):
+    """
+    {week: spent} from a UserPreferences item's ledger attributes
+    """
+    return {
+        name[len(SPENT_PREFIX):]: float(value)
+        for name, value in (item or {}).items()
+        if name.startswith(SPENT_PREFIX)
+    }
+
+
+def budget_summary(item, budget, when=None):
+    """
+    {'week', 'spent', 'remaining'} for the week of `when`, computed from the ledger
+    """
+    week = week_bucket(when)
+    spent = round(spending_by_week(item).get(week, 0.0), 2)
+    return {
+        'week': week,
+        'spent': spent,
+        'remaining': round(float(budget or 0) - spent, 2)
+    }
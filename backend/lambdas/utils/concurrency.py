@@ -0,0 +1,73 @@
+"""
+Small thread-pool helpers for overlapping DynamoDB/S3 round trips in a handler.
+
+Lambda freezes the container as soon as the handler returns, so background
+work must be drained before returning; started early, it overlaps the slow
+part of the request (usually the Bedrock call) and draining costs nothing.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def gather(calls, executor):
+    """
+    Run {name: zero-argument callable} concurrently on executor and return
+    {name: result}. The first exception raised by a call is re-raised.
+    """
+    futures = {name: executor.submit(call) for name, call in calls.items() if call is not None}
+    return {name: future.result() for name, future in futures.items()}
+
+
+class BackgroundTasks:
+    """
+    Fire-and-forget work (e.g. preference writes) that is awaited with
+    drain() before the handler returns. Failures are logged, never raised.
+    """
+
+    def __init__(self, max_workers=2, thread_name_prefix='background'):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        future = self._executor.submit(self._run, fn, args, kwargs)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    @staticmethod
+    def _run(fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            print(f"Error in background task {getattr(fn, '__name__', fn)}: {str(e)}")
+            return None
+
+    def _forget(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def drain(self, timeout=None):
+        """
+        Wait for submitted tasks; returns how many were still running at timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.result(timeout=remaining)
+            except Exception:
+                pass
+        unfinished = self.pending
+        if unfinished:
+            print(f"Warning: {unfinished} background task(s) still running after {timeout}s")
+        return unfinished
@@ -0,0 +1,89 @@
+"""
+API Gateway responses and JSON encoding shared by the handlers.
+
+dumps() is the one JSON encoder: Decimals from DynamoDB become ints or
+floats, output is compact, and orjson is used when it is installed (it is
+several times faster on large plan lists) with the stdlib C encoder as the
+fallback. create_response() is the one response builder; its CORS headers
+are built once per allowed-methods string.
+"""
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # Not bundled with the functions by default; stdlib json is the fallback
+    orjson = None
+
+DEFAULT_METHODS = 'GET, POST, OPTIONS'
+
+_headers = {}
+
+
+def decimal_default(obj):
+    """
+    JSON fallback for DynamoDB values: integral Decimals as int, others as float, sets as lists
+    """
+    if isinstance(obj, Decimal):
+        # float() and is_integer() are the cheapest exact test for the usual small values
+        value = float(obj)
+        if value.is_integer():
+            return int(value) if abs(value) < 2 ** 53 else int(obj)
+        return value
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Reused rather than rebuilt per call like json.dumps(..., default=...) does
+_stdlib_encoder = json.JSONEncoder(default=decimal_default, separators=(',', ':'))
+
+
+def dumps(obj):
+    """
+    Compact JSON text for obj, Decimal-aware
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=decimal_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except (orjson.JSONEncodeError, TypeError):
+            # e.g. integers beyond 64 bits; the stdlib encoder handles them
+            pass
+    return _stdlib_encoder.encode(obj)
+
+
+def cors_headers(methods=DEFAULT_METHODS):
+    """
+    Shared, precomputed header dict for the allowed methods (don't mutate it)
+    """
+    headers = _headers.get(methods)
+    if headers is None:
+        headers = {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': methods,
+            'Access-Control-Allow-Headers': 'Content-Type'
+        }
+        _headers[methods] = headers
+    return headers
+
+
+def create_response(status_code, body, methods=DEFAULT_METHODS):
+    """
+    API Gateway proxy response with CORS headers and a JSON body
+    """
+    return {
+        'statusCode': status_code,
+        'headers': cors_headers(methods),
+        'body': dumps(body)
+    }
+
+
+def error_response(status_code, message, details=None, methods=DEFAULT_METHODS):
+    body = {
+        'success': False,
+        'error': message
+    }
+    if details:
+        body['details'] = details
+    return create_response(status_code, body, methods)
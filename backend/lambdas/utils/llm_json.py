@@ -0,0 +1,220 @@
+"""
+Tolerant, incremental JSON extraction for LLM responses.
+
+Model output may be wrapped in prose or ```json fences, and is cut off
+mid-object when it hits max_tokens. IncrementalJSONExtractor scans the text
+once (optionally chunk by chunk while streaming) and reports every member
+of the watched objects as soon as it is complete, so a truncated response
+still yields all of its finished days/sections.
+"""
+import json
+import re
+from collections import namedtuple
+
+JSONExtraction = namedtuple('JSONExtraction', ['data', 'complete', 'missing'])
+
+# Path of the root object's members
+ROOT = ()
+
+_SIGNIFICANT = re.compile(r'[\\"{}\[\]:,]')
+
+
+class _Frame:
+    """An open object or array while scanning"""
+    __slots__ = ('bracket', 'start', 'key', 'path', 'member_key', 'member_start', 'member_is_container')
+
+    def __init__(self, bracket, start, key, path):
+        self.bracket = bracket
+        self.start = start
+        self.key = key
+        self.path = path
+        self.member_key = None
+        self.member_start = None
+        self.member_is_container = False
+
+
+class IncrementalJSONExtractor:
+    """
+    Scan model output for the first JSON object and emit (path, key, value)
+    for each completed member of the objects at the watched paths.
+    A path is the tuple of keys from the root, e.g. () for top-level members
+    or ('weeklyPlan',) for the days of a meal plan.
+    """
+
+    def __init__(self, watch=(ROOT,)):
+        self.watch = set(tuple(path) for path in watch)
+        self.text = ''
+        self.value = None
+        self.complete = False
+        self._pos = 0
+        self._root_start = None
+        self._in_string = False
+        self._skip_until = 0
+        self._string_start = 0
+        self._last_string = None
+        self._stack = []
+
+    def feed(self, chunk):
+        """
+        Append a chunk of text and return the members it completed
+        """
+        self.text += chunk
+        text = self.text
+        events = []
+
+        if self._root_start is None:
+            # Skip prose and code fences before the object starts
+            start = text.find('{', self._pos)
+            if start == -1:
+                self._pos = len(text)
+                return events
+            self._root_start = start
+            self._pos = start
+
+        # Only quotes, backslashes and structural characters change state
+        for match in _SIGNIFICANT.finditer(text, self._pos):
+            if self.complete:
+                break
+
+            i = match.start()
+            if i < self._skip_until:
+                continue
+            c = text[i]
+
+            if self._in_string:
+                if c == '\\':
+                    # Skip the escaped character
+                    self._skip_until = i + 2
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i + 1]
+                continue
+
+            top = self._stack[-1] if self._stack else None
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == ':':
+                if top is not None and top.bracket == '{':
+                    top.member_key = _decode_key(self._last_string)
+                    top.member_start = i + 1
+                    top.member_is_container = False
+            elif c == ',':
+                if top is not None and top.bracket == '{':
+                    self._finish_scalar(top, i, events)
+            elif c in '{[':
+                if top is None:
+                    self._stack.append(_Frame(c, i, None, ROOT))
+                    continue
+                key = top.member_key if top.bracket == '{' else None
+                if top.bracket == '{':
+                    top.member_is_container = True
+                self._stack.append(_Frame(c, i, key, self._child_path(top, key)))
+            elif c in '}]':
+                if top is None:
+                    continue
+                if top.bracket == '{':
+                    self._finish_scalar(top, i, events)
+                frame = self._stack.pop()
+                if not self._stack:
+                    self._finish_root(i)
+                    continue
+                parent = self._stack[-1]
+                if parent.bracket == '{' and parent.member_key is not None:
+                    if parent.path in self.watch:
+                        value = _loads(text[frame.start:i + 1])
+                        if value is not _INVALID:
+                            events.append((parent.path, parent.member_key, value))
+                    parent.member_key = None
+
+        self._pos = len(text)
+        return events
+
+    @staticmethod
+    def _child_path(parent, key):
+        """Path of a container opened inside parent"""
+        if parent.bracket != '{':
+            # Array elements are not addressable by key
+            return parent.path + (None,)
+        return parent.path + (key,)
+
+    def _finish_scalar(self, frame, end, events):
+        """Emit a scalar member that ends at index end (a ',' or '}')"""
+        if frame.member_key is None or frame.member_is_container:
+            frame.member_key = None
+            return
+        raw = self.text[frame.member_start:end].strip()
+        if raw and frame.path in self.watch:
+            value = _loads(raw)
+            if value is not _INVALID:
+                events.append((frame.path, frame.member_key, value))
+        frame.member_key = None
+
+    def _finish_root(self, end):
+        self.complete = True
+        value = _loads(self.text[self._root_start:end + 1])
+        self.value = None if value is _INVALID else value
+
+
+_INVALID = object()
+
+
+def _loads(raw):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return _INVALID
+
+
+def _decode_key(raw):
+    if raw is None:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw.strip('"')
+
+
+def extract_json(text, expected_keys=(), expected_members=None):
+    """
+    Extract the JSON object from a (possibly fenced or truncated) model response.
+
+    expected_keys lists top-level keys the caller needs; expected_members maps
+    a top-level key to the member names expected inside it, e.g.
+    {'weeklyPlan': ['monday', ...]}. Returns JSONExtraction(data, complete,
+    missing) where missing holds the dotted paths that could not be salvaged
+    ("budgetAnalysis", "weeklyPlan.sunday") so only those need re-requesting.
+    """
+    expected_members = expected_members or {}
+    text = text or ''
+
+    # Fast path: a well-formed response parses in one C-level json.loads
+    data = _loads(text[text.find('{'):text.rfind('}') + 1]) if '{' in text else _INVALID
+    complete = isinstance(data, dict)
+
+    if not complete:
+        extractor = IncrementalJSONExtractor(watch=[ROOT] + [(key,) for key in expected_members])
+        events = extractor.feed(text)
+        complete = isinstance(extractor.value, dict)
+        data = extractor.value
+
+    if not complete:
+        data = {}
+        nested = {}
+        for path, key, value in events:
+            if path == ROOT:
+                data[key] = value
+            elif len(path) == 1:
+                nested.setdefault(path[0], {})[key] = value
+        for parent, members in nested.items():
+            if not isinstance(data.get(parent), dict):
+                data[parent] = members
+
+    missing = [key for key in expected_keys if key not in data]
+    for parent, members in expected_members.items():
+        present = data.get(parent)
+        present = present if isinstance(present, dict) else {}
+        missing.extend(f"{parent}.{member}" for member in members if member not in present)
+
+    return JSONExtraction(data, complete, missing)
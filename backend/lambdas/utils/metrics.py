@@ -0,0 +1,264 @@
+"""
+Model-call and request accounting as CloudWatch Embedded Metric Format logs.
+
+Every Bedrock call (utils.bedrock_client) is logged as one EMF record with
+its token counts, latency, model, estimated cost and the tags of the request
+that made it (endpoint, user, cache status); calls chosen by
+utils.model_router add a route record with the tier and why. metered_handler() wraps a
+Lambda handler and logs one more record per request with its totals, so
+cache hits that never reach Bedrock are counted too. CloudWatch turns the
+records into metrics by endpoint and model; userId is kept as a property
+rather than a dimension to keep metric cardinality low.
+
+A Lambda container serves one request at a time, so the current request's
+tags live in module state that worker threads (parallel day generation)
+see as well. aggregate_records() and percentile() back the local report in
+backend/scripts/metrics_report.py.
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'Savr/Bedrock')
+
+RECORD_MODEL_CALL = 'model_call'
+RECORD_REQUEST = 'request'
+RECORD_ROUTE = 'route'
+
+# USD per million (input, output) tokens; first matching model-id fragment wins
+MODEL_PRICES = [
+    ('claude-3-haiku', 0.25, 1.25),
+    ('claude-3-5-haiku', 0.8, 4.0),
+    ('haiku-4-5', 1.0, 5.0),
+    ('opus', 15.0, 75.0),
+    ('sonnet', 3.0, 15.0),
+]
+
+# (field, EMF metric name, unit) for each record type
+_CALL_METRICS = [
+    ('inputTokens', 'InputTokens', 'Count'),
+    ('outputTokens', 'OutputTokens', 'Count'),
+    ('latencyMs', 'LatencyMs', 'Milliseconds'),
+    ('firstByteMs', 'FirstByteMs', 'Milliseconds'),
+    ('costUsd', 'CostUSD', 'None'),
+    ('attempts', 'Attempts', 'Count'),
+    ('throttles', 'Throttles', 'Count'),
+    ('maxTokens', 'MaxTokens', 'Count'),
+]
+_ROUTE_METRICS = [
+    ('latencyMs', 'RouteLatencyMs', 'Milliseconds'),
+    ('expectedMs', 'ExpectedLatencyMs', 'Milliseconds'),
+    ('inputTokens', 'RouteInputTokens', 'Count'),
+    ('outputTokens', 'RouteOutputTokens', 'Count'),
+]
+_REQUEST_METRICS = [
+    ('latencyMs', 'RequestLatencyMs', 'Milliseconds'),
+    ('inputTokens', 'RequestInputTokens', 'Count'),
+    ('outputTokens', 'RequestOutputTokens', 'Count'),
+    ('costUsd', 'RequestCostUSD', 'None'),
+    ('modelCalls', 'ModelCalls', 'Count'),
+]
+
+_lock = threading.Lock()
+_request = {}
+
+
+def estimate_cost(model_id, input_tokens, output_tokens):
+    """
+    Estimated on-demand price of a call in USD; None for an unknown model
+    """
+    model = str(model_id or '').lower()
+    for fragment, input_price, output_price in MODEL_PRICES:
+        if fragment in model:
+            return round(((input_tokens or 0) * input_price + (output_tokens or 0) * output_price) / 1e6, 6)
+    return None
+
+
+def start_request(endpoint, **tags):
+    """
+    Begin accounting for a new request (replaces any previous one)
+    """
+    global _request
+    with _lock:
+        _request = {'endpoint': endpoint, 'started': time.perf_counter(), 'tags': dict(tags),
+                    'inputTokens': 0, 'outputTokens': 0, 'costUsd': 0.0, 'modelCalls': 0}
+
+
+def tag_request(**tags):
+    """
+    Add tags (userId, cache, generationMode, ...) to the current request's records
+    """
+    with _lock:
+        if _request:
+            _request['tags'].update({key: value for key, value in tags.items() if value is not None})
+
+
+def current_tags():
+    with _lock:
+        if not _request:
+            return {}
+        return dict(_request['tags'], endpoint=_request['endpoint'])
+
+
+def finish_request(status_code=None, emit=None):
+    """
+    Log the request's totals and clear it; returns the record (None without a request)
+    """
+    global _request
+    with _lock:
+        request, _request = _request, {}
+    if not request:
+        return None
+    fields = dict(request['tags'], endpoint=request['endpoint'], statusCode=status_code,
+                  latencyMs=int((time.perf_counter() - request['started']) * 1000),
+                  inputTokens=request['inputTokens'], outputTokens=request['outputTokens'],
+                  costUsd=round(request['costUsd'], 6), modelCalls=request['modelCalls'])
+    record = emf_record(RECORD_REQUEST, fields, _REQUEST_METRICS, [['endpoint']])
+    (emit or _print_record)(record)
+    return record
+
+
+def record_model_call(metrics, emit=None):
+    """
+    Log one Bedrock call (the metrics dict from BedrockClient) with the
+    current request's tags, and add it to the request's totals
+    """
+    fields = dict(current_tags(), **metrics)
+    cost = estimate_cost(metrics.get('modelId'), metrics.get('inputTokens'), metrics.get('outputTokens'))
+    if cost is not None:
+        fields['costUsd'] = cost
+    with _lock:
+        if _request:
+            _request['modelCalls'] += 1
+            _request['inputTokens'] += metrics.get('inputTokens') or 0
+            _request['outputTokens'] += metrics.get('outputTokens') or 0
+            _request['costUsd'] += cost or 0.0
+    record = emf_record(RECORD_MODEL_CALL, fields, _CALL_METRICS, [['endpoint'], ['endpoint', 'modelId']])
+    (emit or _print_record)(record)
+    return record
+
+
+def record_route(fields, emit=None):
+    """
+    Log one routing decision (utils.model_router) and the latency of the call it routed
+    """
+    record = emf_record(RECORD_ROUTE, dict(current_tags(), **fields), _ROUTE_METRICS,
+                        [['endpoint', 'task'], ['endpoint', 'tier']])
+    (emit or _print_record)(record)
+    return record
+
+
+def emf_record(record_type, fields, metric_specs, dimensions):
+    """
+    An EMF document: fields become top-level members, numeric ones listed
+    in metric_specs are declared as metrics under the given dimension sets
+    """
+    record = {key: value for key, value in fields.items() if value is not None}
+    record['record'] = record_type
+    for dimension_set in dimensions:
+        for dimension in dimension_set:
+            record.setdefault(dimension, 'unknown')
+
+    declared = []
+    for field, name, unit in metric_specs:
+        value = record.pop(field, None)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            record[name] = value
+            declared.append({'Name': name, 'Unit': unit})
+
+    record['_aws'] = {
+        'Timestamp': int(time.time() * 1000),
+        'CloudWatchMetrics': [{
+            'Namespace': METRICS_NAMESPACE,
+            'Dimensions': dimensions,
+            'Metrics': declared
+        }]
+    }
+    return record
+
+
+def _print_record(record):
+    # Lambda sends stdout to CloudWatch Logs, which extracts EMF lines as metrics
+    print(json.dumps(record, separators=(',', ':'), default=str))
+
+
+def metered_handler(endpoint):
+    """
+    Decorator for a lambda_handler: one request record per invocation
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            start_request(endpoint, trigger='sqs' if isinstance(event, dict) and 'Records' in event else 'api')
+            status_code = None
+            try:
+                response = handler(event, context)
+                if isinstance(response, dict):
+                    status_code = response.get('statusCode')
+                return response
+            finally:
+                finish_request(status_code)
+        return wrapper
+    return decorate
+
+
+def parse_emf_line(line):
+    """
+    The EMF record in a log line (a bare JSON line, or one prefixed by
+    timestamp/request-id columns as in exported logs); None for other lines
+    """
+    start = line.find('{')
+    if start < 0:
+        return None
+    try:
+        record = json.loads(line[start:])
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or '_aws' not in record or 'record' not in record:
+        return None
+    return record
+
+
+def percentile(values, fraction):
+    """
+    Linear-interpolated percentile of values (fraction 0-1); None when empty
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def aggregate_records(records, group_by, metric_names, fractions=(0.5, 0.9, 0.99)):
+    """
+    {group: {'count', metric: {'sum', 'p50', ...}}} for records grouped by a
+    field (e.g. 'endpoint' or 'userId'), over the named metrics
+    """
+    groups = {}
+    for record in records:
+        group = groups.setdefault(str(record.get(group_by, 'unknown')), {'count': 0, 'values': {}})
+        group['count'] += 1
+        for name in metric_names:
+            value = record.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                group['values'].setdefault(name, []).append(value)
+
+    summary = {}
+    for key, group in groups.items():
+        entry = {'count': group['count']}
+        for name in metric_names:
+            values = group['values'].get(name, [])
+            stats = {'sum': sum(values)}
+            for fraction in fractions:
+                stats[f"p{int(round(fraction * 100))}"] = percentile(values, fraction)
+            entry[name] = stats
+        summary[key] = entry
+    return summary
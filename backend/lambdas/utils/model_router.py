@@ -0,0 +1,240 @@
+"""
+Model tier routing for Bedrock calls.
+
+Handlers ask ModelRouter.route() for a model per call instead of hardcoding
+one. Tiers run fast -> balanced -> deep (Haiku 4.5, Sonnet 3.5, Sonnet 4.5
+by default; MODEL_TIER_* overrides them) and the choice depends on:
+
+- task: categorize, analyze, full plan or partial regenerate, each with
+  input-size thresholds (TASK_POLICIES) that pick its tier,
+- a latency SLO: when the tier's expected latency for a typical response
+  is over it, the next faster tier is tried,
+- throttling: a tier throttled in the last THROTTLE_COOLDOWN_SECONDS is
+  skipped, and a call that is still throttled after a couple of attempts
+  moves to the next faster tier instead of backing off further.
+
+Expected latency per tier is a first-token overhead plus ms per output
+token; the per-token cost starts from a prior and follows observed calls.
+Each routed call is logged as an EMF route record (utils.metrics) with the
+decision, the reason for it and the latency.
+"""
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+
+from utils.bedrock_client import is_throttling_error
+from utils.metrics import record_route
+
+TIER_FAST = 'fast'
+TIER_BALANCED = 'balanced'
+TIER_DEEP = 'deep'
+TIERS = (TIER_FAST, TIER_BALANCED, TIER_DEEP)
+
+DEFAULT_TIER_MODELS = {
+    TIER_FAST: os.environ.get('MODEL_TIER_FAST', 'us.anthropic.claude-haiku-4-5-20251001-v1:0'),
+    TIER_BALANCED: os.environ.get('MODEL_TIER_BALANCED', 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'),
+    TIER_DEEP: os.environ.get('MODEL_TIER_DEEP', 'us.anthropic.claude-sonnet-4-5-20250929-v1:0'),
+}
+
+TASK_CATEGORIZE = 'categorize'
+TASK_ANALYZE = 'analyze'
+TASK_FULL_PLAN = 'full_plan'
+TASK_REGENERATE = 'regenerate'
+
+# Per task: (max estimated input tokens, tier), first match wins; None is "any size"
+TASK_POLICIES = {
+    TASK_CATEGORIZE: [(None, TIER_FAST)],
+    # The analysis prompt is ~540 tokens before items and ~10 per item line:
+    # up to ~25 items on the fast tier, ~65 on the balanced one
+    TASK_ANALYZE: [(800, TIER_FAST), (1200, TIER_BALANCED), (None, TIER_DEEP)],
+    TASK_FULL_PLAN: [(None, TIER_BALANCED)],
+    TASK_REGENERATE: [(600, TIER_FAST), (None, TIER_BALANCED)],
+}
+
+# Priors for expected latency: (first-token overhead ms, ms per output token)
+LATENCY_PRIORS = {
+    TIER_FAST: (600.0, 8.0),
+    TIER_BALANCED: (1000.0, 16.0),
+    TIER_DEEP: (1400.0, 18.0),
+}
+LATENCY_SMOOTHING = 0.2
+
+THROTTLE_COOLDOWN_SECONDS = float(os.environ.get('THROTTLE_COOLDOWN_SECONDS', '30'))
+# Attempts on a tier that has a faster fallback (the fallback gets the client's full retries)
+PRIMARY_MAX_ATTEMPTS = 2
+
+RouteDecision = namedtuple('RouteDecision', ['task', 'tier', 'model_id', 'reason', 'input_tokens', 'max_tokens',
+                                             'slo_ms', 'expected_ms'])
+
+
+def estimate_tokens(text):
+    """
+    Rough token count of prompt text (about 4 characters per token)
+    """
+    return int(math.ceil(len(text or '') / 4.0))
+
+
+class ModelRouter:
+    """
+    Chooses a model tier per call and runs the call with throttle fallback
+    """
+
+    def __init__(self, tier_models=None, policies=None, clock=time.monotonic):
+        self.tier_models = dict(tier_models or DEFAULT_TIER_MODELS)
+        self.policies = policies or TASK_POLICIES
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latency = {tier: list(prior) for tier, prior in LATENCY_PRIORS.items()}
+        self._throttled_until = {}
+
+    def fingerprint(self):
+        """
+        Tier -> model mapping, for cache keys that should change with the models
+        """
+        return ','.join(f"{tier}={self.tier_models[tier]}" for tier in TIERS)
+
+    def route(self, task, input_tokens=0, max_tokens=1000, slo_ms=None, output_tokens=None):
+        """
+        RouteDecision for a call; reason is "size", "throttled" or "slo".
+        The SLO is checked against output_tokens, the typical response
+        length (default max_tokens).
+        """
+        output_tokens = output_tokens or max_tokens
+        tier = TIER_BALANCED
+        for limit, policy_tier in self.policies.get(task, [(None, TIER_BALANCED)]):
+            if limit is None or input_tokens <= limit:
+                tier = policy_tier
+                break
+        reason = 'size'
+
+        while self.is_throttled(tier) and self.faster_tier(tier):
+            tier = self.faster_tier(tier)
+            reason = 'throttled'
+
+        if slo_ms:
+            while self.expected_ms(tier, output_tokens) > slo_ms and self.faster_tier(tier):
+                tier = self.faster_tier(tier)
+                reason = 'slo'
+
+        return RouteDecision(task, tier, self.tier_models[tier], reason, input_tokens, max_tokens, slo_ms,
+                             int(self.expected_ms(tier, output_tokens)))
+
+    def faster_tier(self, tier):
+        index = TIERS.index(tier)
+        return TIERS[index - 1] if index > 0 else None
+
+    def expected_ms(self, tier, output_tokens):
+        with self._lock:
+            overhead, per_token = self._latency[tier]
+        return overhead + per_token * (output_tokens or 0)
+
+    def observe(self, tier, latency_ms, output_tokens):
+        """
+        Fold a finished call into the tier's latency estimate
+        """
+        if not output_tokens or latency_ms is None:
+            return
+        with self._lock:
+            overhead, per_token = self._latency[tier]
+            observed = max(0.0, (latency_ms - overhead) / output_tokens)
+            self._latency[tier][1] = per_token + LATENCY_SMOOTHING * (observed - per_token)
+
+    def is_throttled(self, tier):
+        with self._lock:
+            return self._throttled_until.get(tier, 0) > self._clock()
+
+    def mark_throttled(self, tier):
+        with self._lock:
+            self._throttled_until[tier] = self._clock() + THROTTLE_COOLDOWN_SECONDS
+
+    def invoke_text(self, client, decision, request):
+        """
+        Run a routed InvokeModel on a BedrockClient and return the text,
+        moving to faster tiers while the chosen one is throttled
+        """
+        tier = decision.tier
+        fallback_from = None
+        started = time.perf_counter()
+        while True:
+            fallback = self.faster_tier(tier)
+            try:
+                response = client.invoke(self.tier_models[tier], request,
+                                         max_attempts=PRIMARY_MAX_ATTEMPTS if fallback else None)
+            except Exception as e:
+                if is_throttling_error(e):
+                    self.mark_throttled(tier)
+                    if fallback:
+                        print(f"Model tier {tier} throttled; falling back to {fallback}")
+                        fallback_from = fallback_from or tier
+                        tier = fallback
+                        continue
+                self._record(decision, tier, fallback_from, started, status='error')
+                raise
+
+            output_tokens = (response.get('usage') or {}).get('output_tokens')
+            latency_ms = self._record(decision, tier, fallback_from, started, output_tokens=output_tokens)
+            self.observe(tier, latency_ms, output_tokens)
+            return response['content'][0]['text']
+
+    def invoke_stream(self, client, decision, request):
+        """
+        Routed InvokeModelWithResponseStream: falls back only on the initial request
+        """
+        tier = decision.tier
+        fallback_from = None
+        started = time.perf_counter()
+        while True:
+            fallback = self.faster_tier(tier)
+            try:
+                stream = client.invoke_stream(self.tier_models[tier], request,
+                                              max_attempts=PRIMARY_MAX_ATTEMPTS if fallback else None)
+            except Exception as e:
+                if is_throttling_error(e) and fallback:
+                    self.mark_throttled(tier)
+                    print(f"Model tier {tier} throttled; falling back to {fallback}")
+                    fallback_from = fallback_from or tier
+                    tier = fallback
+                    continue
+                self._record(decision, tier, fallback_from, started, status='error')
+                raise
+            # Latency here is time to first byte; the call record has the full duration
+            self._record(decision, tier, fallback_from, started, status='streaming')
+            return stream
+
+    def _record(self, decision, tier, fallback_from, started, status='ok', output_tokens=None):
+        latency_ms = int((time.perf_counter() - started) * 1000)
+        try:
+            record_route({
+                'task': decision.task,
+                'tier': tier,
+                'modelId': self.tier_models[tier],
+                'reason': 'fallback' if fallback_from else decision.reason,
+                'fallbackFrom': fallback_from,
+                'sloMs': decision.slo_ms,
+                'status': status,
+                'latencyMs': latency_ms,
+                'expectedMs': decision.expected_ms,
+                'inputTokens': decision.input_tokens,
+                'outputTokens': output_tokens
+            })
+        except Exception as e:
+            print(f"Error recording route: {str(e)}")
+        return latency_ms
+
+
+_shared_router = None
+_shared_lock = threading.Lock()
+
+
+def get_model_router():
+    """
+    Process-wide ModelRouter, so throttle state and latency estimates are shared
+    """
+    global _shared_router
+    if _shared_router is None:
+        with _shared_lock:
+            if _shared_router is None:
+                _shared_router = ModelRouter()
+    return _shared_router
@@ -0,0 +1,125 @@
+"""
+Storage codec for MealPlans items.
+
+The plan is stored as one compressed binary attribute (gzip, or zstd when
+PLAN_CODEC=zstd and the zstandard package is installed) of compact JSON,
+next to a few plain summary attributes that can be read or projected
+without decompressing. Items written before the codec keep the nested
+`meal_plan` map; decode_meal_plan reads both, and encode_legacy_item
+rewrites an old item for the backfill in backend/scripts/migrate_meal_plans.py.
+"""
+import gzip
+import json
+import os
+from decimal import Decimal
+
+try:
+    import zstandard
+except ImportError:  # Not bundled by default; gzip is always available
+    zstandard = None
+
+PLAN_BLOB_ATTRIBUTE = 'meal_plan_blob'
+PLAN_CODEC_ATTRIBUTE = 'plan_codec'
+LEGACY_PLAN_ATTRIBUTE = 'meal_plan'
+
+CODEC_GZIP = 'gzip-json-v1'
+CODEC_ZSTD = 'zstd-json-v1'
+
+# Attributes a reader needs to rebuild the plan (for ProjectionExpressions)
+PLAN_ATTRIBUTES = (PLAN_BLOB_ATTRIBUTE, PLAN_CODEC_ATTRIBUTE, LEGACY_PLAN_ATTRIBUTE)
+
+
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def default_codec():
+    if os.environ.get('PLAN_CODEC', 'gzip').lower() == 'zstd' and zstandard is not None:
+        return CODEC_ZSTD
+    return CODEC_GZIP
+
+
+def compress_plan(meal_plan, codec=None):
+    """
+    Compact JSON of the plan, compressed; returns (blob, codec)
+    """
+    codec = codec or default_codec()
+    payload = json.dumps(meal_plan, separators=(',', ':'), default=_json_default).encode('utf-8')
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=6).compress(payload), codec
+    if codec == CODEC_GZIP:
+        return gzip.compress(payload, compresslevel=6, mtime=0), codec
+    raise ValueError(f"Unknown plan codec: {codec}")
+
+
+def decompress_plan(blob, codec):
+    # boto3 returns Binary attributes wrapped in boto3.dynamodb.types.Binary
+    data = bytes(getattr(blob, 'value', blob))
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is required to read zstd-compressed meal plans")
+        payload = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == CODEC_GZIP or codec is None:
+        payload = gzip.decompress(data)
+    else:
+        raise ValueError(f"Unknown plan codec: {codec}")
+    return json.loads(payload)
+
+
+def summarize_plan(meal_plan):
+    """
+    Plain attributes stored beside the blob (numbers as Decimal for DynamoDB)
+    """
+    meal_plan = meal_plan or {}
+    totals = meal_plan.get('weeklyTotals') or {}
+    summary = {
+        'meal_count': len(meal_plan.get('meals') or []),
+        'plan_days': list((meal_plan.get('weeklyPlan') or {}).keys()),
+    }
+    for attribute, key in (('total_calories', 'totalCalories'),
+                           ('avg_daily_calories', 'avgDailyCalories'),
+                           ('estimated_cost', 'estimatedCost')):
+        value = totals.get(key)
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            summary[attribute] = Decimal(str(value))
+    if meal_plan.get('source'):
+        summary['plan_source'] = meal_plan['source']
+    return summary
+
+
+def encode_meal_plan(meal_plan, codec=None):
+    """
+    Item attributes for a plan: the compressed blob, its codec and the summary
+    """
+    blob, codec = compress_plan(meal_plan, codec)
+    attributes = summarize_plan(meal_plan)
+    attributes[PLAN_BLOB_ATTRIBUTE] = blob
+    attributes[PLAN_CODEC_ATTRIBUTE] = codec
+    return attributes
+
+
+def decode_meal_plan(item):
+    """
+    The plan dict stored on a MealPlans item, whichever format wrote it
+    """
+    if not item:
+        return {}
+    if item.get(PLAN_BLOB_ATTRIBUTE) is not None:
+        return decompress_plan(item[PLAN_BLOB_ATTRIBUTE], item.get(PLAN_CODEC_ATTRIBUTE))
+    return item.get(LEGACY_PLAN_ATTRIBUTE) or {}
+
+
+def encode_legacy_item(item, codec=None):
+    """
+    Rewrite an item that still stores the nested map; None when there is
+    nothing to migrate (already encoded, or a plan still being streamed)
+    """
+    if item.get(PLAN_BLOB_ATTRIBUTE) is not None or LEGACY_PLAN_ATTRIBUTE not in item:
+        return None
+    if item.get('status') == 'generating':
+        return None
+    migrated = {key: value for key, value in item.items() if key != LEGACY_PLAN_ATTRIBUTE}
+    migrated.update(encode_meal_plan(item[LEGACY_PLAN_ATTRIBUTE], codec))
+    return migrated
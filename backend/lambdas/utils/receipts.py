@@ -0,0 +1,22 @@
+"""
+Receipts table keys.
+
+Uploads go to receipts/<user_id>/<timestamp>-<file name> (api_upload) and
+parse_receipt stores each one under user_id + receipt_id, where receipt_id
+is the file name part of the key. So any handler holding an s3Key can read
+the parsed receipt with one GetItem instead of querying or scanning for it.
+"""
+
+
+def receipt_key(s3_key):
+    """
+    {'user_id', 'receipt_id'} of the Receipts item for an uploaded receipt's S3 key
+    """
+    parts = str(s3_key or '').split('/')
+    receipt_id = parts[-1]
+    if not receipt_id:
+        raise ValueError(f"Invalid receipt key: {s3_key!r}")
+    return {
+        'user_id': parts[1] if len(parts) > 1 else 'anonymous',
+        'receipt_id': receipt_id
+    }
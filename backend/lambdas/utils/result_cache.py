@@ -0,0 +1,162 @@
+"""
+Two-tier result cache shared by the handlers (generated plans, catalog,
+meal images, receipt insights): an in-process LRU that lives across warm
+invocations in front of the ResultCache DynamoDB table, plus helpers for
+content-addressed keys.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from utils.db_helpers import dumps
+
+# DynamoDB items are capped at 400 KB; leave headroom for the other attributes
+MAX_SHARED_PAYLOAD_BYTES = 350 * 1024
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU with per-entry expiry.
+    Module-level instances survive across warm Lambda invocations.
+    """
+
+    def __init__(self, max_entries=128, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResultCache:
+    """
+    Two-tier cache for JSON results, namespaced by key_prefix: in-process
+    LRU in front of a shared DynamoDB table
+    (partition key cache_key, TTL attribute expires_at).
+    Entries expire after ttl_seconds in both tiers; the memory tier also
+    evicts least-recently-used results beyond max_entries.
+    """
+
+    def __init__(self, table=None, max_entries=128, ttl_seconds=6 * 3600, key_prefix='result#'):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.stats = {'memoryHits': 0, 'sharedHits': 0, 'misses': 0}
+
+    def get(self, key):
+        """
+        Look up a result. Returns (value, tier) where tier is "memory",
+        "dynamodb" or None on a miss.
+        """
+        # Payloads are kept serialized so callers can't mutate a cached result
+        payload = self.memory.get(key)
+        if payload is not None:
+            self.stats['memoryHits'] += 1
+            return json.loads(payload), 'memory'
+
+        payload = self._get_shared(key)
+        if payload is not None:
+            self.memory.put(key, payload)
+            self.stats['sharedHits'] += 1
+            return json.loads(payload), 'dynamodb'
+
+        self.stats['misses'] += 1
+        return None, None
+
+    def put(self, key, value):
+        payload = dumps(value)
+        self.memory.put(key, payload)
+        self._put_shared(key, payload)
+
+    def _get_shared(self, key):
+        if self.table is None:
+            return None
+        try:
+            response = self.table.get_item(Key={'cache_key': self.key_prefix + key})
+            item = response.get('Item')
+            # DynamoDB TTL deletion is lazy, so expired items can still be returned
+            if not item or int(item.get('expires_at', 0)) <= time.time():
+                return None
+            return item['payload']
+        except Exception as e:
+            print(f"Error reading shared cache ({self.key_prefix}): {str(e)}")
+            return None
+
+    def _put_shared(self, key, payload):
+        if self.table is None:
+            return
+        try:
+            if len(payload.encode('utf-8')) > MAX_SHARED_PAYLOAD_BYTES:
+                print(f"Skipping shared cache write ({self.key_prefix}): payload too large")
+                return
+            now = int(time.time())
+            self.table.put_item(
+                Item={
+                    'cache_key': self.key_prefix + key,
+                    'payload': payload,
+                    'created_at': now,
+                    'expires_at': now + self.ttl_seconds
+                }
+            )
+        except Exception as e:
+            print(f"Error writing shared cache ({self.key_prefix}): {str(e)}")
+
+
+def normalize_preferences(preferences):
+    """
+    Canonical form of the preference dict from get_user_preferences.
+    Numbers are rounded to ints and free text is lower-cased, so equivalent
+    preferences produce the same cache key.
+    """
+    normalized = {}
+    for key, value in sorted((preferences or {}).items()):
+        if isinstance(value, bool) or value is None:
+            normalized[key] = value
+        elif isinstance(value, (int, float, Decimal)):
+            normalized[key] = int(round(float(value)))
+        elif isinstance(value, str):
+            text = ' '.join(value.lower().split())
+            if key == 'dietaryRestrictions':
+                text = ','.join(sorted(part.strip() for part in text.split(',') if part.strip()))
+            try:
+                normalized[key] = int(round(float(text)))
+            except ValueError:
+                normalized[key] = text
+        elif isinstance(value, (list, tuple)):
+            normalized[key] = sorted(' '.join(str(part).lower().split()) for part in value)
+        else:
+            normalized[key] = str(value)
+    return normalized
+
+
+def content_hash(material):
+    """
+    SHA-256 of the canonical JSON of material (keys sorted, compact)
+    """
+    encoded = json.dumps(material, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
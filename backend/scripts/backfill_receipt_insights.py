@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Backfill: AI insights for parsed Receipts rows that have none yet.
+
+Receipts are packed several per Bedrock request (analyze_receipt_ai's
+analyze_receipt_batch; receipts in a request share the user's budget and
+dietary restrictions). Results are written conditionally, so receipts
+deleted, re-parsed or analyzed by the API since the scan are left alone.
+Historical receipts are not added to the budget tracker.
+
+For very large backfills, --export-jobs writes a Bedrock batch-inference input
+file (JSONL) plus a manifest of which receipts each record packs; after the
+job has run, --import-results reads its output file and stores the insights.
+
+Run from backend/:
+  python scripts/backfill_receipt_insights.py <receipts-table> --preferences-table <name> [--user ID] [--limit N]
+  python scripts/backfill_receipt_insights.py <receipts-table> --preferences-table <name> --export-jobs jobs.jsonl
+  python scripts/backfill_receipt_insights.py <receipts-table> --import-results jobs.jsonl.out --manifest jobs.jsonl.manifest.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(__file__), '..', 'lambdas')
+sys.path.insert(0, LAMBDAS_DIR)
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, 'analyze_receipt_ai'))
+
+from boto3.dynamodb.conditions import Attr, Key  # noqa: E402
+
+UNANALYZED = Attr('ai_insights').not_exists() & Attr('status').eq('processed')
+
+
+def find_unanalyzed_receipts(table, user_id=None, limit=None):
+    """
+    Parsed receipts with items and no ai_insights: one user's (Query) or the whole table's (Scan)
+    """
+    kwargs = {'FilterExpression': UNANALYZED}
+    if user_id:
+        kwargs['KeyConditionExpression'] = Key('user_id').eq(user_id)
+    read = table.query if user_id else table.scan
+
+    receipts = []
+    while True:
+        response = read(**kwargs)
+        for item in response.get('Items', []):
+            if item.get('items'):
+                receipts.append(item)
+                if limit and len(receipts) >= limit:
+                    return receipts
+        if 'LastEvaluatedKey' not in response:
+            return receipts
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def plan_batches(analysis, receipts, batch_size):
+    preferences = {}
+    entries = []
+    for receipt in receipts:
+        user_id = receipt['user_id']
+        if user_id not in preferences:
+            preferences[user_id] = analysis.get_user_preferences(user_id)
+        entries.append((receipt, preferences[user_id]))
+    return analysis.plan_insight_batches(entries, batch_size)
+
+
+def run_backfill(analysis, batches, workers):
+    stats = {'batches': len(batches), 'receipts': 0, 'written': 0}
+
+    def analyze(batch):
+        receipts, user_preferences = batch
+        return receipts, analysis.analyze_receipt_batch(receipts, user_preferences)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for receipts, insights in executor.map(analyze, batches):
+            stats['receipts'] += len(receipts)
+            stats['written'] += analysis.write_insights_batch(receipts, insights)
+            print(f"{stats['receipts']} receipts analyzed, {stats['written']} written")
+    return stats
+
+
+def export_jobs(analysis, batches, path):
+    manifest = {}
+    with open(path, 'w') as out:
+        for number, (receipts, user_preferences) in enumerate(batches):
+            record_id = f"batch-{number:06d}"
+            out.write(json.dumps(analysis.create_batch_inference_record(record_id, receipts, user_preferences),
+                                 default=str) + '\n')
+            manifest[record_id] = [[receipt['user_id'], receipt['receipt_id']] for receipt in receipts]
+    with open(path + '.manifest.json', 'w') as out:
+        json.dump(manifest, out)
+    return {'batches': len(batches), 'receipts': sum(len(keys) for keys in manifest.values())}
+
+
+def import_results(analysis, path, manifest_path):
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    stats = {'records': 0, 'receipts': 0, 'written': 0, 'missing': 0}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            keys = manifest.get(record.get('recordId'), [])
+            receipts = [analysis.get_receipt({'user_id': user_id, 'receipt_id': receipt_id})
+                        for user_id, receipt_id in keys]
+            # Labels follow the manifest order; drop receipts deleted or analyzed since only after splitting
+            results = analysis.read_batch_inference_output(record, [receipt or {} for receipt in receipts])
+            pending = [(receipt, insights) for receipt, insights in zip(receipts, results)
+                       if receipt and not receipt.get('ai_insights')]
+            stats['records'] += 1
+            stats['receipts'] += len(pending)
+            stats['missing'] += sum(1 for _, insights in pending if insights is None)
+            stats['written'] += analysis.write_insights_batch([receipt for receipt, _ in pending],
+                                                              [insights for _, insights in pending])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('table', help='Receipts table name')
+    parser.add_argument('--preferences-table', help='UserPreferences table name (budget and dietary restrictions)')
+    parser.add_argument('--result-cache-table', help='ResultCache table name (share insights with the API)')
+    parser.add_argument('--user', help='only this user\'s receipts (default: the whole table)')
+    parser.add_argument('--limit', type=int, help='stop after this many receipts')
+    parser.add_argument('--batch-size', type=int, default=4, help='receipts per model request')
+    parser.add_argument('--workers', type=int, default=4, help='model requests in flight')
+    parser.add_argument('--dry-run', action='store_true', help='count receipts and batches only')
+    parser.add_argument('--export-jobs', metavar='FILE', help='write a batch-inference input file instead')
+    parser.add_argument('--import-results', metavar='FILE', help='store insights from a batch-inference output file')
+    parser.add_argument('--manifest', help='manifest written by --export-jobs (default: <FILE>.manifest.json)')
+    args = parser.parse_args()
+
+    # The handler reads its table names at import time
+    os.environ['RECEIPTS_TABLE'] = args.table
+    os.environ['USER_PREFERENCES_TABLE'] = args.preferences_table or ''
+    if args.result_cache_table:
+        os.environ['RESULT_CACHE_TABLE'] = args.result_cache_table
+    import handler as analysis
+
+    if args.import_results:
+        manifest = args.manifest or args.import_results.rsplit('.out', 1)[0] + '.manifest.json'
+        stats = import_results(analysis, args.import_results, manifest)
+        print(f"records {stats['records']}, receipts {stats['receipts']}, written {stats['written']}, "
+              f"missing {stats['missing']} (rerun without --import-results to retry them)")
+        return
+
+    if not args.preferences_table:
+        parser.error('--preferences-table is required to analyze receipts')
+
+    receipts = find_unanalyzed_receipts(analysis.receipts_table, args.user, args.limit)
+    batches = plan_batches(analysis, receipts, args.batch_size)
+    print(f"{len(receipts)} unanalyzed receipts in {len(batches)} batches")
+    if args.dry_run or not batches:
+        return
+
+    if args.export_jobs:
+        stats = export_jobs(analysis, batches, args.export_jobs)
+        print(f"wrote {stats['batches']} records ({stats['receipts']} receipts) to {args.export_jobs}")
+        return
+
+    stats = run_backfill(analysis, batches, args.workers)
+    print(f"batches {stats['batches']}, receipts {stats['receipts']}, written {stats['written']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Report: Bedrock tokens, cost and latency percentiles per endpoint and per user
+
+Reads the EMF log lines written by utils.metrics from exported Lambda logs
+(files or stdin; other log lines are skipped), e.g.
+
+  aws logs tail /aws/lambda/<function> --since 1d > logs.txt
+  python scripts/metrics_report.py logs.txt
+
+Model calls are reported per endpoint and model; whole requests (including
+cache hits that made no call) per endpoint and per user, most expensive first;
+model routing decisions per task, tier and reason.
+
+Run from backend/: python scripts/metrics_report.py [files ...] [--top N] [--json]
+"""
+
+import argparse
+import fileinput
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas'))
+
+from utils.metrics import (  # noqa: E402
+    RECORD_MODEL_CALL, RECORD_REQUEST, RECORD_ROUTE, aggregate_records, parse_emf_line
+)
+
+CALL_COLUMNS = [('LatencyMs', 'latency ms'), ('InputTokens', 'input tok'), ('OutputTokens', 'output tok')]
+REQUEST_COLUMNS = [('RequestLatencyMs', 'latency ms'), ('RequestInputTokens', 'input tok'),
+                   ('RequestOutputTokens', 'output tok')]
+ROUTE_COLUMNS = [('RouteLatencyMs', 'latency ms'), ('ExpectedLatencyMs', 'expected ms'),
+                 ('RouteInputTokens', 'input tok')]
+
+
+def read_records(paths):
+    calls, requests, routes = [], [], []
+    for line in fileinput.input(paths or ['-']):
+        record = parse_emf_line(line)
+        if record is None:
+            continue
+        if record['record'] == RECORD_MODEL_CALL:
+            record['endpointModel'] = f"{record.get('endpoint', 'unknown')} {record.get('modelId', 'unknown')}"
+            calls.append(record)
+        elif record['record'] == RECORD_REQUEST:
+            requests.append(record)
+        elif record['record'] == RECORD_ROUTE:
+            record['taskTier'] = ' '.join(str(record.get(field, 'unknown')) for field in ('task', 'tier', 'reason'))
+            routes.append(record)
+    return calls, requests, routes
+
+
+def build_report(calls, requests, routes=()):
+    call_metrics = [name for name, _ in CALL_COLUMNS] + ['CostUSD']
+    request_metrics = [name for name, _ in REQUEST_COLUMNS] + ['RequestCostUSD', 'ModelCalls']
+    return {
+        'callsByEndpointModel': aggregate_records(calls, 'endpointModel', call_metrics),
+        'requestsByEndpoint': aggregate_records(requests, 'endpoint', request_metrics),
+        'requestsByUser': aggregate_records(requests, 'userId', request_metrics),
+        'routesByTaskTier': aggregate_records(routes, 'taskTier', [name for name, _ in ROUTE_COLUMNS]),
+        'truncatedCalls': sum(1 for call in calls if call.get('stopReason') == 'max_tokens'),
+    }
+
+
+def _number(value):
+    if value is None:
+        return '-'
+    return f"{value:,.0f}"
+
+
+def print_table(title, groups, columns, cost_metric=None, top=None):
+    print(f"\n{title}")
+    header = f"{'':<66}{'count':>7}"
+    for _, label in columns:
+        header += f"  {label + ' p50/p90/p99':>26}"
+    if cost_metric:
+        header += f"  {'cost $':>10}"
+    print(header)
+
+    if cost_metric:
+        rows = sorted(groups.items(), key=lambda item: -item[1][cost_metric]['sum'])
+    else:
+        rows = sorted(groups.items(), key=lambda item: -item[1]['count'])
+    for key, entry in rows[:top] if top else rows:
+        line = f"{key[:65]:<66}{entry['count']:>7}"
+        for name, _ in columns:
+            stats = entry[name]
+            line += f"  {'/'.join(_number(stats[p]) for p in ('p50', 'p90', 'p99')):>26}"
+        if cost_metric:
+            line += f"  {entry[cost_metric]['sum']:>10.4f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bedrock token, cost and latency report from EMF log lines')
+    parser.add_argument('files', nargs='*', help='log files (default: stdin)')
+    parser.add_argument('--top', type=int, default=20, help='users to list, most expensive first')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    calls, requests, routes = read_records(args.files)
+    report = build_report(calls, requests, routes)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{len(calls)} model calls ({report['truncatedCalls']} hit max_tokens), {len(requests)} requests")
+    print_table('Model calls by endpoint and model', report['callsByEndpointModel'], CALL_COLUMNS, 'CostUSD')
+    print_table('Requests by endpoint', report['requestsByEndpoint'], REQUEST_COLUMNS, 'RequestCostUSD')
+    print_table(f"Requests by user (top {args.top} by cost)", report['requestsByUser'], REQUEST_COLUMNS,
+                'RequestCostUSD', top=args.top)
+    if routes:
+        print_table('Routed calls by task, tier and reason', report['routesByTaskTier'], ROUTE_COLUMNS)
+
+
+if __name__ == '__main__':
+    main()
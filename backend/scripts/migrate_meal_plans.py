@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Backfill: rewrite MealPlans items that still store the nested `meal_plan` map
+into the compressed format of utils.plan_codec.
+
+Readers handle both formats, so this can run at any time and be resumed;
+each rewrite is conditional on the item still being in the old format.
+
+Run from backend/: python scripts/migrate_meal_plans.py <table-name> [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas'))
+
+import boto3  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+
+from utils.plan_codec import LEGACY_PLAN_ATTRIBUTE, PLAN_BLOB_ATTRIBUTE, encode_legacy_item  # noqa: E402
+
+
+def migrate_table(table, dry_run=False):
+    stats = {'scanned': 0, 'migrated': 0, 'skipped': 0, 'conflicts': 0}
+    scan_kwargs = {
+        'FilterExpression': 'attribute_exists(#plan) AND attribute_not_exists(#blob)',
+        'ExpressionAttributeNames': {'#plan': LEGACY_PLAN_ATTRIBUTE, '#blob': PLAN_BLOB_ATTRIBUTE}
+    }
+    while True:
+        response = table.scan(**scan_kwargs)
+        stats['scanned'] += response.get('ScannedCount', 0)
+        for item in response.get('Items', []):
+            migrated = encode_legacy_item(item)
+            if migrated is None:
+                stats['skipped'] += 1
+                continue
+            if dry_run:
+                stats['migrated'] += 1
+                continue
+            try:
+                table.put_item(
+                    Item=migrated,
+                    ConditionExpression='attribute_exists(#plan) AND plan_id = :plan_id',
+                    ExpressionAttributeNames={'#plan': LEGACY_PLAN_ATTRIBUTE},
+                    ExpressionAttributeValues={':plan_id': item.get('plan_id')}
+                )
+                stats['migrated'] += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                # Regenerated or already migrated since the scan
+                stats['conflicts'] += 1
+        if 'LastEvaluatedKey' not in response:
+            return stats
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('table', help='MealPlans table name')
+    parser.add_argument('--dry-run', action='store_true', help='count items without rewriting them')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb').Table(args.table)
+    stats = migrate_table(table, dry_run=args.dry_run)
+    print(f"scanned {stats['scanned']}, migrated {stats['migrated']}, "
+          f"skipped {stats['skipped']} (still generating), conflicts {stats['conflicts']}")
+
+
+if __name__ == '__main__':
+    main()
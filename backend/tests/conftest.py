@@ -0,0 +1,44 @@
+"""
+Shared test setup: make the Lambda source directories importable
+"""
+import os
+import sys
+
+LAMBDAS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambdas'))
+
+# Shared utils package (deployed as a Lambda layer)
+if LAMBDAS_DIR not in sys.path:
+    sys.path.insert(0, LAMBDAS_DIR)
+
+# Lambda-local modules (handler.py itself is loaded per test to avoid name clashes)
+for lambda_name in ('generate_plan', 'parse_receipt', 'analyze_receipt_ai'):
+    lambda_path = os.path.join(LAMBDAS_DIR, lambda_name)
+    if lambda_path not in sys.path:
+        sys.path.insert(0, lambda_path)
+
+
+def load_lambda_handler(lambda_name, monkeypatch, env=None):
+    """
+    Import lambdas/<lambda_name>/handler.py under a unique module name, with
+    placeholder table names so module-level boto3 resources can be built offline
+    """
+    import importlib.util
+
+    defaults = {
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'MEAL_PLANS_TABLE': 'MealPlans',
+        'USER_PREFERENCES_TABLE': 'UserPreferences',
+        'RECEIPTS_TABLE': 'Receipts',
+    }
+    for name, value in dict(defaults, **(env or {})).items():
+        monkeypatch.setenv(name, value)
+
+    # Script-style tests elsewhere swap boto3 for a bare module; use the real package
+    if not hasattr(sys.modules.get('boto3'), '__path__'):
+        monkeypatch.delitem(sys.modules, 'boto3', raising=False)
+
+    path = os.path.join(LAMBDAS_DIR, lambda_name, 'handler.py')
+    spec = importlib.util.spec_from_file_location(f"{lambda_name}_handler", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
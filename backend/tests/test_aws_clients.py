@@ -0,0 +1,32 @@
+"""
+Tests for the lazily built boto3 clients and tables
+"""
+from conftest import load_lambda_handler
+from utils.aws_clients import LazyProxy
+
+
+def test_proxy_builds_its_target_once_on_first_use():
+    built = []
+
+    class Table:
+        name = 'MealPlans'
+
+        def get_item(self, Key):
+            return {'Item': Key}
+
+    proxy = LazyProxy(lambda: built.append(1) or Table(), 'table MealPlans')
+    assert not proxy.is_built
+    assert proxy.get_item(Key={'id': 1}) == {'Item': {'id': 1}}
+    assert proxy.name == 'MealPlans'
+    assert built == [1]
+
+
+def test_handlers_build_no_clients_at_import(monkeypatch):
+    generate_plan = load_lambda_handler('generate_plan', monkeypatch, {'PLAN_JOBS_TABLE': 'PlanJobs'})
+    for table in (generate_plan.meal_plans_table, generate_plan.receipts_table, generate_plan.plan_jobs_table):
+        assert not table.is_built
+
+    get_meal_plan = load_lambda_handler('get_meal_plan', monkeypatch)
+    assert not get_meal_plan.meal_plans_table.is_built
+    get_meal_plan.meal_plans_table.name
+    assert get_meal_plan.meal_plans_table.is_built
@@ -0,0 +1,153 @@
+"""
+Tests for the shared Bedrock client: backoff, AIMD limiter and call metrics
+"""
+import io
+import json
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from utils.bedrock_client import AIMDLimiter, BedrockClient
+
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'InvokeModel')
+
+
+def model_response(text, input_tokens=100, output_tokens=50):
+    body = {'content': [{'text': text}], 'usage': {'input_tokens': input_tokens, 'output_tokens': output_tokens}}
+    return {'body': io.BytesIO(json.dumps(body).encode())}
+
+
+class FakeRuntime:
+    """bedrock-runtime stand-in that fails with the queued error codes first"""
+
+    def __init__(self, errors=(), delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def invoke_model(self, modelId, body):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            error = self.errors.pop(0) if self.errors else None
+        try:
+            time.sleep(self.delay)
+            if error:
+                raise client_error(error)
+            return model_response(json.loads(body)['messages'][0]['content'])
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        chunks = [
+            {'type': 'content_block_delta', 'delta': {'text': 'hi'}},
+            {'type': 'message_stop',
+             'amazon-bedrock-invocationMetrics': {'inputTokenCount': 12, 'outputTokenCount': 3}},
+        ]
+        return {'body': [{'chunk': {'bytes': json.dumps(chunk).encode()}} for chunk in chunks]}
+
+
+def request(prompt='hello'):
+    return {'messages': [{'role': 'user', 'content': prompt}], 'max_tokens': 10}
+
+
+def make_client(runtime, **kwargs):
+    metrics = []
+    delays = []
+    client = BedrockClient(client=runtime, on_metrics=metrics.append, sleep=delays.append, **kwargs)
+    return client, metrics, delays
+
+
+def test_throttles_are_retried_with_growing_jittered_backoff():
+    runtime = FakeRuntime(errors=['ThrottlingException', 'ThrottlingException'])
+    client, metrics, delays = make_client(runtime, base_delay=0.1)
+
+    assert client.invoke_text('model', request('hello')) == 'hello'
+    assert runtime.calls == 3
+    assert len(delays) == 2
+    assert 0 <= delays[0] <= 0.1 and 0 <= delays[1] <= 0.2
+    assert metrics[0]['attempts'] == 3 and metrics[0]['throttles'] == 2
+    assert client.stats['throttles'] == 2 and client.stats['retries'] == 2
+
+
+def test_non_retryable_errors_raise_immediately():
+    runtime = FakeRuntime(errors=['ValidationException'])
+    client, metrics, delays = make_client(runtime)
+
+    with pytest.raises(ClientError):
+        client.invoke('model', request())
+    assert runtime.calls == 1 and delays == []
+    assert metrics[0]['status'] == 'error' and metrics[0]['error'] == 'ValidationException'
+
+
+def test_gives_up_after_max_attempts():
+    runtime = FakeRuntime(errors=['ThrottlingException'] * 10)
+    client, _, _ = make_client(runtime, max_attempts=3)
+
+    with pytest.raises(ClientError):
+        client.invoke('model', request())
+    assert runtime.calls == 3
+    assert client.limiter.in_flight == 0
+
+
+def test_metrics_include_latency_and_tokens():
+    client, metrics, _ = make_client(FakeRuntime())
+    client.invoke('model', request())
+
+    assert metrics[0]['status'] == 'ok'
+    assert metrics[0]['inputTokens'] == 100 and metrics[0]['outputTokens'] == 50
+    assert metrics[0]['latencyMs'] >= 0
+
+
+def test_stream_reports_tokens_and_releases_slot():
+    client, metrics, _ = make_client(FakeRuntime())
+    stream = client.invoke_stream('model', request())
+    assert client.limiter.in_flight == 1
+
+    assert len(list(stream)) == 2
+    assert client.limiter.in_flight == 0
+    assert metrics[0]['status'] == 'ok'
+    assert metrics[0]['inputTokens'] == 12 and metrics[0]['outputTokens'] == 3
+
+    # Closing an unread stream also gives its slot back
+    client.invoke_stream('model', request()).close()
+    assert client.limiter.in_flight == 0
+
+
+def test_limiter_additive_increase_multiplicative_decrease():
+    limiter = AIMDLimiter(initial_limit=4, max_limit=8, cooldown_seconds=10)
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.limit > 4
+
+    before = limiter.limit
+    limiter.on_throttle()
+    assert limiter.limit == before // 2
+
+    # A burst of throttles inside the cooldown only halves once
+    limiter.on_throttle()
+    assert limiter.limit == before // 2
+
+
+def test_concurrency_stays_within_limit():
+    runtime = FakeRuntime(delay=0.05)
+    limiter = AIMDLimiter(initial_limit=3, max_limit=3)
+    client, _, _ = make_client(runtime, limiter=limiter)
+
+    threads = [threading.Thread(target=client.invoke, args=('model', request())) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert runtime.calls == 12
+    assert runtime.max_active <= 3
@@ -0,0 +1,90 @@
+"""
+Tests for the weekly budget ledger and the preferences endpoint reading it
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+from conftest import load_lambda_handler
+from utils.budget_ledger import budget_summary, clear_week, record_spend, spending_by_week, week_bucket
+
+
+class LedgerTable:
+    """
+    Applies ADD / SET / REMOVE update expressions the way DynamoDB does: atomically per item
+    """
+
+    def __init__(self, items=None):
+        self.items = {item['user_id']: item for item in items or []}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_item(self, Key):
+        self.calls.append('get_item')
+        item = self.items.get(Key['user_id'])
+        return {'Item': dict(item)} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None):
+        self.calls.append('update_item')
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        with self._lock:
+            item = self.items.setdefault(Key['user_id'], {'user_id': Key['user_id']})
+            if UpdateExpression.startswith('ADD'):
+                attribute = names['#spent']
+                item[attribute] = item.get(attribute, Decimal('0')) + values[':amount']
+            elif UpdateExpression.startswith('REMOVE'):
+                item.pop(names['#spent'], None)
+            else:
+                for assignment in UpdateExpression[len('SET '):].split(', '):
+                    name, placeholder = assignment.split(' = ')
+                    item[name] = values[placeholder]
+
+
+def test_concurrent_spends_are_all_counted():
+    table = LedgerTable()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: record_spend(table, 'u1', 2.5), range(40)))
+
+    assert spending_by_week(table.items['u1']) == {week_bucket(): 100.0}
+    # One write per purchase, no reads
+    assert set(table.calls) == {'update_item'}
+
+
+def test_weeks_are_separate_buckets_and_remaining_is_computed():
+    table = LedgerTable()
+    march = datetime(2025, 3, 1)
+    record_spend(table, 'u1', 30, when=march)
+    record_spend(table, 'u1', 12.25, when=march)
+    record_spend(table, 'u1', 5)
+
+    item = table.items['u1']
+    assert spending_by_week(item)[week_bucket(march)] == 42.25
+    assert budget_summary(item, 80, when=march) == {'week': '2025-W09', 'spent': 42.25, 'remaining': 37.75}
+    assert budget_summary(item, 80)['spent'] == 5.0
+
+    clear_week(table, 'u1', when=march)
+    assert budget_summary(table.items['u1'], 80, when=march)['remaining'] == 80.0
+
+
+def test_preferences_read_spent_from_the_ledger_and_saves_keep_it(monkeypatch):
+    handler = load_lambda_handler('preferences', monkeypatch)
+    table = LedgerTable([{'user_id': 'u1', 'budget': Decimal('100'), 'allergies': ['nuts'],
+                          f"spent#{week_bucket()}": Decimal('35.50')}])
+    monkeypatch.setattr(handler, 'preferences_table', table)
+
+    response = handler.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {'userId': 'u1'}}, None)
+    preferences = json.loads(response['body'])['preferences']
+    assert preferences['spent'] == 35.5 and preferences['remaining'] == 64.5
+    assert preferences['allergies'] == ['nuts']
+
+    body = json.dumps({'userId': 'u1', 'allergies': [], 'budget': 120})
+    assert handler.lambda_handler({'httpMethod': 'POST', 'body': body}, None)['statusCode'] == 200
+    assert budget_summary(table.items['u1'], 120)['spent'] == 35.5
+
+    reset = {'httpMethod': 'POST', 'path': '/preferences/reset-budget', 'body': json.dumps({'userId': 'u1'})}
+    assert handler.lambda_handler(reset, None)['statusCode'] == 200
+    response = handler.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {'userId': 'u1'}}, None)
+    assert json.loads(response['body'])['preferences']['remaining'] == 120.0
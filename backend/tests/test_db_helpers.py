@@ -0,0 +1,43 @@
+"""
+Tests for the shared response builder and JSON encoder
+"""
+import json
+from decimal import Decimal
+
+from utils import db_helpers
+from utils.db_helpers import cors_headers, create_response, dumps, error_response
+
+PAYLOAD = {
+    'mealPlans': [{'calories': Decimal('550'), 'protein': Decimal('32.5'), 'tags': {'quick'}}],
+    'count': 1,
+    'note': 'crème fraîche'
+}
+
+
+def test_decimals_become_ints_or_floats():
+    assert json.loads(dumps(PAYLOAD)) == {
+        'mealPlans': [{'calories': 550, 'protein': 32.5, 'tags': ['quick']}],
+        'count': 1,
+        'note': 'crème fraîche'
+    }
+
+
+def test_stdlib_fallback_matches_orjson(monkeypatch):
+    fast = json.loads(dumps(PAYLOAD))
+    monkeypatch.setattr(db_helpers, 'orjson', None)
+    assert json.loads(dumps(PAYLOAD)) == fast
+    assert dumps({'a': [1, 2]}) == '{"a":[1,2]}'
+
+
+def test_oversized_integers_fall_back_to_stdlib():
+    assert dumps({'big': 2 ** 70}) == '{"big":%d}' % 2 ** 70
+
+
+def test_responses_share_precomputed_headers():
+    response = create_response(200, {'success': True}, 'GET, OPTIONS')
+    assert response['headers'] is cors_headers('GET, OPTIONS')
+    assert response['headers']['Access-Control-Allow-Methods'] == 'GET, OPTIONS'
+
+    error = error_response(404, 'Job not found')
+    assert error['statusCode'] == 404
+    assert json.loads(error['body']) == {'success': False, 'error': 'Job not found'}
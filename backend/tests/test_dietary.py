@@ -0,0 +1,33 @@
+"""
+Tests for dietary restriction terms and word-boundary matching
+"""
+from dietary import is_restricted, restriction_terms
+from prompt_compiler import rank_pantry_items
+
+
+def test_terms_match_whole_words_only():
+    no_eggs = restriction_terms('no eggs')
+    assert is_restricted('3 large eggs', no_eggs)
+    assert not is_restricted('Eggplant', no_eggs)
+
+    nut_allergy = restriction_terms('nut allergy')
+    assert is_restricted('Mixed Nuts', nut_allergy)
+    assert is_restricted('2 tbsp peanut butter', nut_allergy)
+    assert not is_restricted('1 cup coconut milk', nut_allergy)
+
+
+def test_food_groups_expand_and_plant_milks_are_not_dairy():
+    dairy_free = restriction_terms('dairy-free')
+    assert is_restricted('Greek Yogurt', dairy_free)
+    assert is_restricted('shredded cheddar', dairy_free)
+    assert not is_restricted('almond milk', dairy_free)
+    assert not is_restricted('peanut butter', dairy_free)
+
+    assert is_restricted('whole wheat bread', restriction_terms('gluten free'))
+    assert restriction_terms(['No shrimp', 'avoid pork']) == [('shrimp',), ('pork',)]
+
+
+def test_pantry_ranking_keeps_lookalike_items():
+    items = [{'name': 'Eggplant'}, {'name': 'Eggs'}, {'name': 'Coconut Milk'}, {'name': 'Cashews'}]
+    ranked = rank_pantry_items(items, {'dietaryRestrictions': 'no eggs, tree nut allergy'})
+    assert ranked == ['Eggplant', 'Coconut Milk']
@@ -0,0 +1,162 @@
+"""
+Tests for the concurrent meal image resolver, against a local stand-in for Pexels
+"""
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from image_resolver import NO_IMAGE, MealImageResolver, normalize_meal_name
+from plan_cache import PlanCache
+
+
+class FakePexels:
+    """Threaded HTTP server answering /v1/search like Pexels"""
+
+    def __init__(self, delay=0.0, empty_queries=()):
+        self.delay = delay
+        self.empty_queries = set(empty_queries)
+        self.queries = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)['query'][0]
+                with fake.lock:
+                    fake.queries.append(query)
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                time.sleep(fake.delay)
+                with fake.lock:
+                    fake.active -= 1
+
+                photos = [] if query in fake.empty_queries else [
+                    {'src': {'large': f"https://img.test/{urllib.parse.quote(query)}.jpg"}}
+                ]
+                body = json.dumps({'photos': photos}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/search"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def make_pexels():
+    servers = []
+
+    def factory(**kwargs):
+        server = FakePexels(**kwargs)
+        servers.append(server)
+        return server
+
+    yield factory
+    for server in servers:
+        server.close()
+
+
+def default_image(meal_type):
+    return f"default-{meal_type.lower()}"
+
+
+def make_resolver(pexels, **kwargs):
+    return MealImageResolver('test-key', default_image, search_url=pexels.url,
+                             cache=PlanCache(max_entries=64, ttl_seconds=60), **kwargs)
+
+
+WEEK_OF_MEALS = [(f"Meal {i}", 'Lunch') for i in range(28)]
+
+
+def test_normalized_name_ignores_case_and_punctuation():
+    assert normalize_meal_name('  Grilled Chicken-Salad! ') == 'grilled chicken salad'
+
+
+def test_resolves_meals_concurrently_within_pool_limit(make_pexels):
+    pexels = make_pexels(delay=0.05)
+    resolver = make_resolver(pexels, max_connections=4, deadline_seconds=5)
+
+    started = time.perf_counter()
+    urls = resolver.resolve(WEEK_OF_MEALS)
+    elapsed = time.perf_counter() - started
+
+    assert urls == [f"https://img.test/Meal%20{i}%20food.jpg" for i in range(28)]
+    assert pexels.max_active <= 4
+    # 28 lookups of 50ms on 4 connections, far below the 1.4s a serial loop takes
+    assert elapsed < 1.0
+
+
+def test_cache_hit_skips_http_and_uses_normalized_name(make_pexels):
+    pexels = make_pexels()
+    resolver = make_resolver(pexels)
+
+    first = resolver.resolve([('Veggie Omelette', 'Breakfast')])
+    second = resolver.resolve([('veggie omelette!', 'Breakfast'), ('VEGGIE  OMELETTE', 'Snack')])
+
+    assert second == first * 2
+    assert len(pexels.queries) == 1
+
+
+def test_duplicate_meals_share_one_lookup(make_pexels):
+    pexels = make_pexels()
+    resolver = make_resolver(pexels)
+
+    resolver.resolve([('Oatmeal', 'Breakfast')] * 7)
+
+    assert pexels.queries == ['Oatmeal food']
+
+
+def test_deadline_returns_defaults_and_warms_cache(make_pexels):
+    pexels = make_pexels(delay=0.5)
+    resolver = make_resolver(pexels)
+
+    started = time.perf_counter()
+    urls = resolver.resolve([('Slow Soup', 'Dinner')], deadline_seconds=0.05)
+
+    assert time.perf_counter() - started < 0.4
+    assert urls == ['default-dinner']
+
+    # The late result lands in the cache for the next request
+    time.sleep(0.7)
+    assert resolver.resolve([('Slow Soup', 'Dinner')], deadline_seconds=0.05) == [
+        'https://img.test/Slow%20Soup%20food.jpg'
+    ]
+    assert len(pexels.queries) == 1
+
+
+def test_no_results_fall_back_and_are_cached(make_pexels):
+    pexels = make_pexels(empty_queries=['Mystery Dish food'])
+    resolver = make_resolver(pexels)
+
+    assert resolver.resolve([('Mystery Dish', 'Snack')]) == ['default-snack']
+    assert resolver.cache.get('mystery dish')[0] == NO_IMAGE
+    assert resolver.resolve([('Mystery Dish', 'Snack')]) == ['default-snack']
+    assert len(pexels.queries) == 1
+
+
+def test_errors_fall_back_and_are_not_cached():
+    resolver = MealImageResolver('test-key', default_image, search_url='http://127.0.0.1:9/v1/search',
+                                 cache=PlanCache(max_entries=8, ttl_seconds=60), request_timeout=0.5)
+
+    assert resolver.resolve([('Pasta', 'Dinner')]) == ['default-dinner']
+    assert resolver.cache.get('pasta') == (None, None)
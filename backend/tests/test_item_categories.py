@@ -0,0 +1,74 @@
+"""
+Tests for the keyword categorizer that fills in receipt categories without the model
+"""
+import json
+
+import pytest
+
+from conftest import load_lambda_handler
+from item_categories import ItemCategorizer, KeywordMatcher
+from item_names import CANONICAL_NAMES
+
+
+@pytest.fixture(scope='module')
+def categorizer():
+    return ItemCategorizer()
+
+
+def test_matcher_finds_overlapping_keywords_in_one_pass():
+    matcher = KeywordMatcher({'he': 1, 'she': 2, 'his': 3, 'hers': 4})
+    found = {(start, pattern) for start, _, pattern, _ in matcher.find('ushers')}
+    assert found == {(1, 'she'), (2, 'he'), (2, 'hers')}
+
+
+@pytest.mark.parametrize('name, category', [
+    ('Orange Juice', 'beverages'),
+    ('Oranges', 'produce'),
+    ('Almond Milk', 'dairy'),
+    ('Peanut Butter', 'protein'),
+    ('Tortilla Chips', 'snacks'),
+    ('Peaches', 'produce'),
+    ('Tomato Sauce', 'other'),
+    ('Bag Fee', 'other'),
+])
+def test_longest_keyword_decides(categorizer, name, category):
+    assert categorizer.categorize(name).category == category
+
+
+def test_unknown_and_conflicting_names_are_left_for_the_model(categorizer):
+    assert categorizer.categorize('Chicken Noodle Soup').category is None
+    assert categorizer.categorize('Dish Brush').category is None
+    # A keyword on a modifier doesn't say what the item is
+    for name in ('Apple Pie', 'Corn Flakes', 'Ginger Ale', 'Ice Cream Sandwich', 'Banana Split'):
+        assert categorizer.categorize(name).category is None, name
+    # Parsed receipts use the normalizer's canonical names; all of them are covered
+    assert [name for name in CANONICAL_NAMES if categorizer.categorize(name).category is None] == []
+
+
+def test_items_are_categorized_in_bulk(categorizer):
+    items = [{'name': 'Spinach', 'price': 3.49}, {'name': 'Greek Yogurt', 'price': 5},
+             {'name': 'Chicken Noodle Soup', 'price': 2.5}]
+    categories, leftovers = categorizer.categorize_items(items)
+    assert categories['produce'] == [{'name': 'Spinach', 'price': 3.49}]
+    assert categories['dairy'] == [{'name': 'Greek Yogurt', 'price': 5}]
+    assert leftovers == [items[2]]
+    assert set(categories) == {'produce', 'protein', 'dairy', 'grains', 'snacks', 'beverages', 'other'}
+
+
+def test_model_only_places_the_leftovers(monkeypatch):
+    handler = load_lambda_handler('analyze_receipt_ai', monkeypatch)
+    items = [{'name': 'Spinach', 'price': 3.49, 'quantity': 1}, {'name': 'Chicken Noodle Soup', 'price': 2.5},
+             {'name': 'Dish Brush', 'price': 4}]
+
+    prompt = handler.create_analysis_prompt(items, {})
+    assert '- Spinach: $3.49 (Qty: 1) [produce]' in prompt
+    assert '- Chicken Noodle Soup: $2.50 (Qty: 1) [?]' in prompt
+    assert '"categories"' not in prompt
+
+    response = json.dumps({'itemCategories': {'Chicken Noodle Soup': 'Protein', 'Dish Brush': 'household'},
+                           'nutritionalAssessment': {}, 'budgetAnalysis': {}, 'recipeSuggestions': [],
+                           'missingEssentials': [], 'mealPlanIdeas': [], 'healthTips': []})
+    insights = handler.apply_item_categories(handler.parse_ai_insights(response, items), items)
+    assert 'itemCategories' not in insights
+    assert insights['categories']['protein'] == [{'name': 'Chicken Noodle Soup', 'price': 2.5}]
+    assert insights['categories']['other'] == [{'name': 'Dish Brush', 'price': 4}]
@@ -0,0 +1,101 @@
+"""
+Tests for receipt item-name normalization
+"""
+from decimal import Decimal
+
+import pytest
+
+from conftest import load_lambda_handler
+from item_names import ItemNameNormalizer
+
+
+@pytest.fixture(scope='module')
+def normalizer():
+    return ItemNameNormalizer()
+
+
+@pytest.mark.parametrize('raw, canonical', [
+    ('ORG BNLS CHKN BRST 2.31 LB', 'Chicken Breast'),
+    ('GV WHL MLK 1 GAL', 'Whole Milk'),
+    ('KS ORG EGGS LG 24CT', 'Eggs'),
+    ('GRND TRKY 93/7', 'Ground Turkey'),
+    ('SWT POTATOES', 'Sweet Potatoes'),
+    ('PB CRUNCHY', 'Peanut Butter'),
+])
+def test_abbreviations_expand_to_canonical_names(normalizer, raw, canonical):
+    assert normalizer.normalize(raw) == canonical
+
+
+def test_fuzzy_tokens_use_trie_skeleton_and_trigrams(normalizer):
+    # Truncated word (prefix trie)
+    assert normalizer.match('BROCC FLORETS') == ('Broccoli', True, 'canonical')
+    # Vowels dropped
+    assert normalizer.normalize('STRWBRY 1LB') == 'Strawberries'
+    # OCR misspelling
+    assert normalizer.normalize('BROCOLI CROWNS') == 'Broccoli'
+
+
+def test_unknown_and_fee_lines_are_only_cleaned(normalizer):
+    assert normalizer.match('BAG FEE') == ('Bag Fee', False, 'expanded')
+    assert normalizer.normalize('COKE 12PK') == 'Coke'
+
+
+@pytest.mark.parametrize('raw, expanded', [
+    ('ICE CREAM', 'Ice Cream'),
+    ('POTATO CHIPS', 'Potato Chips'),
+    ('APPLE PIE', 'Apple Pie'),
+    ('PEPPERONI PIZZA', 'Pepperoni Pizza'),
+    ('CHOC CHIP COOKIES', 'Choc Chip Cookies'),
+    ('ORANGE SODA', 'Orange Soda'),
+    ('CHICKEN NOODLE SOUP', 'Chicken Noodle Soup'),
+    ('MILK CHOCOLATE BAR', 'Milk Chocolate Bar'),
+])
+def test_partial_matches_keep_the_expanded_name(normalizer, raw, expanded):
+    assert normalizer.match(raw) == (expanded, False, 'expanded')
+
+
+@pytest.mark.parametrize('raw, name', [
+    # Real words are not completed to a longer vocabulary word
+    ('Coconut Water', 'Coconut Water'),
+    ('Sparkling Water', 'Sparkling Water'),
+    ('WATER', 'Water'),
+    ('BLUE CHEESE', 'Blue Cheese'),
+    # A misspelling guess that lands on a descriptor ("bull" -> "bulk") isn't dropped
+    ('RED BULL', 'Red Bull'),
+    ('Pepper Jack Cheese', 'Pepper Jack Cheese'),
+    # An unconfirmed truncation guess goes back to what was printed
+    ('MUSHR SOUP', 'Mushr Soup'),
+])
+def test_real_words_are_kept_as_printed(normalizer, raw, name):
+    assert normalizer.match(raw) == (name, False, 'expanded')
+
+
+def test_leftover_descriptors_still_canonicalize(normalizer):
+    assert normalizer.normalize('BABY SPINACH') == 'Spinach'
+    assert normalizer.normalize('GREEK YOGRT PLAIN') == 'Greek Yogurt'
+
+
+def test_repeated_names_hit_the_memo():
+    normalizer = ItemNameNormalizer()
+    normalizer.normalize('ORG BNLS CHKN BRST')
+    normalizer.normalize(' ORG  BNLS CHKN BRST ')
+    assert normalizer.stats == {'hits': 1, 'misses': 1}
+
+
+def test_parse_stores_canonical_and_raw_names(monkeypatch):
+    handler = load_lambda_handler('parse_receipt', monkeypatch)
+
+    def line_item(name, price):
+        return {'LineItemExpenseFields': [
+            {'Type': {'Text': 'ITEM'}, 'ValueDetection': {'Text': name}},
+            {'Type': {'Text': 'PRICE'}, 'ValueDetection': {'Text': price}},
+        ]}
+
+    response = {'ExpenseDocuments': [{'LineItemGroups': [{'LineItems': [
+        line_item('ORG BNLS CHKN BRST', '$8.49'), line_item('Bananas', '1.20')
+    ]}]}]}
+    items = handler.parse_textract_response(response)
+
+    assert items[0] == {'name': 'Chicken Breast', 'raw_name': 'ORG BNLS CHKN BRST',
+                        'price': Decimal('8.49'), 'quantity': 1}
+    assert items[1] == {'name': 'Bananas', 'price': Decimal('1.20'), 'quantity': 1}
@@ -0,0 +1,63 @@
+"""
+Tests for the tolerant incremental JSON extractor used on model responses
+"""
+import json
+
+from utils.llm_json import IncrementalJSONExtractor, extract_json
+
+DAYS = ['monday', 'tuesday', 'wednesday']
+
+PLAN = {
+    "weeklyPlan": {
+        day: {
+            "breakfast": {"name": f"{day} oats, \"overnight\" {{style}}", "calories": 400},
+            "snacks": [{"name": "Apple", "calories": 95}]
+        }
+        for day in DAYS
+    },
+    "tips": ["Prep on Sunday"]
+}
+
+
+def test_fenced_complete_response():
+    text = "Sure! Here is the plan:\n```json\n" + json.dumps(PLAN, indent=2) + "\n```\nEnjoy!"
+    result = extract_json(text, expected_keys=['weeklyPlan', 'tips'], expected_members={'weeklyPlan': DAYS})
+    assert result.complete
+    assert result.data == PLAN
+    assert result.missing == []
+
+
+def test_truncated_response_keeps_complete_days():
+    text = json.dumps(PLAN)
+    cut = text[:text.index('"wednesday"') + 30]
+    result = extract_json(cut, expected_keys=['weeklyPlan', 'tips'], expected_members={'weeklyPlan': DAYS})
+
+    assert not result.complete
+    assert list(result.data['weeklyPlan']) == ['monday', 'tuesday']
+    assert result.missing == ['tips', 'weeklyPlan.wednesday']
+
+
+def test_truncated_scalars_and_sections():
+    text = '{"budgetAnalysis": {"totalSpent": 85.5}, "healthScore": 7, "note": "a, b", "tips": ["x"'
+    result = extract_json(text, expected_keys=['budgetAnalysis', 'healthScore', 'note', 'tips'])
+
+    assert result.data == {'budgetAnalysis': {'totalSpent': 85.5}, 'healthScore': 7, 'note': 'a, b'}
+    assert result.missing == ['tips']
+
+
+def test_no_json_at_all():
+    result = extract_json("I'm sorry, I can't help with that.", expected_keys=['weeklyPlan'])
+    assert result.data == {}
+    assert result.missing == ['weeklyPlan']
+
+
+def test_incremental_feed_matches_single_pass():
+    text = json.dumps(PLAN)
+    extractor = IncrementalJSONExtractor(watch=[(), ('weeklyPlan',)])
+    events = []
+    for i in range(0, len(text), 3):
+        events.extend(extractor.feed(text[i:i + 3]))
+
+    assert [key for path, key, _ in events if path == ('weeklyPlan',)] == DAYS
+    assert [key for path, key, _ in events if path == ()] == ['weeklyPlan', 'tips']
+    assert extractor.value == PLAN
@@ -0,0 +1,95 @@
+"""
+Tests for the EMF model-call and request accounting
+"""
+import json
+
+from utils import metrics
+from utils.metrics import (
+    aggregate_records, estimate_cost, metered_handler, parse_emf_line, percentile, record_model_call, record_route,
+    tag_request
+)
+
+SONNET = 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'
+
+
+def test_model_call_record_is_valid_emf_with_request_tags(capsys):
+    @metered_handler('generate_plan')
+    def handler(event, context):
+        tag_request(userId='u1', cache='miss')
+        record_model_call({'modelId': SONNET, 'operation': 'InvokeModel', 'inputTokens': 600,
+                           'outputTokens': 3000, 'latencyMs': 21000, 'attempts': 1, 'throttles': 0,
+                           'stopReason': 'end_turn', 'status': 'ok'})
+        return {'statusCode': 200}
+
+    handler({'body': '{}'}, None)
+    call, request = [parse_emf_line(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert call['record'] == 'model_call'
+    assert call['endpoint'] == 'generate_plan' and call['userId'] == 'u1' and call['cache'] == 'miss'
+    assert call['InputTokens'] == 600 and call['LatencyMs'] == 21000
+    assert call['CostUSD'] == estimate_cost(SONNET, 600, 3000) == 0.0468
+    directive = call['_aws']['CloudWatchMetrics'][0]
+    assert directive['Dimensions'] == [['endpoint'], ['endpoint', 'modelId']]
+    # userId is a property, never a dimension
+    assert all('userId' not in dimensions for dimensions in directive['Dimensions'])
+    assert {metric['Name'] for metric in directive['Metrics']} >= {'InputTokens', 'OutputTokens', 'CostUSD'}
+
+    assert request['record'] == 'request'
+    assert request['statusCode'] == 200 and request['trigger'] == 'api'
+    assert request['RequestInputTokens'] == 600 and request['ModelCalls'] == 1
+    assert request['RequestCostUSD'] == call['CostUSD']
+
+
+def test_missing_values_are_not_declared_as_metrics():
+    record = record_model_call({'modelId': 'unknown-model', 'status': 'error', 'latencyMs': 12},
+                               emit=lambda record: None)
+    names = {metric['Name'] for metric in record['_aws']['CloudWatchMetrics'][0]['Metrics']}
+    assert names == {'LatencyMs'}
+    assert record['endpoint'] == 'unknown'
+
+
+
+def test_route_record_is_dimensioned_by_task_and_tier():
+    record = record_route({'task': 'analyze', 'tier': 'fast', 'reason': 'slo', 'sloMs': 25000, 'latencyMs': 8000,
+                           'expectedMs': 10200, 'inputTokens': 900, 'outputTokens': None},
+                          emit=lambda record: None)
+    directive = record['_aws']['CloudWatchMetrics'][0]
+    assert directive['Dimensions'] == [['endpoint', 'task'], ['endpoint', 'tier']]
+    assert {metric['Name'] for metric in directive['Metrics']} == {'RouteLatencyMs', 'ExpectedLatencyMs',
+                                                                   'RouteInputTokens'}
+    assert record['record'] == 'route' and record['reason'] == 'slo'
+
+def test_requests_without_model_calls_are_still_recorded(capsys):
+    @metered_handler('generate_plan')
+    def handler(event, context):
+        tag_request(cache='hit:memory')
+        raise RuntimeError('boom')
+
+    try:
+        handler({'Records': []}, None)
+    except RuntimeError:
+        pass
+    request = parse_emf_line(capsys.readouterr().out)
+    assert request['ModelCalls'] == 0 and request['trigger'] == 'sqs' and 'statusCode' not in request
+    assert metrics.current_tags() == {}
+
+
+def test_log_lines_with_prefixes_parse_and_others_are_skipped():
+    record = {'record': 'request', 'endpoint': 'x', '_aws': {}}
+    assert parse_emf_line(f"2025-03-01T12:00:00Z abc-123 {json.dumps(record)}")['endpoint'] == 'x'
+    assert parse_emf_line('START RequestId: abc') is None
+    assert parse_emf_line('{"bedrockCall": {}}') is None
+
+
+def test_percentiles_and_grouping():
+    assert percentile([], 0.5) is None
+    assert percentile([10, 20, 30, 40], 0.5) == 25
+    assert percentile(range(1, 101), 0.99) == 99.01
+
+    records = [{'userId': 'a', 'RequestCostUSD': 0.05}, {'userId': 'a', 'RequestCostUSD': 0.01},
+               {'userId': 'b', 'RequestCostUSD': 0.02}, {'RequestCostUSD': None}]
+    summary = aggregate_records(records, 'userId', ['RequestCostUSD'])
+    assert summary['a']['count'] == 2
+    assert round(summary['a']['RequestCostUSD']['sum'], 2) == 0.06
+    assert summary['a']['RequestCostUSD']['p50'] == 0.03
+    assert summary['unknown']['RequestCostUSD']['p50'] is None
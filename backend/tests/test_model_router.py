@@ -0,0 +1,111 @@
+"""
+Tests for model tier routing: size policies, latency SLO and throttle fallback
+"""
+import pytest
+from botocore.exceptions import ClientError
+
+from utils import model_router
+from utils.model_router import (
+    TASK_ANALYZE, TASK_CATEGORIZE, TASK_FULL_PLAN, TASK_REGENERATE, TIER_BALANCED, TIER_DEEP, TIER_FAST, ModelRouter,
+)
+
+MODELS = {TIER_FAST: 'haiku', TIER_BALANCED: 'sonnet', TIER_DEEP: 'sonnet-deep'}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeClient:
+    """BedrockClient stand-in: models listed in throttled always raise ThrottlingException"""
+
+    def __init__(self, throttled=()):
+        self.throttled = set(throttled)
+        self.calls = []
+
+    def invoke(self, model_id, request, max_attempts=None):
+        self.calls.append((model_id, max_attempts))
+        if model_id in self.throttled:
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'slow down'}}, 'InvokeModel')
+        return {'content': [{'text': model_id}], 'usage': {'input_tokens': 10, 'output_tokens': 100}}
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    records = []
+    monkeypatch.setattr(model_router, 'record_route', records.append)
+    return records
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def router(clock):
+    return ModelRouter(tier_models=MODELS, clock=clock)
+
+
+@pytest.mark.parametrize('task, input_tokens, tier', [
+    (TASK_ANALYZE, 600, TIER_FAST),
+    (TASK_ANALYZE, 1000, TIER_BALANCED),
+    (TASK_ANALYZE, 5000, TIER_DEEP),
+    (TASK_REGENERATE, 400, TIER_FAST),
+    (TASK_REGENERATE, 900, TIER_BALANCED),
+    (TASK_FULL_PLAN, 3000, TIER_BALANCED),
+    (TASK_CATEGORIZE, 3000, TIER_FAST),
+])
+def test_task_and_size_pick_the_tier(router, task, input_tokens, tier):
+    decision = router.route(task, input_tokens=input_tokens, max_tokens=2000)
+    assert (decision.tier, decision.model_id, decision.reason) == (tier, MODELS[tier], 'size')
+
+
+def test_slo_steps_down_to_a_tier_that_can_meet_it(router):
+    # deep: 1400 + 18 * 1200 = 23000 ms, balanced: 1000 + 16 * 1200 = 20200 ms, fast: 600 + 8 * 1200 = 10200 ms
+    assert router.route(TASK_ANALYZE, 5000, 3000, slo_ms=25000, output_tokens=1200).tier == TIER_DEEP
+    decision = router.route(TASK_ANALYZE, 5000, 3000, slo_ms=15000, output_tokens=1200)
+    assert (decision.tier, decision.reason, decision.expected_ms) == (TIER_FAST, 'slo', 10200)
+
+    # Observed slow calls on the fast tier raise its estimate
+    for _ in range(20):
+        router.observe(TIER_FAST, 600 + 20 * 1200, 1200)
+    assert router.expected_ms(TIER_FAST, 1200) > 15000
+
+
+def test_throttled_tier_is_skipped_until_the_cooldown_passes(router, clock):
+    router.mark_throttled(TIER_BALANCED)
+    decision = router.route(TASK_FULL_PLAN, 3000)
+    assert (decision.tier, decision.reason) == (TIER_FAST, 'throttled')
+
+    clock.now += model_router.THROTTLE_COOLDOWN_SECONDS + 1
+    assert router.route(TASK_FULL_PLAN, 3000).tier == TIER_BALANCED
+
+
+def test_throttling_falls_back_to_the_faster_tier(router, routes):
+    client = FakeClient(throttled={'sonnet-deep'})
+    decision = router.route(TASK_ANALYZE, 5000, 3000)
+
+    assert router.invoke_text(client, decision, {'messages': []}) == 'sonnet'
+    # Deep gets a short retry budget before balanced takes over
+    assert client.calls == [('sonnet-deep', model_router.PRIMARY_MAX_ATTEMPTS),
+                            ('sonnet', model_router.PRIMARY_MAX_ATTEMPTS)]
+    assert router.is_throttled(TIER_DEEP) and not router.is_throttled(TIER_BALANCED)
+
+    record = routes[-1]
+    assert (record['task'], record['tier'], record['reason'], record['fallbackFrom']) == \
+        (TASK_ANALYZE, TIER_BALANCED, 'fallback', TIER_DEEP)
+    assert record['status'] == 'ok' and record['outputTokens'] == 100
+
+
+def test_throttling_on_the_fastest_tier_is_raised(router, routes):
+    client = FakeClient(throttled={'haiku'})
+    decision = router.route(TASK_CATEGORIZE, 100)
+    with pytest.raises(ClientError):
+        router.invoke_text(client, decision, {'messages': []})
+    assert client.calls == [('haiku', None)]
+    assert routes[-1]['status'] == 'error'
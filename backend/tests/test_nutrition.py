@@ -0,0 +1,87 @@
+"""
+Tests for the nutrient-table macro engine
+"""
+import pytest
+
+import nutrition
+from nutrition import NutritionEngine, get_nutrition_engine
+
+
+def day(breakfast, lunch, dinner, snacks=()):
+    return {
+        'breakfast': {'name': 'Breakfast', 'ingredients': breakfast},
+        'lunch': {'name': 'Lunch', 'ingredients': lunch},
+        'dinner': {'name': 'Dinner', 'ingredients': dinner},
+        'snacks': [{'name': 'Snack', 'ingredients': list(snacks)}] if snacks else []
+    }
+
+
+def test_resolves_amounts_units_and_counts():
+    engine = get_nutrition_engine()
+    cases = {
+        '150g chicken breast': ('chicken breast', 150),
+        '1 cup brown rice': ('brown rice', 195),
+        '1 tbsp olive oil': ('olive oil', 13.5),
+        '2 large eggs': ('egg', 100),
+        '1/2 avocado': ('avocado', 75),
+        'salt and black pepper': ('seasoning', 1),
+        'spinach': ('spinach', 60),
+    }
+    for ingredient, (food, grams) in cases.items():
+        row, amount = engine.resolve(ingredient)
+        assert engine.foods[row] == food, ingredient
+        assert amount == pytest.approx(grams), ingredient
+
+
+def test_unknown_ingredients_use_the_generic_row():
+    engine = get_nutrition_engine()
+    row, _ = engine.resolve('dragonfruit glaze')
+    assert engine.foods[row] == nutrition.FALLBACK_FOOD
+
+
+def test_apply_fills_meal_macros_and_compares_with_targets():
+    weekly_plan = {'monday': day(['100g chicken breast'], ['100g white rice'], ['1 tbsp olive oil'])}
+    totals = get_nutrition_engine().apply(weekly_plan, {'caloricTarget': 1000, 'proteinTarget': 50,
+                                                        'carbTarget': 100, 'fatTarget': 20})
+
+    lunch = weekly_plan['monday']['lunch']
+    assert (lunch['calories'], lunch['protein'], lunch['carbs'], lunch['fat']) == (130, 3, 28, 0)
+    assert totals['avgDailyCalories'] == 165 + 130 + 119
+    assert totals['dailyDeviation']['monday']['calories'] == pytest.approx((414.34 - 1000) / 1000, abs=1e-3)
+    assert 0 <= totals['targetMatch'] <= 100
+
+
+def test_meals_without_ingredients_keep_their_numbers():
+    weekly_plan = {'monday': {'breakfast': {'name': 'Oatmeal', 'calories': 350}}}
+    totals = get_nutrition_engine().apply(weekly_plan)
+    assert weekly_plan['monday']['breakfast']['calories'] == 350
+    assert totals['avgDailyCalories'] == 0
+
+
+def test_batch_scoring_matches_single_plans():
+    engine = get_nutrition_engine()
+    plans = [
+        {'monday': day(['2 eggs', '1 slice bread'], ['150g salmon', '1 cup quinoa'], ['200g tofu'], ['1 banana'])},
+        {'monday': day(['1 cup oats'], ['1 cup black beans'], ['150g steak', '1 potato']),
+         'tuesday': day(['1 cup greek yogurt'], ['2 tortillas', '100g chicken'], ['1 cup pasta'])},
+    ]
+    targets = [(2000, 150, 200, 65), (2500, 120, 300, 80)]
+    report = engine.score_plans(plans, targets)
+
+    assert len(report.meal_keys) == 10
+    assert [key for key in report.day_keys] == [(0, 'monday'), (1, 'monday'), (1, 'tuesday')]
+    for plan_index, plan in enumerate(plans):
+        single = engine.score_plans([plan], [targets[plan_index]])
+        assert list(single.plan_scores) == pytest.approx([report.plan_scores[plan_index]])
+
+
+def test_python_fallback_matches_numpy(monkeypatch):
+    plans = [{'monday': day(['2 eggs'], ['150g salmon', '1 cup quinoa'], ['200g tofu'], ['1 banana'])}]
+    with_numpy = get_nutrition_engine().score_plans(plans)
+
+    monkeypatch.setattr(nutrition, 'np', None)
+    without_numpy = NutritionEngine().score_plans(plans)
+
+    flatten = lambda rows: [float(value) for row in rows for value in row]  # noqa: E731
+    assert flatten(without_numpy.meal_totals) == pytest.approx(flatten(with_numpy.meal_totals))
+    assert list(without_numpy.plan_scores) == pytest.approx(list(with_numpy.plan_scores))
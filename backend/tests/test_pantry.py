@@ -0,0 +1,79 @@
+"""
+Tests for the projected, ranked pantry read from recent receipts
+"""
+from datetime import datetime, timedelta
+
+from pantry import RECEIPT_PROJECTION, aggregate_pantry, fetch_recent_pantry
+
+NOW = datetime(2025, 3, 1, 12, 0, 0)
+
+
+def receipt(days_ago, *names, status='processed'):
+    return {
+        'processed_at': (NOW - timedelta(days=days_ago)).isoformat(),
+        'status': status,
+        'items': [{'name': name, 'price': 1} for name in names]
+    }
+
+
+class ReceiptsTable:
+    """Query over one user's receipts (newest first), recording each call"""
+
+    def __init__(self, receipts):
+        self.receipts = receipts
+        self.calls = []
+
+    def query(self, Limit, ExclusiveStartKey=None, **kwargs):
+        self.calls.append(dict(kwargs, Limit=Limit, ExclusiveStartKey=ExclusiveStartKey))
+        start = ExclusiveStartKey['position'] if ExclusiveStartKey else 0
+        end = start + Limit
+        response = {'Items': self.receipts[start:end]}
+        if end < len(self.receipts):
+            response['LastEvaluatedKey'] = {'position': end}
+        return response
+
+
+def test_dedupes_and_ranks_by_frequency_and_recency():
+    receipts = [
+        receipt(1, 'Bananas', 'Spinach'),
+        receipt(8, 'BANANAS', 'Chicken Breast', 'Bag Fee'),
+        receipt(60, 'Chicken breast', 'Rice'),
+        receipt(61, 'chicken breast ', 'Rice'),
+        receipt(62, 'Rice', 'Rice'),
+    ]
+    pantry = aggregate_pantry(receipts, now=NOW.timestamp())
+
+    names = [item['name'] for item in pantry]
+    assert names[:3] == ['Bananas', 'Spinach', 'Chicken Breast']
+    assert 'Bag Fee' not in names
+    rice = next(item for item in pantry if item['name'] == 'Rice')
+    # Counted once per receipt
+    assert rice['count'] == 3
+    # Three old purchases weigh less than two recent ones
+    assert names.index('Rice') > names.index('Bananas')
+
+
+def test_error_receipts_are_ignored():
+    pantry = aggregate_pantry([receipt(1, 'Milk', status='error'), receipt(2, 'Eggs')], now=NOW.timestamp())
+    assert [item['name'] for item in pantry] == ['Eggs']
+
+
+def test_fetch_projects_and_stops_once_enough_items_are_found():
+    receipts = [receipt(day, f"item {day}a", f"item {day}b") for day in range(40)]
+    table = ReceiptsTable(receipts)
+
+    pantry = fetch_recent_pantry(table, 'u1', max_items=10, min_receipts=6, page_size=3)
+
+    assert len(pantry) == 10
+    # 2 pages reach 6 receipts / 12 distinct items
+    assert len(table.calls) == 2
+    assert table.calls[0]['ProjectionExpression'] == RECEIPT_PROJECTION
+    assert table.calls[0]['ScanIndexForward'] is False
+
+
+def test_fetch_pages_to_the_end_of_short_histories():
+    table = ReceiptsTable([receipt(day, 'Milk', 'Eggs') for day in range(5)])
+    pantry = fetch_recent_pantry(table, 'u1', page_size=2)
+
+    assert len(table.calls) == 3
+    assert [item['count'] for item in pantry] == [5, 5]
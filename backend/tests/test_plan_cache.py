@@ -0,0 +1,86 @@
+"""
+Tests for the content-addressed generate-plan cache
+"""
+import time
+from decimal import Decimal
+
+from plan_cache import PlanCache, make_plan_cache_key
+from utils.result_cache import LRUCache
+
+DEFAULT_PREFERENCES = {
+    'budget': 100,
+    'dietaryRestrictions': '',
+    'nutritionGoal': 'maintenance',
+    'caloricTarget': 2000,
+    'proteinTarget': 150,
+    'carbTarget': 200,
+    'fatTarget': 65
+}
+
+
+class FakeTable:
+    """Minimal stand-in for a DynamoDB Table resource"""
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key['cache_key'])
+        return {'Item': item} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item['cache_key']] = Item
+
+
+def test_key_ignores_order_case_and_number_types():
+    stored = dict(DEFAULT_PREFERENCES, caloricTarget=Decimal('2000'), nutritionGoal=' Maintenance ')
+    key_a = make_plan_cache_key(DEFAULT_PREFERENCES, [{'name': 'Rice'}, {'name': 'eggs'}])
+    key_b = make_plan_cache_key(stored, [{'name': 'EGGS'}, {'name': 'rice'}, {'name': 'rice '}])
+    assert key_a == key_b
+
+
+def test_key_changes_with_pantry_and_preferences():
+    base = make_plan_cache_key(DEFAULT_PREFERENCES, [{'name': 'rice'}])
+    assert base != make_plan_cache_key(DEFAULT_PREFERENCES, [{'name': 'pasta'}])
+    assert base != make_plan_cache_key(dict(DEFAULT_PREFERENCES, caloricTarget=1800), [{'name': 'rice'}])
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_memory_then_shared_tier():
+    table = FakeTable()
+    plan = {'weeklyPlan': {'monday': {'breakfast': {'name': 'Oats', 'calories': 400}}}}
+
+    writer = PlanCache(table=table)
+    writer.put('k', plan)
+    assert writer.get('k') == (plan, 'memory')
+
+    # A cold container only has the DynamoDB tier
+    reader = PlanCache(table=table)
+    assert reader.get('k') == (plan, 'dynamodb')
+    assert reader.get('k') == (plan, 'memory')
+    assert reader.get('missing') == (None, None)
+    assert reader.stats == {'memoryHits': 1, 'sharedHits': 1, 'misses': 1}
+
+
+def test_expired_shared_items_are_misses():
+    table = FakeTable()
+    PlanCache(table=table).put('k', {'weeklyPlan': {}})
+    table.items['plan#k']['expires_at'] = int(time.time()) - 1
+
+    assert PlanCache(table=table).get('k') == (None, None)
+
+
+def test_cached_plans_cannot_be_mutated_by_callers():
+    cache = PlanCache()
+    cache.put('k', {'meals': []})
+    cache.get('k')[0]['meals'].append('changed')
+    assert cache.get('k')[0] == {'meals': []}
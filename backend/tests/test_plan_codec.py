@@ -0,0 +1,89 @@
+"""
+Tests for the compressed MealPlans storage format
+"""
+import json
+from decimal import Decimal
+
+import pytest
+
+from conftest import load_lambda_handler
+from plan_fanout import WEEKDAYS
+from utils import plan_codec
+from utils.plan_codec import (CODEC_GZIP, PLAN_BLOB_ATTRIBUTE, decode_meal_plan, encode_legacy_item,
+                              encode_meal_plan)
+
+
+def make_plan():
+    weekly_plan = {}
+    meals = []
+    for day in WEEKDAYS:
+        weekly_plan[day] = {}
+        for slot in ('breakfast', 'lunch', 'dinner'):
+            meal = {'name': f"{day} {slot} bowl", 'calories': 550, 'protein': 32.5, 'carbs': 60, 'fat': 18,
+                    'ingredients': ['150g chicken breast', '1 cup brown rice', '1 cup broccoli'],
+                    'prepTime': '25 mins'}
+            weekly_plan[day][slot] = meal
+            meals.append(dict(meal, day=day.capitalize(), mealType=slot.capitalize(),
+                              imageUrl='https://images.pexels.com/photos/1640777/pexels-photo-1640777.jpeg'))
+    return {'weeklyPlan': weekly_plan, 'meals': meals, 'shoppingList': [], 'tips': [],
+            'weeklyTotals': {'totalCalories': 11550, 'avgDailyCalories': 1650, 'estimatedCost': 84.5}}
+
+
+def test_round_trip_with_summary_attributes():
+    plan = make_plan()
+    attributes = encode_meal_plan(plan)
+
+    assert attributes['plan_codec'] == CODEC_GZIP
+    assert attributes['meal_count'] == 21
+    assert attributes['plan_days'] == WEEKDAYS
+    assert attributes['estimated_cost'] == Decimal('84.5')
+    assert decode_meal_plan(attributes) == plan
+
+
+def test_compressed_plan_is_much_smaller_than_the_map():
+    plan = make_plan()
+    blob = encode_meal_plan(plan)[PLAN_BLOB_ATTRIBUTE]
+    assert len(blob) * 4 < len(json.dumps(plan))
+
+
+def test_decimals_from_dynamodb_are_encoded_as_numbers():
+    attributes = encode_meal_plan({'weeklyTotals': {'totalCalories': Decimal('2000'), 'avgDailyFat': Decimal('65.5')}})
+    assert decode_meal_plan(attributes)['weeklyTotals'] == {'totalCalories': 2000, 'avgDailyFat': 65.5}
+
+
+def test_legacy_items_decode_and_migrate():
+    plan = make_plan()
+    legacy = {'user_id': 'u1', 'plan_date': '2025-01-06', 'plan_id': 'p1', 'meal_plan': plan, 'status': 'active'}
+    assert decode_meal_plan(legacy) is plan
+
+    migrated = encode_legacy_item(legacy)
+    assert 'meal_plan' not in migrated
+    assert migrated['plan_id'] == 'p1'
+    assert decode_meal_plan(migrated) == plan
+    assert encode_legacy_item(migrated) is None
+    assert encode_legacy_item(dict(legacy, status='generating')) is None
+
+
+def test_zstd_needs_the_optional_package(monkeypatch):
+    monkeypatch.setenv('PLAN_CODEC', 'zstd')
+    monkeypatch.setattr(plan_codec, 'zstandard', None)
+    assert encode_meal_plan({})['plan_codec'] == CODEC_GZIP
+    with pytest.raises(ValueError):
+        plan_codec.decompress_plan(b'', plan_codec.CODEC_ZSTD)
+
+
+def test_get_meal_plan_serves_both_formats(monkeypatch):
+    handler = load_lambda_handler('get_meal_plan', monkeypatch)
+    plan = make_plan()
+    compressed = dict(encode_meal_plan(plan), plan_id='p2', plan_date='2025-01-13')
+    legacy = {'plan_id': 'p1', 'plan_date': '2025-01-06', 'meal_plan': {'meals': [{'calories': Decimal('550')}]}}
+
+    class Table:
+        def query(self, **kwargs):
+            return {'Items': [compressed, legacy]}
+
+    monkeypatch.setattr(handler, 'meal_plans_table', Table())
+    body = json.loads(handler.lambda_handler({'queryStringParameters': {'userId': 'u1'}}, None)['body'])
+
+    assert body['mealPlans'][0]['mealPlan'] == plan
+    assert body['mealPlans'][1]['mealPlan'] == {'meals': [{'calories': 550}]}
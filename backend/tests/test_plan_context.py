@@ -0,0 +1,87 @@
+"""
+Tests for the concurrent context-loading stage of generate_plan
+"""
+import threading
+import time
+
+import pytest
+
+from conftest import load_lambda_handler
+from utils.concurrency import BackgroundTasks
+
+DELAY = 0.2
+
+
+class SlowPreferencesTable:
+    def __init__(self, item=None, write_delay=DELAY):
+        self.item = item or {}
+        self.write_delay = write_delay
+        self.saved = threading.Event()
+
+    def get_item(self, Key):
+        time.sleep(DELAY)
+        return {'Item': self.item}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues):
+        time.sleep(self.write_delay)
+        self.item = dict(self.item, preferences=ExpressionAttributeValues[':preferences'])
+        self.saved.set()
+
+
+class SlowReceiptsTable:
+    def query(self, **kwargs):
+        time.sleep(DELAY)
+        return {'Items': [{'processed_at': '2025-03-01T12:00:00', 'items': [{'name': 'Spinach'}]}]}
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    module = load_lambda_handler('generate_plan', monkeypatch)
+    monkeypatch.setattr(module, 'receipts_table', SlowReceiptsTable())
+    monkeypatch.setattr(module, 'warm_recipe_catalog', lambda: None)
+    return module
+
+
+def test_preferences_and_pantry_are_read_concurrently(handler, monkeypatch):
+    monkeypatch.setattr(handler, 'user_preferences_table', SlowPreferencesTable({'budget': 80}))
+
+    started = time.monotonic()
+    preferences, grocery_items = handler.load_plan_context('u1', {})
+    elapsed = time.monotonic() - started
+
+    assert preferences['budget'] == 80
+    assert [item['name'] for item in grocery_items] == ['Spinach']
+    assert elapsed < 2 * DELAY
+
+
+def test_request_pantry_skips_the_receipts_read(handler, monkeypatch):
+    monkeypatch.setattr(handler, 'user_preferences_table', SlowPreferencesTable())
+    monkeypatch.setattr(handler, 'get_recent_grocery_items', lambda user_id: pytest.fail('receipts read'))
+
+    _, grocery_items = handler.load_plan_context('u1', {'pantryItems': ['Eggs']})
+    assert grocery_items == [{'name': 'Eggs'}]
+
+
+def test_preference_writes_do_not_block_the_read(handler, monkeypatch):
+    table = SlowPreferencesTable(write_delay=5 * DELAY)
+    monkeypatch.setattr(handler, 'user_preferences_table', table)
+
+    started = time.monotonic()
+    preferences, _ = handler.load_plan_context('u1', {'preferences': {'budget': 60}})
+    assert time.monotonic() - started < 2 * DELAY
+    assert preferences['budget'] == 60
+    assert not table.saved.is_set()
+
+    assert handler.background_tasks.drain(timeout=5) == 0
+    assert table.item['preferences']['budget'] == 60
+
+
+def test_background_failures_are_logged_and_drained():
+    tasks = BackgroundTasks()
+    tasks.submit(lambda: 1 / 0)
+    blocker = threading.Event()
+    tasks.submit(blocker.wait)
+
+    assert tasks.drain(timeout=0.05) == 1
+    blocker.set()
+    assert tasks.drain(timeout=1) == 0
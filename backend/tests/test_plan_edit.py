@@ -0,0 +1,187 @@
+"""
+Tests for regenerating one day, slot or snack of a saved meal plan
+"""
+import json
+
+import pytest
+
+from conftest import load_lambda_handler
+from plan_edit import (
+    SCOPE_DAY, SCOPE_MEAL, SCOPE_SLOT, PlanPartNotFound, apply_replacement, build_plan_update, check_target,
+    compile_regeneration_prompt, extract_replacement, parse_regeneration_target
+)
+from plan_fanout import WEEKDAYS
+from utils.plan_codec import decode_meal_plan, encode_meal_plan
+
+PREFERENCES = {'budget': 100, 'caloricTarget': 2000, 'proteinTarget': 150, 'carbTarget': 200, 'fatTarget': 65}
+
+
+def meal(name, calories=500):
+    return {'name': name, 'calories': calories, 'ingredients': ['100g rice'], 'prepTime': '10 mins'}
+
+
+def make_week():
+    return {
+        day: {
+            'breakfast': meal(f"{day} oats", 400),
+            'lunch': meal(f"{day} salad", 500),
+            'dinner': meal(f"{day} salmon", 700),
+            'snacks': [meal(f"{day} apple", 100), meal(f"{day} yogurt", 150)]
+        }
+        for day in WEEKDAYS
+    }
+
+
+def test_parse_target_scopes():
+    assert parse_regeneration_target({'day': 'Tuesday'}).scope == SCOPE_DAY
+    assert parse_regeneration_target({'day': 'tuesday', 'mealType': 'Dinner'}).scope == SCOPE_SLOT
+    snack = parse_regeneration_target({'day': 'tuesday', 'mealType': 'snack', 'mealIndex': '1'})
+    assert snack.scope == SCOPE_MEAL and snack.meal_type == 'snacks' and snack.index == 1
+
+    for spec in ({'day': 'someday'}, {'day': 'monday', 'mealType': 'brunch'},
+                 {'day': 'monday', 'mealType': 'dinner', 'mealIndex': 0}, 'monday'):
+        with pytest.raises(ValueError):
+            parse_regeneration_target(spec)
+
+
+def test_check_target_allows_a_missing_day_but_not_a_missing_meal():
+    week = make_week()
+    del week['sunday']
+    check_target(week, parse_regeneration_target({'day': 'sunday'}))
+    with pytest.raises(PlanPartNotFound):
+        check_target(week, parse_regeneration_target({'day': 'sunday', 'mealType': 'dinner'}))
+    with pytest.raises(PlanPartNotFound):
+        check_target(week, parse_regeneration_target({'day': 'monday', 'mealType': 'snacks', 'mealIndex': 5}))
+
+
+def test_slot_prompt_is_compact_and_has_week_context():
+    week = make_week()
+    target = parse_regeneration_target({'day': 'tuesday', 'mealType': 'dinner'})
+    compiled = compile_regeneration_prompt(PREFERENCES, [{'name': 'Tofu'}], week, target)
+
+    assert 'monday: B monday oats; L monday salad; D monday salmon' in compiled.text
+    assert 'SAME DAY (keep): tuesday: B tuesday oats; L tuesday salad; S tuesday apple' in compiled.text
+    assert 'REPLACING (the user wants something different): tuesday salmon' in compiled.text
+    # 2000 kcal target minus the 1150 kcal kept on tuesday
+    assert 'about 850 kcal' in compiled.text
+    assert '{"meal":M}' in compiled.text and 'Tofu' in compiled.text
+    assert compiled.tokens < 400
+
+
+def test_extract_and_apply_replacement_keep_the_rest_of_the_week():
+    week = make_week()
+    target = parse_regeneration_target({'day': 'friday', 'mealType': 'snacks', 'mealIndex': 1})
+    assert extract_replacement({'meal': {'name': ''}}, target) is None
+    replacement = extract_replacement({'meal': meal('Hummus and carrots', 200)}, target)
+
+    merged = apply_replacement(week, target, replacement)
+    assert list(merged) == WEEKDAYS
+    assert [snack['name'] for snack in merged['friday']['snacks']] == ['friday apple', 'Hummus and carrots']
+    assert merged['friday']['dinner'] is week['friday']['dinner']
+    assert week['friday']['snacks'][1]['name'] == 'friday yogurt'
+
+    day_target = parse_regeneration_target({'day': 'monday'})
+    assert extract_replacement({'day': {'breakfast': meal('Eggs')}}, day_target) is None
+    day = extract_replacement({'day': {slot: meal(slot) for slot in ('breakfast', 'lunch', 'dinner')}}, day_target)
+    assert day['snacks'] == []
+
+
+def test_plan_update_sets_attributes_and_guards_the_revision():
+    key = {'user_id': 'u1', 'plan_date': '2025-03-01'}
+    update = build_plan_update(key, {'meal_count': 21, 'updated_at': 'now'}, 'plan-1', revision=3,
+                               remove=['meal_plan'])
+
+    assert update['Key'] == key
+    assert update['UpdateExpression'] == 'SET #a0 = :a0, #a1 = :a1 ADD #rev :one REMOVE #r0'
+    assert update['ExpressionAttributeNames']['#a0'] == 'meal_count'
+    assert update['ExpressionAttributeNames']['#r0'] == 'meal_plan'
+    assert update['ConditionExpression'] == '#plan_id = :plan_id AND #rev = :revision'
+    assert update['ExpressionAttributeValues'][':revision'] == 3
+
+    first = build_plan_update(key, {'meal_count': 21}, 'plan-1')
+    assert 'attribute_not_exists(#rev)' in first['ConditionExpression']
+
+
+class FakeMealPlansTable:
+    def __init__(self, item):
+        self.item = item
+        self.updates = []
+
+    def get_item(self, Key):
+        return {'Item': self.item} if self.item and Key['plan_date'] == self.item['plan_date'] else {}
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+        return {'Attributes': {'plan_revision': 1}}
+
+
+class FakeBedrock:
+    def __init__(self, reply):
+        self.reply = reply
+        self.requests = []
+
+    def invoke(self, model_id, body, max_attempts=None):
+        self.requests.append(body)
+        return {'content': [{'text': json.dumps(self.reply)}], 'usage': {'output_tokens': 300}}
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    module = load_lambda_handler('generate_plan', monkeypatch)
+    monkeypatch.setattr(module, 'get_image_resolver', lambda: None)
+    monkeypatch.setattr(module, 'get_recent_grocery_items', lambda user_id: [])
+    return module
+
+
+def saved_item():
+    item = {'user_id': 'u1', 'plan_date': '2025-03-01', 'plan_id': 'plan-1', 'status': 'active',
+            'preferences_used': PREFERENCES}
+    item.update(encode_meal_plan({'weeklyPlan': make_week(), 'meals': [], 'weeklyTotals': {'estimatedCost': 100}}))
+    return item
+
+
+def invoke(handler, regenerate):
+    event = {'body': json.dumps({'userId': 'u1', 'regenerate': regenerate})}
+    response = handler.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def test_regenerating_one_dinner_updates_the_saved_plan_in_place(handler, monkeypatch):
+    table = FakeMealPlansTable(saved_item())
+    bedrock = FakeBedrock({'meal': {'name': 'Tofu stir fry', 'ingredients': ['200g tofu'], 'prepTime': '20 mins'}})
+    monkeypatch.setattr(handler, 'meal_plans_table', table)
+    monkeypatch.setattr(handler, 'bedrock', bedrock)
+
+    status, body = invoke(handler, {'planDate': '2025-03-01', 'day': 'tuesday', 'mealType': 'dinner'})
+
+    assert status == 200
+    assert body['regenerated'] == {'scope': 'slot', 'day': 'tuesday', 'mealType': 'dinner', 'mealIndex': None}
+    assert bedrock.requests[0]['max_tokens'] < handler.MAX_TOKENS_PER_DAY
+    assert body['mealPlan']['weeklyPlan']['tuesday']['dinner']['name'] == 'Tofu stir fry'
+    assert body['revision'] == 1
+
+    update = table.updates[0]
+    assert update['UpdateExpression'].startswith('SET ')
+    values = {update['ExpressionAttributeNames'][name.replace(':', '#')]: value
+              for name, value in update['ExpressionAttributeValues'].items() if name.startswith(':a')}
+    stored = decode_meal_plan(values)
+    assert stored['weeklyPlan']['tuesday']['dinner']['name'] == 'Tofu stir fry'
+    assert stored['weeklyPlan']['monday']['dinner']['name'] == 'monday salmon'
+
+
+def test_regenerate_errors_map_to_status_codes(handler, monkeypatch):
+    table = FakeMealPlansTable(saved_item())
+    monkeypatch.setattr(handler, 'meal_plans_table', table)
+    monkeypatch.setattr(handler, 'bedrock', FakeBedrock({'meal': meal('Pasta')}))
+
+    assert invoke(handler, {'planDate': '2025-03-01', 'day': 'funday'})[0] == 400
+    assert invoke(handler, {'planDate': '2025-01-01', 'day': 'monday'})[0] == 404
+
+    class ConditionalCheckFailed(Exception):
+        response = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+
+    def conflict(**kwargs):
+        raise ConditionalCheckFailed()
+
+    monkeypatch.setattr(table, 'update_item', conflict)
+    assert invoke(handler, {'planDate': '2025-03-01', 'day': 'monday', 'mealType': 'lunch'})[0] == 409
@@ -0,0 +1,100 @@
+"""
+Tests for the parallel per-day meal plan fan-out
+"""
+import json
+import threading
+import time
+
+import pytest
+
+from conftest import load_lambda_handler
+from plan_fanout import WEEKDAYS, chunk_days, generate_days_in_parallel
+
+
+def day_meals(day):
+    return {"breakfast": {"name": f"{day} oats", "calories": 400}}
+
+
+def test_chunk_days():
+    assert chunk_days(WEEKDAYS, 2) == [
+        ['monday', 'tuesday'], ['wednesday', 'thursday'], ['friday', 'saturday'], ['sunday']
+    ]
+    assert len(chunk_days(WEEKDAYS, 1)) == 7
+
+
+def test_chunks_run_concurrently_and_merge_in_order():
+    def generate(days):
+        time.sleep(0.1)
+        return {day: day_meals(day) for day in reversed(days)}
+
+    started = time.time()
+    weekly_plan, failed = generate_days_in_parallel(generate, days_per_call=1, max_workers=7)
+    elapsed = time.time() - started
+
+    assert failed == []
+    assert list(weekly_plan) == WEEKDAYS
+    assert elapsed < 0.5
+
+
+def test_pool_is_bounded():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def generate(days):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+        return {day: day_meals(day) for day in days}
+
+    generate_days_in_parallel(generate, days_per_call=1, max_workers=3)
+    assert max(peak) <= 3
+
+
+def test_only_failed_days_are_retried():
+    calls = []
+
+    def generate(days):
+        calls.append(list(days))
+        # First call for the Wednesday/Thursday chunk drops Thursday
+        if days == ['wednesday', 'thursday']:
+            return {'wednesday': day_meals('wednesday')}
+        if days == ['friday', 'saturday'] and calls.count(['friday', 'saturday']) == 1:
+            raise RuntimeError("ThrottlingException")
+        return {day: day_meals(day) for day in days}
+
+    weekly_plan, failed = generate_days_in_parallel(generate, days_per_call=2, max_workers=4, retry_delay=0)
+
+    assert failed == []
+    assert list(weekly_plan) == WEEKDAYS
+    assert ['thursday'] in calls
+    assert calls.count(['monday', 'tuesday']) == 1
+
+
+def test_days_that_keep_failing_are_reported():
+    def generate(days):
+        if 'sunday' in days:
+            raise RuntimeError("model error")
+        return {day: day_meals(day) for day in days}
+
+    weekly_plan, failed = generate_days_in_parallel(generate, days_per_call=1, max_retries=1, retry_delay=0)
+
+    assert failed == ['sunday']
+    assert 'sunday' not in weekly_plan
+    assert len(weekly_plan) == 6
+
+
+def test_days_per_call_is_validated_and_clamped(monkeypatch):
+    handler = load_lambda_handler('generate_plan', monkeypatch)
+    assert [handler.parse_days_per_call(value) for value in (None, '1', 0, -3, 7, 1.0)] == [2, 1, 1, 1, 2, 1]
+    for value in ('two', '1.5', [1], True):
+        with pytest.raises(ValueError):
+            handler.parse_days_per_call(value)
+
+    event = {'body': json.dumps({'userId': 'u1', 'generationMode': 'parallel', 'daysPerCall': 'lots'})}
+    response = handler.lambda_handler(event, None)
+    assert response['statusCode'] == 400
+    assert 'daysPerCall' in json.loads(response['body'])['error']
@@ -0,0 +1,149 @@
+"""
+Tests for asynchronous generate-plan jobs and their status lookup
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import load_lambda_handler
+from plan_jobs import JOB_FAILED, JOB_QUEUED, JOB_SUCCEEDED, LocalJobQueue, PlanJobStore, sqs_records_to_messages
+
+
+class FakeTable:
+    """In-memory stand-in for a single-key DynamoDB Table resource"""
+
+    def __init__(self, key_name):
+        self.key_name = key_name
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key[self.key_name])
+        return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item[self.key_name]] = dict(Item)
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues):
+        item = self.items.setdefault(Key[self.key_name], dict(Key))
+        for assignment in UpdateExpression[len('SET '):].split(', '):
+            name, value = assignment.split(' = ')
+            item[ExpressionAttributeNames[name]] = ExpressionAttributeValues[value]
+
+
+@pytest.fixture
+def generate_plan(monkeypatch):
+    handler = load_lambda_handler('generate_plan', monkeypatch, {'PLAN_JOBS_TABLE': 'PlanJobs'})
+    store = PlanJobStore(FakeTable('job_id'))
+    queue = LocalJobQueue(handler.process_plan_job, run_inline=True)
+    monkeypatch.setattr(handler, 'plan_job_store', store)
+    monkeypatch.setattr(handler, '_job_queue', queue)
+    return handler
+
+
+def api_event(body):
+    return {'body': json.dumps(body)}
+
+
+def test_store_tracks_job_lifecycle():
+    store = PlanJobStore(FakeTable('job_id'), ttl_seconds=60)
+    store.create('job-1', 'user-1', 'parallel')
+    assert store.get('job-1')['status'] == JOB_QUEUED
+    assert store.get('job-1')['expires_at'] > 0
+
+    store.mark_running('job-1')
+    store.mark_succeeded('job-1', 'job-1', '2025-01-06')
+    job = store.get('job-1')
+    assert job['status'] == JOB_SUCCEEDED
+    assert job['plan_date'] == '2025-01-06'
+    assert 'started_at' in job and 'finished_at' in job
+
+
+def test_sqs_records_skip_malformed_bodies():
+    event = {'Records': [{'body': '{"jobId": "a"}'}, {'messageId': 'm2', 'body': 'not json'}]}
+    assert sqs_records_to_messages(event) == [{'jobId': 'a'}]
+
+
+def test_async_post_returns_job_id_and_worker_saves_plan(generate_plan, monkeypatch):
+    calls = []
+
+    def fake_generation(user_id, body, plan_id=None, plan_date=None):
+        calls.append((user_id, body, plan_id, plan_date))
+        return {'planId': plan_id, 'mealPlan': {'meals': []}, 'generationMode': 'standard', 'cache': {}}
+
+    monkeypatch.setattr(generate_plan, 'run_plan_generation', fake_generation)
+    response = generate_plan.lambda_handler(api_event({'userId': 'u1', 'async': True}), None)
+
+    assert response['statusCode'] == 202
+    job_id = json.loads(response['body'])['jobId']
+    assert generate_plan._job_queue.sent[0]['jobId'] == job_id
+
+    # The worker reuses the job id as the plan id
+    assert calls[0][0] == 'u1' and calls[0][2] == job_id
+    job = generate_plan.plan_job_store.get(job_id)
+    assert job['status'] == JOB_SUCCEEDED
+    assert job['plan_id'] == job_id
+
+
+def test_worker_records_failures_and_skips_completed_jobs(generate_plan, monkeypatch):
+    def failing_generation(user_id, body, plan_id=None, plan_date=None):
+        raise RuntimeError('Bedrock throttled')
+
+    monkeypatch.setattr(generate_plan, 'run_plan_generation', failing_generation)
+    store = generate_plan.plan_job_store
+    store.create('job-2', 'u1', 'standard')
+
+    event = {'Records': [{'body': json.dumps({'jobId': 'job-2', 'userId': 'u1', 'body': {}})}]}
+    assert generate_plan.lambda_handler(event, None) == {'processed': 1}
+    assert store.get('job-2')['status'] == JOB_FAILED
+    assert 'Bedrock throttled' in store.get('job-2')['error']
+
+    # Redelivery of an already finished job doesn't regenerate it
+    store.mark_succeeded('job-2', 'job-2', '2025-01-06')
+    generate_plan.lambda_handler(event, None)
+    assert store.get('job-2')['status'] == JOB_SUCCEEDED
+
+
+def test_get_meal_plan_reports_job_status(monkeypatch):
+    handler = load_lambda_handler('get_meal_plan', monkeypatch, {'PLAN_JOBS_TABLE': 'PlanJobs'})
+    jobs = FakeTable('job_id')
+    monkeypatch.setattr(handler, 'plan_jobs_table', jobs)
+    monkeypatch.setattr(handler, 'get_specific_meal_plan',
+                        lambda user_id, plan_date: {'planId': 'job-3', 'planDate': plan_date})
+
+    store = PlanJobStore(jobs)
+    store.create('job-3', 'u1', 'standard')
+    queued = handler.lambda_handler({'queryStringParameters': {'jobId': 'job-3'}}, None)
+    assert json.loads(queued['body'])['job']['status'] == JOB_QUEUED
+
+    store.mark_succeeded('job-3', 'job-3', '2025-01-06')
+    done = json.loads(handler.lambda_handler({'queryStringParameters': {'jobId': 'job-3'}}, None)['body'])
+    assert done['job']['status'] == JOB_SUCCEEDED
+    assert done['job']['mealPlan'] == {'planId': 'job-3', 'planDate': '2025-01-06'}
+
+    missing = handler.lambda_handler({'queryStringParameters': {'jobId': 'nope'}}, None)
+    assert missing['statusCode'] == 404
+
+
+def test_get_meal_plan_fails_stale_and_replaced_jobs(monkeypatch):
+    handler = load_lambda_handler('get_meal_plan', monkeypatch, {'PLAN_JOBS_TABLE': 'PlanJobs'})
+    jobs = FakeTable('job_id')
+    monkeypatch.setattr(handler, 'plan_jobs_table', jobs)
+    # Another generation the same day saved its plan under the same date
+    monkeypatch.setattr(handler, 'get_specific_meal_plan',
+                        lambda user_id, plan_date: {'planId': 'later-plan', 'planDate': plan_date})
+
+    store = PlanJobStore(jobs)
+    store.create('job-4', 'u1', 'standard')
+    store.mark_running('job-4')
+    assert handler.get_plan_job('job-4')['status'] == 'running'
+
+    # The Lambda timed out mid-job and never recorded a result
+    started = datetime.now() - timedelta(seconds=handler.STALE_JOB_SECONDS + 60)
+    jobs.items['job-4']['started_at'] = started.isoformat()
+    stale = handler.get_plan_job('job-4')
+    assert (stale['status'], stale['error']) == (JOB_FAILED, 'Meal plan job timed out')
+
+    store.mark_succeeded('job-4', 'job-4', '2025-01-06')
+    replaced = handler.get_plan_job('job-4')
+    assert replaced['status'] == JOB_FAILED and replaced['mealPlan'] is None
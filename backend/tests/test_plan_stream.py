@@ -0,0 +1,180 @@
+"""
+Tests for incremental per-day parsing of streamed meal plans
+"""
+import json
+from decimal import Decimal
+
+import pytest
+
+from conftest import load_lambda_handler
+from plan_fanout import WEEKDAYS
+from plan_stream import DayStreamParser, read_meal_plan_stream
+
+PREFERENCES = {'budget': 100, 'caloricTarget': 2000, 'proteinTarget': 150, 'carbTarget': 200, 'fatTarget': 65,
+               'dietaryRestrictions': ''}
+
+SAMPLE_PLAN = {
+    "weeklyPlan": {
+        "monday": {
+            "breakfast": {"name": "Oats {with} \"berries\"", "calories": 400},
+            "snacks": [{"name": "Apple", "calories": 95}]
+        },
+        "tuesday": {
+            "breakfast": {"name": "Eggs", "calories": 350},
+            "dinner": {"name": "Salmon", "calories": 600}
+        }
+    },
+    "tips": ["Drink water"]
+}
+
+
+def make_stream(text, chunk_size):
+    """Wrap text into Bedrock InvokeModelWithResponseStream events"""
+    events = [{'chunk': {'bytes': json.dumps({'type': 'message_start'}).encode()}}]
+    for i in range(0, len(text), chunk_size):
+        payload = {'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': text[i:i + chunk_size]}}
+        events.append({'chunk': {'bytes': json.dumps(payload).encode()}})
+    events.append({'chunk': {'bytes': json.dumps({'type': 'message_stop'}).encode()}})
+    return events
+
+
+def test_days_emitted_as_they_close():
+    text = "Here is your plan:\n" + json.dumps(SAMPLE_PLAN, indent=2)
+    monday_end = text.index('"tuesday"')
+
+    parser = DayStreamParser()
+    first = parser.feed(text[:monday_end])
+    rest = parser.feed(text[monday_end:])
+
+    assert first == [("monday", SAMPLE_PLAN["weeklyPlan"]["monday"])]
+    assert rest == [("tuesday", SAMPLE_PLAN["weeklyPlan"]["tuesday"])]
+
+
+def test_nested_objects_are_not_emitted_as_days():
+    parser = DayStreamParser()
+    days = parser.feed(json.dumps(SAMPLE_PLAN))
+    assert [name for name, _ in days] == ["monday", "tuesday"]
+
+
+def test_read_meal_plan_stream_single_character_chunks():
+    text = json.dumps(SAMPLE_PLAN)
+    seen = []
+
+    full_text = read_meal_plan_stream(make_stream(text, 1), lambda day, meals: seen.append(day))
+
+    assert full_text == text
+    assert seen == ["monday", "tuesday"]
+
+
+def test_read_meal_plan_stream_raises_on_error_event():
+    events = make_stream(json.dumps(SAMPLE_PLAN), 50)[:2]
+    events.append({'throttlingException': {'message': 'Too many requests'}})
+
+    try:
+        read_meal_plan_stream(events, lambda day, meals: None)
+    except RuntimeError as e:
+        assert 'throttlingException' in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+
+
+def full_week_plan():
+    day = {'breakfast': {'name': 'Oats', 'ingredients': ['1 cup oats']},
+           'lunch': {'name': 'Rice Bowl', 'ingredients': ['1 cup rice']},
+           'dinner': {'name': 'Salmon', 'ingredients': ['150g salmon']},
+           'snacks': [{'name': 'Apple', 'ingredients': ['1 apple']}]}
+    return {'weeklyPlan': {name: dict(day) for name in WEEKDAYS}}
+
+
+class FakeEventStream:
+    def __init__(self, events, error=None):
+        self.events = events
+        self.error = error
+
+    def __iter__(self):
+        for event in self.events:
+            yield event
+        if self.error:
+            raise self.error
+
+    def close(self):
+        pass
+
+
+class StreamedPlansTable:
+    def __init__(self):
+        self.puts = []
+        self.updates = []
+
+    def put_item(self, Item):
+        self.puts.append(Item)
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+
+
+class CountingResolver:
+    def __init__(self):
+        self.batches = []
+
+    def resolve(self, meals):
+        self.batches.append(list(meals))
+        return ['https://images.example/meal.jpg'] * len(meals)
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    handler = load_lambda_handler('generate_plan', monkeypatch)
+    resolver = CountingResolver()
+    table = StreamedPlansTable()
+    monkeypatch.setattr(handler, 'get_image_resolver', lambda: resolver)
+    monkeypatch.setattr(handler, 'meal_plans_table', table)
+
+    def use_stream(stream):
+        monkeypatch.setattr(handler.model_router, 'invoke_stream', lambda client, decision, request: stream)
+
+    return handler, resolver, table, use_stream
+
+
+def test_streamed_days_are_published_before_images_are_resolved(streaming):
+    handler, resolver, table, use_stream = streaming
+    use_stream(FakeEventStream(make_stream(json.dumps(full_week_plan()), 200)))
+
+    plan_id, meal_plan = handler.generate_and_publish_streaming('u1', PREFERENCES, [], plan_date='2025-03-03')
+
+    assert len(table.updates) == len(WEEKDAYS)
+    published = [meal for update in table.updates for meal in update['ExpressionAttributeValues'][':meals']]
+    assert all(meal['img'] == handler.get_default_image(meal['meal'].lower()) for meal in published)
+    # One lookup batch for the whole week, after the stream was read
+    assert len(resolver.batches) == 1 and len(resolver.batches[0]) == 4 * len(WEEKDAYS)
+    assert all(meal['img'].startswith('https://images.example/') for meal in meal_plan['meals'])
+
+
+def test_streaming_record_stores_float_preferences_as_decimals(streaming):
+    handler, _, table, use_stream = streaming
+    use_stream(FakeEventStream(make_stream(json.dumps(full_week_plan()), 500)))
+
+    handler.generate_and_publish_streaming('u1', dict(PREFERENCES, budget=87.5), [], plan_date='2025-03-03')
+
+    assert table.puts[0]['status'] == 'generating'
+    budget = table.puts[0]['preferences_used']['budget']
+    assert isinstance(budget, Decimal) and budget == Decimal('87.5')
+
+
+def test_interrupted_stream_saves_the_streamed_days_as_a_model_plan(streaming, monkeypatch):
+    handler, _, table, use_stream = streaming
+    # A catalog that could stand in for the whole week must not label the streamed days
+    catalog_week = {'weeklyPlan': full_week_plan()['weeklyPlan'], 'meals': [], 'source': 'catalog',
+                    'tips': ["AI generation is unavailable; this week was built from saved recipes."]}
+    monkeypatch.setattr(handler, 'build_catalog_meal_plan', lambda *args, **kwargs: dict(catalog_week))
+    text = json.dumps(full_week_plan())
+    events = make_stream(text[:text.index('"wednesday"')], 100)
+    use_stream(FakeEventStream(events, error=RuntimeError('connection reset')))
+
+    _, meal_plan = handler.generate_and_publish_streaming('u1', PREFERENCES, [], plan_date='2025-03-03')
+
+    assert list(meal_plan['weeklyPlan']) == ['monday', 'tuesday']
+    assert meal_plan['missingDays'] == WEEKDAYS[2:]
+    assert 'source' not in meal_plan
+    assert not any('unavailable' in tip for tip in meal_plan['tips'])
+    assert len(meal_plan['meals']) == 8
@@ -0,0 +1,46 @@
+"""
+Tests for the token-budgeted meal plan prompt compiler
+"""
+from prompt_compiler import compile_meal_plan_prompt, estimate_tokens, rank_pantry_items
+
+PREFERENCES = {
+    'budget': 100,
+    'dietaryRestrictions': 'vegetarian, no nuts',
+    'nutritionGoal': 'weight-loss',
+    'caloricTarget': 1800,
+    'proteinTarget': 120,
+    'carbTarget': 150,
+    'fatTarget': 60
+}
+
+
+def test_ranking_prefers_frequent_then_recent_and_drops_non_food():
+    items = [{'name': 'Spinach'}, {'name': 'Eggs'}, {'name': 'Sales Tax'},
+             {'name': 'eggs'}, {'name': 'Mixed Nuts'}, {'name': 'Rice'}]
+    assert rank_pantry_items(items, PREFERENCES) == ['Eggs', 'Spinach', 'Rice']
+
+
+def test_prompt_includes_preferences_and_requested_days():
+    compiled = compile_meal_plan_prompt(PREFERENCES, [{'name': 'Quinoa'}], days=['monday', 'tuesday'])
+    assert '2-day' in compiled.text
+    assert 'monday, tuesday' in compiled.text
+    assert '$100' in compiled.text and '1800 kcal' in compiled.text
+    assert 'Quinoa' in compiled.text
+    assert '"weeklyPlan"' in compiled.text
+
+
+def test_pantry_is_trimmed_to_token_budget():
+    grocery_items = [{'name': f'Ingredient number {i}'} for i in range(300)]
+    unbounded = compile_meal_plan_prompt(PREFERENCES, grocery_items, input_token_budget=100000)
+    bounded = compile_meal_plan_prompt(PREFERENCES, grocery_items, input_token_budget=400)
+
+    assert len(unbounded.pantry_items) == 300
+    assert bounded.tokens <= 400
+    assert 0 < len(bounded.pantry_items) < 300
+    assert len(bounded.pantry_items) + len(bounded.dropped_items) == 300
+    # The most relevant (most recent) items are the ones kept
+    assert bounded.pantry_items[0] == 'Ingredient number 0'
+
+
+def test_estimate_tokens_grows_with_text():
+    assert 0 < estimate_tokens('chicken') < estimate_tokens('grilled chicken with brown rice')
@@ -0,0 +1,252 @@
+"""
+Tests for analyze_receipt_ai reading parsed receipts and caching insights on them
+"""
+import json
+from decimal import Decimal
+
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import load_lambda_handler
+from utils.receipts import receipt_key
+from utils.result_cache import ResultCache
+
+S3_KEY = 'receipts/u1/20250301-120000-receipt.jpg'
+
+# Model output: categories come from the local categorizer, the model only places leftovers
+INSIGHTS = {
+    'itemCategories': {},
+    'nutritionalAssessment': {'healthScore': 8},
+    'budgetAnalysis': {'totalSpent': 12.5},
+    'recipeSuggestions': [],
+    'missingEssentials': [],
+    'mealPlanIdeas': [],
+    'healthTips': []
+}
+
+
+class FakeReceiptsTable:
+    def __init__(self, items):
+        self.items = {(item['user_id'], item['receipt_id']): item for item in items}
+        self.reads = []
+
+    def get_item(self, Key):
+        self.reads.append(Key)
+        item = self.items.get((Key['user_id'], Key['receipt_id']))
+        return {'Item': item} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeNames,
+                    ExpressionAttributeValues):
+        item = self.items.get((Key['user_id'], Key['receipt_id']))
+        current = (item or {}).get('ai_insights')
+        current_total = ((current or {}).get('budgetAnalysis') or {}).get('totalSpent')
+        if item is None or 'attribute_not_exists(#insights)' in ConditionExpression and current is not None or \
+                ':previous_total' in ConditionExpression and \
+                current_total != ExpressionAttributeValues[':previous_total'] or \
+                ':processed_at' in ConditionExpression and \
+                item.get('processed_at') != ExpressionAttributeValues[':processed_at']:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'failed'}},
+                              'UpdateItem')
+        item['ai_insights'] = ExpressionAttributeValues[':insights']
+
+
+class FakePreferencesTable:
+    def __init__(self):
+        self.spends = []
+
+    def get_item(self, Key):
+        return {'Item': {'user_id': Key['user_id'], 'preferences': {'budget': 80}}}
+
+    def update_item(self, **kwargs):
+        self.spends.append(float(kwargs['ExpressionAttributeValues'][':amount']))
+
+
+def model_response(reply):
+    return {'content': [{'text': json.dumps(reply)}], 'usage': {'input_tokens': 600, 'output_tokens': 900}}
+
+
+class FakeBedrock:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, model_id, request, max_attempts=None):
+        self.calls += 1
+        return model_response(INSIGHTS)
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    module = load_lambda_handler('analyze_receipt_ai', monkeypatch)
+    receipt = {'user_id': 'u1', 'receipt_id': '20250301-120000-receipt.jpg', 's3_key': S3_KEY,
+               'status': 'processed', 'items': [{'name': 'Spinach', 'price': Decimal('3.49'), 'quantity': 1}]}
+    empty = {'user_id': 'u1', 'receipt_id': 'empty.jpg', 'status': 'processed', 'items': []}
+    # Another user's upload of the same shop: different case, spacing and price type
+    duplicate = {'user_id': 'u2', 'receipt_id': 'retake.jpg', 'status': 'processed',
+                 'items': [{'name': ' SPINACH', 'price': 3.49, 'quantity': 1}]}
+    monkeypatch.setattr(module, 'receipts_table', FakeReceiptsTable([receipt, empty, duplicate]))
+    monkeypatch.setattr(module, 'user_preferences_table', FakePreferencesTable())
+    monkeypatch.setattr(module, 'bedrock', FakeBedrock())
+    return module
+
+
+def invoke(handler, body):
+    response = handler.lambda_handler({'body': json.dumps(body)}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def test_receipt_key_comes_from_the_upload_key():
+    assert receipt_key(S3_KEY) == {'user_id': 'u1', 'receipt_id': '20250301-120000-receipt.jpg'}
+    with pytest.raises(ValueError):
+        receipt_key('receipts/u1/')
+
+
+def test_insights_are_stored_and_served_from_the_receipt(handler):
+    status, body = invoke(handler, {'s3Key': S3_KEY, 'userId': 'u1'})
+    assert status == 200 and body['cached'] is False
+    assert body['receiptId'] == '20250301-120000-receipt.jpg'
+    assert body['insights']['originalItems'][0]['name'] == 'Spinach'
+    assert body['insights']['categories']['produce'] == [{'name': 'Spinach', 'price': 3.49}]
+    assert handler.receipts_table.reads == [receipt_key(S3_KEY)]
+
+    status, body = invoke(handler, {'s3Key': S3_KEY, 'userId': 'u1'})
+    assert status == 200 and body['cached'] is True
+    assert body['insights']['nutritionalAssessment']['healthScore'] == 8
+    assert handler.bedrock.calls == 1
+
+    # The total is added to the ledger once; a re-analysis only adds a change in total
+    invoke(handler, {'s3Key': S3_KEY, 'userId': 'u1', 'forceRefresh': True})
+    assert handler.user_preferences_table.spends == [12.5]
+
+
+def test_racing_analyses_of_one_receipt_record_the_spend_once(handler, monkeypatch):
+    # Both requests read the receipt before either stored its insights
+    stale = dict(handler.receipts_table.items[('u1', '20250301-120000-receipt.jpg')])
+    monkeypatch.setattr(handler, 'get_receipt', lambda key: dict(stale))
+
+    assert invoke(handler, {'s3Key': S3_KEY, 'userId': 'u1'})[0] == 200
+    assert invoke(handler, {'s3Key': S3_KEY, 'userId': 'u1'})[0] == 200
+    assert handler.user_preferences_table.spends == [12.5]
+
+
+def test_missing_foreign_and_empty_receipts(handler):
+    assert invoke(handler, {'s3Key': 'receipts/u1/unknown.jpg', 'userId': 'u1'})[0] == 404
+    assert invoke(handler, {'s3Key': S3_KEY, 'userId': 'someone-else'})[0] == 404
+    # Leaving userId out doesn't skip the owner check
+    assert invoke(handler, {'s3Key': S3_KEY})[0] == 400
+    assert invoke(handler, {'s3Key': 'receipts/anonymous/r1.jpg'})[0] == 400
+
+    status, body = invoke(handler, {'s3Key': 'receipts/u1/empty.jpg', 'userId': 'u1'})
+    assert status == 200 and body['insights']['fallback'] is True
+    assert handler.bedrock.calls == 0
+    assert 'ai_insights' not in handler.receipts_table.items[('u1', 'empty.jpg')]
+
+
+class FakeCacheTable:
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key['cache_key'])
+        return {'Item': item} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item['cache_key']] = Item
+
+
+def test_identical_item_lists_share_insights_across_users(handler, monkeypatch):
+    shared = FakeCacheTable()
+    monkeypatch.setattr(handler, 'insight_cache', ResultCache(table=shared, key_prefix='insight#'))
+    assert invoke(handler, {'s3Key': S3_KEY, 'userId': 'u1'})[0] == 200
+    assert handler.bedrock.calls == 1
+    assert list(shared.items) and all(key.startswith('insight#') for key in shared.items)
+
+    # A cold container still finds the analysis in the shared tier
+    monkeypatch.setattr(handler, 'insight_cache', ResultCache(table=shared, key_prefix='insight#'))
+    status, body = invoke(handler, {'s3Key': 'receipts/u2/retake.jpg', 'userId': 'u2'})
+    assert status == 200 and handler.bedrock.calls == 1
+    assert body['insights']['nutritionalAssessment']['healthScore'] == 8
+    assert body['insights']['originalItems'][0]['name'] == ' SPINACH'
+    assert 'ai_insights' in handler.receipts_table.items[('u2', 'retake.jpg')]
+
+
+def test_insight_cache_key_covers_items_and_prompt_preferences(handler):
+    items = [{'name': 'Milk', 'price': Decimal('2.50'), 'quantity': 1},
+             {'name': 'Eggs', 'price': 4, 'quantity': 2}]
+    key = handler.make_insight_cache_key(items, {'budget': 80, 'dietaryRestrictions': 'Nuts, dairy'})
+
+    reordered = [{'name': 'eggs', 'price': 4.0, 'quantity': 2}, {'name': 'MILK ', 'price': 2.5}]
+    assert handler.make_insight_cache_key(
+        reordered, {'budget': '80', 'dietaryRestrictions': 'dairy,nuts', 'theme': 'dark'}) == key
+
+    assert handler.make_insight_cache_key(items, {'budget': 60, 'dietaryRestrictions': 'nuts,dairy'}) != key
+    assert handler.make_insight_cache_key(items[:1], {'budget': 80, 'dietaryRestrictions': 'nuts,dairy'}) != key
+
+
+class BatchBedrock:
+    """
+    Answers batch prompts for every label except the last, single prompts normally
+    """
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, model_id, request, max_attempts=None):
+        prompt = request['messages'][0]['content']
+        self.prompts.append(prompt)
+        labels = [line.split()[1].rstrip(':') for line in prompt.splitlines() if line.startswith('RECEIPT R')]
+        if not labels:
+            return model_response(INSIGHTS)
+        # Truncated: the last receipt's analysis never arrives
+        return model_response({label: INSIGHTS for label in labels[:-1]})
+
+
+def test_batch_analysis_packs_receipts_and_retries_the_missing_one(handler, monkeypatch):
+    monkeypatch.setattr(handler, 'bedrock', BatchBedrock())
+    receipts = [{'user_id': 'u1', 'receipt_id': f"r{n}", 'items': [{'name': f"Item {n}", 'price': n, 'quantity': 1}]}
+                for n in range(1, 4)] + [{'user_id': 'u1', 'receipt_id': 'empty', 'items': []}]
+    entries = [(receipt, {'budget': 80}) for receipt in receipts] + [(receipts[0], {'budget': 60})]
+    batches = handler.plan_insight_batches(entries, max_receipts=3)
+    assert [len(batch[0]) for batch in batches] == [3, 1, 1]
+
+    results = handler.analyze_receipt_batch(receipts, {'budget': 80})
+    # One packed request for the three receipts with items, one retry for the truncated last one
+    assert len(handler.bedrock.prompts) == 2
+    assert 'RECEIPT R3:' in handler.bedrock.prompts[0] and 'RECEIPT' not in handler.bedrock.prompts[1]
+    assert [result['originalItems'][0]['name'] for result in results[:3]] == ['Item 1', 'Item 2', 'Item 3']
+    assert results[3]['fallback'] is True
+
+    table = FakeReceiptsTable([dict(receipt) for receipt in receipts])
+    monkeypatch.setattr(handler, 'receipts_table', table)
+    assert handler.write_insights_batch(receipts, results) == 3
+    assert table.items[('u1', 'r1')]['ai_insights']['itemCount'] == 1
+
+
+def test_backfill_writes_skip_receipts_changed_since_the_scan(handler, monkeypatch):
+    scanned = [{'user_id': 'u1', 'receipt_id': f"r{n}", 'processed_at': '2025-03-01T12:00:00',
+                'items': [{'name': 'Milk', 'price': 2, 'quantity': 1}]} for n in range(1, 5)]
+    table = FakeReceiptsTable([dict(receipt) for receipt in scanned])
+    monkeypatch.setattr(handler, 'receipts_table', table)
+
+    # Between the scan and the write: the API analyzed r1, r2 was re-parsed and r3 deleted
+    table.items[('u1', 'r1')]['ai_insights'] = {'budgetAnalysis': {'totalSpent': Decimal('2')}}
+    table.items[('u1', 'r2')]['processed_at'] = '2025-03-02T09:00:00'
+    del table.items[('u1', 'r3')]
+
+    backfilled = dict(INSIGHTS, budgetAnalysis={'totalSpent': 99.0})
+    assert handler.write_insights_batch(scanned, [backfilled] * 4) == 1
+    assert table.items[('u1', 'r1')]['ai_insights'] == {'budgetAnalysis': {'totalSpent': Decimal('2')}}
+    assert 'ai_insights' not in table.items[('u1', 'r2')]
+    assert ('u1', 'r3') not in table.items
+    assert table.items[('u1', 'r4')]['ai_insights']['budgetAnalysis']['totalSpent'] == Decimal('99.0')
+
+
+def test_batch_inference_output_is_split_per_receipt(handler):
+    receipts = [{'items': [{'name': 'Milk', 'price': 2}]}, {'items': [{'name': 'Eggs', 'price': 4}]}]
+    record = handler.create_batch_inference_record('batch-000001', receipts, {'budget': 80})
+    assert record['modelInput']['max_tokens'] == 2 * handler.BATCH_MAX_TOKENS_PER_RECEIPT
+
+    output = dict(record, modelOutput={'content': [{'text': json.dumps({'R2': INSIGHTS, 'R1': {'categories': {}}})}]})
+    first, second = handler.read_batch_inference_output(output, receipts)
+    assert first is None
+    assert second['originalItems'][0]['name'] == 'Eggs'
+    assert handler.read_batch_inference_output({'recordId': 'x', 'error': {'errorCode': 400}}, receipts) == [None, None]
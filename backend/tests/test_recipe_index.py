@@ -0,0 +1,179 @@
+"""
+Tests for the ingredient -> recipe index used as a Bedrock-free fast path
+"""
+from decimal import Decimal
+
+from plan_cache import PlanCache
+from plan_fanout import WEEKDAYS
+from recipe_index import RecipeCatalog, RecipeIndex, normalize_ingredient
+from utils.plan_codec import encode_meal_plan
+
+
+def meal(name, ingredients, calories):
+    return {'name': name, 'ingredients': ingredients, 'prepTime': '15 mins',
+            'calories': calories, 'protein': 20, 'carbs': 30, 'fat': 10}
+
+
+SAVED_PLAN = {
+    'weeklyPlan': {
+        'monday': {
+            'breakfast': meal('Veggie Omelette', ['3 large eggs', 'spinach', 'salt'], 400),
+            'lunch': meal('Chicken Rice Bowl', ['chicken breast', 'brown rice', 'broccoli'], 600),
+            'dinner': meal('Salmon and Potatoes', ['salmon fillet', 'potatoes', 'olive oil'], 700),
+            'snacks': [meal('Greek Yogurt Cup', ['greek yogurt', 'berries'], 200)]
+        },
+        'tuesday': {
+            'breakfast': meal('Overnight Oats', ['rolled oats', 'milk', 'berries'], 450),
+            'lunch': meal('Peanut Noodles', ['rice noodles', 'peanut butter', 'carrots'], 650),
+            'dinner': meal('Chicken Stir-Fry', ['chicken thighs', 'broccoli', 'brown rice'], 650),
+            'snacks': [meal('Apple Slices', ['apple', 'peanut butter'], 180)]
+        }
+    }
+}
+
+
+def make_index():
+    index = RecipeIndex()
+    index.add_plan(SAVED_PLAN)
+    return index
+
+
+def test_normalize_ingredient_drops_quantities_and_descriptors():
+    assert normalize_ingredient('2 cups Chopped Tomatoes (ripe)') == 'tomato'
+    assert normalize_ingredient('1/2 lb boneless skinless chicken breasts') == 'chicken breast'
+
+
+def test_duplicate_meals_are_indexed_once():
+    index = make_index()
+    index.add_plan(SAVED_PLAN)
+    assert len(index) == 8
+
+
+def test_pantry_coverage_matches_partial_names_and_staples():
+    index = make_index()
+    coverage = index.pantry_coverage(['Eggs', 'baby spinach'])
+    omelette = index._by_name['veggie omelette']
+    # eggs and spinach from the pantry, salt is a staple
+    assert coverage[omelette] == 1.0
+
+    coverage = index.pantry_coverage(['chicken'])
+    assert coverage[index._by_name['chicken rice bowl']] == 1 / 3
+
+
+def test_assemble_week_rotates_covered_recipes():
+    pantry = ['eggs', 'spinach', 'oats', 'milk', 'berries', 'chicken', 'brown rice', 'broccoli',
+              'salmon', 'potatoes', 'rice noodles', 'peanut butter', 'carrots', 'greek yogurt', 'apple']
+    weekly_plan = make_index().assemble_week(pantry, {'caloricTarget': 2000})
+
+    assert list(weekly_plan) == WEEKDAYS
+    breakfasts = [weekly_plan[day]['breakfast']['name'] for day in WEEKDAYS]
+    assert set(breakfasts) == {'Veggie Omelette', 'Overnight Oats'}
+    assert breakfasts[0] != breakfasts[1]
+    assert all(len(weekly_plan[day]['snacks']) == 1 for day in WEEKDAYS)
+
+
+def test_assemble_week_needs_enough_covered_recipes():
+    index = make_index()
+    assert index.assemble_week(['eggs', 'spinach'], {}) is None
+    # With no coverage requirement any catalog recipe qualifies (Bedrock-down fallback)
+    assert index.assemble_week([], {}, min_coverage=0) is not None
+
+
+def test_assemble_week_respects_restrictions():
+    index = make_index()
+    preferences = {'dietaryRestrictions': 'no peanuts'}
+    weekly_plan = index.assemble_week([], preferences, min_coverage=0, min_choices=1)
+    assert {weekly_plan[day]['lunch']['name'] for day in WEEKDAYS} == {'Chicken Rice Bowl'}
+    assert {weekly_plan[day]['snacks'][0]['name'] for day in WEEKDAYS} == {'Greek Yogurt Cup'}
+
+    # Only one peanut-free lunch left, fewer than the default two choices
+    assert index.assemble_week([], preferences, min_coverage=0) is None
+
+
+VEGGIE_PLAN = {
+    'weeklyPlan': {
+        'wednesday': {
+            'breakfast': meal('Tofu Scramble', ['firm tofu', 'spinach'], 400),
+            'lunch': meal('Lentil Soup', ['lentils', 'carrots', 'vegetable broth'], 550),
+            'dinner': meal('Bean Chili', ['black beans', 'tomatoes', 'rice'], 650),
+            'snacks': [meal('Hummus and Carrots', ['hummus', 'carrots'], 200)]
+        }
+    }
+}
+
+
+def week_meal_names(weekly_plan, slots=('breakfast', 'lunch', 'dinner')):
+    return {weekly_plan[day][slot]['name'] for day in WEEKDAYS for slot in slots}
+
+
+def test_assemble_week_respects_diets():
+    index = make_index()
+    index.add_plan(VEGGIE_PLAN)
+
+    vegetarian = index.assemble_week([], {'dietaryRestrictions': 'vegetarian'}, min_coverage=0, min_choices=1)
+    assert week_meal_names(vegetarian) == {'Veggie Omelette', 'Overnight Oats', 'Tofu Scramble', 'Peanut Noodles',
+                                           'Lentil Soup', 'Bean Chili'}
+
+    vegan = index.assemble_week([], {'dietaryRestrictions': 'Vegan'}, min_coverage=0, min_choices=1)
+    assert week_meal_names(vegan) == {'Tofu Scramble', 'Peanut Noodles', 'Lentil Soup', 'Bean Chili'}
+    assert {vegan[day]['snacks'][0]['name'] for day in WEEKDAYS} == {'Apple Slices', 'Hummus and Carrots'}
+
+    # Only one meatless dinner, fewer than the default two choices
+    assert index.assemble_week([], {'dietaryRestrictions': 'vegetarian'}, min_coverage=0) is None
+
+
+def test_unparsed_restrictions_leave_the_week_to_the_model():
+    index = make_index()
+    pantry = ['spinach', 'rice', 'eggs', 'milk']
+    assert index.assemble_week(pantry, {'dietaryRestrictions': 'none'}, min_coverage=0) is not None
+    assert index.assemble_week(pantry, {'dietaryRestrictions': 'keto'}, min_coverage=0) is None
+    assert index.assemble_week(pantry, {'dietaryRestrictions': 'no nuts, halal'}, min_coverage=0) is None
+
+
+def test_records_round_trip():
+    index = make_index()
+    restored = RecipeIndex.from_records(index.to_records())
+    assert len(restored) == len(index)
+    assert restored.recipes[0]['slots'] == index.recipes[0]['slots']
+
+
+class ScanTable:
+    """Paginated Scan over stored MealPlans items (numbers as Decimal, like DynamoDB)"""
+
+    def __init__(self, items, page_size=1):
+        self.items = items
+        self.page_size = page_size
+        self.scans = 0
+
+    def scan(self, Limit, ProjectionExpression, ExpressionAttributeNames, ExclusiveStartKey=None):
+        self.scans += 1
+        start = ExclusiveStartKey['position'] if ExclusiveStartKey else 0
+        end = start + min(Limit, self.page_size)
+        response = {'Items': self.items[start:end]}
+        if end < len(self.items):
+            response['LastEvaluatedKey'] = {'position': end}
+        return response
+
+
+def test_catalog_builds_from_saved_plans_and_snapshots():
+    decimal_plan = {'weeklyPlan': {'monday': {
+        'breakfast': dict(SAVED_PLAN['weeklyPlan']['monday']['breakfast'], calories=Decimal('400'))
+    }}}
+    table = ScanTable([{'meal_plan': SAVED_PLAN}, {'meal_plan': decimal_plan}, {'meal_plan': {}}])
+    cache = PlanCache(max_entries=1, ttl_seconds=60)
+
+    index = RecipeCatalog(table=table, cache=cache).get()
+    assert len(index) == 8
+    assert table.scans == 3
+    assert index.recipes[0]['calories'] == 400
+
+    # A new container loads the snapshot instead of scanning again
+    fresh_table = ScanTable([])
+    assert len(RecipeCatalog(table=fresh_table, cache=cache).get()) == 8
+    assert fresh_table.scans == 0
+
+
+def test_catalog_reads_compressed_and_legacy_plans():
+    table = ScanTable([encode_meal_plan(SAVED_PLAN), {'meal_plan': SAVED_PLAN}], page_size=2)
+    index = RecipeCatalog(table=table, cache=None).get()
+    assert len(index) == 8
@@ -0,0 +1,93 @@
+"""
+Tests for the shopping list built from plan ingredients
+"""
+from shopping_list import build_shopping_list, format_amount
+
+WEEKLY_PLAN = {
+    'monday': {
+        'breakfast': {'name': 'Eggs on toast', 'ingredients': ['2 eggs', '2 slices bread', 'salt to taste']},
+        'lunch': {'name': 'Chicken bowl', 'ingredients': ['150g grilled chicken', '1 cup brown rice', '1 cup kale']},
+        'dinner': {'name': 'Salmon', 'ingredients': ['200g salmon fillet', '1 cup broccoli', '1/2 cup water']},
+        'snacks': [{'name': 'Latte', 'ingredients': ['1 cup almond milk']}]
+    },
+    'tuesday': {
+        'breakfast': {'name': 'Eggs', 'ingredients': ['3 Eggs', '1 tbsp butter']},
+        'lunch': {'name': 'Chicken wrap', 'ingredients': ['1 lb chicken breast', '1 whole wheat tortilla']},
+        'dinner': {'name': 'Mystery stew', 'ingredients': ['2 cups dragonfruit stew']},
+        'snacks': []
+    }
+}
+
+
+def by_name(items):
+    return {item['name']: item for item in items}
+
+
+def test_ingredients_are_aggregated_with_normalized_units():
+    items = by_name(build_shopping_list(WEEKLY_PLAN))
+
+    assert items['eggs']['count'] == 5 and items['eggs']['amount'] == '5'
+    # 150 g + 1 lb, "grilled chicken" and "chicken breast" are one item
+    assert items['chicken breast']['grams'] == 604
+    assert items['chicken breast']['amount'] == '605 g'
+    assert items['chicken breast']['uses'] == 2
+    assert items['salt']['amount'] == 'as needed'
+    # Aliases that are different products keep their own line
+    assert 'almond milk' in items and 'milk' not in items
+    assert 'kale' in items
+    assert 'water' not in items
+    assert items['dragonfruit stew']['category'] == 'other'
+
+
+def test_other_products_are_not_merged_into_a_shorter_row():
+    plan = {'monday': {
+        'breakfast': {'name': 'Smoothie', 'ingredients': ['1 cup coconut milk', '1 cup soy milk', '1 cup milk']},
+        'lunch': {'name': 'Stir-fry', 'ingredients': ['2 tbsp peanut oil', '1 tbsp olive oil']},
+        'dinner': {'name': 'Bagel', 'ingredients': ['2 tbsp cream cheese', '30g cheddar']},
+        'snacks': []
+    }}
+    items = by_name(build_shopping_list(plan))
+
+    assert {'coconut milk', 'soy milk', 'milk', 'peanut oil', 'olive oil', 'cream cheese', 'cheddar'} <= set(items)
+    assert items['milk']['uses'] == 1 and items['milk']['grams'] == 244
+    assert items['olive oil']['uses'] == 1
+
+
+def test_items_are_named_as_written_and_joined_foods_split():
+    plan = {'monday': {
+        'breakfast': {'name': 'Porridge', 'ingredients': ['1/2 cup oats', '1 cup mixed berries', '1 tsp salt']},
+        'lunch': {'name': 'Salad', 'ingredients': ['2 cups mixed greens', 'salt and pepper to taste']},
+        'dinner': {'name': 'Comfort food', 'ingredients': ['1 cup mac and cheese']},
+        'snacks': []
+    }}
+    items = by_name(build_shopping_list(plan))
+
+    assert {'oats', 'mixed berries', 'mixed greens', 'mac and cheese'} <= set(items)
+    assert not {'oat', 'mixed berry', 'mixed green'} & set(items)
+    # "salt and pepper to taste" is two items; the salt joins the measured teaspoon
+    assert not any('taste' in name for name in items)
+    assert items['salt']['uses'] == 2 and items['salt']['amount'] == '5 g'
+    assert len(items) == 6
+
+
+def test_list_is_sorted_by_aisle():
+    categories = [item['category'] for item in build_shopping_list(WEEKLY_PLAN)]
+    assert categories[0] == 'produce'
+    assert categories[-1] == 'other'
+    assert categories.index('protein') < categories.index('dairy') < categories.index('grains & bakery')
+
+
+def test_pantry_items_are_subtracted():
+    pantry = [{'name': 'Broccoli'}, '400g chicken breast', {'name': '12 eggs'}, {'name': 'Dish soap'}]
+    items = by_name(build_shopping_list(WEEKLY_PLAN, pantry))
+
+    assert 'broccoli' not in items
+    assert 'eggs' not in items
+    assert items['chicken breast']['grams'] == 204
+    assert 'salmon' in items
+
+
+def test_format_amount():
+    assert format_amount(1234, 0, 0) == '1.3 kg'
+    assert format_amount(42, 1.5, 0) == '2 + 45 g'
+    assert format_amount(0, 0, 2) == 'as needed'
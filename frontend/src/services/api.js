@@ -121,6 +121,32 @@ export const generateMealPlan = async (pantryItems, preferences, userId) => {
     }
 }
 
+/**
+ * Regenerate one day, meal slot, or snack of a saved meal plan (the rest of the week is kept)
+ * @param {string} userId - User session ID
+ * @param {string} planDate - Date of the saved plan (YYYY-MM-DD format)
+ * @param {string} day - Day to change (e.g. 'tuesday')
+ * @param {string} [mealType] - 'breakfast', 'lunch', 'dinner' or 'snacks'; omit to regenerate the whole day
+ * @param {number} [mealIndex] - Index of a single snack to replace
+ * @returns {Promise<Object>} Updated meal plan with meals array
+ * @throws {Object} Error object with status and message
+ */
+export const regenerateMealPlanPart = async (userId, planDate, day, mealType = null, mealIndex = null) => {
+    try {
+        const regenerate = { planDate, day }
+        if (mealType) regenerate.mealType = mealType
+        if (mealIndex !== null) regenerate.mealIndex = mealIndex
+
+        const response = await api.post('/generate-plan', {
+            userId,
+            regenerate
+        })
+        return response.data
+    } catch (error) {
+        handleApiError(error, 'regenerateMealPlanPart')
+    }
+}
+
 /**
  * Get all meal plans for a user
  * @param {string} userId - AWS Cognito user ID
@@ -306,7 +332,7 @@ export const getUserPreferences = async (userId) => {
 }
 
 /**
- * Reset weekly budget (clears total_spent)
+ * Reset weekly budget (clears this week's spend in the budget ledger)
  * @param {string} userId - User ID
  * @returns {Promise<Object>} Updated preferences
  * @throws {Object} Error object with status and message
@@ -28,6 +28,8 @@ lambda_stack = LambdaStack(
     user_preferences_table=dynamodb_stack.user_preferences_table,
     receipts_table=dynamodb_stack.receipts_table,
     receipts_bucket=s3_stack.receipts_bucket,
+    result_cache_table=dynamodb_stack.result_cache_table,
+    plan_jobs_table=dynamodb_stack.plan_jobs_table,
     iam_role=iam_stack.lambda_execution_role
 )
 # Pass lambda functions to API Gateway
@@ -47,3 +47,27 @@ class DynamoDBStack(Stack):
             ),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
         )
+
+        # Shared result cache for generated plans (entries expire via TTL)
+        self.result_cache_table = dynamodb.Table(
+            self,
+            "ResultCacheTable",
+            table_name="ResultCache",
+            partition_key=dynamodb.Attribute(
+                name="cache_key", type=dynamodb.AttributeType.STRING
+            ),
+            time_to_live_attribute="expires_at",
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        )
+
+        # Status of asynchronous generate-plan jobs, polled via get_meal_plan
+        self.plan_jobs_table = dynamodb.Table(
+            self,
+            "PlanJobsTable",
+            table_name="PlanJobs",
+            partition_key=dynamodb.Attribute(
+                name="job_id", type=dynamodb.AttributeType.STRING
+            ),
+            time_to_live_attribute="expires_at",
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        )
@@ -46,6 +46,8 @@ class IamRolesStack(Stack):
                     Fn.sub("arn:aws:dynamodb:${AWS::Region}:${AWS::AccountId}:table/MealPlans"),
                     Fn.sub("arn:aws:dynamodb:${AWS::Region}:${AWS::AccountId}:table/UserPreferences"),
                     Fn.sub("arn:aws:dynamodb:${AWS::Region}:${AWS::AccountId}:table/Receipts"),
+                    Fn.sub("arn:aws:dynamodb:${AWS::Region}:${AWS::AccountId}:table/ResultCache"),
+                    Fn.sub("arn:aws:dynamodb:${AWS::Region}:${AWS::AccountId}:table/PlanJobs"),
                     # Allow access to indexes
                     Fn.sub("arn:aws:dynamodb:${AWS::Region}:${AWS::AccountId}:table/MealPlans/index/*"),
                     Fn.sub("arn:aws:dynamodb:${AWS::Region}:${AWS::AccountId}:table/UserPreferences/index/*"),
@@ -2,6 +2,9 @@ from aws_cdk import (
     Stack,
     aws_lambda as _lambda,
     aws_iam as iam,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
+    BundlingOptions,
     Duration,
 )
 from constructs import Construct
@@ -17,11 +20,31 @@ class LambdaStack(Stack):
         user_preferences_table,
         receipts_table,
         receipts_bucket,
+        result_cache_table=None,
+        plan_jobs_table=None,
         iam_role=None, 
         **kwargs
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        # Shared Python modules (backend/lambdas/utils) packaged as a layer,
+        # importable from handlers as `from utils.<module> import ...`
+        self.shared_utils_layer = _lambda.LayerVersion(
+            self,
+            "SharedUtilsLayer",
+            code=_lambda.Code.from_asset(
+                "../backend/lambdas",
+                bundling=BundlingOptions(
+                    image=_lambda.Runtime.PYTHON_3_11.bundling_image,
+                    command=[
+                        "bash", "-c",
+                        "mkdir -p /asset-output/python && cp -r /asset-input/utils /asset-output/python/",
+                    ],
+                ),
+            ),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_9, _lambda.Runtime.PYTHON_3_11],
+            description="Shared helpers for Savr.ai Lambda functions",
+        )
 
         # Auth functions
         self.auth_login_function = _lambda.Function(
@@ -33,6 +56,7 @@ class LambdaStack(Stack):
             timeout=Duration.seconds(10),
             memory_size=128,
             role=iam_role,
+            layers=[self.shared_utils_layer],
             environment={
                 "COGNITO_DOMAIN": "https://us-east-1lwfygbjd9.auth.us-east-1.amazoncognito.com",
                 "COGNITO_CLIENT_ID": "68r61tb357f3dgk0lpsors0bsk",
@@ -49,6 +73,7 @@ class LambdaStack(Stack):
             timeout=Duration.seconds(10),
             memory_size=128,
             role=iam_role,
+            layers=[self.shared_utils_layer],
             environment={
                 "COGNITO_DOMAIN": "https://us-east-1lwfygbjd9.auth.us-east-1.amazoncognito.com",
                 "COGNITO_CLIENT_ID": "68r61tb357f3dgk0lpsors0bsk",
@@ -66,6 +91,7 @@ class LambdaStack(Stack):
             timeout=Duration.seconds(30),
             memory_size=256,
             role=iam_role,
+            layers=[self.shared_utils_layer],
             environment={
                 "RECEIPTS_BUCKET": receipts_bucket.bucket_name,
             },
@@ -74,31 +100,69 @@ class LambdaStack(Stack):
         receipts_bucket.grant_write(self.api_upload_function)
 
 
+        # Queue for asynchronous generate-plan jobs (body.async); the same
+        # function consumes it, outside API Gateway's 29s limit
+        self.plan_jobs_dlq = sqs.Queue(
+            self,
+            "PlanJobsDeadLetterQueue",
+            retention_period=Duration.days(4),
+        )
+        self.plan_jobs_queue = sqs.Queue(
+            self,
+            "PlanJobsQueue",
+            visibility_timeout=Duration.seconds(180),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=2, queue=self.plan_jobs_dlq),
+        )
+
         # Create Lambda functions for each handler
         self.generate_plan_function = _lambda.Function(
             self,
             "GeneratePlanFunction",
             runtime=_lambda.Runtime.PYTHON_3_9,
             handler="handler.lambda_handler",
-            code=_lambda.Code.from_asset("../backend/lambdas/generate_plan"),
+            # Bundled with requirements.txt so NumPy is there for the nutrition engine
+            code=_lambda.Code.from_asset(
+                "../backend/lambdas/generate_plan",
+                bundling=BundlingOptions(
+                    image=_lambda.Runtime.PYTHON_3_9.bundling_image,
+                    command=[
+                        "bash", "-c",
+                        "pip install -r requirements.txt -t /asset-output && cp -au . /asset-output",
+                    ],
+                ),
+            ),
             timeout=Duration.seconds(60),
             memory_size=512,
             role=iam_role,
+            layers=[self.shared_utils_layer],
             environment={
                 "MEAL_PLANS_TABLE": meal_plans_table.table_name,
                 "USER_PREFERENCES_TABLE": user_preferences_table.table_name,
                 "RECEIPTS_TABLE": receipts_table.table_name,
+                "RESULT_CACHE_TABLE": result_cache_table.table_name if result_cache_table else "",
                 "PEXELS_API_KEY": os.environ.get("PEXELS_API_KEY", ""),
+                "PLAN_JOBS_TABLE": plan_jobs_table.table_name if plan_jobs_table else "",
+                "PLAN_JOBS_QUEUE_URL": self.plan_jobs_queue.queue_url,
             },
         )
         # DDB access
         meal_plans_table.grant_read_write_data(self.generate_plan_function)
         user_preferences_table.grant_read_data(self.generate_plan_function)
         receipts_table.grant_read_data(self.generate_plan_function)
+        if result_cache_table:
+            result_cache_table.grant_read_write_data(self.generate_plan_function)
+        if plan_jobs_table:
+            plan_jobs_table.grant_read_write_data(self.generate_plan_function)
+        # Job worker: one job per invocation
+        self.plan_jobs_queue.grant_send_messages(self.generate_plan_function)
+        self.generate_plan_function.add_event_source(
+            lambda_event_sources.SqsEventSource(self.plan_jobs_queue, batch_size=1)
+        )
         # Bedrock invoke permissions (Claude 3.5 Sonnet only - no Titan needed)
+        # Streaming is used by generationMode=stream
         self.generate_plan_function.add_to_role_policy(
             iam.PolicyStatement(
-                actions=["bedrock:InvokeModel"],
+                actions=["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream"],
                 resources=[
                     "arn:aws:bedrock:*::foundation-model/anthropic.claude-*",
                     "arn:aws:bedrock:*:*:inference-profile/*"
@@ -116,11 +180,15 @@ class LambdaStack(Stack):
             timeout=Duration.seconds(30),
             memory_size=256,
             role=iam_role,
+            layers=[self.shared_utils_layer],
             environment={
                 "MEAL_PLANS_TABLE": meal_plans_table.table_name,
+                "PLAN_JOBS_TABLE": plan_jobs_table.table_name if plan_jobs_table else "",
             },
         )
         meal_plans_table.grant_read_data(self.get_meal_plan_function)
+        if plan_jobs_table:
+            plan_jobs_table.grant_read_data(self.get_meal_plan_function)
 
 
         self.parse_receipt_function = _lambda.Function(
@@ -132,6 +200,7 @@ class LambdaStack(Stack):
             timeout=Duration.seconds(60),
             memory_size=512,
             role=iam_role,
+            layers=[self.shared_utils_layer],
             environment={
                 "RECEIPTS_BUCKET": receipts_bucket.bucket_name,
                 "RECEIPTS_TABLE": receipts_table.table_name,
@@ -159,21 +228,27 @@ class LambdaStack(Stack):
             timeout=Duration.seconds(60),
             memory_size=512,
             role=iam_role,
+            layers=[self.shared_utils_layer],
             environment={
                 "RECEIPTS_TABLE": receipts_table.table_name,
                 "USER_PREFERENCES_TABLE": user_preferences_table.table_name,
+                "RESULT_CACHE_TABLE": result_cache_table.table_name if result_cache_table else "",
             },
         )
         # DDB access
         receipts_table.grant_read_write_data(self.analyze_receipt_ai_function)
         user_preferences_table.grant_read_write_data(self.analyze_receipt_ai_function)  # Write access for budget tracking
+        if result_cache_table:
+            # Insight cache shared across users (insight# keys)
+            result_cache_table.grant_read_write_data(self.analyze_receipt_ai_function)
         # Bedrock invoke permissions for AI analysis (Claude 4.5 Sonnet)
         self.analyze_receipt_ai_function.add_to_role_policy(
             iam.PolicyStatement(
                 actions=["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream"],
                 resources=[
                     "arn:aws:bedrock:*::foundation-model/us.anthropic.claude-sonnet-4-5*",
-                    "arn:aws:bedrock:*::foundation-model/anthropic.claude-*"
+                    "arn:aws:bedrock:*::foundation-model/anthropic.claude-*",
+                    "arn:aws:bedrock:*:*:inference-profile/*"
                 ],
             )
         )
@@ -189,6 +264,7 @@ class LambdaStack(Stack):
             timeout=Duration.seconds(10),
             memory_size=256,
             role=iam_role,
+            layers=[self.shared_utils_layer],
             environment={
                 "USER_PREFERENCES_TABLE": user_preferences_table.table_name,
             },